@@ -3,6 +3,7 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import bisect
 import codecs
 import collections
 import concurrent.futures
@@ -11,10 +12,12 @@
 import io
 import itertools
 import json
+import mmap
 import os
 import pathlib
 import re
 import shutil
+import struct
 import sys
 import tarfile
 import tempfile
@@ -23,8 +26,8 @@
 import urllib.parse
 import urllib.request
 import warnings
-from contextlib import closing
-from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+from contextlib import closing, contextmanager
+from typing import Any, Deque, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union, cast
 
 import llnl.util.filesystem as fsys
 import llnl.util.lang
@@ -52,6 +55,7 @@
 import spack.store
 import spack.user_environment
 import spack.util.archive
+import spack.util.chunking
 import spack.util.crypto
 import spack.util.file_cache as file_cache
 import spack.util.filesystem as ssys
@@ -63,6 +67,7 @@
 import spack.util.timer as timer
 import spack.util.url as url_util
 import spack.util.web as web_util
+import spack.version as vn
 from spack import traverse
 from spack.caches import misc_cache_location
 from spack.oci.image import (
@@ -87,15 +92,47 @@
 from spack.stage import Stage
 from spack.util.executable import which
 
-from .enums import InstallRecordStatus
-
 BUILD_CACHE_RELATIVE_PATH = "build_cache"
 BUILD_CACHE_KEYS_RELATIVE_PATH = "_pgp"
 
+#: Manifest of the index deltas pushed since index.json was generated, in the build cache
+INDEX_DELTAS_MANIFEST = "index.deltas.json"
+
+#: Directory of the index deltas, in the build cache
+INDEX_DELTAS_RELATIVE_PATH = "index-deltas"
+
+#: Number of index deltas after which pushing regenerates index.json instead of adding a delta
+MAX_INDEX_DELTAS = 64
+
 #: The build cache layout version that this version of Spack creates.
 #: Version 2: includes parent directories of the package prefix in the tarball
 CURRENT_BUILD_CACHE_LAYOUT_VERSION = 2
 
+#: The build cache layout version of zstd compressed tarballs, which older versions of Spack
+#: cannot read. Gzip compressed tarballs keep the current layout version.
+#: Version 3: the tarball is compressed with zstd, and starts with the buildinfo file
+ZSTD_BUILD_CACHE_LAYOUT_VERSION = 3
+
+#: The build cache layout version of chunked tarballs.
+#: Version 4: the .spack file is a manifest of the members of the tarball, and the content of
+#: files is stored in chunks shared by all specs in the build cache
+CHUNKED_BUILD_CACHE_LAYOUT_VERSION = 4
+
+#: The most recent build cache layout version that this version of Spack can read.
+MAX_SUPPORTED_BUILD_CACHE_LAYOUT_VERSION = 4
+
+#: Compression of the tarballs pushed to a build cache. With "gzip+zstd", a zstd tarball is
+#: pushed next to the gzip one, so that older versions of Spack can still use the latter. With
+#: "chunks", files are split in content-defined chunks, which are compressed and stored once
+#: per build cache, see ``spack.util.chunking``.
+BUILD_CACHE_COMPRESSIONS = ("gzip", "zstd", "gzip+zstd", "chunks")
+
+#: Compression of the .spack file by layout version, unless specified in the spec file
+_LAYOUT_COMPRESSION = {
+    ZSTD_BUILD_CACHE_LAYOUT_VERSION: "zstd",
+    CHUNKED_BUILD_CACHE_LAYOUT_VERSION: "chunks",
+}
+
 
 class BuildCacheDatabase(spack_db.Database):
     """A database for binary buildcaches.
@@ -112,6 +149,199 @@ def __init__(self, root):
         self._write_transaction_impl = llnl.util.lang.nullcontext
         self._read_transaction_impl = llnl.util.lang.nullcontext
 
+    def _read_from_spec_index(self, index: "BuildCacheSpecIndex") -> None:
+        """Fill the database from a spec index. Specs in any of its mirrors are marked
+        ``in_buildcache``, and are decoded from the memory mapped index on first access."""
+        records = {}
+        positions = {}
+        for i, dag_hash in enumerate(index.hashes()):
+            record = index.decode_fields(i)
+            record["in_buildcache"] = index.in_any_mirror(i)
+            records[dag_hash] = record
+            positions[dag_hash] = i
+
+        def node_loader(dag_hash: str):
+            return lambda: index.decode_spec(positions[dag_hash])
+
+        # Node dictionaries are converted to the current database version when the index is written
+        version = cast(vn.StandardVersion, spack_db._DB_VERSION)
+        self._read_installs(version, records, node_loader, index.path)
+
+    def query_by_names(self, names: Optional[Iterable[str]] = None) -> List["spack.spec.Spec"]:
+        """Return the specs in the build cache of the packages passed as input, or of all
+        packages if ``names`` is None. Unlike ``query_local``, the specs of other packages are not
+        constructed, and the specs returned are not connected to their dependents."""
+        records = (self._data[key] for key in self._query_index().select(names=names))
+        return [record.spec for record in records if record.in_buildcache]
+
+
+class BuildCacheSpecIndex:
+    """Compact, memory mapped index of the specs in the build caches of several mirrors.
+
+    The file starts with a fixed size header, containing a magic string, the version of this file
+    format, the number of mirrors, the number of specs, and the length of the list of mirror URLs
+    that follows as JSON. Then come the sorted DAG hashes of the specs, one bitset per mirror
+    marking the specs in its build cache, the offsets of the entries, and the entries. Like in
+    ``spack.database.BinaryIndexFile``, an entry has the length of two JSON payloads: the name
+    of the spec and whether it is external, and the node dictionary of the spec.
+
+    Looking up the mirrors of a spec is a binary search of its DAG hash followed by a test of one
+    bit per mirror, without decoding any payload. The index also contains specs that are not in
+    any mirror, but are dependencies of specs that are, so that all specs can be constructed from
+    it.
+
+    The file is never modified: indexes of different mirror contents are written to different
+    files, and replaced atomically.
+    """
+
+    MAGIC = b"SPACKBCI"
+    #: Version of the format of the index
+    FORMAT_VERSION = 1
+    #: Magic string, format version, number of mirrors, number of specs, length of mirror list
+    HEADER = struct.Struct("<8sHIII")
+    #: Length of the fields payload, length of the spec payload
+    ENTRY = struct.Struct("<II")
+    #: Offset of an entry
+    OFFSET = struct.Struct("<Q")
+    #: Length of a DAG hash
+    KEY_SIZE = 32
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if sys.platform == "win32" or size == 0:
+                    # Windows doesn't allow replacing files that are mapped in memory
+                    self.buffer: Any = f.read()
+                else:
+                    self.buffer = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            magic, fmt, num_mirrors, self.size, mirrors_len = self.HEADER.unpack_from(self.buffer)
+            if magic != self.MAGIC or fmt != self.FORMAT_VERSION:
+                raise ValueError("not a build cache spec index")
+            start = self.HEADER.size
+            self.mirrors: List[str] = json.loads(bytes(self.buffer[start : start + mirrors_len]))
+            if len(self.mirrors) != num_mirrors:
+                raise ValueError("invalid list of mirrors")
+        except (OSError, ValueError, struct.error) as e:
+            raise InvalidSpecIndexError(f"cannot read build cache spec index {path}: {e}") from e
+
+        self._keys_start = start + mirrors_len
+        self._bitset_size = (self.size + 7) // 8
+        self._bitsets_start = self._keys_start + self.size * self.KEY_SIZE
+        self._offsets_start = self._bitsets_start + num_mirrors * self._bitset_size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, i: int) -> str:
+        """DAG hash of the i-th spec"""
+        start = self._keys_start + i * self.KEY_SIZE
+        return self.buffer[start : start + self.KEY_SIZE].decode("ascii")
+
+    def hashes(self) -> Iterable[str]:
+        for i in range(self.size):
+            yield self[i]
+
+    def find(self, dag_hash: str) -> Optional[int]:
+        """Return the position of a DAG hash in the index, or None if it's not there"""
+        i = bisect.bisect_left(self, dag_hash)  # type: ignore[call-overload]
+        return i if i < self.size and self[i] == dag_hash else None
+
+    def _has_bit(self, mirror: int, i: int) -> bool:
+        byte = self.buffer[self._bitsets_start + mirror * self._bitset_size + (i >> 3)]
+        return bool(byte & (1 << (i & 7)))
+
+    def mirrors_of(self, i: int) -> List[str]:
+        """Return the URLs of the mirrors with the i-th spec in their build cache"""
+        return [url for m, url in enumerate(self.mirrors) if self._has_bit(m, i)]
+
+    def in_any_mirror(self, i: int) -> bool:
+        return any(self._has_bit(m, i) for m in range(len(self.mirrors)))
+
+    def _payloads(self, i: int) -> Tuple[int, int, int]:
+        (offset,) = self.OFFSET.unpack_from(
+            self.buffer, self._offsets_start + i * self.OFFSET.size
+        )
+        fields_len, spec_len = self.ENTRY.unpack_from(self.buffer, offset)
+        start = offset + self.ENTRY.size
+        return start, start + fields_len, start + fields_len + spec_len
+
+    def decode_fields(self, i: int) -> Dict[str, Any]:
+        """Decode the ``name`` of the i-th spec, and whether it is ``external``"""
+        start, end, _ = self._payloads(i)
+        return json.loads(bytes(self.buffer[start:end]))
+
+    def decode_spec(self, i: int) -> Dict[str, Any]:
+        """Decode the node dictionary of the i-th spec"""
+        _, start, end = self._payloads(i)
+        return json.loads(bytes(self.buffer[start:end]))
+
+    def close(self) -> None:
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    @classmethod
+    def write(
+        cls,
+        path: str,
+        mirrors: List[str],
+        nodes: Dict[str, Dict[str, Any]],
+        in_mirror: List[Set[str]],
+    ) -> None:
+        """Write an index of the spec nodes passed as input, keyed by DAG hash, where
+        ``in_mirror[m]`` are the DAG hashes in the build cache of the m-th mirror. The file is
+        replaced atomically."""
+        keys = sorted(nodes)
+        position = {dag_hash: i for i, dag_hash in enumerate(keys)}
+        bitset_size = (len(keys) + 7) // 8
+        bitsets = [bytearray(bitset_size) for _ in mirrors]
+        for bitset, hashes in zip(bitsets, in_mirror):
+            for dag_hash in hashes:
+                i = position[dag_hash]
+                bitset[i >> 3] |= 1 << (i & 7)
+
+        mirrors_json = json.dumps(mirrors).encode("utf-8")
+        entries_start = (
+            cls.HEADER.size
+            + len(mirrors_json)
+            + len(keys) * cls.KEY_SIZE
+            + len(mirrors) * bitset_size
+            + len(keys) * cls.OFFSET.size
+        )
+        entries = []
+        offsets = []
+        offset = entries_start
+        for dag_hash in keys:
+            node = nodes[dag_hash]
+            fields = {"name": node["name"], "external": bool(node.get("external"))}
+            fields_json = json.dumps(fields).encode("utf-8")
+            spec_json = json.dumps(node, separators=(",", ":")).encode("utf-8")
+            entry = cls.ENTRY.pack(len(fields_json), len(spec_json)) + fields_json + spec_json
+            offsets.append(offset)
+            entries.append(entry)
+            offset += len(entry)
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".spec-index-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(
+                    cls.HEADER.pack(
+                        cls.MAGIC, cls.FORMAT_VERSION, len(mirrors), len(keys), len(mirrors_json)
+                    )
+                )
+                f.write(mirrors_json)
+                f.write(b"".join(key.encode("ascii") for key in keys))
+                for bitset in bitsets:
+                    f.write(bitset)
+                f.write(b"".join(cls.OFFSET.pack(o) for o in offsets))
+                f.writelines(entries)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
 
 class FetchCacheError(Exception):
     """Error thrown when fetching the cache failed, usually a composite error list."""
@@ -166,23 +396,29 @@ def __init__(self, cache_root: Optional[str] = None):
         # stores a map of mirror URL to index hash and cache key (index path)
         self._local_index_cache: Optional[dict] = None
 
-        # hashes of remote indices already ingested into the concrete spec
-        # cache (_mirrors_for_spec)
-        self._specs_already_associated: Set[str] = set()
+        # memory mapped index of the specs in the cached remote indices, and the key of the
+        # cached indices it was generated from
+        self._spec_index: Optional[BuildCacheSpecIndex] = None
+        self._spec_index_key: Optional[str] = None
+
+        # database of the specs in _spec_index, constructed lazily when specs are listed
+        self._spec_index_db: Optional[BuildCacheDatabase] = None
 
         # mapping from mirror urls to the time.time() of the last index fetch and a bool indicating
         # whether the fetch succeeded or not.
         self._last_fetch_times: Dict[str, float] = {}
 
         # _mirrors_for_spec is a dictionary mapping DAG hashes to lists of
-        # entries indicating mirrors where that concrete spec can be found.
+        # entries indicating mirrors where that concrete spec can be found,
+        # for specs that were found by fetching their spec file directly
+        # rather than through _spec_index.
         # Each entry is a dictionary consisting of:
         #
         #     - the mirror where the spec is, keyed by ``mirror_url``
         #     - the concrete spec itself, keyed by ``spec`` (including the
         #           full hash, since the dag hash may match but we want to
         #           use the updated source if available)
-        self._mirrors_for_spec: Dict[str, dict] = {}
+        self._mirrors_for_spec: Dict[str, list] = {}
 
     def _init_local_index_cache(self):
         if not self._index_file_cache:
@@ -201,40 +437,89 @@ def _init_local_index_cache(self):
     def clear(self):
         """For testing purposes we need to be able to empty the cache and
         clear associated data structures."""
+        self._close_spec_index()
         if self._index_file_cache:
             self._index_file_cache.destroy()
             self._index_file_cache = None
         self._local_index_cache = None
-        self._specs_already_associated = set()
         self._last_fetch_times = {}
         self._mirrors_for_spec = {}
 
+    def _close_spec_index(self):
+        if self._spec_index:
+            self._spec_index.close()
+        self._spec_index = self._spec_index_key = self._spec_index_db = None
+
     def _write_local_index_cache(self):
         self._init_local_index_cache()
         cache_key = self._index_contents_key
         with self._index_file_cache.write_transaction(cache_key) as (old, new):
             json.dump(self._local_index_cache, new)
 
+    def cached_indices_key(self) -> str:
+        """Return a hash of the hashes of the locally cached buildcache index files and their
+        deltas, which changes whenever the contents of a mirror are found to have changed."""
+        self._init_local_index_cache()
+        cached = sorted(
+            (url, entry["index_hash"], [d["hash"] for d in entry.get("deltas", ())])
+            for url, entry in self._local_index_cache.items()
+        )
+        return compute_hash(json.dumps(cached))
+
     def regenerate_spec_cache(self, clear_existing=False):
-        """Populate the local cache of concrete specs (``_mirrors_for_spec``)
-        from the locally cached buildcache index files.  This is essentially a
-        no-op if it has already been done, as we keep track of the index
-        hashes for which we have already associated the built specs."""
+        """Make the index of concrete specs (``_spec_index``) match the locally cached buildcache
+        index files. The index is persisted next to the cached files, so this is essentially a
+        no-op if it has already been done for the current contents of the mirrors."""
         self._init_local_index_cache()
 
         if clear_existing:
-            self._specs_already_associated = set()
             self._mirrors_for_spec = {}
 
-        for mirror_url in self._local_index_cache:
+        # The spec index is keyed by the cached indices it is generated from
+        key = self.cached_indices_key()
+        if key == self._spec_index_key:
+            return
+
+        self._close_spec_index()
+        path = os.path.join(self._index_cache_root, f"specs-{key[:16]}.idx")
+        if not os.path.exists(path):
+            self._write_spec_index(path)
+        try:
+            self._spec_index = BuildCacheSpecIndex(path)
+        except InvalidSpecIndexError as e:
+            tty.debug(str(e))
+            self._write_spec_index(path)
+            self._spec_index = BuildCacheSpecIndex(path)
+        self._spec_index_key = key
+
+    def _write_spec_index(self, path):
+        """Write the index of the specs in the locally cached buildcache index files, and remove
+        the indices of previous contents of the mirrors"""
+        mirrors = sorted(self._local_index_cache)
+        nodes: Dict[str, Dict[str, Any]] = {}
+        in_mirror: List[Set[str]] = []
+        for mirror_url in mirrors:
             cache_entry = self._local_index_cache[mirror_url]
-            cached_index_path = cache_entry["index_path"]
-            cached_index_hash = cache_entry["index_hash"]
-            if cached_index_hash not in self._specs_already_associated:
-                self._associate_built_specs_with_mirror(cached_index_path, mirror_url)
-                self._specs_already_associated.add(cached_index_hash)
+            cache_keys = [cache_entry["index_path"]]
+            cache_keys.extend(d["index_path"] for d in cache_entry.get("deltas", ()))
+            hashes: Set[str] = set()
+            for cache_key in cache_keys:
+                hashes.update(self._read_cached_index(cache_key, mirror_url, nodes))
+            in_mirror.append(hashes)
+
+        BuildCacheSpecIndex.write(path, mirrors, nodes, in_mirror)
+
+        for entry in os.listdir(self._index_cache_root):
+            other = os.path.join(self._index_cache_root, entry)
+            if entry.startswith("specs-") and entry.endswith(".idx") and other != path:
+                try:
+                    os.remove(other)
+                except OSError:
+                    pass
 
-    def _associate_built_specs_with_mirror(self, cache_key, mirror_url):
+    def _read_cached_index(self, cache_key, mirror_url, nodes):
+        """Add the spec nodes of a cached buildcache index file to ``nodes``, and return the
+        DAG hashes of the specs in the build cache."""
         tmpdir = tempfile.mkdtemp()
 
         try:
@@ -250,41 +535,48 @@ def _associate_built_specs_with_mirror(self, cache_key, mirror_url):
                     f"you need a newer Spack version to read the buildcache index for the "
                     f"following mirror: '{mirror_url}'. {e.database_version_message}"
                 )
-                return
-
-            spec_list = [
-                s
-                for s in db.query_local(installed=InstallRecordStatus.ANY)
-                if s.external or db.query_local_by_spec_hash(s.dag_hash()).in_buildcache
-            ]
-
-            for indexed_spec in spec_list:
-                dag_hash = indexed_spec.dag_hash()
-
-                if dag_hash not in self._mirrors_for_spec:
-                    self._mirrors_for_spec[dag_hash] = []
-
-                for entry in self._mirrors_for_spec[dag_hash]:
-                    # A binary mirror can only have one spec per DAG hash, so
-                    # if we already have an entry under this DAG hash for this
-                    # mirror url, we're done.
-                    if entry["mirror_url"] == mirror_url:
-                        break
-                else:
-                    self._mirrors_for_spec[dag_hash].append(
-                        {"mirror_url": mirror_url, "spec": indexed_spec}
-                    )
+                return []
+
+            # Records are not materialized here: node dictionaries of the current version of the
+            # database are copied as is.
+            hashes = []
+            for dag_hash, record in db._data.items():
+                node = record.to_dict(include_fields=("spec",))["spec"]
+                nodes.setdefault(dag_hash, node)
+                if record.in_buildcache or node.get("external"):
+                    hashes.append(dag_hash)
+            return hashes
         finally:
             shutil.rmtree(tmpdir)
 
-    def get_all_built_specs(self):
+    def _spec_index_database(self) -> BuildCacheDatabase:
+        if self._spec_index_db is None:
+            assert self._spec_index is not None
+            tmpdir = tempfile.mkdtemp()
+            try:
+                db = BuildCacheDatabase(tmpdir)
+            finally:
+                shutil.rmtree(tmpdir)
+            db._read_from_spec_index(self._spec_index)
+            self._spec_index_db = db
+        return self._spec_index_db
+
+    def get_all_built_specs(self, names: Optional[Set[str]] = None):
+        """Return the specs in the build caches of all mirrors. If ``names`` is given, only the
+        specs of those packages are returned, and the other specs are never read from the spec
+        index."""
         spec_list = []
+        if self._spec_index is not None:
+            spec_list.extend(self._spec_index_database().query_by_names(names))
+        indexed = set(s.dag_hash() for s in spec_list)
         for dag_hash in self._mirrors_for_spec:
             # in the absence of further information, all concrete specs
             # with the same DAG hash are equivalent, so we can just
             # return the first one in the list.
-            if len(self._mirrors_for_spec[dag_hash]) > 0:
-                spec_list.append(self._mirrors_for_spec[dag_hash][0]["spec"])
+            if dag_hash not in indexed and len(self._mirrors_for_spec[dag_hash]) > 0:
+                spec = self._mirrors_for_spec[dag_hash][0]["spec"]
+                if names is None or spec.name in names:
+                    spec_list.append(spec)
 
         return spec_list
 
@@ -329,9 +621,21 @@ def find_by_hash(self, find_hash, mirrors_to_check=None):
             mirrors_to_check: Optional mapping containing mirrors to check.  If
                 None, just assumes all configured mirrors.
         """
-        if find_hash not in self._mirrors_for_spec:
-            return []
-        results = self._mirrors_for_spec[find_hash]
+
+        def spec_from_index():
+            return self._spec_index_database().query_local_by_spec_hash(find_hash).spec
+
+        return self._find(find_hash, spec_from_index, mirrors_to_check)
+
+    def _find(self, find_hash, get_spec, mirrors_to_check):
+        results = list(self._mirrors_for_spec.get(find_hash, ()))
+        i = self._spec_index.find(find_hash) if self._spec_index is not None else None
+        if i is not None:
+            found_urls = [r["mirror_url"] for r in results]
+            mirror_urls = [url for url in self._spec_index.mirrors_of(i) if url not in found_urls]
+            if mirror_urls:
+                spec = get_spec()
+                results.extend({"mirror_url": url, "spec": spec} for url in mirror_urls)
         if not mirrors_to_check:
             return results
         mirror_urls = mirrors_to_check.values()
@@ -425,21 +729,24 @@ def update(self, with_cooldown=False):
                         needs_regen = self._fetch_and_cache_index(
                             cached_mirror_url, cache_entry=cache_entry
                         )
+                        new_deltas = self._fetch_and_cache_index_deltas(cached_mirror_url)
                         self._last_fetch_times[cached_mirror_url] = (now, True)
                         all_methods_failed = False
                     except FetchIndexError as e:
-                        needs_regen = False
+                        needs_regen = new_deltas = False
                         fetch_errors.append(e)
                         self._last_fetch_times[cached_mirror_url] = (now, False)
-                    # The need to regenerate implies a need to clear as well.
+                    # The need to regenerate implies a need to clear as well. New deltas only
+                    # add specs, so they don't require clearing.
                     spec_cache_clear_needed |= needs_regen
-                    spec_cache_regenerate_needed |= needs_regen
+                    spec_cache_regenerate_needed |= needs_regen or new_deltas
             else:
                 # No longer have this mirror, cached index should be removed
                 items_to_remove.append(
                     {
                         "url": cached_mirror_url,
-                        "cache_key": os.path.join(self._index_cache_root, cached_index_path),
+                        "cache_keys": [cached_index_path]
+                        + [d["index_path"] for d in cache_entry.get("deltas", ())],
                     }
                 )
                 if cached_mirror_url in self._last_fetch_times:
@@ -450,8 +757,8 @@ def update(self, with_cooldown=False):
         # Clean up items to be removed, identified above
         for item in items_to_remove:
             url = item["url"]
-            cache_key = item["cache_key"]
-            self._index_file_cache.remove(cache_key)
+            for cache_key in item["cache_keys"]:
+                self._index_file_cache.remove(cache_key)
             del self._local_index_cache[url]
 
         # Iterate the configured mirrors now.  Any mirror urls we do not
@@ -464,6 +771,7 @@ def update(self, with_cooldown=False):
             # Need to fetch the index and update the local caches
             try:
                 needs_regen = self._fetch_and_cache_index(mirror_url)
+                needs_regen |= self._fetch_and_cache_index_deltas(mirror_url)
                 self._last_fetch_times[mirror_url] = (now, True)
                 all_methods_failed = False
             except FetchIndexError as e:
@@ -541,15 +849,50 @@ def _fetch_and_cache_index(self, mirror_url, cache_entry={}):
             "etag": result.etag,
         }
 
-        # clean up the old cache_key if necessary
+        # clean up the old cache_key if necessary, and the deltas of the old index
         old_cache_key = cache_entry.get("index_path", None)
         if old_cache_key:
             self._index_file_cache.remove(old_cache_key)
+        for delta in cache_entry.get("deltas", ()):
+            self._index_file_cache.remove(delta["index_path"])
 
         # We fetched an index and updated the local index cache, we should
         # regenerate the spec cache as a result.
         return True
 
+    def _fetch_and_cache_index_deltas(self, mirror_url):
+        """Fetch the index deltas pushed to a mirror since its cached index.json was generated,
+        and cache the ones that are not cached yet.
+
+        Args:
+            mirror_url (str): Base url of mirror
+
+        Returns:
+            True if new deltas were cached.
+
+        Throws:
+            FetchIndexError
+        """
+        cache_entry = self._local_index_cache.get(mirror_url)
+        if not cache_entry or urllib.parse.urlparse(mirror_url).scheme == "oci":
+            return False
+
+        deltas = cache_entry.setdefault("deltas", [])
+        fetcher = IndexDeltaFetcher(
+            mirror_url, cache_entry["index_hash"], known_deltas=[d["hash"] for d in deltas]
+        )
+        new_deltas = fetcher.conditional_fetch()
+
+        url_hash = compute_hash(mirror_url)
+        for delta_hash, data in new_deltas:
+            cache_key = "{}_delta_{}.json".format(url_hash[:10], delta_hash[:10])
+            self._index_file_cache.init_entry(cache_key)
+            with self._index_file_cache.write_transaction(cache_key) as (old, new):
+                new.write(data)
+            deltas.append({"hash": delta_hash, "index_path": cache_key})
+
+        return bool(new_deltas)
+
 
 def binary_index_location():
     """Set up a BinaryCacheIndex for remote buildcache dbs in the user's homedir."""
@@ -747,7 +1090,7 @@ def get_buildinfo_dict(spec):
     """Create metadata for a tarball"""
     manifest = get_buildfile_manifest(spec)
 
-    return {
+    buildinfo = {
         "sbang_install_path": spack.hooks.sbang.sbang_install_path(),
         "buildpath": spack.store.STORE.layout.root,
         "spackprefix": spack.paths.prefix,
@@ -759,6 +1102,31 @@ def get_buildinfo_dict(spec):
         "hash_to_prefix": {d.dag_hash(): str(d.prefix) for d in deps_to_relocate(spec)},
     }
 
+    # Record where the prefixes are, so that installs don't need to look for them
+    text_prefixes, binary_prefixes = _prefixes_to_relocate(buildinfo)
+    buildinfo["relocation_offsets"] = relocate.relocation_offsets(
+        str(spec.prefix),
+        manifest["text_to_relocate"],
+        manifest["binary_to_relocate"],
+        text_prefixes,
+        binary_prefixes,
+    )
+    return buildinfo
+
+
+def _prefixes_to_relocate(buildinfo) -> Tuple[List[str], List[str]]:
+    """Return the prefixes in text files and binaries that ``relocate_package`` may relocate
+    for a tarball with the given metadata, in the order it matches them."""
+    old_layout_root = str(buildinfo["buildpath"])
+    old_prefix = os.path.join(old_layout_root, buildinfo["relative_prefix"])
+    binary_prefixes = [*buildinfo["hash_to_prefix"].values(), old_prefix, old_layout_root]
+    text_prefixes = [
+        str(buildinfo["sbang_install_path"]),
+        *binary_prefixes,
+        "#!/bin/bash {0}/bin/sbang".format(buildinfo["spackprefix"]),
+    ]
+    return text_prefixes, binary_prefixes
+
 
 def tarball_directory_name(spec):
     """
@@ -787,6 +1155,59 @@ def tarball_path_name(spec, ext):
     return os.path.join(tarball_directory_name(spec), tarball_name(spec, ext))
 
 
+def chunks_url(mirror_url: str) -> str:
+    """Return the URL of the directory of the chunks of chunked tarballs in a build cache"""
+    return url_util.join(mirror_url, build_cache_relative_path(), "_chunks")
+
+
+def _chunk_url(chunks_root_url: str, digest: str) -> str:
+    return url_util.join(chunks_root_url, digest[:2], digest)
+
+
+def chunk_url(mirror_url: str, digest: str) -> str:
+    """Return the URL of a chunk of chunked tarballs in a build cache"""
+    return _chunk_url(chunks_url(mirror_url), digest)
+
+
+def is_chunk_manifest(path: str) -> bool:
+    """Whether a tarball downloaded from a build cache is the JSON manifest of a chunked tarball,
+    rather than an archive"""
+    with open(path, "rb") as f:
+        return f.read(1) == b"{"
+
+
+def _manifest_chunks(manifest_path: str) -> Set[str]:
+    """Digests of the chunks listed in the manifest of a chunked tarball"""
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return {digest for member in manifest["members"] for digest in member.get("chunks", ())}
+
+
+def _existing_chunks(mirror_url: str) -> Optional[Set[str]]:
+    """Digests of the chunks in a build cache, listed at once. Returns None if the build cache
+    cannot be listed, e.g. over http, in which case chunks have to be looked up one by one."""
+    try:
+        paths = web_util.list_url(chunks_url(mirror_url), recursive=True)
+    except Exception as e:
+        tty.debug(f"Cannot list the chunks in {mirror_url}: {e}")
+        return None
+    if paths is None:
+        return None
+    return {path.rsplit("/", 1)[-1] for path in paths}
+
+
+def _chunk_exists(digest: str, mirror_url: str, existing: Optional[Set[str]]) -> bool:
+    if existing is not None:
+        return digest in existing
+    return web_util.url_exists(chunk_url(mirror_url, digest))
+
+
+def chunk_store_location() -> str:
+    """Local store of the chunks downloaded from build caches. It's part of the fetch cache, so
+    that ``spack clean --downloads`` removes it."""
+    return os.path.join(spack.caches.fetch_cache_location(), "_buildcache-chunks")
+
+
 def select_signing_key() -> str:
     keys = spack.util.gpg.signing_keys()
     num = len(keys)
@@ -869,6 +1290,98 @@ def _read_specs_and_push_index(
         extra_args={"ContentType": "text/plain", "CacheControl": "no-cache"},
     )
 
+    # The new index includes all deltas pushed so far
+    _push_index_deltas_manifest(cache_prefix, {"base": index_hash, "deltas": []}, temp_dir)
+
+
+def _read_index_deltas_manifest(cache_prefix: str) -> Optional[dict]:
+    """Read the manifest of the index deltas in a build cache, or return None if it does not
+    exist or is invalid."""
+    try:
+        _, _, response = web_util.read_from_url(url_util.join(cache_prefix, INDEX_DELTAS_MANIFEST))
+        manifest = json.load(response)
+    except (web_util.SpackWebError, ValueError):
+        return None
+    if (
+        not isinstance(manifest, dict)
+        or not isinstance(manifest.get("base"), str)
+        or not isinstance(manifest.get("deltas"), list)
+    ):
+        return None
+    return manifest
+
+
+def _push_index_deltas_manifest(cache_prefix: str, manifest: dict, temp_dir: str) -> None:
+    manifest_path = os.path.join(temp_dir, INDEX_DELTAS_MANIFEST)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    web_util.push_to_url(
+        manifest_path,
+        url_util.join(cache_prefix, INDEX_DELTAS_MANIFEST),
+        keep_original=False,
+        extra_args={"ContentType": "application/json", "CacheControl": "no-cache"},
+    )
+
+
+def _url_update_package_index(url: str, specs: List[Spec], tmpdir: str) -> None:
+    """Add the given specs to the build cache index on the given mirror, without reading the
+    other spec files in the mirror.
+
+    The specs are written to an index delta, which is listed in the index.deltas.json manifest
+    next to index.json. The index is regenerated from scratch instead if it does not exist yet,
+    or if it has accumulated ``MAX_INDEX_DELTAS`` deltas.
+
+    Concurrent pushes may each overwrite the manifest, in which case the deltas of all but one
+    of them are lost, until the index is regenerated with ``spack buildcache update-index``.
+
+    Args:
+        url: Base url of binary mirror.
+        specs: Specs that were pushed to the mirror.
+        tmpdir: Directory for temporary files
+    """
+    cache_prefix = url_util.join(url, build_cache_relative_path())
+
+    try:
+        _, _, response = web_util.read_from_url(url_util.join(cache_prefix, "index.json.hash"))
+        base_hash: Optional[str] = response.read(64).decode("utf-8")
+    except web_util.SpackWebError:
+        base_hash = None
+
+    manifest = _read_index_deltas_manifest(cache_prefix) if base_hash else None
+    if manifest is not None and manifest["base"] != base_hash:
+        # The index was regenerated by a Spack version that doesn't know about deltas
+        manifest = None
+
+    if not base_hash or (manifest and len(manifest["deltas"]) >= MAX_INDEX_DELTAS):
+        _url_generate_package_index(url, tmpdir)
+        return
+
+    if manifest is None:
+        manifest = {"base": base_hash, "deltas": []}
+
+    try:
+        db = BuildCacheDatabase(tmpdir)
+        for spec in specs:
+            db.add(spec)
+            db.mark(spec, "in_buildcache", True)
+
+        delta_path = os.path.join(db.database_directory, "delta.json")
+        with open(delta_path, "w") as f:
+            db._write_to_file(f)
+        with open(delta_path) as f:
+            delta_hash = compute_hash(f.read())
+
+        web_util.push_to_url(
+            delta_path,
+            url_util.join(cache_prefix, INDEX_DELTAS_RELATIVE_PATH, f"{delta_hash}.json"),
+            keep_original=False,
+            extra_args={"ContentType": "application/json"},
+        )
+        manifest["deltas"].append(delta_hash)
+        _push_index_deltas_manifest(cache_prefix, manifest, tmpdir)
+    except Exception as e:
+        raise GenerateIndexError(f"Encountered problem pushing package index to {url}: {e}") from e
+
 
 def _specs_from_cache_aws_cli(cache_prefix):
     """Use aws cli to sync all the specs into a local temporary directory.
@@ -1071,24 +1584,38 @@ def tarfile_of_spec_prefix(tar: tarfile.TarFile, prefix: str) -> None:
     )
 
 
-def _do_create_tarball(tarfile_path: str, binaries_dir: str, buildinfo: dict):
-    with spack.util.archive.gzip_compressed_tarfile(tarfile_path) as (
-        tar,
-        inner_checksum,
-        outer_checksum,
-    ):
-        # Tarball the install prefix
-        tarfile_of_spec_prefix(tar, binaries_dir)
+def _add_buildinfo_to_tarfile(tar: tarfile.TarFile, binaries_dir: str, buildinfo: dict) -> None:
+    # Serialize buildinfo for the tarball
+    bstring = syaml.dump(buildinfo, default_flow_style=True).encode("utf-8")
+    tarinfo = tarfile.TarInfo(
+        name=spack.util.archive.default_path_to_name(buildinfo_file_name(binaries_dir))
+    )
+    tarinfo.type = tarfile.REGTYPE
+    tarinfo.size = len(bstring)
+    tarinfo.mode = 0o644
+    tar.addfile(tarinfo, io.BytesIO(bstring))
 
-        # Serialize buildinfo for the tarball
-        bstring = syaml.dump(buildinfo, default_flow_style=True).encode("utf-8")
-        tarinfo = tarfile.TarInfo(
-            name=spack.util.archive.default_path_to_name(buildinfo_file_name(binaries_dir))
-        )
-        tarinfo.type = tarfile.REGTYPE
-        tarinfo.size = len(bstring)
-        tarinfo.mode = 0o644
-        tar.addfile(tarinfo, io.BytesIO(bstring))
+
+def _do_create_tarball(
+    tarfile_path: str, binaries_dir: str, buildinfo: dict, compression: str = "gzip"
+):
+    jobs = config.determine_number_of_jobs(parallel=True)
+    if compression == "zstd":
+        compressed_tarfile = spack.util.archive.zstd_compressed_tarfile(tarfile_path, jobs=jobs)
+    else:
+        # Tarballs are compressed in blocks by multiple threads, which gives the same output
+        # regardless of the number of threads.
+        compressed_tarfile = spack.util.archive.gzip_compressed_tarfile(tarfile_path, jobs=jobs)
+
+    with compressed_tarfile as (tar, inner_checksum, outer_checksum):
+        # Zstd tarballs are extracted in stream mode, where the package prefix must be known
+        # before any file is extracted, so the buildinfo file comes first.
+        if compression == "zstd":
+            _add_buildinfo_to_tarfile(tar, binaries_dir, buildinfo)
+            tarfile_of_spec_prefix(tar, binaries_dir)
+        else:
+            tarfile_of_spec_prefix(tar, binaries_dir)
+            _add_buildinfo_to_tarfile(tar, binaries_dir, buildinfo)
 
     return inner_checksum.hexdigest(), outer_checksum.hexdigest()
 
@@ -1118,16 +1645,16 @@ def remote_specfile(self, signed: bool) -> str:
             tarball_name(self.spec, ".spec.json.sig" if signed else ".spec.json"),
         )
 
-    def remote_tarball(self) -> str:
+    def remote_tarball(self, ext: str = ".spack") -> str:
         return url_util.join(
-            self.remote, build_cache_relative_path(), tarball_path_name(self.spec, ".spack")
+            self.remote, build_cache_relative_path(), tarball_path_name(self.spec, ext)
         )
 
     def local_specfile(self) -> str:
         return os.path.join(self.local, f"{self.spec.dag_hash()}.spec.json")
 
-    def local_tarball(self) -> str:
-        return os.path.join(self.local, f"{self.spec.dag_hash()}.tar.gz")
+    def local_tarball(self, ext: str = ".tar.gz") -> str:
+        return os.path.join(self.local, f"{self.spec.dag_hash()}{ext}")
 
 
 def _exists_in_buildcache(spec: Spec, tmpdir: str, out_url: str) -> ExistsInBuildcache:
@@ -1141,15 +1668,53 @@ def _exists_in_buildcache(spec: Spec, tmpdir: str, out_url: str) -> ExistsInBuil
 
 
 def _url_upload_tarball_and_specfile(
-    spec: Spec, tmpdir: str, out_url: str, exists: ExistsInBuildcache, signing_key: Optional[str]
+    spec: Spec,
+    tmpdir: str,
+    out_url: str,
+    exists: ExistsInBuildcache,
+    signing_key: Optional[str],
+    compression: str = "gzip",
 ):
     files = BuildcacheFiles(spec, tmpdir, out_url)
-    tarball = files.local_tarball()
-    checksum, _ = _do_create_tarball(tarball, spec.prefix, get_buildinfo_dict(spec))
     spec_dict = spec.to_dict(hash=ht.dag_hash)
-    spec_dict["buildcache_layout_version"] = CURRENT_BUILD_CACHE_LAYOUT_VERSION
+
+    if compression == "chunks":
+        # The manifest of the tarball takes the place of the tarball
+        tarball = files.local_tarball(".chunks.json")
+        manifest = {
+            "chunk_hash_algorithm": "sha256",
+            "chunk_compression": "zlib",
+            "members": _url_push_chunks(spec, tmpdir, out_url),
+        }
+        with open(tarball, "w") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+        checksum = spack.util.crypto.checksum(hashlib.sha256, tarball)
+        spec_dict["buildcache_layout_version"] = CHUNKED_BUILD_CACHE_LAYOUT_VERSION
+        spec_dict["binary_cache_compression"] = "chunks"
+    elif compression == "zstd":
+        tarball = files.local_tarball(".tar.zst")
+        checksum, _ = _do_create_tarball(tarball, spec.prefix, get_buildinfo_dict(spec), "zstd")
+        spec_dict["buildcache_layout_version"] = ZSTD_BUILD_CACHE_LAYOUT_VERSION
+        spec_dict["binary_cache_compression"] = "zstd"
+    else:
+        # Computing the buildinfo scans all the files in the prefix, so with gzip+zstd it is
+        # shared by both tarballs
+        buildinfo = get_buildinfo_dict(spec)
+        tarball = files.local_tarball()
+        checksum, _ = _do_create_tarball(tarball, spec.prefix, buildinfo)
+        spec_dict["buildcache_layout_version"] = CURRENT_BUILD_CACHE_LAYOUT_VERSION
     spec_dict["binary_cache_checksum"] = {"hash_algorithm": "sha256", "hash": checksum}
 
+    # The zstd tarball is advertised as an alternative, which older versions of Spack ignore.
+    if compression == "gzip+zstd":
+        zstd_tarball = files.local_tarball(".tar.zst")
+        zstd_checksum, _ = _do_create_tarball(zstd_tarball, spec.prefix, buildinfo, "zstd")
+        spec_dict["binary_cache_zstd_checksum"] = {
+            "hash_algorithm": "sha256",
+            "hash": zstd_checksum,
+        }
+        web_util.push_to_url(zstd_tarball, files.remote_tarball(".spack.zst"), keep_original=False)
+
     if exists.tarball:
         web_util.remove_url(files.remote_tarball())
     if exists.signed:
@@ -1175,6 +1740,54 @@ def _url_upload_tarball_and_specfile(
     )
 
 
+def _url_push_chunk(
+    digest: str, data: bytes, tmpdir: str, out_url: str, existing: Optional[Set[str]]
+) -> None:
+    if _chunk_exists(digest, out_url, existing):
+        return
+    path = os.path.join(tmpdir, digest)
+    with open(path, "wb") as f:
+        f.write(spack.util.chunking.compress_chunk(data))
+    web_util.push_to_url(path, chunk_url(out_url, digest), keep_original=False)
+
+
+def _url_push_chunks(spec: Spec, tmpdir: str, out_url: str) -> List[dict]:
+    """Split the files in the install prefix of a spec in chunks, and push the chunks that are
+    not in the build cache yet. Returns the members of the tarball of the spec, with the digests
+    of the chunks of each file."""
+    # Chunks are written to a directory of their own, since the same chunk can be pushed by
+    # several specs concurrently.
+    chunks_tmpdir = tempfile.mkdtemp(dir=tmpdir)
+    # The chunks in the build cache are listed once, rather than checked one request per chunk
+    existing = _existing_chunks(out_url)
+    seen: Set[str] = set()
+    pending: Deque[concurrent.futures.Future] = collections.deque()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+
+        def add_chunk(digest: str, data: bytes) -> None:
+            if digest in seen:
+                return
+            seen.add(digest)
+            pending.append(
+                executor.submit(_url_push_chunk, digest, data, chunks_tmpdir, out_url, existing)
+            )
+            # Bound the memory used by chunks waiting to be pushed
+            while len(pending) > 64:
+                pending.popleft().result()
+
+        writer = spack.util.chunking.ChunkingTarWriter(add_chunk)
+        # Chunked tarballs are extracted in stream mode like zstd tarballs, so the buildinfo file
+        # comes first. Only addfile is called on the tarfile.
+        tar = cast(tarfile.TarFile, writer)
+        _add_buildinfo_to_tarfile(tar, spec.prefix, get_buildinfo_dict(spec))
+        tarfile_of_spec_prefix(tar, spec.prefix)
+        while pending:
+            pending.popleft().result()
+
+    return writer.members
+
+
 class Uploader:
     def __init__(self, mirror: spack.mirror.Mirror, force: bool, update_index: bool):
         self.mirror = mirror
@@ -1277,10 +1890,12 @@ def __init__(
         force: bool,
         update_index: bool,
         signing_key: Optional[str],
+        compression: str = "gzip",
     ) -> None:
         super().__init__(mirror, force, update_index)
         self.url = mirror.push_url
         self.signing_key = signing_key
+        self.compression = compression
 
     def push(
         self, specs: List[spack.spec.Spec]
@@ -1293,6 +1908,7 @@ def push(
             signing_key=self.signing_key,
             tmpdir=self.tmpdir,
             executor=self.executor,
+            compression=self.compression,
         )
 
 
@@ -1302,15 +1918,21 @@ def make_uploader(
     update_index: bool = False,
     signing_key: Optional[str] = None,
     base_image: Optional[str] = None,
+    compression: str = "gzip",
 ) -> Uploader:
-    """Builder for the appropriate uploader based on the mirror type"""
+    """Builder for the appropriate uploader based on the mirror type. The compression only
+    applies to URL mirrors, OCI images are always gzip compressed."""
     if mirror.push_url.startswith("oci://"):
         return OCIUploader(
             mirror=mirror, force=force, update_index=update_index, base_image=base_image
         )
     else:
         return URLUploader(
-            mirror=mirror, force=force, update_index=update_index, signing_key=signing_key
+            mirror=mirror,
+            force=force,
+            update_index=update_index,
+            signing_key=signing_key,
+            compression=compression,
         )
 
 
@@ -1363,6 +1985,7 @@ def _url_push(
     update_index: bool,
     tmpdir: str,
     executor: concurrent.futures.Executor,
+    compression: str = "gzip",
 ) -> Tuple[List[Spec], List[Tuple[Spec, BaseException]]]:
     """Pushes to the provided build cache, and returns a list of skipped specs that were already
     present (when force=False), and a list of errors. Does not raise on error."""
@@ -1406,25 +2029,26 @@ def _url_push(
             out_url,
             exists[spec.dag_hash()],
             signing_key,
+            compression,
         )
         for spec in specs_to_upload
     ]
 
-    uploaded_any = False
+    uploaded: List[Spec] = []
     fancy_progress = FancyProgress(total)
 
     for spec, upload_future in zip(specs_to_upload, upload_futures):
         fancy_progress.start(spec, upload_future.running())
         error = upload_future.exception()
         if error is None:
-            uploaded_any = True
+            uploaded.append(spec)
             fancy_progress.ok()
         else:
             fancy_progress.fail()
             errors.append((spec, error))
 
     # don't bother pushing keys / index if all failed to upload
-    if not uploaded_any:
+    if not uploaded:
         return skipped, errors
 
     if signing_key:
@@ -1435,7 +2059,7 @@ def _url_push(
     if update_index:
         index_tmpdir = os.path.join(tmpdir, "index")
         os.mkdir(index_tmpdir)
-        _url_generate_package_index(out_url, index_tmpdir)
+        _url_update_package_index(out_url, uploaded, index_tmpdir)
 
     return skipped, errors
 
@@ -1925,6 +2549,27 @@ def _get_valid_spec_file(path: str, max_supported_layout: int) -> Tuple[Dict, in
     return spec_dict, layout_version
 
 
+def _tarball_formats(spec_dict: dict, layout_version: int) -> List[Tuple[str, str, str]]:
+    """Return the extension, compression and sha256 checksum of the tarballs of a spec in a
+    build cache, in order of preference. The compression is "chunks" for the manifest of a
+    chunked tarball. Zstd tarballs are preferred, but skipped if the zstd executable is not
+    available."""
+    formats = []
+    if "binary_cache_zstd_checksum" in spec_dict:
+        formats.append((".spack.zst", "zstd", spec_dict["binary_cache_zstd_checksum"]["hash"]))
+    default_compression = _LAYOUT_COMPRESSION.get(layout_version, "gzip")
+    formats.append(
+        (
+            ".spack",
+            spec_dict.get("binary_cache_compression", default_compression),
+            spec_dict.get("binary_cache_checksum", {}).get("hash"),
+        )
+    )
+    if which("zstd") is None:
+        formats = [f for f in formats if f[1] != "zstd"]
+    return formats
+
+
 def download_tarball(spec, unsigned: Optional[bool] = False, mirrors_for_spec=None):
     """
     Download binary tarball for given package into stage area, returning
@@ -1959,7 +2604,6 @@ def download_tarball(spec, unsigned: Optional[bool] = False, mirrors_for_spec=No
     if not configured_mirrors:
         tty.die("Please add a spack mirror to allow download of pre-compiled packages.")
 
-    tarball = tarball_path_name(spec, ".spack")
     specfile_prefix = tarball_name(spec, ".spec")
 
     # Note on try_first and try_next:
@@ -2033,7 +2677,7 @@ def fetch_url_to_mirror(url):
                         try:
                             _get_valid_spec_file(
                                 local_specfile_stage.save_filename,
-                                CURRENT_BUILD_CACHE_LAYOUT_VERSION,
+                                MAX_SUPPORTED_BUILD_CACHE_LAYOUT_VERSION,
                             )
                         except InvalidMetadataFile as e:
                             tty.warn(
@@ -2069,15 +2713,14 @@ def fetch_url_to_mirror(url):
                     fetch_url, BUILD_CACHE_RELATIVE_PATH, specfile_prefix
                 )
                 specfile_url = f"{specfile_path}.{ext}"
-                spackfile_url = url_util.join(fetch_url, BUILD_CACHE_RELATIVE_PATH, tarball)
                 local_specfile_stage = try_fetch(specfile_url)
                 if local_specfile_stage:
                     local_specfile_path = local_specfile_stage.save_filename
                     signature_verified = False
 
                     try:
-                        _get_valid_spec_file(
-                            local_specfile_path, CURRENT_BUILD_CACHE_LAYOUT_VERSION
+                        spec_dict, layout_version = _get_valid_spec_file(
+                            local_specfile_path, MAX_SUPPORTED_BUILD_CACHE_LAYOUT_VERSION
                         )
                     except InvalidMetadataFile as e:
                         tty.warn(
@@ -2113,14 +2756,48 @@ def fetch_url_to_mirror(url):
                         #     verify signature, checksum doesn't match) we will fail at
                         #     that point instead of trying to download more tarballs from
                         #     the remaining mirrors, looking for one we can use.
-                        tarball_stage = try_fetch(spackfile_url)
-                        if tarball_stage:
-                            return {
+                        tarball_formats = _tarball_formats(spec_dict, layout_version)
+                        if not tarball_formats:
+                            tty.warn(
+                                f"Ignoring binary package for {spec.name}/{spec.dag_hash()[:7]} "
+                                f"from {fetch_url}, since zstd is required to extract it"
+                            )
+                        for tarball_ext, compression, checksum in tarball_formats:
+                            tarball_stage = try_fetch(
+                                url_util.join(
+                                    fetch_url,
+                                    BUILD_CACHE_RELATIVE_PATH,
+                                    tarball_path_name(spec, tarball_ext),
+                                )
+                            )
+                            if not tarball_stage:
+                                continue
+                            download_result = {
                                 "tarball_stage": tarball_stage,
                                 "specfile_stage": local_specfile_stage,
                                 "signature_verified": signature_verified,
                                 "signature_required": not currently_unsigned,
+                                "tarball_compression": compression,
+                                "tarball_checksum": checksum,
                             }
+                            # The chunks missing from the local store are downloaded right
+                            # away, after the manifest listing them is verified.
+                            if compression == "chunks":
+                                try:
+                                    verify_tarball_checksum(download_result)
+                                    _fetch_missing_chunks(
+                                        tarball_stage.save_filename,
+                                        chunks_url(fetch_url),
+                                        spack.util.chunking.ChunkStore(chunk_store_location()),
+                                    )
+                                except Exception as e:
+                                    tty.warn(
+                                        f"Failed to download the chunks of {spec.name}/"
+                                        f"{spec.dag_hash()[:7]} from {fetch_url}: {e}"
+                                    )
+                                    tarball_stage.destroy()
+                                    continue
+                            return download_result
 
                     local_specfile_stage.destroy()
 
@@ -2142,6 +2819,71 @@ def fetch_url_to_mirror(url):
     return None
 
 
+def _fetch_missing_chunks(
+    manifest_path: str, chunks_root_url: str, store: spack.util.chunking.ChunkStore
+) -> None:
+    """Download the chunks listed in the manifest of a chunked tarball that are not in a chunk
+    store yet, from the directory of chunks of a build cache. Chunks are verified before they are
+    added to the store."""
+    missing = {digest for digest in _manifest_chunks(manifest_path) if digest not in store}
+    if not missing:
+        return
+
+    tty.debug(f"Downloading {len(missing)} chunks from {chunks_root_url}")
+
+    def fetch(digest: str) -> None:
+        _, _, response = web_util.read_from_url(_chunk_url(chunks_root_url, digest))
+        store.add(digest, response.read())
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+        for _ in executor.map(fetch, missing):
+            pass
+
+
+def copy_chunks(manifest_path: str, src_mirror_url: str, dest_mirror_url: str) -> None:
+    """Copy the chunks listed in the manifest of a chunked tarball from a build cache to another,
+    unless the destination has them already. Chunks are verified before they are pushed."""
+    existing = _existing_chunks(dest_mirror_url)
+    missing = [
+        digest
+        for digest in _manifest_chunks(manifest_path)
+        if not _chunk_exists(digest, dest_mirror_url, existing)
+    ]
+    if not missing:
+        return
+
+    tty.debug(f"Copying {len(missing)} chunks from {src_mirror_url} to {dest_mirror_url}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = spack.util.chunking.ChunkStore(tmpdir)
+
+        def copy(digest: str) -> None:
+            _, _, response = web_util.read_from_url(chunk_url(src_mirror_url, digest))
+            store.add(digest, response.read())
+            web_util.push_to_url(
+                store.path(digest), chunk_url(dest_mirror_url, digest), keep_original=False
+            )
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+            for _ in executor.map(copy, missing):
+                pass
+
+
+@contextmanager
+def _open_tarball(tarfile_path: str, compression: Optional[str]):
+    """Open the tarball of a spec for reading, or reassemble it from its chunks"""
+    if compression == "chunks":
+        with open(tarfile_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        store = spack.util.chunking.ChunkStore(chunk_store_location())
+        with closing(spack.util.chunking.open_chunked_tarfile(manifest["members"], store)) as tar:
+            yield tar
+        return
+
+    jobs = config.determine_number_of_jobs(parallel=True)
+    with spack.util.archive.open_compressed_tarfile(tarfile_path, jobs=jobs) as tar:
+        yield tar
+
+
 def dedupe_hardlinks_if_necessary(root, buildinfo):
     """Updates a buildinfo dict for old archives that did
     not dedupe hardlinks. De-duping hardlinks is necessary
@@ -2175,10 +2917,23 @@ def dedupe_hardlinks_if_necessary(root, buildinfo):
         buildinfo[key] = new_list
 
 
-def relocate_package(spec):
+def relocation_jobs() -> int:
+    """Return the number of threads relocating the files of a package, which defaults to the
+    number of build jobs."""
+    jobs = spack.config.get("config:relocation_jobs")
+    if jobs is None:
+        jobs = spack.config.determine_number_of_jobs(parallel=True)
+    return jobs
+
+
+def relocate_package(spec, jobs: Optional[int] = None, timer=timer.NULL_TIMER):
     """
-    Relocate the given package
+    Relocate the given package, with up to ``jobs`` threads relocating files in parallel. The
+    default is ``config:relocation_jobs``, or the number of build jobs when it is not set. The
+    time of each step is recorded by ``timer``.
     """
+    if jobs is None:
+        jobs = relocation_jobs()
     workdir = str(spec.prefix)
     buildinfo = read_buildinfo_file(workdir)
     new_layout_root = str(spack.store.STORE.layout.root)
@@ -2273,6 +3028,13 @@ def relocate_package(spec):
     # Old archives maybe have hardlinks repeated.
     dedupe_hardlinks_if_necessary(workdir, buildinfo)
 
+    # Offsets of the prefixes in the files, recorded when the tarball was created. Files that
+    # are not in there, or whose offsets turn out to be stale, are scanned for prefixes.
+    offsets = {
+        os.path.join(workdir, filename): entry
+        for filename, entry in buildinfo.get("relocation_offsets", {}).items()
+    }
+
     def is_backup_file(file):
         return file.endswith("~")
 
@@ -2292,55 +3054,74 @@ def is_backup_file(file):
         # If the buildcache was not created with relativized rpaths
         # do the relocation of path in binaries
         platform = spack.platforms.by_name(spec.platform)
-        if "macho" in platform.binary_formats:
-            relocate.relocate_macho_binaries(
-                files_to_relocate,
-                old_layout_root,
-                new_layout_root,
-                prefix_to_prefix_bin,
-                rel,
-                old_prefix,
-                new_prefix,
-            )
-        elif "elf" in platform.binary_formats and not rel:
-            # The new ELF dynamic section relocation logic only handles absolute to
-            # absolute relocation.
-            relocate.new_relocate_elf_binaries(files_to_relocate, prefix_to_prefix_bin)
-        elif "elf" in platform.binary_formats and rel:
-            relocate.relocate_elf_binaries(
-                files_to_relocate,
-                old_layout_root,
-                new_layout_root,
-                prefix_to_prefix_bin,
-                rel,
-                old_prefix,
-                new_prefix,
-            )
+        with timer.measure("binaries"):
+            if "macho" in platform.binary_formats:
+                relocate.relocate_macho_binaries(
+                    files_to_relocate,
+                    old_layout_root,
+                    new_layout_root,
+                    prefix_to_prefix_bin,
+                    rel,
+                    old_prefix,
+                    new_prefix,
+                )
+            elif "elf" in platform.binary_formats and not rel:
+                # The new ELF dynamic section relocation logic only handles absolute to
+                # absolute relocation.
+                # Binaries without prefixes in their RPATH and PT_INTERP don't need this step
+                elf_binaries = [
+                    f
+                    for f in files_to_relocate
+                    if f not in offsets
+                    or offsets[f].get("elf_strings", True)
+                    or os.path.getsize(f) != offsets[f]["size"]
+                ]
+                relocate.new_relocate_elf_binaries(elf_binaries, prefix_to_prefix_bin, jobs=jobs)
+            elif "elf" in platform.binary_formats and rel:
+                relocate.relocate_elf_binaries(
+                    files_to_relocate,
+                    old_layout_root,
+                    new_layout_root,
+                    prefix_to_prefix_bin,
+                    rel,
+                    old_prefix,
+                    new_prefix,
+                    jobs=jobs,
+                )
 
         # Relocate links to the new install prefix
-        links = [os.path.join(workdir, f) for f in buildinfo.get("relocate_links", [])]
-        relocate.relocate_links(links, prefix_to_prefix_bin)
+        with timer.measure("links"):
+            links = [os.path.join(workdir, f) for f in buildinfo.get("relocate_links", [])]
+            relocate.relocate_links(links, prefix_to_prefix_bin)
 
         # For all buildcaches
         # relocate the install prefixes in text files including dependencies
-        relocate.relocate_text(text_names, prefix_to_prefix_text)
+        with timer.measure("text"):
+            relocate.relocate_text(text_names, prefix_to_prefix_text, jobs=jobs, offsets=offsets)
 
         # relocate the install prefixes in binary files including dependencies
-        changed_files = relocate.relocate_text_bin(files_to_relocate, prefix_to_prefix_bin)
+        with timer.measure("binary_text"):
+            changed_files = relocate.relocate_text_bin(
+                files_to_relocate, prefix_to_prefix_bin, jobs=jobs, offsets=offsets
+            )
 
         # Add ad-hoc signatures to patched macho files when on macOS.
         if "macho" in platform.binary_formats and sys.platform == "darwin":
             codesign = which("codesign")
             if not codesign:
                 return
-            for binary in changed_files:
-                codesign("-fs-", binary)
+            with timer.measure("codesign"):
+                for binary in changed_files:
+                    codesign("-fs-", binary)
 
     # If we are installing back to the same location
     # relocate the sbang location if the spack directory changed
     else:
         if old_spack_prefix != new_spack_prefix:
-            relocate.relocate_text(text_names, prefix_to_prefix_text)
+            with timer.measure("text"):
+                relocate.relocate_text(
+                    text_names, prefix_to_prefix_text, jobs=jobs, offsets=offsets
+                )
 
 
 def _extract_inner_tarball(spec, filename, extract_to, signature_required: bool, remote_checksum):
@@ -2394,6 +3175,10 @@ def _extract_inner_tarball(spec, filename, extract_to, signature_required: bool,
 def _tar_strip_component(tar: tarfile.TarFile, prefix: str):
     """Yield all members of tarfile that start with given prefix, and strip that prefix (including
     symlinks)"""
+    return _strip_component(tar.getmembers(), prefix)
+
+
+def _strip_component(members: Iterable[tarfile.TarInfo], prefix: str):
     # Including trailing /, otherwise we end up with absolute paths.
     regex = re.compile(re.escape(prefix) + "/*")
 
@@ -2403,7 +3188,7 @@ def _tar_strip_component(tar: tarfile.TarFile, prefix: str):
     # to ensure that those are updated too.
     # Absolute symlinks are copied verbatim -- relocation should take care of
     # them.
-    for m in tar.getmembers():
+    for m in members:
         result = regex.match(m.name)
         if not result:
             continue
@@ -2436,7 +3221,7 @@ def extract_tarball(spec, download_result, force=False, timer=timer.NULL_TIMER):
 
     specfile_path = download_result["specfile_stage"].save_filename
     spec_dict, layout_version = _get_valid_spec_file(
-        specfile_path, CURRENT_BUILD_CACHE_LAYOUT_VERSION
+        specfile_path, MAX_SUPPORTED_BUILD_CACHE_LAYOUT_VERSION
     )
     bchecksum = spec_dict["binary_cache_checksum"]
 
@@ -2458,7 +3243,7 @@ def extract_tarball(spec, download_result, force=False, timer=timer.NULL_TIMER):
             _delete_staged_downloads(download_result)
             shutil.rmtree(tmpdir)
             raise e
-    elif 1 <= layout_version <= 2:
+    elif 1 <= layout_version <= MAX_SUPPORTED_BUILD_CACHE_LAYOUT_VERSION:
         # Newer buildcache layout: the .spack file contains just
         # in the install tree, the signature, if it exists, is
         # wrapped around the spec.json at the root.  If sig verify
@@ -2472,24 +3257,23 @@ def extract_tarball(spec, download_result, force=False, timer=timer.NULL_TIMER):
                 "or configure the mirror with signed: false."
             )
 
-        # compute the sha256 checksum of the tarball
-        local_checksum = spack.util.crypto.checksum(hashlib.sha256, tarfile_path)
-        expected = bchecksum["hash"]
-
-        # if the checksums don't match don't install
-        if local_checksum != expected:
-            size, contents = fsys.filesummary(tarfile_path)
-            _delete_staged_downloads(download_result)
-            raise NoChecksumException(
-                tarfile_path, size, contents, "sha256", expected, local_checksum
+        # The checksum may have been verified already, right after the download
+        if not download_result.get("checksum_verified"):
+            _check_tarball_checksum(
+                tarfile_path,
+                download_result.get("tarball_checksum", bchecksum["hash"]),
+                download_result,
             )
     try:
-        with closing(tarfile.open(tarfile_path, "r")) as tar:
-            # Remove install prefix from tarfil to extract directly into spec.prefix
-            tar.extractall(
-                path=spec.prefix,
-                members=_tar_strip_component(tar, prefix=_ensure_common_prefix(tar)),
-            )
+        compression = download_result.get("tarball_compression")
+        with _open_tarball(tarfile_path, compression) as tar:
+            # Remove install prefix from tarfil to extract directly into spec.prefix. Zstd and
+            # chunked tarballs are streamed, and checked member by member.
+            if compression in ("zstd", "chunks"):
+                members = _stream_strip_common_prefix(tar)
+            else:
+                members = _tar_strip_component(tar, prefix=_ensure_common_prefix(tar))
+            tar.extractall(path=spec.prefix, members=members)
     except Exception:
         shutil.rmtree(spec.prefix, ignore_errors=True)
         _delete_staged_downloads(download_result)
@@ -2501,7 +3285,7 @@ def extract_tarball(spec, download_result, force=False, timer=timer.NULL_TIMER):
 
     timer.start("relocate")
     try:
-        relocate_package(spec)
+        relocate_package(spec, timer=timer)
     except Exception as e:
         shutil.rmtree(spec.prefix, ignore_errors=True)
         raise e
@@ -2523,21 +3307,109 @@ def extract_tarball(spec, download_result, force=False, timer=timer.NULL_TIMER):
     timer.stop("relocate")
 
 
-def _ensure_common_prefix(tar: tarfile.TarFile) -> str:
-    # Find the lowest `binary_distribution` file (hard-coded forward slash is on purpose).
-    binary_distribution = min(
-        (
-            e.name
-            for e in tar.getmembers()
-            if e.isfile() and e.name.endswith(".spack/binary_distribution")
-        ),
-        key=len,
-        default=None,
+def _check_tarball_checksum(tarfile_path: str, expected: str, download_result) -> None:
+    """Check the sha256 checksum of a downloaded tarball, and delete the downloads if it
+    does not match."""
+    local_checksum = spack.util.crypto.checksum(hashlib.sha256, tarfile_path)
+
+    # if the checksums don't match don't install
+    if local_checksum != expected:
+        size, contents = fsys.filesummary(tarfile_path)
+        _delete_staged_downloads(download_result)
+        raise NoChecksumException(tarfile_path, size, contents, "sha256", expected, local_checksum)
+
+
+def verify_tarball_checksum(download_result) -> None:
+    """Verify the checksum of a tarball returned by ``download_tarball()``, so that it doesn't
+    need to be verified again on extraction.
+
+    Tarballs in the oldest buildcache layout wrap the checksummed tarball, and are verified
+    only on extraction.
+    """
+    spec_dict, layout_version = _get_valid_spec_file(
+        download_result["specfile_stage"].save_filename, MAX_SUPPORTED_BUILD_CACHE_LAYOUT_VERSION
     )
+    if layout_version == 0:
+        return
+    _check_tarball_checksum(
+        download_result["tarball_stage"].save_filename,
+        download_result.get("tarball_checksum", spec_dict["binary_cache_checksum"]["hash"]),
+        download_result,
+    )
+    download_result["checksum_verified"] = True
 
-    if binary_distribution is None:
-        raise ValueError("Tarball is not a Spack package, missing binary_distribution file")
 
+def download_and_verify_tarball(spec, unsigned: Optional[bool] = False, mirrors_for_spec=None):
+    """Same as ``download_tarball()``, but also verify the checksum of the tarball."""
+    download_result = download_tarball(spec, unsigned, mirrors_for_spec)
+    if download_result is not None:
+        verify_tarball_checksum(download_result)
+    return download_result
+
+
+class BinaryPrefetcher:
+    """Download and verify the tarballs of several specs concurrently, ahead of their
+    installation.
+
+    Downloads run in a pool of threads, since they are mostly waiting on the network and on
+    the disk, and the download stages need to be shared with the installer.
+    """
+
+    def __init__(self, jobs: int, unsigned: Optional[bool] = None) -> None:
+        self.unsigned = unsigned
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=jobs)
+        self.downloads: Dict[str, concurrent.futures.Future] = {}
+
+    def prefetch(self, spec: Spec) -> None:
+        """Start the download of the tarball of a spec from the configured mirrors."""
+        key = spec.dag_hash()
+        if key in self.downloads:
+            return
+
+        # Mirrors whose index lists the spec are tried first, the other ones afterwards. The
+        # index is queried in the calling thread, since it is not thread safe.
+        mirrors_for_spec = get_mirrors_for_spec(spec, index_only=True) or None
+        self.downloads[key] = self.executor.submit(
+            download_and_verify_tarball, spec.build_spec, self.unsigned, mirrors_for_spec
+        )
+
+    def pop(self, spec: Spec) -> Optional[dict]:
+        """Wait for the download of a spec, and return it.
+
+        Returns ``None`` if the spec was not prefetched, or could not be downloaded. In the
+        latter case, errors are reported when the download is tried again by the installer.
+        """
+        future = self.downloads.pop(spec.dag_hash(), None)
+        if future is None:
+            return None
+
+        try:
+            return future.result()
+        except Exception as e:
+            tty.debug(f"Failed to prefetch the binary of {spec.format('{name}/{hash:7}')}: {e}")
+            return None
+
+    def shutdown(self) -> None:
+        """Cancel the pending downloads, and delete the downloads that were not used."""
+        for future in self.downloads.values():
+            future.cancel()
+        self.executor.shutdown(wait=True)
+
+        for future in self.downloads.values():
+            if future.cancelled() or future.exception() is not None:
+                continue
+            download_result = future.result()
+            if download_result is not None:
+                _delete_staged_downloads(download_result)
+        self.downloads.clear()
+
+
+def _is_buildinfo_member(member: tarfile.TarInfo) -> bool:
+    # The hard-coded forward slash is on purpose.
+    return member.isfile() and member.name.endswith(".spack/binary_distribution")
+
+
+def _prefix_of_buildinfo_member(binary_distribution: str) -> str:
     pkg_path = pathlib.PurePosixPath(binary_distribution).parent.parent
 
     # Even the most ancient Spack version has required to list the dir of the package itself, so
@@ -2545,18 +3417,34 @@ def _ensure_common_prefix(tar: tarfile.TarFile) -> str:
     if pkg_path == pathlib.PurePosixPath():
         raise ValueError("Invalid tarball, missing package prefix dir")
 
-    pkg_prefix = str(pkg_path)
+    return str(pkg_path)
+
+
+def _check_member_in_prefix(member: tarfile.TarInfo, pkg_prefix: str) -> bool:
+    """Ensure a tar entry is in the pkg_prefix dir, and if it's not, that it is a parent dir of
+    it. Returns whether the entry is the pkg_prefix dir itself."""
+    stripped = member.name.rstrip("/")
+    if not (stripped.startswith(pkg_prefix) or member.isdir() and pkg_prefix.startswith(stripped)):
+        raise ValueError(f"Tarball contains file {stripped} outside of prefix {pkg_prefix}")
+    return member.isdir() and stripped == pkg_prefix
+
+
+def _ensure_common_prefix(tar: tarfile.TarFile) -> str:
+    # Find the lowest `binary_distribution` file.
+    binary_distribution = min(
+        (e.name for e in tar.getmembers() if _is_buildinfo_member(e)), key=len, default=None
+    )
+
+    if binary_distribution is None:
+        raise ValueError("Tarball is not a Spack package, missing binary_distribution file")
+
+    pkg_prefix = _prefix_of_buildinfo_member(binary_distribution)
 
     # Ensure all tar entries are in the pkg_prefix dir, and if they're not, they should be parent
     # dirs of it.
     has_prefix = False
     for member in tar.getmembers():
-        stripped = member.name.rstrip("/")
-        if not (
-            stripped.startswith(pkg_prefix) or member.isdir() and pkg_prefix.startswith(stripped)
-        ):
-            raise ValueError(f"Tarball contains file {stripped} outside of prefix {pkg_prefix}")
-        if member.isdir() and stripped == pkg_prefix:
+        if _check_member_in_prefix(member, pkg_prefix):
             has_prefix = True
 
     # This is technically not required, but let's be defensive about the existence of the package
@@ -2567,6 +3455,27 @@ def _ensure_common_prefix(tar: tarfile.TarFile) -> str:
     return pkg_prefix
 
 
+def _stream_strip_common_prefix(tar: tarfile.TarFile):
+    """Same as ``_tar_strip_component(tar, _ensure_common_prefix(tar))`` for a tarfile opened in
+    stream mode, whose members can only be read once. The buildinfo file must be the first
+    member, so that the package prefix is known before any file is extracted. Other members are
+    checked as they are extracted."""
+    members = iter(tar)
+    first = next(members, None)
+    if first is None or not _is_buildinfo_member(first):
+        raise ValueError("Tarball is not a Spack package, missing binary_distribution file")
+
+    pkg_prefix = _prefix_of_buildinfo_member(first.name)
+    has_prefix = False
+    for member in itertools.chain([first], members):
+        if _check_member_in_prefix(member, pkg_prefix):
+            has_prefix = True
+        yield from _strip_component([member], pkg_prefix)
+
+    if not has_prefix:
+        raise ValueError(f"Tarball does not contain a common prefix {pkg_prefix}")
+
+
 def install_root_node(
     spec: spack.spec.Spec,
     unsigned=False,
@@ -2727,7 +3636,7 @@ def get_mirrors_for_spec(spec=None, mirrors_to_check=None, index_only=False):
     return results
 
 
-def update_cache_and_get_specs():
+def update_cache_and_get_specs(names: Optional[Set[str]] = None):
     """
     Get all concrete specs for build caches available on configured mirrors.
     Initialization of internal cache data structures is done as lazily as
@@ -2735,11 +3644,13 @@ def update_cache_and_get_specs():
     local index cache (essentially a no-op if it has been done already and
     nothing has changed on the configured mirrors.)
 
+    If ``names`` is given, only the specs of those packages are returned.
+
     Throws:
         FetchCacheError
     """
     BINARY_INDEX.update()
-    return BINARY_INDEX.get_all_built_specs()
+    return BINARY_INDEX.get_all_built_specs(names=names)
 
 
 def clear_spec_cache():
@@ -2903,9 +3814,23 @@ def _download_buildcache_entry(mirror_root, descriptions):
             stage = Stage(description_url, name="build_cache", path=path, keep=True)
             try:
                 stage.fetch()
-                break
             except spack.error.FetchError as e:
                 tty.debug(e)
+                continue
+
+            # Chunked tarballs come with the chunks they are made of
+            chunks_path = description.get("chunks")
+            if chunks_path and is_chunk_manifest(stage.save_filename):
+                try:
+                    _fetch_missing_chunks(
+                        stage.save_filename,
+                        url_util.join(mirror_root, "_chunks"),
+                        spack.util.chunking.ChunkStore(chunks_path),
+                    )
+                except Exception as e:
+                    tty.error(f"Failed to download the chunks of {description_url}: {e}")
+                    return False
+            break
         else:
             if fail_if_missing:
                 tty.error("Failed to download required url {0}".format(description_url))
@@ -2948,7 +3873,12 @@ def download_single_spec(concrete_spec, destination, mirror_url=None):
     local_tarball_path = os.path.join(destination, tarball_dir_name)
 
     files_to_fetch = [
-        {"url": [tarball_path_name], "path": local_tarball_path, "required": True},
+        {
+            "url": [tarball_path_name],
+            "path": local_tarball_path,
+            "required": True,
+            "chunks": os.path.join(destination, "_chunks"),
+        },
         {
             "url": [
                 tarball_name(concrete_spec, ".spec.json.sig"),
@@ -2973,20 +3903,30 @@ def __init__(self, all_architectures):
         """
         self.all_architectures = all_architectures
 
-        specs = update_cache_and_get_specs()
-
-        if not self.all_architectures:
-            arch = spack.spec.Spec.default_arch()
-            specs = [s for s in specs if s.satisfies(arch)]
-
-        self.possible_specs = specs
-
-    def __call__(self, spec: Spec, **kwargs):
+        # Specs are read from the build caches on first use, and only for the packages being
+        # searched for, unless the query spec has no package name
+        self._possible_specs: Dict[Optional[str], List[Spec]] = {}
+
+    def possible_specs(self, name: Optional[str] = None) -> List[Spec]:
+        """Return the specs in the build caches of a package, or of all packages if ``name``
+        is None."""
+        if name not in self._possible_specs:
+            specs = update_cache_and_get_specs(names={name} if name else None)
+            if not self.all_architectures:
+                arch = spack.spec.Spec.default_arch()
+                specs = [s for s in specs if s.satisfies(arch)]
+            self._possible_specs[name] = specs
+        return self._possible_specs[name]
+
+    def __call__(self, spec: Union[str, Spec], **kwargs):
         """
         Args:
             spec: The spec being searched for
         """
-        return [s for s in self.possible_specs if s.satisfies(spec)]
+        if isinstance(spec, str):
+            spec = Spec(spec)
+        name = spec.name if spec.name and not spec.virtual else None
+        return [s for s in self.possible_specs(name) if s.satisfies(spec)]
 
 
 class FetchIndexError(Exception):
@@ -3001,6 +3941,10 @@ class BuildcacheIndexError(spack.error.SpackError):
     """Raised when a buildcache cannot be read for any reason"""
 
 
+class InvalidSpecIndexError(spack.error.SpackError):
+    """Raised when the local index of the specs in build caches cannot be read"""
+
+
 FetchIndexResult = collections.namedtuple("FetchIndexResult", "etag hash data fresh")
 
 
@@ -3108,6 +4052,53 @@ def conditional_fetch(self) -> FetchIndexResult:
         )
 
 
+class IndexDeltaFetcher:
+    """Fetcher for the index deltas pushed since index.json was generated, using the
+    index.deltas.json manifest. Only the deltas that are not known yet are downloaded."""
+
+    def __init__(self, url, base_hash, known_deltas, urlopen=web_util.urlopen):
+        self.url = url
+        self.base_hash = base_hash
+        self.known_deltas = set(known_deltas)
+        self.urlopen = urlopen
+        self.headers = {"User-Agent": web_util.SPACK_USER_AGENT}
+
+    def conditional_fetch(self) -> List[Tuple[str, str]]:
+        """Return the hash and contents of the new deltas, in the order they were pushed"""
+        # Failure to fetch the manifest is not fatal, older build caches don't have it
+        url_manifest = url_util.join(self.url, BUILD_CACHE_RELATIVE_PATH, INDEX_DELTAS_MANIFEST)
+        try:
+            response = self.urlopen(urllib.request.Request(url_manifest, headers=self.headers))
+            manifest = json.load(response)
+            base, deltas = manifest["base"], manifest["deltas"]
+        except (TimeoutError, urllib.error.URLError, ValueError, KeyError, TypeError):
+            return []
+
+        # Deltas of another version of index.json are already in it, or unrelated to it
+        if base != self.base_hash:
+            return []
+
+        result = []
+        for delta_hash in deltas:
+            if delta_hash in self.known_deltas:
+                continue
+            url_delta = url_util.join(
+                self.url,
+                BUILD_CACHE_RELATIVE_PATH,
+                INDEX_DELTAS_RELATIVE_PATH,
+                f"{delta_hash}.json",
+            )
+            try:
+                response = self.urlopen(urllib.request.Request(url_delta, headers=self.headers))
+                data = codecs.getreader("utf-8")(response).read()
+            except (TimeoutError, urllib.error.URLError, ValueError) as e:
+                raise FetchIndexError(f"Could not fetch index delta {url_delta}", e) from e
+            if compute_hash(data) != delta_hash:
+                raise FetchIndexError(f"Remote index delta {url_delta} is invalid")
+            result.append((delta_hash, data))
+        return result
+
+
 class OCIIndexFetcher:
     def __init__(self, url: str, local_hash, urlopen=None) -> None:
         self.local_hash = local_hash
@@ -1178,7 +1178,9 @@ def _setup_pkg_and_run(
             package that we'll build in the child process).
         function: function to call in the child process; serialized_pkg is passed to
             this as the first argument.
-        kwargs: additional keyword arguments to pass to ``function()``.
+        kwargs: additional keyword arguments to pass to ``function()``. The build
+            environment is not set up if ``fake`` is true or ``setup_environment`` is false,
+            and the number of build jobs is overridden by ``build_jobs``.
         write_pipe: multiprocessing ``Connection`` to the parent process, to which the
             child *must* send a result (or an error) back to parent on.
         input_multiprocess_fd: stdin from the parent (not passed currently on Windows)
@@ -1199,7 +1201,11 @@ def _setup_pkg_and_run(
 
         pkg = serialized_pkg.restore()
 
-        if not kwargs.get("fake", False):
+        # Builds running concurrently with others get a share of the available jobs
+        if kwargs.get("build_jobs") is not None:
+            _limit_build_jobs(kwargs["build_jobs"])
+
+        if not kwargs.get("fake", False) and kwargs.get("setup_environment", True):
             kwargs["unmodified_env"] = os.environ.copy()
             kwargs["env_modifications"] = setup_package(
                 pkg, dirty=kwargs.get("dirty", False), context=Context.from_string(context)
@@ -1268,15 +1274,83 @@ def _setup_pkg_and_run(
             input_pipe.close()
 
 
-def start_build_process(pkg, function, kwargs):
-    """Create a child process to do part of a spack build.
+def _limit_build_jobs(jobs: int) -> None:
+    """Set the number of jobs of the build in the current (child) process, overriding both
+    configuration files and the command line."""
+    if "command_line" in spack.config.CONFIG.scopes:
+        spack.config.set("config:build_jobs", jobs, scope="command_line")
+    spack.config.CONFIG.push_scope(
+        spack.config.InternalConfigScope("build_jobs", {"config": {"build_jobs": jobs}})
+    )
 
-    Args:
 
-        pkg (spack.package_base.PackageBase): package whose environment we should set up the
-            child process for.
-        function (typing.Callable): argless function to run in the child
-            process.
+class BuildProcess:
+    """Handle to a child process that runs part of a Spack build.
+
+    The child process sends a single result to the parent, which is received by
+    ``complete()``. The ``read_pipe`` of several handles can be passed to
+    ``multiprocessing.connection.wait``, to wait for any of them to finish.
+    """
+
+    def __init__(self, pkg, process: multiprocessing.Process, read_pipe: Connection):
+        self.pkg = pkg
+        self.process = process
+        self.read_pipe = read_pipe
+
+    def terminate(self) -> None:
+        """Terminate the child process, and wait for it to stop."""
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.read_pipe.close()
+
+    def _exitcode_msg(self) -> str:
+        typ = "exit" if self.process.exitcode >= 0 else "signal"
+        return f"{typ} {abs(self.process.exitcode)}"
+
+    def complete(self):
+        """Wait for the child process to finish, and return its result.
+
+        Errors raised in the child process are raised again in the parent.
+        """
+        try:
+            child_result = self.read_pipe.recv()
+        except EOFError:
+            self.process.join()
+            raise InstallError(f"The process has stopped unexpectedly ({self._exitcode_msg()})")
+        finally:
+            self.read_pipe.close()
+
+        self.process.join()
+
+        # If returns a StopPhase, raise it
+        if isinstance(child_result, spack.error.StopPhase):
+            # do not print
+            raise child_result
+
+        # let the caller know which package went wrong.
+        if isinstance(child_result, InstallError):
+            child_result.pkg = self.pkg
+
+        if isinstance(child_result, ChildError):
+            # If the child process raised an error, print its output here rather
+            # than waiting until the call to SpackError.die() in main(). This
+            # allows exception handling output to be logged from within Spack.
+            # see spack.main.SpackCommand.
+            child_result.print_context()
+            raise child_result
+
+        # Fallback. Usually caught beforehand in EOFError above.
+        if self.process.exitcode != 0:
+            raise InstallError(f"The process failed unexpectedly ({self._exitcode_msg()})")
+
+        return child_result
+
+
+def start_build_process(pkg, function, kwargs):
+    """Create a child process to do part of a spack build, and wait for its result.
+
+    See ``spawn_build_process()`` for the arguments.
 
     Usage::
 
@@ -1284,14 +1358,30 @@ def child_fun():
             # do stuff
         build_env.start_build_process(pkg, child_fun)
 
+    If something goes wrong, the child process catches the error and
+    passes it to the parent wrapped in a ChildError.  The parent is
+    expected to handle (or re-raise) the ChildError.
+    """
+    return spawn_build_process(pkg, function, kwargs).complete()
+
+
+def spawn_build_process(pkg, function, kwargs, *, forward_stdin: bool = True) -> BuildProcess:
+    """Create a child process to do part of a spack build, without waiting for it.
+
+    Args:
+
+        pkg (spack.package_base.PackageBase): package whose environment we should set up the
+            child process for.
+        function (typing.Callable): argless function to run in the child
+            process.
+        kwargs (dict): additional keyword arguments for ``function``
+        forward_stdin: whether the child process may read from the standard input of the
+            parent. Only one of several concurrent build processes should do so.
+
     The child process is run with the build environment set up by
     spack.build_environment.  This allows package authors to have full
     control over the environment, etc. without affecting other builds
     that might be executed in the same spack call.
-
-    If something goes wrong, the child process catches the error and
-    passes it to the parent wrapped in a ChildError.  The parent is
-    expected to handle (or re-raise) the ChildError.
     """
     read_pipe, write_pipe = multiprocessing.Pipe(duplex=False)
     input_fd = None
@@ -1302,7 +1392,12 @@ def child_fun():
 
     try:
         # Forward sys.stdin when appropriate, to allow toggling verbosity
-        if sys.platform != "win32" and sys.stdin.isatty() and hasattr(sys.stdin, "fileno"):
+        if (
+            forward_stdin
+            and sys.platform != "win32"
+            and sys.stdin.isatty()
+            and hasattr(sys.stdin, "fileno")
+        ):
             input_fd = Connection(os.dup(sys.stdin.fileno()))
         mflags = os.environ.get("MAKEFLAGS", False)
         if mflags:
@@ -1341,40 +1436,7 @@ def child_fun():
         if input_fd is not None:
             input_fd.close()
 
-    def exitcode_msg(p):
-        typ = "exit" if p.exitcode >= 0 else "signal"
-        return f"{typ} {abs(p.exitcode)}"
-
-    try:
-        child_result = read_pipe.recv()
-    except EOFError:
-        p.join()
-        raise InstallError(f"The process has stopped unexpectedly ({exitcode_msg(p)})")
-
-    p.join()
-
-    # If returns a StopPhase, raise it
-    if isinstance(child_result, spack.error.StopPhase):
-        # do not print
-        raise child_result
-
-    # let the caller know which package went wrong.
-    if isinstance(child_result, InstallError):
-        child_result.pkg = pkg
-
-    if isinstance(child_result, ChildError):
-        # If the child process raised an error, print its output here rather
-        # than waiting until the call to SpackError.die() in main(). This
-        # allows exception handling output to be logged from within Spack.
-        # see spack.main.SpackCommand.
-        child_result.print_context()
-        raise child_result
-
-    # Fallback. Usually caught beforehand in EOFError above.
-    if p.exitcode != 0:
-        raise InstallError(f"The process failed unexpectedly ({exitcode_msg(p)})")
-
-    return child_result
+    return BuildProcess(pkg, p, read_pipe)
 
 
 CONTEXT_BASES = (spack.package_base.PackageBase, spack.builder.Builder)
@@ -0,0 +1,231 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Persistent history of the durations and resources of past installations.
+
+Each installation records the duration of its phases, and for builds from sources also the
+CPU time, the peak resident set size and the number of build jobs. Records are stored in a
+file cache, one entry per package, so that they outlive the installations themselves and can
+be queried to estimate the duration of future installations, or to find regressions.
+"""
+import json
+import os
+import socket
+import statistics
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import llnl.util.lang
+import llnl.util.tty as tty
+
+import spack.config
+import spack.paths
+import spack.spec
+import spack.util.file_cache
+import spack.util.path
+import spack.util.timer
+import spack.version
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+#: Maximum number of records kept for each package. The oldest ones are dropped first.
+MAX_RECORDS = 100
+
+#: A record of a past installation, as stored in the history
+BuildRecord = Dict[str, Any]
+
+
+def history_location() -> str:
+    """Directory where the build history is stored."""
+    path = spack.config.get("config:build_history", spack.paths.default_build_history_path)
+    return spack.util.path.canonicalize_path(path)
+
+
+def resource_usage() -> Dict[str, float]:
+    """Return the CPU time (in seconds) and peak resident set size (in bytes) used so far by
+    the current process and its children, or an empty dictionary if they are not available."""
+    if resource is None:
+        return {}
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in kilobytes on Linux, and in bytes on macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "cpu_time": own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        "peak_rss": max(own.ru_maxrss, children.ru_maxrss) * rss_unit,
+    }
+
+
+def make_record(
+    spec: spack.spec.Spec,
+    timer: spack.util.timer.BaseTimer,
+    *,
+    cache: bool,
+    jobs: Optional[int] = None,
+    usage: Optional[Dict[str, float]] = None,
+) -> BuildRecord:
+    """Return the record of the installation of a spec.
+
+    Args:
+        spec: spec that was installed
+        timer: timer of the installation phases, stopped
+        cache: whether the spec was installed from a binary cache
+        jobs: number of build jobs, for builds from sources
+        usage: resources used by the build, as returned by ``resource_usage()``
+    """
+    record: BuildRecord = {
+        "hash": spec.dag_hash(),
+        "version": str(spec.version),
+        "variants": spec.format("{variants}").strip(),
+        "host": socket.gethostname(),
+        "target": str(spec.target),
+        "cache": cache,
+        "jobs": jobs,
+        "time": time.time(),
+        "total": timer.duration(),
+        "phases": {phase: timer.duration(phase) for phase in timer.phases},
+    }
+    record.update(usage or {})
+    return record
+
+
+class BuildHistory:
+    """Records of past installations, stored under ``<root>/<package>.json``."""
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self._cache: Optional[spack.util.file_cache.FileCache] = None
+
+    @property
+    def cache(self) -> spack.util.file_cache.FileCache:
+        # The directory is only created on first use
+        if self._cache is None:
+            self._cache = spack.util.file_cache.FileCache(self.root)
+        return self._cache
+
+    @staticmethod
+    def _key(pkg_name: str) -> str:
+        return f"{pkg_name}.json"
+
+    def add(self, pkg_name: str, record: BuildRecord) -> None:
+        """Add the record of an installation to the history of a package."""
+        key = self._key(pkg_name)
+        self.cache.init_entry(key)
+        with self.cache.write_transaction(key) as (old, new):
+            records = _load(old)
+            records.append(record)
+            json.dump({"records": records[-MAX_RECORDS:]}, new, separators=(",", ":"))
+
+    def records(self, pkg_name: str) -> List[BuildRecord]:
+        """Return the records of a package, from the oldest to the most recent."""
+        key = self._key(pkg_name)
+        if not os.path.exists(os.path.join(self.root, key)):
+            return []
+        with self.cache.read_transaction(key) as f:
+            return _load(f)
+
+    def packages(self) -> List[str]:
+        """Return the names of the packages with records in the history."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name[: -len(".json")] for name in os.listdir(self.root) if name.endswith(".json")
+        )
+
+    def clear(self, pkg_names: Optional[Iterable[str]] = None) -> None:
+        """Remove the records of some packages, or of all of them."""
+        for pkg_name in self.packages() if pkg_names is None else pkg_names:
+            self.cache.remove(self._key(pkg_name))
+
+
+def _load(f) -> List[BuildRecord]:
+    if f is None:
+        return []
+    try:
+        return json.load(f)["records"]
+    except (ValueError, KeyError, TypeError) as e:
+        tty.debug(f"Discarding a corrupt build history in {f.name}: {e}")
+        return []
+
+
+def _history() -> BuildHistory:
+    return BuildHistory(history_location())
+
+
+#: Build history of the current configuration
+HISTORY: BuildHistory = llnl.util.lang.Singleton(_history)  # type: ignore
+
+
+def record_install(
+    spec: spack.spec.Spec,
+    timer: spack.util.timer.BaseTimer,
+    *,
+    cache: bool,
+    jobs: Optional[int] = None,
+    usage: Optional[Dict[str, float]] = None,
+) -> None:
+    """Add the installation of a spec to the build history. Errors are not fatal, since the
+    history is only informative."""
+    try:
+        HISTORY.add(spec.name, make_record(spec, timer, cache=cache, jobs=jobs, usage=usage))
+    except (OSError, spack.util.file_cache.CacheError) as e:
+        tty.debug(f"Cannot record the build of {spec.format('{name}/{hash:7}')}: {e}")
+
+
+def best_match(
+    records: List[BuildRecord], *, cache: bool, version: Optional[str] = None
+) -> Optional[BuildRecord]:
+    """Return the most relevant record to estimate an installation, if any.
+
+    Only records of installations of the same kind (from sources, or from a binary cache) are
+    considered. Among those, records of the same version and of the current host are preferred,
+    and then the most recent ones.
+    """
+    host = socket.gethostname()
+    candidates = [r for r in records if bool(r.get("cache")) == cache and "total" in r]
+    if not candidates:
+        return None
+    return max(
+        candidates,
+        key=lambda r: (r.get("version") == version, r.get("host") == host, r.get("time", 0)),
+    )
+
+
+def regressions(
+    records: List[BuildRecord], threshold: float
+) -> List[Tuple[Tuple[str, str], str, float, str, float]]:
+    """Find the versions of a package that build slower than the previous version.
+
+    Builds from sources are grouped by host and variants, and the median build time of each
+    version is compared to the median build time of the closest older version of the same group.
+
+    Args:
+        records: records of a single package
+        threshold: minimum relative increase of the build time to report, e.g. 0.2 for 20%
+
+    Returns:
+        Tuples of the (host, variants) group, the older version and its build time, the newer
+        version and its build time
+    """
+    durations: Dict[Tuple[str, str], Dict[str, List[float]]] = {}
+    for r in records:
+        if r.get("cache") or "total" not in r:
+            continue
+        group = durations.setdefault((r.get("host", ""), r.get("variants", "")), {})
+        group.setdefault(r["version"], []).append(r["total"])
+
+    result = []
+    for group_key, by_version in sorted(durations.items()):
+        versions = sorted(by_version, key=spack.version.Version)
+        for older, newer in zip(versions, versions[1:]):
+            before = statistics.median(by_version[older])
+            after = statistics.median(by_version[newer])
+            if after > before * (1 + threshold):
+                result.append((group_key, older, before, newer, after))
+    return result
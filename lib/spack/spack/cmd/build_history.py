@@ -0,0 +1,131 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+import datetime
+import json
+import sys
+
+import llnl.util.tty as tty
+from llnl.util.lang import pretty_date, pretty_seconds
+from llnl.util.tty.colify import colify_table
+from llnl.util.tty.color import colorize
+
+import spack.build_history
+
+description = "query the durations and resources of past installations"
+section = "build"
+level = "long"
+
+
+def setup_parser(subparser):
+    sp = subparser.add_subparsers(metavar="SUBCOMMAND", dest="build_history_command")
+
+    show_parser = sp.add_parser("show", help=build_history_show.__doc__)
+    show_parser.add_argument(
+        "--json", action="store_true", default=False, help="output records in JSON format"
+    )
+    show_parser.add_argument(
+        "packages", nargs="*", help="names of the packages to show (default is all)"
+    )
+
+    regressions_parser = sp.add_parser("regressions", help=build_history_regressions.__doc__)
+    regressions_parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=20.0,
+        help="minimum increase of the build time to report, in percent (default: 20)",
+    )
+    regressions_parser.add_argument(
+        "packages", nargs="*", help="names of the packages to check (default is all)"
+    )
+
+    clear_parser = sp.add_parser("clear", help=build_history_clear.__doc__)
+    clear_parser.add_argument(
+        "packages", nargs="*", help="names of the packages to clear (default is all)"
+    )
+
+
+def _pretty_bytes(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TiB"
+
+
+def build_history_show(args):
+    """show the records of past installations"""
+    history = spack.build_history.HISTORY
+    names = args.packages or history.packages()
+
+    if args.json:
+        json.dump({name: history.records(name) for name in names}, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return
+
+    for name in names:
+        records = history.records(name)
+        if not records:
+            continue
+        tty.msg(name)
+        table = [
+            ["VERSION", "VARIANTS", "HOST", "FROM", "JOBS", "TIME", "CPU", "PEAK RSS", "DATE"]
+        ]
+        for r in records:
+            table.append(
+                [
+                    r.get("version", "-"),
+                    r.get("variants") or "-",
+                    r.get("host", "-"),
+                    "cache" if r.get("cache") else "source",
+                    r.get("jobs") or "-",
+                    pretty_seconds(r["total"]),
+                    pretty_seconds(r["cpu_time"]) if "cpu_time" in r else "-",
+                    _pretty_bytes(r["peak_rss"]) if "peak_rss" in r else "-",
+                    pretty_date(datetime.datetime.fromtimestamp(r.get("time", 0))),
+                ]
+            )
+        colify_table(table, indent=4)
+
+
+def build_history_regressions(args):
+    """report versions that build slower than the previous version"""
+    history = spack.build_history.HISTORY
+    threshold = args.threshold / 100.0
+
+    found = False
+    for name in args.packages or history.packages():
+        for (host, variants), older, before, newer, after in spack.build_history.regressions(
+            history.records(name), threshold
+        ):
+            found = True
+            increase = 100.0 * (after - before) / before if before else float("inf")
+            where = f"{host}, {variants}" if variants else host
+            print(
+                f"{name} {older} -> {newer}: {pretty_seconds(before)} -> "
+                f"{pretty_seconds(after)} ({colorize(f'@R{{+{increase:.0f}%}}')}) on {where}"
+            )
+
+    if not found:
+        tty.msg(f"No build time regressions above {args.threshold:g}%")
+
+
+def build_history_clear(args):
+    """remove records of past installations"""
+    spack.build_history.HISTORY.clear(args.packages or None)
+
+
+def build_history(parser, args):
+    if not args.build_history_command:
+        parser.print_help()
+        return
+
+    action = {
+        "show": build_history_show,
+        "regressions": build_history_regressions,
+        "clear": build_history_clear,
+    }
+    action[args.build_history_command](args)
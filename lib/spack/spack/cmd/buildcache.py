@@ -9,7 +9,7 @@
 import shutil
 import sys
 import tempfile
-from typing import List, Tuple
+from typing import List, Optional, Set, Tuple
 
 import llnl.util.tty as tty
 from llnl.string import plural
@@ -120,6 +120,13 @@ def setup_parser(subparser: argparse.ArgumentParser):
         action="store_true",
         help="for a private mirror, include non-redistributable packages",
     )
+    push.add_argument(
+        "--compression",
+        default="gzip",
+        choices=bindist.BUILD_CACHE_COMPRESSIONS,
+        help="compression of the tarballs: zstd is faster to extract but needs a recent Spack, "
+        "gzip+zstd pushes both, chunks stores file contents deduplicated across specs",
+    )
     arguments.add_common_arguments(push, ["specs", "jobs"])
     push.set_defaults(func=push_fn)
 
@@ -410,6 +417,9 @@ def push_fn(args):
         )
         unsigned = True
 
+    if mirror.push_url.startswith("oci://") and args.compression != "gzip":
+        tty.warn("OCI images are always gzip compressed, ignoring --compression")
+
     # Select a signing key, or None if unsigned.
     signing_key = None if unsigned else (args.key or bindist.select_signing_key())
 
@@ -444,6 +454,7 @@ def push_fn(args):
         update_index=args.update_index,
         signing_key=signing_key,
         base_image=args.base_image,
+        compression=args.compression,
     ) as uploader:
         skipped, upload_errors = uploader.push(specs=specs)
         failed.extend(upload_errors)
@@ -495,8 +506,15 @@ def install_fn(args):
 
 def list_fn(args):
     """list binary packages available from mirrors"""
+    # Only the specs of the packages being listed are read, unless a constraint has no name
+    names: Optional[Set[str]] = None
+    if args.specs:
+        queries = [spack.spec.Spec(c) for c in args.specs]
+        if all(q.name and not q.virtual for q in queries):
+            names = {q.name for q in queries}
+
     try:
-        specs = bindist.update_cache_and_get_specs()
+        specs = bindist.update_cache_and_get_specs(names=names)
     except bindist.FetchCacheError as e:
         tty.die(e)
 
@@ -631,8 +649,14 @@ def save_specfile_fn(args):
     )
 
 
+def _mirror_root_of(url):
+    """Return the URL of the mirror containing a build cache file"""
+    return url.rsplit("/" + bindist.build_cache_relative_path() + "/", 1)[0]
+
+
 def copy_buildcache_file(src_url, dest_url, local_path=None):
-    """Copy from source url to destination url"""
+    """Copy from source url to destination url. The chunks of chunked tarballs are copied
+    along."""
     tmpdir = None
 
     if not local_path:
@@ -644,6 +668,11 @@ def copy_buildcache_file(src_url, dest_url, local_path=None):
         try:
             temp_stage.create()
             temp_stage.fetch()
+            # Chunks are pushed before the tarball referencing them
+            if local_path.endswith(".spack") and bindist.is_chunk_manifest(local_path):
+                bindist.copy_chunks(
+                    local_path, _mirror_root_of(src_url), _mirror_root_of(dest_url)
+                )
             web_util.push_to_url(local_path, dest_url, keep_original=True)
         except spack.error.FetchError as e:
             # Expected, since we have to try all the possible extensions
@@ -703,6 +732,7 @@ def sync_fn(args):
         buildcache_rel_paths.extend(
             [
                 os.path.join(build_cache_dir, bindist.tarball_path_name(s, ".spack")),
+                os.path.join(build_cache_dir, bindist.tarball_path_name(s, ".spack.zst")),
                 os.path.join(build_cache_dir, bindist.tarball_name(s, ".spec.json.sig")),
                 os.path.join(build_cache_dir, bindist.tarball_name(s, ".spec.json")),
                 os.path.join(build_cache_dir, bindist.tarball_name(s, ".spec.yaml")),
@@ -717,3 +717,13 @@ def mirror_name(name):
         return spack.mirror.require_mirror_name(name)
     except ValueError as e:
         raise argparse.ArgumentTypeError(str(e)) from e
+
+
+def positive_int(value):
+    try:
+        number = int(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from e
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value}")
+    return number
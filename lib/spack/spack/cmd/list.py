@@ -117,9 +117,9 @@ def match(p, f):
                 if f.match(p):
                     return True
 
-                pkg_cls = spack.repo.PATH.get_pkg_class(p)
-                if pkg_cls.__doc__:
-                    return f.match(pkg_cls.__doc__)
+                pkg_metadata = spack.repo.PATH.get_pkg_metadata(p)
+                if pkg_metadata.__doc__:
+                    return f.match(pkg_metadata.__doc__)
                 return False
 
         else:
@@ -169,7 +169,7 @@ def get_dependencies(pkg):
 @formatter
 def version_json(pkg_names, out):
     """Print all packages with their latest versions."""
-    pkg_classes = [spack.repo.PATH.get_pkg_class(name) for name in pkg_names]
+    pkg_classes = [spack.repo.PATH.get_pkg_metadata(name) for name in pkg_names]
 
     out.write("[\n")
 
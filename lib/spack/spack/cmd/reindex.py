@@ -3,6 +3,10 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import time
+
+from llnl.util import tty
+
 import spack.store
 
 description = "rebuild Spack's package database"
@@ -10,5 +14,33 @@
 level = "long"
 
 
+def setup_parser(subparser):
+    subparser.add_argument(
+        "-j",
+        "--jobs",
+        action="store",
+        type=int,
+        default=1,
+        help="number of processes used to read spec files from the install tree (default: 1)",
+    )
+
+
+class ProgressReporter:
+    """Reports the progress of the search of the install tree, at most once per interval"""
+
+    def __init__(self, interval: float = 2.0) -> None:
+        self.interval = interval
+        self.last = time.monotonic()
+
+    def __call__(self, searched: int, total: int, found: int) -> None:
+        now = time.monotonic()
+        if searched < total and now - self.last < self.interval:
+            return
+        self.last = now
+        tty.msg(f"Searched {searched}/{total} directories, found {found} installations")
+
+
 def reindex(parser, args):
-    spack.store.STORE.reindex()
+    if args.jobs < 1:
+        tty.die(f"invalid value for --jobs: expected a positive integer, got {args.jobs}")
+    spack.store.STORE.reindex(jobs=args.jobs, progress=ProgressReporter())
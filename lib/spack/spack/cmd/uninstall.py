@@ -145,6 +145,7 @@ def is_installed(spec):
         record = spack.store.STORE.db.query_local_by_spec_hash(spec.dag_hash())
         return record and record.installed
 
+    spack.store.STORE.db.connect_dependents()
     specs = traverse.traverse_nodes(
         specs,
         root=False,
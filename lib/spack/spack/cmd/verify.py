@@ -7,9 +7,11 @@
 import llnl.util.tty as tty
 
 import spack.cmd
+import spack.config
 import spack.environment as ev
 import spack.store
 import spack.verify
+from spack.cmd.common import arguments
 
 description = "check that all spack packages are on disk as installed"
 section = "admin"
@@ -26,6 +28,19 @@ def setup_parser(subparser):
         "-j", "--json", action="store_true", help="ouptut json-formatted errors"
     )
     subparser.add_argument("-a", "--all", action="store_true", help="verify all packages")
+    subparser.add_argument(
+        "--fast",
+        action="store_true",
+        help="do not hash again files whose size, modification time and inode did not change "
+        "since the last verification",
+    )
+    subparser.add_argument(
+        "--jobs",
+        action=arguments.SetParallelJobs,
+        type=int,
+        dest="jobs",
+        help="explicitly set number of parallel jobs used to hash files",
+    )
     subparser.add_argument(
         "specs_or_files", nargs=argparse.REMAINDER, help="specs or files to verify"
     )
@@ -91,15 +106,28 @@ def verify(parser, args):
         setup_parser.parser.print_help()
         return 1
 
+    jobs = spack.config.determine_number_of_jobs(parallel=True)
+    all_results = spack.verify.VerificationResults()
+    failed = 0
     for spec in specs:
-        tty.debug("Verifying package %s")
-        results = spack.verify.check_spec_manifest(spec)
-        if results.has_errors():
-            if args.json:
-                print(results.json_string())
-            else:
-                tty.msg("In package %s" % spec.format("{name}/{hash:7}"))
-                print(results)
-            return 1
-        else:
+        tty.debug("Verifying package %s" % spec.format("{name}/{hash:7}"))
+        results = spack.verify.check_spec_manifest(spec, fast=args.fast, jobs=jobs)
+        if not results.has_errors():
             tty.debug(results)
+            continue
+
+        failed += 1
+        if args.json:
+            all_results += results
+        else:
+            tty.msg("In package %s: %s" % (spec.format("{name}/{hash:7}"), results.summary()))
+            print(results)
+
+    if not failed:
+        return 0
+
+    if args.json:
+        print(all_results.json_string())
+    elif len(specs) > 1:
+        tty.msg("%d of %d packages failed verification" % (failed, len(specs)))
+    return 1
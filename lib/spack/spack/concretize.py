@@ -3,17 +3,26 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 """High-level functions to concretize list of specs"""
+import hashlib
+import json
+import os
 import sys
 import time
 from contextlib import contextmanager
-from typing import Iterable, Optional, Sequence, Tuple, Union
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
 
 import llnl.util.tty as tty
 
+import spack
+import spack.caches
 import spack.compilers
 import spack.config
+import spack.deptypes as dt
 import spack.error
+import spack.package_base
+import spack.package_metadata
 import spack.repo
+import spack.util.file_cache
 import spack.util.parallel
 from spack.spec import ArchSpec, CompilerSpec, Spec
 
@@ -190,10 +199,187 @@ def _concretize_task(packed_arguments: Tuple[int, str, TestsType]) -> Tuple[int,
     index, spec_str, tests = packed_arguments
     with tty.SuppressOutput(msg_enabled=False):
         start = time.time()
-        spec = Spec(spec_str).concretized(tests=tests)
+        abstract = Spec(spec_str)
+        if not spack.config.get("concretizer:cache", False):
+            return index, abstract.concretized(tests=tests), time.time() - start
+
+        cache = ConcretizationCache(spack.caches.MISC_CACHE)
+        key = cache.key(abstract, tests)
+        spec = cache.get(key) if key else None
+        if spec is None:
+            spec = abstract.concretized(tests=tests)
+            if key:
+                cache.put(key, spec)
         return index, spec, time.time() - start
 
 
+def _stat_fingerprints(paths: Iterable[str]) -> List[Tuple[str, int, int]]:
+    """Return the path, modification time and size of the files that exist among those passed
+    as input."""
+    result = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        result.append((path, st.st_mtime_ns, st.st_size))
+    return result
+
+
+class ConcretizationCache:
+    """Persistent cache of the results of concretizing single abstract specs.
+
+    Entries are stored in a file cache, and addressed by a hash of everything the result
+    depends on: the abstract spec, the configuration of the concretizer, the sources of the
+    specs that can be reused, and the source files of every package that can be reached from
+    the spec. Changing a package only invalidates the entries of the specs that can reach it.
+
+    Sources of reusable specs are represented by fingerprints that are cheap to compute, and
+    change whenever their specs may have changed, so that computing the key of an entry never
+    requires constructing reusable specs.
+    """
+
+    #: Version of the format of cache entries. Bumping it invalidates all entries.
+    FORMAT_VERSION = 2
+
+    #: Configuration sections the result of a concretization depends on
+    CONFIG_SECTIONS = (
+        "concretizer",
+        "packages",
+        "compilers",
+        "repos",
+        "mirrors",
+        "upstreams",
+        "develop",
+    )
+
+    def __init__(self, cache: spack.util.file_cache.FileCache) -> None:
+        self.cache = cache
+
+    def key(self, spec: Spec, tests: TestsType) -> Optional[str]:
+        """Return the key of the entry for an abstract spec, or None if the result of its
+        concretization cannot be cached.
+        """
+        # Abstract hashes are resolved against the current database and buildcaches
+        if any(node.abstract_hash for node in spec.traverse()):
+            return None
+
+        import spack.environment
+
+        env = spack.environment.active_environment()
+        inputs = {
+            "format": self.FORMAT_VERSION,
+            "spack": spack.spack_version,
+            "spec": str(spec),
+            "tests": tests if isinstance(tests, bool) else sorted(tests),
+            "config": {section: spack.config.get(section) for section in self.CONFIG_SECTIONS},
+            "deprecated": spack.config.get("config:deprecated", False),
+            "require_checksum": "SPACK_CONCRETIZER_REQUIRE_CHECKSUM" in os.environ,
+            "dev_specs": env.dev_specs if env else {},
+            "host": str(ArchSpec.default_arch()),
+            "reusable": self._reusable_fingerprints(env),
+            "packages": self._package_fingerprints(spec, tests),
+        }
+        data = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    @staticmethod
+    def _reusable_fingerprints(env) -> dict:
+        """Fingerprints of the sources of reusable specs: the index files of the databases of
+        the store and its upstreams, the cached indices of the build caches, and the concrete
+        specs of environments."""
+        import spack.binary_distribution
+        import spack.environment
+        import spack.mirror
+        import spack.store
+
+        reuse = spack.config.get("concretizer:reuse", False)
+        if reuse is False:
+            return {}
+
+        db = spack.store.STORE.db
+        files = [path for d in [db, *db.upstream_dbs] for path in d.index_files()]
+
+        sources = reuse.get("from", ()) if isinstance(reuse, dict) else ()
+        for source in sources:
+            if source["type"] == "environment" and "path" in source:
+                try:
+                    env_dir = spack.environment.as_env_dir(source["path"])
+                except spack.environment.SpackEnvironmentError:
+                    continue
+                files.append(os.path.join(env_dir, spack.environment.lockfile_name))
+
+        buildcaches = None
+        if spack.mirror.MirrorCollection(binary=True):
+            index = spack.binary_distribution.BINARY_INDEX
+            try:
+                index.update(with_cooldown=True)
+            except spack.binary_distribution.FetchCacheError as e:
+                tty.debug(f"Cannot update the buildcache indices: {e}")
+            buildcaches = index.cached_indices_key()
+
+        return {
+            "files": _stat_fingerprints(files),
+            "buildcaches": buildcaches,
+            "environment": (
+                {
+                    "concrete": sorted(env.concretized_order),
+                    "included": {
+                        name: sorted(specs) for name, specs in env.included_specs_by_hash.items()
+                    },
+                }
+                if env
+                else None
+            ),
+        }
+
+    @staticmethod
+    def _package_fingerprints(spec: Spec, tests: TestsType) -> dict:
+        """Fingerprints of the packages that can be part of the concretization of a spec."""
+        depflag = dt.ALL if tests else dt.LINK | dt.RUN | dt.BUILD
+        roots = [spec.name] if spec.name else []
+        roots.extend(spack.repo.PATH.packages_with_tags("runtime"))
+        roots.extend(
+            compiler.spec.name
+            for compiler in spack.compilers.all_compilers_from(spack.config.CONFIG)
+            if spack.repo.PATH.exists(compiler.spec.name)
+        )
+        names = spack.package_base.possible_dependencies(
+            *roots, *(dep.name for dep in spec.traverse(root=False) if dep.name), depflag=depflag
+        )
+        return {
+            name: spack.package_metadata.fingerprint(spack.repo.PATH.get_pkg_metadata(name))
+            for name in names
+            if not spack.repo.PATH.is_virtual(name)
+        }
+
+    @staticmethod
+    def _cache_key(key: str) -> str:
+        return f"concretization/{key[:2]}/{key}.json"
+
+    def get(self, key: str) -> Optional[Spec]:
+        """Return the concrete spec stored for a key, if any."""
+        cache_key = self._cache_key(key)
+        try:
+            if not self.cache.init_entry(cache_key):
+                return None
+            with self.cache.read_transaction(cache_key) as f:
+                return Spec.from_json(f)
+        except (spack.util.file_cache.CacheError, OSError, ValueError, KeyError) as e:
+            tty.debug(f"Cannot read cached concretization {key}: {e}")
+            return None
+
+    def put(self, key: str, spec: Spec) -> None:
+        """Store the concrete spec for a key."""
+        cache_key = self._cache_key(key)
+        try:
+            self.cache.init_entry(cache_key)
+            with self.cache.write_transaction(cache_key) as (old, new):
+                spec.to_json(new)
+        except (spack.util.file_cache.CacheError, OSError) as e:
+            tty.debug(f"Cannot cache concretization {key}: {e}")
+
+
 class UnavailableCompilerVersionError(spack.error.SpackError):
     """Raised when there is no available compiler that satisfies a
     compiler spec."""
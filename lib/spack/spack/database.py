@@ -18,11 +18,16 @@
 provides a cache and a sanity checking mechanism for what is in the
 filesystem.
 """
+import bisect
 import contextlib
 import datetime
+import json
+import math
+import mmap
 import os
 import pathlib
 import socket
+import struct
 import sys
 import time
 from json import JSONDecoder
@@ -56,6 +61,7 @@
 
 import spack.deptypes as dt
 import spack.hash_types as ht
+import spack.repo
 import spack.spec
 import spack.traverse as tr
 import spack.util.lock as lk
@@ -65,6 +71,7 @@
     DirectoryLayout,
     DirectoryLayoutError,
     InconsistentInstallDirectoryError,
+    ProgressCallback,
 )
 from spack.error import SpackError
 from spack.util.crypto import bit_length
@@ -113,6 +120,9 @@
 #: We store by DAG hash, so we track the dependencies that the DAG hash includes.
 _TRACKED_DEPENDENCIES = ht.dag_hash.depflag
 
+#: Formats that can be used to store the database index on disk
+_INDEX_FORMATS = ("json", "binary")
+
 #: Default list of fields written for each install record
 DEFAULT_INSTALL_RECORD_FIELDS = (
     "spec",
@@ -150,6 +160,16 @@ def _now() -> float:
     return time.time()
 
 
+def _node_name_and_external(node: Dict[str, Any]) -> Tuple[Optional[str], bool]:
+    """Return the name of the spec in a node dictionary, and whether the spec is external."""
+    if "name" not in node and len(node) == 1:
+        # old format, the node is keyed by name
+        name, node = next(iter(node.items()))
+    else:
+        name = node.get("name")
+    return name, bool(node.get("external"))
+
+
 def _autospec(function):
     """Decorator that automatically converts the argument of a single-arg
     function to a Spec."""
@@ -217,6 +237,11 @@ def __init__(
         self.in_buildcache = in_buildcache
         self.origin = origin
 
+    @property
+    def name(self) -> str:
+        """Name of the spec in this record"""
+        return self.spec.name
+
     def install_type_matches(self, installed: InstallRecordStatus) -> bool:
         if self.installed:
             return InstallRecordStatus.INSTALLED in installed
@@ -229,7 +254,7 @@ def to_dict(self, include_fields=DEFAULT_INSTALL_RECORD_FIELDS):
 
         for field_name in include_fields:
             if field_name == "spec":
-                rec_dict.update({"spec": self.spec.node_dict_with_hashes()})
+                rec_dict.update({"spec": self._node_dict()})
             elif field_name == "deprecated_for" and self.deprecated_for:
                 rec_dict.update({"deprecated_for": self.deprecated_for})
             else:
@@ -240,8 +265,11 @@ def to_dict(self, include_fields=DEFAULT_INSTALL_RECORD_FIELDS):
 
         return rec_dict
 
-    @classmethod
-    def from_dict(cls, spec, dictionary):
+    def _node_dict(self) -> Dict[str, Any]:
+        return self.spec.node_dict_with_hashes()
+
+    @staticmethod
+    def _fields_from_dict(dictionary) -> Dict[str, Any]:
         d = dict(dictionary.items())
         d.pop("spec", None)
 
@@ -252,7 +280,73 @@ def from_dict(cls, spec, dictionary):
         if "installed" not in d:
             d["installed"] = False
 
-        return InstallRecord(spec, **d)
+        return d
+
+    @classmethod
+    def from_dict(cls, spec, dictionary):
+        return InstallRecord(spec, **cls._fields_from_dict(dictionary))
+
+
+class LazyInstallRecord(InstallRecord):
+    """An install record read from a database index, whose spec is constructed on first access.
+
+    The record keeps the node dictionary of its spec in serialized form, or a function to load
+    it, until the spec is needed. Constructing the spec also constructs the specs of its
+    dependencies, but nothing else, so that looking up a few records in a large database is
+    proportional to the size of their DAGs.
+    """
+
+    def __init__(
+        self,
+        dag_hash: str,
+        name: str,
+        materialize: Callable[["LazyInstallRecord"], None],
+        node_dict: Optional[Dict[str, Any]] = None,
+        node_loader: Optional[Callable[[], Dict[str, Any]]] = None,
+        reuse_node_dict: bool = False,
+        **kwargs,
+    ) -> None:
+        super().__init__(None, **kwargs)  # type: ignore[arg-type]
+        self.dag_hash = dag_hash
+        self._name = name
+        self._materialize = materialize
+        self._raw_node_dict = node_dict
+        self._node_loader = node_loader
+        #: Whether the serialized node dictionary can be written back as is
+        self._reuse_node_dict = reuse_node_dict
+
+    @property
+    def spec(self) -> "spack.spec.Spec":
+        if self._spec is None:
+            self._materialize(self)
+        return self._spec  # type: ignore[return-value]
+
+    @spec.setter
+    def spec(self, value: "spack.spec.Spec") -> None:
+        self._spec = value
+        # The serialized form is not needed anymore
+        self._raw_node_dict = self._node_loader = None
+
+    @property
+    def name(self) -> str:
+        return self._name if self._spec is None else self._spec.name
+
+    @property
+    def materialized(self) -> bool:
+        """Whether the spec of this record has been constructed"""
+        return self._spec is not None
+
+    def serialized_node_dict(self) -> Dict[str, Any]:
+        """Node dictionary of the spec of this record, as read from the database index"""
+        if self._raw_node_dict is not None:
+            return self._raw_node_dict
+        assert self._node_loader is not None
+        return self._node_loader()
+
+    def _node_dict(self) -> Dict[str, Any]:
+        if self._spec is None and self._reuse_node_dict:
+            return self.serialized_node_dict()
+        return super()._node_dict()
 
 
 class ForbiddenLockError(SpackError):
@@ -532,6 +626,371 @@ def _path(self, spec: "spack.spec.Spec") -> pathlib.Path:
         return self.dir / f"{spec.name}-{spec.dag_hash()}"
 
 
+class BinaryIndexFile:
+    """Binary, indexed representation of the install records of a database on disk.
+
+    The file starts with a fixed size header, containing a magic string, the version of this
+    file format and the version of the database. The header is followed by a sequence of
+    entries, one per install record. Each entry has a fixed size prefix with a status flag, the
+    DAG hash of the record and the length of two JSON payloads: the fields of the install record,
+    and the node dictionary of its spec.
+
+    Readers scan only the fixed size prefixes to compute the offset of each record, and decode
+    payloads on demand. Writers can append new entries, and invalidate old ones in place by
+    turning them into tombstones, so that a transaction touching a few records doesn't need to
+    rewrite the entire file. If the same DAG hash is found in more than one live entry, the last
+    one wins. A truncated entry at the end of the file, e.g. due to an interrupted write, is
+    ignored and overwritten by the next append.
+
+    This class does no locking.
+    """
+
+    MAGIC = b"SPACKIDX"
+    #: Version of the binary format, independent of the database version
+    FORMAT_VERSION = 1
+    #: Magic string, format version, database version
+    HEADER = struct.Struct("<8sH16s")
+    #: Status flag, DAG hash, length of the record payload, length of the spec payload
+    ENTRY = struct.Struct("<B32sII")
+
+    TOMBSTONE = 0
+    LIVE = 1
+
+    #: Minimum number of bytes in tombstones before the file is compacted on write
+    COMPACTION_THRESHOLD = 1 << 20
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        #: Offset of the live entry for each DAG hash
+        self.offsets: Dict[str, int] = {}
+        #: Offset past the last complete entry in the file
+        self.end = 0
+        #: Number of bytes taken by tombstones and superseded entries
+        self.dead_bytes = 0
+
+    def _check(self, cond: bool, msg: str) -> None:
+        if not cond:
+            raise CorruptDatabaseError(f"Spack database is corrupt: {msg}", self.path)
+
+    def _scan(self, buffer) -> vn.StandardVersion:
+        """Read the header, and the offsets of all the live entries in the buffer."""
+        self._check(len(buffer) >= self.HEADER.size, "truncated header in binary index")
+        magic, fmt, db_version = self.HEADER.unpack_from(buffer, 0)
+        self._check(magic == self.MAGIC, "invalid magic string in binary index")
+        self._check(fmt <= self.FORMAT_VERSION, f"unknown binary index format {fmt}")
+
+        self.offsets, self.dead_bytes = {}, 0
+        offset, size = self.HEADER.size, len(buffer)
+        while offset + self.ENTRY.size <= size:
+            flag, key, record_len, spec_len = self.ENTRY.unpack_from(buffer, offset)
+            entry_end = offset + self.ENTRY.size + record_len + spec_len
+            if entry_end > size:
+                break
+
+            if flag == self.LIVE:
+                dag_hash = key.decode("ascii")
+                previous = self.offsets.get(dag_hash)
+                if previous is not None:
+                    self.dead_bytes += self._entry_size(buffer, previous)
+                self.offsets[dag_hash] = offset
+            else:
+                self.dead_bytes += entry_end - offset
+            offset = entry_end
+
+        self.end = offset
+        return vn.Version(db_version.rstrip(b"\0").decode("ascii"))
+
+    def _entry_size(self, buffer, offset: int) -> int:
+        _, _, record_len, spec_len = self.ENTRY.unpack_from(buffer, offset)
+        return self.ENTRY.size + record_len + spec_len
+
+    def _payloads(self, buffer, offset: int) -> Tuple[int, int, int]:
+        _, _, record_len, spec_len = self.ENTRY.unpack_from(buffer, offset)
+        start = offset + self.ENTRY.size
+        return start, start + record_len, start + record_len + spec_len
+
+    def decode_fields(self, buffer, offset: int) -> Dict[str, Any]:
+        """Decode the fields of the install record in the entry at the given offset. These
+        include the ``name`` of the spec, and whether it is ``external``."""
+        start, end, _ = self._payloads(buffer, offset)
+        return json.loads(bytes(buffer[start:end]))
+
+    def decode_spec(self, buffer, offset: int) -> Dict[str, Any]:
+        """Decode the spec node dictionary in the entry at the given offset."""
+        _, start, end = self._payloads(buffer, offset)
+        return json.loads(bytes(buffer[start:end]))
+
+    def open(self) -> Tuple[vn.StandardVersion, Any]:
+        """Scan the file, and return the database version and a read-only buffer with the file
+        content, to decode entries from.
+
+        The buffer is a memory map of the file where possible, so that payloads are paged in only
+        when decoded. This is safe because payloads are never modified in place: updates only
+        append entries and flip status flags, and full rewrites replace the file atomically.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if sys.platform == "win32" or size == 0:
+                    # Windows doesn't allow replacing files that are mapped in memory
+                    buffer = f.read()
+                else:
+                    buffer = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise CorruptDatabaseError("error reading binary database index:", str(e)) from e
+
+        return self._scan(buffer), buffer
+
+    @classmethod
+    def encode(cls, dag_hash: str, record: Dict[str, Any]) -> bytes:
+        """Encode an install record dictionary, including its ``spec``, into an entry."""
+        key = dag_hash.encode("ascii")
+        if len(key) != 32:
+            raise ValueError(f"cannot store DAG hash '{dag_hash}' in a binary index")
+        record = dict(record)
+        node = record.pop("spec")
+        # Readers need the name of the spec to index it without decoding the spec payload
+        record["name"], record["external"] = _node_name_and_external(node)
+        spec = sjson.dump(node).encode("utf-8")
+        fields = sjson.dump(record).encode("utf-8")
+        return cls.ENTRY.pack(cls.LIVE, key, len(fields), len(spec)) + fields + spec
+
+    def write(self, version: vn.StandardVersion, records: Dict[str, Dict[str, Any]]) -> None:
+        """Rewrite the whole file with the records passed as input, replacing it atomically."""
+        temp_file = f"{self.path}.{_getfqdn()}.{os.getpid()}.temp"
+        offsets: Dict[str, int] = {}
+        try:
+            with open(temp_file, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, self.FORMAT_VERSION, str(version).encode()))
+                for dag_hash, record in records.items():
+                    offsets[dag_hash] = f.tell()
+                    f.write(self.encode(dag_hash, record))
+                end = f.tell()
+            fs.rename(temp_file, self.path)
+        except BaseException:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+
+        self.offsets, self.end, self.dead_bytes = offsets, end, 0
+
+    def update(self, records: Dict[str, Dict[str, Any]], removed: Iterable[str]) -> None:
+        """Append the records passed as input, and turn any previous entry for them, or for the
+        removed DAG hashes, into a tombstone.
+
+        New entries are written before old ones are invalidated, so that an interrupted update
+        leaves at worst duplicate live entries, which are resolved in favor of the last one.
+        """
+        stale = [self.offsets[h] for h in (*records, *removed) if h in self.offsets]
+        with open(self.path, "r+b") as f:
+            f.seek(self.end)
+            f.truncate()
+            for dag_hash, record in records.items():
+                self.offsets[dag_hash] = f.tell()
+                f.write(self.encode(dag_hash, record))
+            self.end = f.tell()
+
+            tombstone = bytes([self.TOMBSTONE])
+            for offset in stale:
+                f.seek(offset)
+                self.dead_bytes += self._entry_size(f.read(self.ENTRY.size), 0)
+                f.seek(offset)
+                f.write(tombstone)
+
+        for dag_hash in removed:
+            self.offsets.pop(dag_hash, None)
+
+    def needs_compaction(self) -> bool:
+        """Whether dead entries take enough space that the file should be rewritten."""
+        return self.dead_bytes > max(self.COMPACTION_THRESHOLD, self.end // 2)
+
+
+class DatabaseJournal:
+    """Append-only journal of the install records modified since ``index.json`` was written.
+
+    The first line of the journal identifies the snapshot of ``index.json`` it applies to. Each
+    following line is a JSON object with the DAG hash of an install record and, unless the record
+    was removed, its new content. Readers replay the journal on top of the snapshot, so that a
+    write transaction modifying a few records only needs to append a few lines. A journal whose
+    snapshot doesn't match ``index.json``, e.g. because the index was rewritten by a version of
+    Spack that doesn't know about journals, is stale and ignored. An incomplete line at the end
+    of the journal, e.g. due to an interrupted write, is ignored and overwritten by the next
+    append.
+
+    This class does no locking.
+    """
+
+    #: Minimum size of the journal, in bytes, before it is compacted into index.json
+    COMPACTION_THRESHOLD = 1 << 20
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        #: Snapshot of index.json the journal applies to, or None if it's unknown
+        self.snapshot: Optional[str] = None
+        #: Offset past the last complete line of a valid journal, or 0 if there's none
+        self.end = 0
+
+    def replay(self, snapshot: Optional[str], installs: Dict[str, Dict[str, Any]]) -> None:
+        """Apply the journal to the install records of the snapshot passed as input."""
+        self.snapshot, self.end = snapshot, 0
+        if snapshot is None:
+            return
+
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+
+        with f:
+            line = f.readline()
+            try:
+                header = json.loads(line)
+            except ValueError:
+                return
+            if not line.endswith(b"\n") or not isinstance(header, dict):
+                return
+            elif header.get("snapshot") != snapshot:
+                return
+            self.end = f.tell()
+
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                    if "record" in entry:
+                        installs[entry["hash"]] = entry["record"]
+                    else:
+                        installs.pop(entry["hash"], None)
+                except (ValueError, KeyError, TypeError) as e:
+                    raise CorruptDatabaseError("error parsing database journal:", str(e)) from e
+                self.end += len(line)
+
+    def append(self, records: Dict[str, Dict[str, Any]], removed: Iterable[str]) -> None:
+        """Append updated and removed install records to the journal."""
+        lines = [sjson.dump({"hash": k, "record": v}) for k, v in records.items()]
+        lines.extend(sjson.dump({"hash": k}) for k in removed)
+        if not self.end:
+            lines.insert(0, sjson.dump({"snapshot": self.snapshot}))
+
+        with open(self.path, "r+b" if self.end else "wb") as f:
+            f.seek(self.end)
+            f.truncate()
+            f.write("".join(f"{line}\n" for line in lines).encode("utf-8"))
+            self.end = f.tell()
+
+    def reset(self, snapshot: Optional[str]) -> None:
+        """Discard the journal, after index.json has been written with a new snapshot."""
+        self.snapshot, self.end = snapshot, 0
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def needs_compaction(self, index_size: int) -> bool:
+        """Whether the journal is large enough, relative to index.json, to be compacted."""
+        return self.end > max(self.COMPACTION_THRESHOLD, index_size // 4)
+
+
+class _SecondaryIndexes:
+    """Indexes of the install records of a database, by package name, explicit flag and
+    installation time, used to restrict the records a query needs to check.
+
+    Indexes are updated one record at a time, by DAG hash, when a record is added, modified or
+    removed. The values indexed for each record are remembered, so stale entries can be removed
+    after the record itself has been modified or deleted.
+    """
+
+    def __init__(self, data: Dict[str, InstallRecord]) -> None:
+        #: Install records being indexed, by DAG hash
+        self.data = data
+        #: DAG hashes by package name, in insertion order
+        self.by_name: Dict[str, Dict[str, None]] = {}
+        #: DAG hashes of explicit installs, in insertion order
+        self.explicit: Dict[str, None] = {}
+        #: Sorted (installation time, DAG hash) pairs
+        self.by_time: List[Tuple[float, str]] = []
+        #: Indexed (name, explicit, installation time) values, by DAG hash
+        self.values: Dict[str, Tuple[str, bool, float]] = {}
+
+        for key, rec in data.items():
+            self._add(key, rec)
+            self.by_time.append((rec.installation_time, key))
+        self.by_time.sort()
+
+    def _add(self, key: str, rec: InstallRecord) -> None:
+        name, explicit = rec.name, bool(rec.explicit)
+        self.values[key] = (name, explicit, rec.installation_time)
+        self.by_name.setdefault(name, {})[key] = None
+        if explicit:
+            self.explicit[key] = None
+
+    def update(self, key: str) -> None:
+        """Update the indexes for the record with the DAG hash passed as input."""
+        rec = self.data.get(key)
+        values = self.values.pop(key, None)
+        if values is not None:
+            name, explicit, installation_time = values
+            del self.by_name[name][key]
+            if not self.by_name[name]:
+                del self.by_name[name]
+            self.explicit.pop(key, None)
+            del self.by_time[bisect.bisect_left(self.by_time, (installation_time, key))]
+
+        if rec is not None:
+            self._add(key, rec)
+            bisect.insort(self.by_time, (rec.installation_time, key))
+
+    def select(
+        self,
+        *,
+        names: Optional[Iterable[str]] = None,
+        explicit: Optional[bool] = None,
+        start_date: Optional[datetime.datetime] = None,
+        end_date: Optional[datetime.datetime] = None,
+    ) -> Iterable[str]:
+        """Return the DAG hashes of the records that may match the criteria passed as input.
+
+        The result is a superset of the matching records, so it needs to be filtered further.
+        """
+        selections: List[Iterable[str]] = []
+        if names is not None:
+            selections.append([key for name in names for key in self.by_name.get(name, {})])
+
+        if explicit:
+            selections.append(self.explicit)
+
+        if start_date or end_date:
+            # Allow some slack, since installation times are compared as local dates
+            lo, hi = 0, len(self.by_time)
+            if start_date:
+                lo = bisect.bisect_left(self.by_time, (_timestamp(start_date, -math.inf) - 1,))
+            if end_date:
+                hi = bisect.bisect_right(self.by_time, (_timestamp(end_date, math.inf) + 1,))
+            selections.append([key for _, key in self.by_time[lo:hi]])
+
+        if not selections:
+            return self.data
+
+        smallest, *others = sorted(selections, key=len)
+        if not others:
+            return smallest
+        other_sets = [set(other) for other in others]
+        return [key for key in smallest if all(key in other for other in other_sets)]
+
+
+def _timestamp(date: datetime.datetime, default: float) -> float:
+    """Return the POSIX timestamp of a date, or a default if it's out of range."""
+    try:
+        return date.timestamp()
+    except (OverflowError, OSError, ValueError):
+        return default
+
+
+def _provider_names(virtual: str) -> List[str]:
+    """Return the names of the packages that can provide the virtual passed as input."""
+    providers = spack.repo.PATH.provider_index.providers.get(virtual, {})
+    return sorted({provider.name for specs in providers.values() for provider in specs})
+
+
 SelectType = Callable[[InstallRecord], bool]
 
 
@@ -547,6 +1006,8 @@ def __init__(
         is_upstream: bool = False,
         lock_cfg: LockConfiguration = DEFAULT_LOCK_CFG,
         layout: Optional[DirectoryLayout] = None,
+        index_format: str = "json",
+        journal: bool = False,
     ) -> None:
         """Database for Spack installations.
 
@@ -560,19 +1021,38 @@ def __init__(
         If that does not exist, it will create a database when needed by scanning the entire
         store root for ``spec.json`` files according to Spack's directory layout.
 
+        With ``index_format="binary"`` the database is instead stored in an ``index.bin`` file
+        (see ``BinaryIndexFile``), which can be updated incrementally. Databases migrate
+        transparently between the two formats: the index that exists is read, and the next write
+        replaces it with an index in the requested format.
+
+        With ``journal=True``, and the JSON format, write transactions append the modified
+        records to an ``index.journal`` file (see ``DatabaseJournal``), and ``index.json`` is
+        rewritten only when the journal grows past a size threshold. Versions of Spack that don't
+        know about journals only see the records in ``index.json``.
+
         Args:
             root: root directory where to create the database directory.
             upstream_dbs: upstream databases for this repository.
             is_upstream: whether this repository is an upstream.
             lock_cfg: configuration for the locks to be used by this repository.
                 Relevant only if the repository is not an upstream.
+            index_format: format used to write the index, either "json" or "binary"
+            journal: whether to journal changes to a JSON index, instead of rewriting it
         """
+        if index_format not in _INDEX_FORMATS:
+            raise ValueError(f"invalid database index format: '{index_format}'")
+
         self.root = root
         self.database_directory = os.path.join(self.root, _DB_DIRNAME)
         self.layout = layout
+        self.index_format = index_format
+        self.journal = journal
 
         # Set up layout of database files within the db dir
         self._index_path = os.path.join(self.database_directory, "index.json")
+        self._binary_index_path = os.path.join(self.database_directory, "index.bin")
+        self._journal_path = os.path.join(self.database_directory, "index.journal")
         self._verifier_path = os.path.join(self.database_directory, "index_verifier")
         self._lock_path = os.path.join(self.database_directory, "lock")
 
@@ -607,6 +1087,21 @@ def __init__(
             )
         self._data: Dict[str, InstallRecord] = {}
 
+        self._binary_index = BinaryIndexFile(self._binary_index_path)
+        self._journal = DatabaseJournal(self._journal_path)
+
+        # Indexes of the records in self._data by name, explicit flag and installation time.
+        # They are built on the first query, and kept up to date as records are modified.
+        self._secondary_indexes: Optional[_SecondaryIndexes] = None
+
+        # DAG hashes of the records modified since the index was last read or written, or None
+        # if the whole index has to be written again.
+        self._dirty: Optional[Set[str]] = None
+
+        # Whether the specs of all the records in self._data have been constructed. Specs are
+        # constructed lazily after reading the index, see LazyInstallRecord.
+        self._fully_materialized = True
+
         # For every installed spec we keep track of its install prefix, so that
         # we can answer the simple query whether a given path is already taken
         # before installing a different spec.
@@ -625,7 +1120,7 @@ def read_transaction(self):
         """Get a read lock context manager for use in a `with` block."""
         return self._read_transaction_impl(self.lock, acquire=self._read)
 
-    def _write_to_file(self, stream):
+    def _write_to_file(self, stream, snapshot: Optional[str] = None):
         """Write out the database in JSON format to the stream passed
         as argument.
 
@@ -652,31 +1147,15 @@ def _write_to_file(self, stream):
             }
         }
 
+        # identifier of this snapshot, which a journal of later changes refers to
+        if snapshot:
+            database["database"]["snapshot"] = snapshot
+
         try:
             sjson.dump(database, stream)
         except (TypeError, ValueError) as e:
             raise sjson.SpackJSONError("error writing JSON database:", str(e))
 
-    def _read_spec_from_dict(self, spec_reader, hash_key, installs, hash=ht.dag_hash):
-        """Recursively construct a spec from a hash in a YAML database.
-
-        Does not do any locking.
-        """
-        spec_dict = installs[hash_key]["spec"]
-
-        # Install records don't include hash with spec, so we add it in here
-        # to ensure it is read properly.
-        if "name" not in spec_dict.keys():
-            # old format, can't update format here
-            for name in spec_dict:
-                spec_dict[name]["hash"] = hash_key
-        else:
-            # new format, already a singleton
-            spec_dict[hash.name] = hash_key
-
-        # Build spec from dict first.
-        return spec_reader.from_node_dict(spec_dict)
-
     def db_for_spec_hash(self, hash_key):
         with self.read_transaction():
             if hash_key in self._data:
@@ -716,43 +1195,6 @@ def query_local_by_spec_hash(self, hash_key):
         with self.read_transaction():
             return self._data.get(hash_key, None)
 
-    def _assign_dependencies(
-        self,
-        spec_reader: Type["spack.spec.SpecfileReaderBase"],
-        hash_key: str,
-        installs: dict,
-        data: Dict[str, InstallRecord],
-    ):
-        # Add dependencies from other records in the install DB to
-        # form a full spec.
-        spec = data[hash_key].spec
-        spec_node_dict = installs[hash_key]["spec"]
-        if "name" not in spec_node_dict:
-            # old format
-            spec_node_dict = spec_node_dict[spec.name]
-        if "dependencies" in spec_node_dict:
-            yaml_deps = spec_node_dict["dependencies"]
-            for dname, dhash, dtypes, _, virtuals in spec_reader.read_specfile_dep_specs(
-                yaml_deps
-            ):
-                # It is important that we always check upstream installations in the same order,
-                # and that we always check the local installation first: if a downstream Spack
-                # installs a package then dependents in that installation could be using it. If a
-                # hash is installed locally and upstream, there isn't enough information to
-                # determine which one a local package depends on, so the convention ensures that
-                # this isn't an issue.
-                _, record = self.query_by_spec_hash(dhash, data=data)
-                child = record.spec if record else None
-
-                if not child:
-                    tty.warn(
-                        f"Missing dependency not in database: "
-                        f"{spec.cformat('{name}{/hash:7}')} needs {dname}-{dhash[:7]}"
-                    )
-                    continue
-
-                spec._add_dependency(child, depflag=dt.canonicalize(dtypes), virtuals=virtuals)
-
     def _read_from_file(self, filename):
         """Fill database from file, do not maintain old data.
         Translate the spec portions from node-dict form to spec form.
@@ -781,13 +1223,7 @@ def check(cond, msg):
 
         # TODO: better version checking semantics.
         version = vn.Version(db["version"])
-        if version > _DB_VERSION:
-            raise InvalidDatabaseVersionError(self, _DB_VERSION, version)
-        elif version < _DB_VERSION and not any(
-            old == version and new == _DB_VERSION for old, new in _SKIP_REINDEX
-        ):
-            tty.warn(f"Spack database version changed from {version} to {_DB_VERSION}. Upgrading.")
-
+        if self._upgrade_required(version):
             self.reindex()
             installs = dict(
                 (k, v.to_dict(include_fields=self._record_fields)) for k, v in self._data.items()
@@ -795,68 +1231,222 @@ def check(cond, msg):
         else:
             check("installs" in db, "no 'installs' in JSON DB.")
             installs = db["installs"]
+            if filename == self._index_path:
+                self._journal.replay(db.get("snapshot"), installs)
+
+        self._read_installs(version, installs, None, filename)
+        self._dirty = set() if self.index_format == "json" else None
+
+    def _read_from_binary_file(self):
+        """Fill database from its binary index, do not maintain old data.
+
+        Only the fields of install records are decoded here, specs are decoded from the memory
+        mapped index when they are first needed.
+
+        Does not do any locking.
+        """
+        binary_index = self._binary_index
+        version, buffer = binary_index.open()
+        if self._upgrade_required(version):
+            self.reindex()
+            return
+
+        try:
+            records = {
+                dag_hash: binary_index.decode_fields(buffer, offset)
+                for dag_hash, offset in binary_index.offsets.items()
+            }
+        except (ValueError, struct.error) as e:
+            raise CorruptDatabaseError("error parsing binary database index:", str(e)) from e
+
+        offsets = dict(binary_index.offsets)
+
+        def node_loader(dag_hash: str) -> Callable[[], Dict[str, Any]]:
+            return lambda: binary_index.decode_spec(buffer, offsets[dag_hash])
+
+        self._read_installs(version, records, node_loader, self._binary_index_path)
+        self._dirty = set()
+
+    def _upgrade_required(self, version: vn.StandardVersion) -> bool:
+        """Whether a database index with the version passed as input needs to be reindexed."""
+        if version > _DB_VERSION:
+            raise InvalidDatabaseVersionError(self, _DB_VERSION, version)
+        elif version < _DB_VERSION and not any(
+            old == version and new == _DB_VERSION for old, new in _SKIP_REINDEX
+        ):
+            tty.warn(f"Spack database version changed from {version} to {_DB_VERSION}. Upgrading.")
+            return True
+        return False
+
+    def _read_installs(
+        self,
+        version: vn.StandardVersion,
+        records: Dict[str, Dict[str, Any]],
+        node_loader: Optional[Callable[[str], Callable[[], Dict[str, Any]]]],
+        filename: str,
+    ) -> None:
+        """Fill the database from install record dictionaries keyed by DAG hash.
 
+        Records either contain the node dictionary of their spec under the ``spec`` key, or the
+        ``name`` of their spec and whether it is ``external``, with ``node_loader`` returning a
+        function to load the node dictionary for a DAG hash.
+
+        Specs are not constructed here, but on first access to the spec of a record. All the
+        specs in the database share their nodes (i.e. they are a true Merkle DAG, unlike most
+        specs), so constructing a spec first constructs its dependencies.
+
+        Does not do any locking.
+        """
         spec_reader = reader(version)
+        data: Dict[str, InstallRecord] = {}
 
         def invalid_record(hash_key, error):
             return CorruptDatabaseError(
                 f"Invalid record in Spack database: hash: {hash_key}, cause: "
                 f"{type(error).__name__}: {error}",
-                self._index_path,
+                filename,
             )
 
-        # Build up the database in three passes:
-        #
-        #   1. Read in all specs without dependencies.
-        #   2. Hook dependencies up among specs.
-        #   3. Mark all specs concrete.
-        #
-        # The database is built up so that ALL specs in it share nodes
-        # (i.e., its specs are a true Merkle DAG, unlike most specs.)
+        def node_dependencies(node_dict):
+            if "name" not in node_dict:
+                # old format
+                node_dict = next(iter(node_dict.values()))
+            if "dependencies" not in node_dict:
+                return []
+            return list(spec_reader.read_specfile_dep_specs(node_dict["dependencies"]))
+
+        def materialize(record: LazyInstallRecord) -> None:
+            # Construct specs in post-order, so that dependencies are connected, and marked
+            # concrete, before their dependents. Marking a spec concrete *while* connecting its
+            # dependencies would cache its hashes prematurely.
+            stack: List[LazyInstallRecord] = [record]
+            visiting: Dict[str, Tuple[Dict[str, Any], List]] = {}
+            while stack:
+                current = stack[-1]
+                if current.materialized:
+                    stack.pop()
+                    continue
 
-        # Pass 1: Iterate through database and build specs w/o dependencies
-        data: Dict[str, InstallRecord] = {}
-        installed_prefixes: Set[str] = set()
-        for hash_key, rec in installs.items():
-            try:
-                # This constructs a spec DAG from the list of all installs
-                spec = self._read_spec_from_dict(spec_reader, hash_key, installs)
+                hash_key = current.dag_hash
+                if hash_key in visiting:
+                    node_dict, dependencies = visiting[hash_key]
+                else:
+                    try:
+                        node_dict = current.serialized_node_dict()
+                        dependencies = node_dependencies(node_dict)
+                    except Exception as e:
+                        raise invalid_record(hash_key, e) from e
+
+                pending = [
+                    child
+                    for _, dhash, _, _, _ in dependencies
+                    for child in (data.get(dhash),)
+                    if isinstance(child, LazyInstallRecord) and not child.materialized
+                ]
+                if pending:
+                    if hash_key in visiting:
+                        raise invalid_record(hash_key, ValueError("circular dependency"))
+                    visiting[hash_key] = node_dict, dependencies
+                    stack.extend(pending)
+                    continue
 
-                # Insert the brand new spec in the database.  Each
-                # spec has its own copies of its dependency specs.
-                # TODO: would a more immmutable spec implementation simplify
-                #       this?
-                data[hash_key] = InstallRecord.from_dict(spec, rec)
+                try:
+                    # Install records don't include hash with spec, so we add it in here
+                    # to ensure it is read properly.
+                    if "name" not in node_dict:
+                        # old format, can't update format here
+                        for name in node_dict:
+                            node_dict[name]["hash"] = hash_key
+                    else:
+                        # new format, already a singleton
+                        node_dict[ht.dag_hash.name] = hash_key
+                    spec = spec_reader.from_node_dict(node_dict)
+                except Exception as e:
+                    raise invalid_record(hash_key, e) from e
+
+                for dname, dhash, dtypes, _, virtuals in dependencies:
+                    # It is important that we always check upstream installations in the same
+                    # order, and that we always check the local installation first: if a
+                    # downstream Spack installs a package then dependents in that installation
+                    # could be using it. If a hash is installed locally and upstream, there isn't
+                    # enough information to determine which one a local package depends on, so
+                    # the convention ensures that this isn't an issue.
+                    _, child_record = self.query_by_spec_hash(dhash, data=data)
+                    if not child_record:
+                        tty.warn(
+                            f"Missing dependency not in database: "
+                            f"{spec.cformat('{name}{/hash:7}')} needs {dname}-{dhash[:7]}"
+                        )
+                        continue
+                    spec._add_dependency(
+                        child_record.spec, depflag=dt.canonicalize(dtypes), virtuals=virtuals
+                    )
 
-                if not spec.external and "installed" in rec and rec["installed"]:
-                    installed_prefixes.add(rec["path"])
-            except Exception as e:
-                raise invalid_record(hash_key, e) from e
+                spec._mark_root_concrete()
+                current.spec = spec
+                stack.pop()
 
-        # Pass 2: Assign dependencies once all specs are created.
-        for hash_key in data:
+        installed_prefixes: Set[str] = set()
+        reuse_node_dict = version == _DB_VERSION
+        for hash_key, rec in records.items():
             try:
-                self._assign_dependencies(spec_reader, hash_key, installs, data)
-            except MissingDependenciesError:
-                raise
+                fields = InstallRecord._fields_from_dict(rec)
+                name = fields.pop("name", None)
+                external = fields.pop("external", False)
+                if node_loader is None:
+                    fields["node_dict"] = rec["spec"]
+                    name, external = _node_name_and_external(rec["spec"])
+                else:
+                    fields["node_loader"] = node_loader(hash_key)
+                if not name:
+                    raise ValueError("missing spec name")
+
+                data[hash_key] = LazyInstallRecord(
+                    hash_key, name, materialize, reuse_node_dict=reuse_node_dict, **fields
+                )
             except Exception as e:
                 raise invalid_record(hash_key, e) from e
 
-        # Pass 3: Mark all specs concrete.  Specs representing real
-        # installations must be explicitly marked.
-        # We do this *after* all dependencies are connected because if we
-        # do it *while* we're constructing specs,it causes hashes to be
-        # cached prematurely.
-        for hash_key, rec in data.items():
-            rec.spec._mark_root_concrete()
+            if not external and fields["installed"]:
+                installed_prefixes.add(fields["path"])
 
         self._data = data
         self._installed_prefixes = installed_prefixes
+        self._fully_materialized = False
 
-    def reindex(self):
+    def _materialize(self) -> None:
+        """Construct the specs of all the records in the database, so that each of them is
+        connected to all of its installed dependents.
+
+        Does not do any locking.
+        """
+        if self._fully_materialized:
+            return
+        for rec in self._data.values():
+            rec.spec
+        self._fully_materialized = True
+
+    def connect_dependents(self) -> None:
+        """Construct the specs of all the records in this database and in its upstreams, so
+        that specs returned by queries are connected to all of their installed dependents.
+
+        Queries and lookups by hash construct only the specs they return and their dependencies,
+        so this is needed before traversing specs from the database towards their dependents.
+        """
+        with self.read_transaction():
+            self._materialize()
+        for upstream_db in self.upstream_dbs:
+            upstream_db._materialize()
+
+    def reindex(self, jobs: int = 1, progress: Optional[ProgressCallback] = None):
         """Build database index from scratch based on a directory layout.
 
         Locks the DB if it isn't locked already.
+
+        Args:
+            jobs: number of processes used to search the directory layout and read spec files.
+                The result doesn't depend on the number of processes.
+            progress: optional callback reporting the progress of the directory layout search
         """
         if self.is_upstream:
             raise UpstreamDatabaseLockingError("Cannot reindex an upstream database")
@@ -865,8 +1455,9 @@ def reindex(self):
         # ignore errors if we need to rebuild a corrupt database.
         def _read_suppress_error():
             try:
-                if os.path.isfile(self._index_path):
-                    self._read_from_file(self._index_path)
+                index_path = self._current_index_path()
+                if index_path:
+                    self._read_index(index_path)
             except CorruptDatabaseError as e:
                 tty.warn(f"Reindexing corrupt database, error was: {e}")
                 self._data = {}
@@ -875,21 +1466,27 @@ def _read_suppress_error():
         with lk.WriteTransaction(self.lock, acquire=_read_suppress_error, release=self._write):
             old_installed_prefixes, self._installed_prefixes = self._installed_prefixes, set()
             old_data, self._data = self._data, {}
+            self._dirty = None
             try:
-                self._reindex(old_data)
+                self._reindex(old_data, jobs=jobs, progress=progress)
             except BaseException:
                 # If anything explodes, restore old data, skip write.
                 self._data = old_data
                 self._installed_prefixes = old_installed_prefixes
                 raise
 
-    def _reindex(self, old_data: Dict[str, InstallRecord]):
+    def _reindex(
+        self,
+        old_data: Dict[str, InstallRecord],
+        jobs: int = 1,
+        progress: Optional[ProgressCallback] = None,
+    ):
         # Specs on the file system are the source of truth for record.spec. The old database values
         # if available are the source of truth for the rest of the record.
         assert self.layout, "Database layout must be set to reindex"
 
-        specs_from_fs = self.layout.all_specs()
-        deprecated_for = self.layout.deprecated_for(specs_from_fs)
+        specs_from_fs = self.layout.all_specs(jobs=jobs, progress=progress)
+        deprecated_for = self.layout.deprecated_for(specs_from_fs, jobs=jobs)
 
         known_specs: List[spack.spec.Spec] = [
             *specs_from_fs,
@@ -1027,13 +1624,19 @@ def _write(self, type, value, traceback):
             self._state_is_inconsistent = True
             return
 
-        temp_file = self._index_path + (".%s.%s.temp" % (_getfqdn(), os.getpid()))
-
-        # Write a temporary database file them move it into place
         try:
-            with open(temp_file, "w") as f:
-                self._write_to_file(f)
-            fs.rename(temp_file, self._index_path)
+            if self.index_format == "binary":
+                self._write_binary_index()
+                stale_index_paths = [self._index_path, self._journal_path]
+            else:
+                self._write_json_index()
+                stale_index_paths = [self._binary_index_path]
+            self._dirty = set()
+
+            # Keep a single index on disk, so that readers can't pick up a stale one
+            for stale_index_path in stale_index_paths:
+                if os.path.exists(stale_index_path):
+                    os.remove(stale_index_path)
 
             if _use_uuid:
                 with open(self._verifier_path, "w") as f:
@@ -1042,14 +1645,106 @@ def _write(self, type, value, traceback):
                     self.last_seen_verifier = new_verifier
         except BaseException as e:
             tty.debug(e)
+            raise
+
+    def _write_json_index(self) -> None:
+        """Write the database to index.json, or append the records modified since the index was
+        last read or written to its journal, if journaling is enabled.
+
+        This routine does no locking.
+        """
+        journal, dirty = self._journal, self._dirty
+        if (
+            self.journal
+            and dirty is not None
+            and journal.snapshot
+            and os.path.isfile(self._index_path)
+            and not journal.needs_compaction(os.path.getsize(self._index_path))
+        ):
+            updated = {
+                k: self._data[k].to_dict(include_fields=self.record_fields)
+                for k in dirty
+                if k in self._data
+            }
+            journal.append(updated, removed=[k for k in dirty if k not in self._data])
+            return
+
+        snapshot = str(uuid.uuid4()) if self.journal and _use_uuid else None
+        temp_file = self._index_path + (".%s.%s.temp" % (_getfqdn(), os.getpid()))
+
+        # Write a temporary database file them move it into place
+        try:
+            with open(temp_file, "w") as f:
+                self._write_to_file(f, snapshot=snapshot)
+            fs.rename(temp_file, self._index_path)
+        except BaseException:
             # Clean up temp file if something goes wrong.
             if os.path.exists(temp_file):
                 os.remove(temp_file)
             raise
 
+        journal.reset(snapshot)
+
+    def _write_binary_index(self) -> None:
+        """Write the database to the binary index. Only the records modified since the index was
+        last read or written are appended, unless the file needs to be rewritten from scratch.
+
+        This routine does no locking.
+        """
+        binary_index = self._binary_index
+        dirty = self._dirty
+        if (
+            dirty is None
+            or binary_index.needs_compaction()
+            or not os.path.isfile(binary_index.path)
+        ):
+            records = {
+                k: v.to_dict(include_fields=self.record_fields) for k, v in self._data.items()
+            }
+            binary_index.write(_DB_VERSION, records)
+            return
+
+        updated = {
+            k: self._data[k].to_dict(include_fields=self.record_fields)
+            for k in dirty
+            if k in self._data
+        }
+        binary_index.update(updated, removed=[k for k in dirty if k not in self._data])
+
+    def index_files(self) -> List[str]:
+        """Return the paths of the files the index of this database is read from, whether they
+        exist or not."""
+        return [self._index_path, self._binary_index_path, self._journal_path]
+
+    def _current_index_path(self) -> Optional[str]:
+        """Return the path of the index to be read, or None if no index exists.
+
+        If both a JSON and a binary index exist, e.g. because an older version of Spack wrote to
+        this database after it was migrated, the most recently modified one is used.
+        """
+        candidates = [self._index_path, self._binary_index_path]
+        if self.index_format == "binary":
+            candidates.reverse()
+
+        existing = [(os.stat(p).st_mtime, p) for p in candidates if os.path.isfile(p)]
+        if not existing:
+            return None
+        elif len(existing) == 1:
+            return existing[0][1]
+        # Ties are resolved in favor of the preferred format
+        return max(existing, key=lambda x: x[0])[1]
+
+    def _read_index(self, index_path: str) -> None:
+        """Read the index at the path passed as input, in the appropriate format."""
+        if index_path == self._binary_index_path:
+            self._read_from_binary_file()
+        else:
+            self._read_from_file(index_path)
+
     def _read(self):
         """Re-read Database from the data in the set location. This does no locking."""
-        if os.path.isfile(self._index_path):
+        index_path = self._current_index_path()
+        if index_path:
             current_verifier = ""
             if _use_uuid:
                 try:
@@ -1060,9 +1755,9 @@ def _read(self):
             if (current_verifier != self.last_seen_verifier) or (current_verifier == ""):
                 self.last_seen_verifier = current_verifier
                 # Read from file if a database exists
-                self._read_from_file(self._index_path)
+                self._read_index(index_path)
             elif self._state_is_inconsistent:
-                self._read_from_file(self._index_path)
+                self._read_index(index_path)
                 self._state_is_inconsistent = False
             return
         elif self.is_upstream:
@@ -1161,6 +1856,7 @@ def _add(
                 new_spec._add_dependency(record.spec, depflag=dep.depflag, virtuals=dep.virtuals)
                 if not upstream:
                     record.ref_count += 1
+                    self._record_changed(dkey)
 
             # Mark concrete once everything is built, and preserve the original hashes of concrete
             # specs.
@@ -1174,6 +1870,7 @@ def _add(
             self._data[key].installation_time = _now()
 
         self._data[key].explicit = explicit
+        self._record_changed(key)
 
     @_autospec
     def add(self, spec: "spack.spec.Spec", *, explicit: bool = False, allow_missing=False) -> None:
@@ -1217,9 +1914,12 @@ def _decrement_ref_count(self, spec: "spack.spec.Spec") -> None:
 
         if rec.ref_count == 0 and not rec.installed:
             del self._data[key]
+            self._record_changed(key)
 
             for dep in spec.dependencies(deptype=_TRACKED_DEPENDENCIES):
                 self._decrement_ref_count(dep)
+        else:
+            self._record_changed(key)
 
     def _increment_ref_count(self, spec: "spack.spec.Spec") -> None:
         key = spec.dag_hash()
@@ -1229,6 +1929,7 @@ def _increment_ref_count(self, spec: "spack.spec.Spec") -> None:
 
         rec = self._data[key]
         rec.ref_count += 1
+        self._record_changed(key)
 
     def _remove(self, spec: "spack.spec.Spec") -> "spack.spec.Spec":
         """Non-locking version of remove(); does real work."""
@@ -1242,9 +1943,11 @@ def _remove(self, spec: "spack.spec.Spec") -> "spack.spec.Spec":
 
         if rec.ref_count > 0:
             rec.installed = False
+            self._record_changed(key)
             return rec.spec
 
         del self._data[key]
+        self._record_changed(key)
 
         # Remove any reference to this node from dependencies and
         # decrement the reference count
@@ -1310,6 +2013,7 @@ def _deprecate(self, spec: "spack.spec.Spec", deprecator: "spack.spec.Spec") ->
         spec_rec.deprecated_for = deprecator_key
         spec_rec.installed = False
         self._data[spec_key] = spec_rec
+        self._record_changed(spec_key)
 
     @_autospec
     def mark(self, spec: "spack.spec.Spec", key: str, value: Any) -> None:
@@ -1318,8 +2022,27 @@ def mark(self, spec: "spack.spec.Spec", key: str, value: Any) -> None:
             return self._mark(spec, key, value)
 
     def _mark(self, spec: "spack.spec.Spec", key, value) -> None:
-        record = self._data[self._get_matching_spec_key(spec)]
-        setattr(record, key, value)
+        spec_key = self._get_matching_spec_key(spec)
+        setattr(self._data[spec_key], key, value)
+        self._record_changed(spec_key)
+
+    def _record_changed(self, key: str) -> None:
+        """Record that the install record with the given DAG hash has been added, modified or
+        removed, so that it's written by the next transaction, and indexed for queries."""
+        if self._dirty is not None:
+            self._dirty.add(key)
+
+        if self._secondary_indexes is not None and self._secondary_indexes.data is self._data:
+            self._secondary_indexes.update(key)
+
+    def _query_index(self) -> "_SecondaryIndexes":
+        """Return the secondary indexes of the records in the database, building them if needed.
+
+        Does no locking.
+        """
+        if self._secondary_indexes is None or self._secondary_indexes.data is not self._data:
+            self._secondary_indexes = _SecondaryIndexes(self._data)
+        return self._secondary_indexes
 
     @_autospec
     def deprecate(self, spec: "spack.spec.Spec", deprecator: "spack.spec.Spec") -> None:
@@ -1339,6 +2062,9 @@ def installed_relatives(
         if direction not in ("parents", "children"):
             raise ValueError("Invalid direction: %s" % direction)
 
+        if direction == "parents":
+            self.connect_dependents()
+
         relatives: Set[spack.spec.Spec] = set()
         for spec in self.query(spec):
             if transitive:
@@ -1416,6 +2142,9 @@ def get_by_hash_local(
         ``installed`` defaults to ``InstallRecordStatus.ANY`` so we can refer to any known hash.
 
         ``query()`` and ``query_one()`` differ in that they only return installed specs by default.
+
+        Lookups by hash construct only the specs they return and their dependencies, so returned
+        specs are connected to their installed dependents only after ``connect_dependents()``.
         """
         with self.read_transaction():
             return self._get_by_hash_local(dag_hash, default=default, installed=installed)
@@ -1437,6 +2166,8 @@ def get_by_hash(
         ``installed`` defaults to ``InstallRecordStatus.ANY`` so we can refer to any known hash.
         ``query()`` and ``query_one()`` differ in that they only return installed specs by default.
 
+        Lookups by hash construct only the specs they return and their dependencies, so returned
+        specs are connected to their installed dependents only after ``connect_dependents()``.
         """
 
         spec = self.get_by_hash_local(dag_hash, default=default, installed=installed)
@@ -1462,68 +2193,101 @@ def _query(
         hashes: Optional[Iterable[str]] = None,
         in_buildcache: Optional[bool] = None,
         origin: Optional[str] = None,
+        names: Optional[Iterable[str]] = None,
     ) -> List["spack.spec.Spec"]:
         installed = normalize_query(installed)
-
-        # Restrict the set of records over which we iterate first
-        matching_hashes = self._data
-        if hashes is not None:
-            matching_hashes = {h: self._data[h] for h in hashes if h in self._data}
+        selected_names = set(names) if names is not None else None
 
         if isinstance(query_spec, str):
             query_spec = spack.spec.Spec(query_spec)
 
+        # Restrict the set of records over which we iterate first
+        candidates: Iterable[str]
         if query_spec is not None and query_spec.concrete:
             hash_key = query_spec.dag_hash()
-            if hash_key not in matching_hashes:
+            if hashes is not None and hash_key not in hashes:
                 return []
-            matching_hashes = {hash_key: matching_hashes[hash_key]}
+            candidates = [hash_key]
+        elif hashes is not None:
+            candidates = hashes
+        else:
+            candidates = self._query_index().select(
+                names=[query_spec.name] if query_spec and query_spec.name else selected_names,
+                explicit=explicit,
+                start_date=start_date,
+                end_date=end_date,
+            )
 
-        results = []
-        start_date = start_date or datetime.datetime.min
-        end_date = end_date or datetime.datetime.max
+        min_date = start_date or datetime.datetime.min
+        max_date = end_date or datetime.datetime.max
 
-        deferred = []
-        for rec in matching_hashes.values():
-            if origin and not (origin == rec.origin):
-                continue
+        def _select(candidates: Iterable[str]) -> Tuple[List["spack.spec.Spec"], List]:
+            results: List[spack.spec.Spec] = []
+            deferred: List[spack.spec.Spec] = []
+            for hash_key in dict.fromkeys(candidates):
+                rec = self._data.get(hash_key)
+                if rec is None:
+                    continue
 
-            if not rec.install_type_matches(installed):
-                continue
+                if origin and not (origin == rec.origin):
+                    continue
 
-            if in_buildcache is not None and rec.in_buildcache != in_buildcache:
-                continue
+                if selected_names is not None and rec.name not in selected_names:
+                    continue
 
-            if explicit is not None and rec.explicit != explicit:
-                continue
+                if not rec.install_type_matches(installed):
+                    continue
 
-            if predicate_fn is not None and not predicate_fn(rec):
-                continue
+                if in_buildcache is not None and rec.in_buildcache != in_buildcache:
+                    continue
 
-            if start_date or end_date:
-                inst_date = datetime.datetime.fromtimestamp(rec.installation_time)
-                if not (start_date < inst_date < end_date):
+                if explicit is not None and rec.explicit != explicit:
                     continue
 
-            if query_spec is None or query_spec.concrete:
-                results.append(rec.spec)
-                continue
+                if predicate_fn is not None and not predicate_fn(rec):
+                    continue
 
-            # check anon specs and exact name matches first
-            if not query_spec.name or rec.spec.name == query_spec.name:
-                if rec.spec.satisfies(query_spec):
+                if start_date or end_date:
+                    inst_date = datetime.datetime.fromtimestamp(rec.installation_time)
+                    if not (min_date < inst_date < max_date):
+                        continue
+
+                if query_spec is None or query_spec.concrete:
                     results.append(rec.spec)
+                    continue
 
-            # save potential virtual matches for later, but not if we already found a match
-            elif not results:
-                deferred.append(rec.spec)
+                # check anon specs and exact name matches first
+                if not query_spec.name or rec.spec.name == query_spec.name:
+                    if rec.spec.satisfies(query_spec):
+                        results.append(rec.spec)
+
+                # save potential virtual matches for later, but not if we already found a match
+                elif not results:
+                    deferred.append(rec.spec)
+            return results, deferred
+
+        results, deferred = _select(candidates)
 
         # Checking for virtuals is expensive, so we save it for last and only if needed.
         # If we get here, we didn't find anything in the DB that matched by name.
         # If we did fine something, the query spec can't be virtual b/c we matched an actual
         # package installation, so skip the virtual check entirely. If we *didn't* find anything,
-        # check all the deferred specs *if* the query is virtual.
-        if not results and query_spec is not None and deferred and query_spec.virtual:
+        # check all the deferred specs *if* the query is virtual. Unless the candidates were
+        # given explicitly, these are the installations of packages that provide the virtual.
+        if results or query_spec is None or query_spec.concrete or not query_spec.name:
+            return results
+
+        if hashes is None and query_spec.virtual:
+            _, deferred = _select(
+                self._query_index().select(
+                    names=_provider_names(query_spec.name),
+                    explicit=explicit,
+                    start_date=start_date,
+                    end_date=end_date,
+                )
+            )
+
+        if deferred and query_spec.virtual:
             results = [spec for spec in deferred if spec.satisfies(query_spec)]
 
         return results
@@ -1540,12 +2304,16 @@ def query_local(
         hashes: Optional[List[str]] = None,
         in_buildcache: Optional[bool] = None,
         origin: Optional[str] = None,
+        names: Optional[Iterable[str]] = None,
     ) -> List["spack.spec.Spec"]:
         """Queries the local Spack database.
 
         This function doesn't guarantee any sorting of the returned data for performance reason,
         since comparing specs for __lt__ may be an expensive operation.
 
+        Only the specs of the records selected by the query are constructed, so the returned specs
+        are connected to their installed dependents only after ``connect_dependents()``.
+
         Args:
             query_spec:  if query_spec is ``None``, match all specs in the database.
                 If it is a spec, return all specs matching ``spec.satisfies(query_spec)``.
@@ -1574,6 +2342,8 @@ def query_local(
             hashes: list of hashes used to restrict the search
 
             origin: origin of the spec
+
+            names: if set, considers only specs of packages with these names
         """
         with self.read_transaction():
             return self._query(
@@ -1586,6 +2356,7 @@ def query_local(
                 hashes=hashes,
                 in_buildcache=in_buildcache,
                 origin=origin,
+                names=names,
             )
 
     def query(
@@ -1601,6 +2372,7 @@ def query(
         hashes: Optional[List[str]] = None,
         origin: Optional[str] = None,
         install_tree: str = "all",
+        names: Optional[Iterable[str]] = None,
     ) -> List["spack.spec.Spec"]:
         """Queries the Spack database including all upstream databases.
 
@@ -1634,6 +2406,8 @@ def query(
             install_tree: query 'all' (default), 'local', 'upstream', or upstream path
 
             origin: origin of the spec
+
+            names: if set, considers only specs of packages with these names
         """
         valid_trees = ["all", "upstream", "local", self.root] + [u.root for u in self.upstream_dbs]
         if install_tree not in valid_trees:
@@ -1661,6 +2435,7 @@ def query(
                     hashes=hashes,
                     in_buildcache=in_buildcache,
                     origin=origin,
+                    names=names,
                 )
                 or []
             )
@@ -1678,6 +2453,7 @@ def query(
                     hashes=hashes,
                     in_buildcache=in_buildcache,
                     origin=origin,
+                    names=names,
                 )
             )
 
@@ -3,13 +3,14 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import concurrent.futures
 import errno
 import os
 import re
 import shutil
 import sys
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import llnl.util.filesystem as fs
 from llnl.util.symlink import readlink
@@ -19,7 +20,9 @@
 import spack.projections
 import spack.spec
 import spack.store
+import spack.util.parallel
 import spack.util.spack_json as sjson
+import spack.util.spack_yaml as syaml
 from spack.error import SpackError
 
 default_projections = {
@@ -43,7 +46,87 @@ def _get_spec(prefix: str) -> Optional["spack.spec.Spec"]:
     return None
 
 
-def specs_from_metadata_dirs(root: str) -> List["spack.spec.Spec"]:
+def _subdirectories(path: str) -> List[str]:
+    """Returns the subdirectories of a path, not following symlinks"""
+    try:
+        scandir = os.scandir(path)
+    except OSError:
+        return []
+
+    with scandir as entries:
+        return [entry.path for entry in entries if entry.is_dir(follow_symlinks=False)]
+
+
+def _read_specfile_data(path: str) -> Any:
+    """Reads a JSON or YAML spec file, and returns its content without constructing a spec"""
+    with open(path, "r") as fd:
+        file_content = fd.read()
+    if path.endswith(".json"):
+        return sjson.load(file_content)
+    return syaml.load(file_content)
+
+
+def _search_prefixes(prefixes: List[str]) -> List[Tuple[Optional[Any], List[str]]]:
+    """Reads the spec file of each prefix passed as input. For each prefix returns the content of
+    its spec file, if any, or its subdirectories to be searched otherwise."""
+    result: List[Tuple[Optional[Any], List[str]]] = []
+    for prefix in prefixes:
+        for f in ("spec.json", "spec.yaml"):
+            try:
+                result.append((_read_specfile_data(os.path.join(prefix, ".spack", f)), []))
+                break
+            except Exception:
+                continue
+        else:
+            result.append((None, _subdirectories(prefix)))
+    return result
+
+
+def _read_deprecated_dirs(paths: List[str]) -> List[List[Any]]:
+    """Returns the content of the spec files in each of the deprecated directories passed as
+    input, skipping the files that cannot be read."""
+    result: List[List[Any]] = []
+    for path in paths:
+        data: List[Any] = []
+        result.append(data)
+        try:
+            scandir = os.scandir(path)
+        except OSError:
+            continue
+
+        with scandir as entries:
+            for entry in entries:
+                try:
+                    data.append(_read_specfile_data(entry.path))
+                except Exception:
+                    continue
+    return result
+
+
+def _chunks(items: List[str], size: int) -> List[List[str]]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+#: Number of directories read by a worker process in a single task
+_SEARCH_CHUNK_SIZE = 64
+
+#: Callback used to report the number of directories searched so far, the number of directories
+#: found so far, and the number of specs found so far
+ProgressCallback = Callable[[int, int, int], None]
+
+
+def specs_from_metadata_dirs(
+    root: str, jobs: int = 1, progress: Optional[ProgressCallback] = None
+) -> List["spack.spec.Spec"]:
+    """Returns the specs of all the installation prefixes under root.
+
+    With more than one job, directories are searched and spec files are read and parsed by
+    concurrent worker processes. Specs are still constructed in this process, and returned in
+    the same order as a serial search.
+    """
+    if jobs > 1:
+        return _specs_from_metadata_dirs_concurrently(root, jobs, progress)
+
     stack = [root]
     specs = []
 
@@ -57,15 +140,64 @@ def specs_from_metadata_dirs(root: str) -> List["spack.spec.Spec"]:
             specs.append(spec)
             continue
 
-        try:
-            scandir = os.scandir(prefix)
-        except OSError:
+        stack.extend(_subdirectories(prefix))
+    return specs
+
+
+def _specs_from_metadata_dirs_concurrently(
+    root: str, jobs: int, progress: Optional[ProgressCallback]
+) -> List["spack.spec.Spec"]:
+    # Search the directory tree one level at a time, reading spec files in worker processes
+    results: Dict[str, Tuple[Optional[Any], List[str]]] = {}
+    searched, found = 0, 0
+    with spack.util.parallel.make_concurrent_executor(jobs, require_fork=False) as executor:
+        level = [root]
+        total = 1
+        while level:
+            futures = {
+                executor.submit(_search_prefixes, chunk): chunk
+                for chunk in _chunks(level, _SEARCH_CHUNK_SIZE)
+            }
+            level = []
+            for future in concurrent.futures.as_completed(futures):
+                chunk = futures[future]
+                for prefix, (data, subdirs) in zip(chunk, future.result()):
+                    results[prefix] = (data, subdirs)
+                    level.extend(subdirs)
+                    found += data is not None
+                    total += len(subdirs)
+                searched += len(chunk)
+                if progress:
+                    progress(searched, total, found)
+
+    # Construct specs in the same order as a serial search
+    stack = [root]
+    specs = []
+    while stack:
+        prefix = stack.pop()
+        if prefix in results:
+            data, subdirs = results.pop(prefix)
+        else:
+            # Only needed below prefixes with a spec file that could not be parsed
+            data, subdirs = _search_prefixes([prefix])[0]
+
+        if data is not None:
+            try:
+                spec: Optional[spack.spec.Spec] = spack.spec.Spec.from_dict(data)
+            except Exception:
+                # Fall back to the serial search, which tries all the spec files in the prefix
+                spec = _get_spec(prefix)
+
+            if spec:
+                spec.prefix = prefix
+                specs.append(spec)
+                continue
+
+            stack.extend(_subdirectories(prefix))
             continue
 
-        with scandir as entries:
-            for entry in entries:
-                if entry.is_dir(follow_symlinks=False):
-                    stack.append(entry.path)
+        stack.extend(subdirs)
+
     return specs
 
 
@@ -339,17 +471,30 @@ def remove_install_directory(self, spec, deprecated=False):
                         raise e
             path = os.path.dirname(path)
 
-    def all_specs(self) -> List["spack.spec.Spec"]:
+    def all_specs(
+        self, jobs: int = 1, progress: Optional[ProgressCallback] = None
+    ) -> List["spack.spec.Spec"]:
         """Returns a list of all specs detected in self.root, detected by `.spack` directories.
         Their prefix is set to the directory containing the `.spack` directory. Note that these
         specs may follow a different layout than the current layout if it was changed after
-        installation."""
-        return specs_from_metadata_dirs(self.root)
+        installation.
+
+        Args:
+            jobs: number of processes used to search directories and read spec files
+            progress: optional callback reporting the progress of the search
+        """
+        return specs_from_metadata_dirs(self.root, jobs=jobs, progress=progress)
 
     def deprecated_for(
-        self, specs: List["spack.spec.Spec"]
+        self, specs: List["spack.spec.Spec"], jobs: int = 1
     ) -> List[Tuple["spack.spec.Spec", "spack.spec.Spec"]]:
-        """Returns a list of tuples of specs (new, old) where new is deprecated for old"""
+        """Returns a list of tuples of specs (new, old) where new is deprecated for old.
+
+        With more than one job, deprecated spec files are read and parsed by concurrent worker
+        processes."""
+        if jobs > 1:
+            return self._deprecated_for_concurrently(specs, jobs)
+
         spec_with_deprecated = []
         for spec in specs:
             try:
@@ -368,6 +513,26 @@ def deprecated_for(
                         continue
         return spec_with_deprecated
 
+    def _deprecated_for_concurrently(
+        self, specs: List["spack.spec.Spec"], jobs: int
+    ) -> List[Tuple["spack.spec.Spec", "spack.spec.Spec"]]:
+        paths = [
+            os.path.join(str(spec.prefix), self.metadata_dir, self.deprecated_dir)
+            for spec in specs
+        ]
+        with spack.util.parallel.make_concurrent_executor(jobs, require_fork=False) as executor:
+            results = executor.map(_read_deprecated_dirs, _chunks(paths, _SEARCH_CHUNK_SIZE))
+            contents = [data for chunk in results for data in chunk]
+
+        spec_with_deprecated = []
+        for spec, data in zip(specs, contents):
+            for entry in data:
+                try:
+                    spec_with_deprecated.append((spec, spack.spec.Spec.from_dict(entry)))
+                except Exception:
+                    continue
+        return spec_with_deprecated
+
 
 class DirectoryLayoutError(SpackError):
     """Superclass for directory layout errors."""
@@ -9,3 +9,9 @@
 def post_install(spec, explicit=None):
     if not spec.external:
         spack.verify.write_manifest(spec)
+
+
+def post_uninstall(spec):
+    # Hashes cached by ``spack verify --fast`` are stale once the prefix is removed
+    if not spec.external:
+        spack.verify.FileHashCache(spec).remove()
@@ -32,8 +32,10 @@
 import heapq
 import io
 import itertools
+import multiprocessing.connection
 import os
 import shutil
+import statistics
 import sys
 import time
 from collections import defaultdict
@@ -50,6 +52,7 @@
 
 import spack.binary_distribution as binary_distribution
 import spack.build_environment
+import spack.build_history
 import spack.builder
 import spack.config
 import spack.database
@@ -64,7 +67,9 @@
 import spack.spec
 import spack.store
 import spack.util.executable
+import spack.util.file_cache
 import spack.util.path
+import spack.util.spack_json as sjson
 import spack.util.timer as timer
 from spack.util.environment import EnvironmentModifications, dump_environment
 from spack.util.executable import which
@@ -75,6 +80,10 @@
 _counter = itertools.count(0)
 
 
+#: Message of the error raised on the first failure, when failing fast
+_FAIL_FAST_ERR = "Terminating after first install failure"
+
+
 class BuildStatus(enum.Enum):
     """Different build (task) states."""
 
@@ -112,6 +121,81 @@ def _write_timer_json(pkg, timer, cache):
         return
 
 
+def _read_timer_json(spec: "spack.spec.Spec") -> Optional[dict]:
+    """Return the times recorded by ``_write_timer_json`` for an installed spec, if any."""
+    path = os.path.join(
+        spack.store.STORE.layout.metadata_path(spec), spack.package_base.spack_times_log
+    )
+    try:
+        with open(path, encoding="utf-8") as f:
+            return sjson.load(f)
+    except (OSError, ValueError) as e:
+        tty.debug(f"Cannot read the install times of {spec.format('{name}/{hash:7}')}: {e}")
+        return None
+
+
+def _expects_binary_install(task: "Task") -> bool:
+    """Whether the package of a task is expected to be installed from a binary cache, i.e. if
+    binaries may be used, and the local copy of the build cache indexes lists one for it."""
+    if not task.use_cache:
+        return False
+    if task.cache_only:
+        return True
+    return bool(binary_distribution.get_mirrors_for_spec(task.pkg.spec, index_only=True))
+
+
+def _recorded_install_times(
+    tasks: List["Task"], installed: List["spack.spec.Spec"]
+) -> Dict[str, float]:
+    """Return the durations of past installations of the packages of some tasks.
+
+    The duration of a task is the one recorded for an installation of the same package, in the
+    same way (from sources, or from a binary cache), preferably of the same version. Records are
+    taken from the build history first, and then from the prefixes of installed specs. Tasks
+    without such a record are omitted.
+
+    Args:
+        tasks: tasks whose durations are estimated
+        installed: installed specs
+
+    Returns:
+        Durations in seconds, keyed by package id
+    """
+    names = {task.pkg.name for task in tasks}
+    candidates: Dict[str, List["spack.spec.Spec"]] = defaultdict(list)
+    for spec in installed:
+        if spec.name in names and not spec.external:
+            candidates[spec.name].append(spec)
+
+    history: Dict[str, List[spack.build_history.BuildRecord]] = {}
+    for name in names:
+        try:
+            history[name] = spack.build_history.HISTORY.records(name)
+        except (OSError, spack.util.file_cache.CacheError) as e:
+            tty.debug(f"Cannot read the build history of {name}: {e}")
+            history[name] = []
+
+    durations: Dict[str, float] = {}
+    for task in tasks:
+        from_binary = _expects_binary_install(task)
+        record = spack.build_history.best_match(
+            history[task.pkg.name], cache=from_binary, version=str(task.pkg.spec.version)
+        )
+        if record is not None:
+            durations[task.pkg_id] = float(record["total"])
+            continue
+
+        same_version_first = sorted(
+            candidates[task.pkg.name], key=lambda s: s.version != task.pkg.spec.version
+        )
+        for spec in same_version_first:
+            data = _read_timer_json(spec)
+            if data is not None and bool(data.get("cache")) == from_binary:
+                durations[task.pkg_id] = float(data["total"])
+                break
+    return durations
+
+
 class ExecuteResult(enum.Enum):
     # Task succeeded
     SUCCESS = enum.auto()
@@ -162,13 +246,15 @@ def get_progress(self) -> str:
 class TermStatusLine:
     """
     This class is used in distributed builds to inform the user that other packages are
-    being installed by another process.
+    being installed by another process, and in concurrent builds to show the packages
+    being built by this process.
     """
 
     def __init__(self, enabled: bool):
         self.enabled: bool = enabled
         self.pkg_set: Set[str] = set()
         self.pkg_list: List[str] = []
+        self.active: List[str] = []
 
     def add(self, pkg_id: str):
         """Add a package to the waiting list, and if it is new, update the status line."""
@@ -193,11 +279,27 @@ def clear(self):
         self.pkg_set.clear()
         self.pkg_list = []
 
+        # Concurrent builds may have printed after the "Waiting for" messages, in which
+        # case they can't be erased without erasing build output.
+        if self.active:
+            return
+
         # Move the cursor to the beginning of the first "Waiting for" message and clear
         # everything after it.
         sys.stdout.write(f"\x1b[{lines}F\x1b[J")
         sys.stdout.flush()
 
+    def set_active(self, pkg_ids: List[str]):
+        """Show the packages being built concurrently, if they changed since the last call."""
+        if not self.enabled or pkg_ids == self.active:
+            return
+
+        self.clear()
+        self.active = list(pkg_ids)
+        if pkg_ids:
+            tty.msg(colorize("@*{Building} " + ", ".join("@*g{%s}" % x for x in pkg_ids)))
+            sys.stdout.flush()
+
 
 def _check_last_phase(pkg: "spack.package_base.PackageBase") -> None:
     """
@@ -355,7 +457,10 @@ def _print_timer(pre: str, pkg_id: str, timer: timer.BaseTimer) -> None:
 
 
 def _install_from_cache(
-    pkg: "spack.package_base.PackageBase", explicit: bool, unsigned: Optional[bool] = False
+    pkg: "spack.package_base.PackageBase",
+    explicit: bool,
+    unsigned: Optional[bool] = False,
+    download_result: Optional[dict] = None,
 ) -> bool:
     """
     Install the package from binary cache
@@ -365,25 +470,38 @@ def _install_from_cache(
         explicit: ``True`` if installing the package was explicitly
             requested by the user, otherwise, ``False``
         unsigned: if ``True`` or ``False`` override the mirror signature verification defaults
+        download_result: tarball of the package, if it was downloaded already
 
     Return: ``True`` if the package was extract from binary cache, ``False`` otherwise
     """
     t = timer.Timer()
-    installed_from_cache = _try_install_from_binary_cache(
-        pkg, explicit, unsigned=unsigned, timer=t
-    )
+    if download_result is not None:
+        installed_from_cache = _process_binary_cache_tarball(
+            pkg, explicit, unsigned, timer=t, download_result=download_result
+        )
+    else:
+        installed_from_cache = _try_install_from_binary_cache(
+            pkg, explicit, unsigned=unsigned, timer=t
+        )
     if not installed_from_cache:
         return False
     t.stop()
+    _report_install_from_cache(pkg, explicit, t)
+    return True
+
 
+def _report_install_from_cache(
+    pkg: "spack.package_base.PackageBase", explicit: bool, t: timer.BaseTimer
+) -> None:
+    """Report the installation of a package from binary cache, and run post-install hooks."""
     pkg_id = package_id(pkg.spec)
     tty.debug(f"Successfully extracted {pkg_id} from binary cache")
 
     _write_timer_json(pkg, t, True)
+    spack.build_history.record_install(pkg.spec, t, cache=True)
     _print_timer(pre=_log_prefix(pkg.name), pkg_id=pkg_id, timer=t)
     _print_installed_pkg(pkg.spec.prefix)
     spack.hooks.post_install(pkg.spec, explicit)
-    return True
 
 
 def _process_external_package(pkg: "spack.package_base.PackageBase", explicit: bool) -> None:
@@ -433,6 +551,7 @@ def _process_binary_cache_tarball(
     unsigned: Optional[bool],
     mirrors_for_spec: Optional[list] = None,
     timer: timer.BaseTimer = timer.NULL_TIMER,
+    download_result: Optional[dict] = None,
 ) -> bool:
     """
     Process the binary cache tarball.
@@ -444,35 +563,52 @@ def _process_binary_cache_tarball(
         mirrors_for_spec: Optional list of concrete specs and mirrors
         obtained by calling binary_distribution.get_mirrors_for_spec().
         timer: timer to keep track of binary install phases.
+        download_result: tarball of the package, if it was downloaded already
 
     Return:
         bool: ``True`` if the package was extracted from binary cache,
             else ``False``
     """
-    with timer.measure("fetch"):
-        download_result = binary_distribution.download_tarball(
-            pkg.spec.build_spec, unsigned, mirrors_for_spec
-        )
+    if download_result is None:
+        with timer.measure("fetch"):
+            download_result = binary_distribution.download_tarball(
+                pkg.spec.build_spec, unsigned, mirrors_for_spec
+            )
 
-        if download_result is None:
-            return False
+            if download_result is None:
+                return False
 
     tty.msg(f"Extracting {package_id(pkg.spec)} from binary cache")
 
     with timer.measure("install"), spack.util.path.filter_padding():
         binary_distribution.extract_tarball(pkg.spec, download_result, force=False, timer=timer)
+        _register_binary_install(pkg, explicit)
+        return True
 
-        if pkg.spec.spliced:  # overwrite old metadata with new
-            spack.store.STORE.layout.write_spec(
-                pkg.spec, spack.store.STORE.layout.spec_file_path(pkg.spec)
-            )
 
-        if hasattr(pkg, "_post_buildcache_install_hook"):
-            pkg._post_buildcache_install_hook()
+def _register_binary_install(pkg: "spack.package_base.PackageBase", explicit: bool) -> None:
+    """Complete the installation of a package extracted from binary cache, and add it to the
+    database."""
+    if pkg.spec.spliced:  # overwrite old metadata with new
+        spack.store.STORE.layout.write_spec(
+            pkg.spec, spack.store.STORE.layout.spec_file_path(pkg.spec)
+        )
 
-        pkg.installed_from_binary_cache = True
-        spack.store.STORE.db.add(pkg.spec, explicit=explicit)
-        return True
+    if hasattr(pkg, "_post_buildcache_install_hook"):
+        pkg._post_buildcache_install_hook()
+
+    pkg.installed_from_binary_cache = True
+    spack.store.STORE.db.add(pkg.spec, explicit=explicit)
+
+
+def extract_binary_process(pkg: "spack.package_base.PackageBase", install_args: dict) -> None:
+    """Extract and relocate a binary package downloaded by the parent process.
+
+    This runs in a child process, so that several binary packages can be extracted and
+    relocated concurrently. The parent process registers the installation.
+    """
+    with spack.util.path.filter_padding():
+        binary_distribution.extract_tarball(pkg.spec, install_args["download_result"], force=False)
 
 
 def _try_install_from_binary_cache(
@@ -964,6 +1100,10 @@ def __init__(
             pkg_id for pkg_id in self.dependencies if pkg_id not in installed
         )
 
+        # Estimated duration of the longest chain of installations that starts with this task,
+        # which orders the tasks that are ready to be installed.
+        self.critical_path = 0.0
+
         # Ensure key sequence-related properties are updated accordingly.
         self.attempts = attempts
         self._update()
@@ -1116,9 +1256,9 @@ def cache_only(self) -> bool:
             return self.request.install_args.get("dependencies_cache_only", _cache_only)
 
     @property
-    def key(self) -> Tuple[int, int]:
-        """The key is the tuple (# uninstalled dependencies, sequence)."""
-        return (self.priority, self.sequence)
+    def key(self) -> Tuple[int, float, int]:
+        """The key is the tuple (# uninstalled dependencies, -critical path, sequence)."""
+        return (self.priority, -self.critical_path, self.sequence)
 
     def next_attempt(self, installed) -> "Task":
         """Create a new, updated task for the next installation attempt."""
@@ -1137,11 +1277,41 @@ def priority(self):
 class BuildTask(Task):
     """Class for representing a build task for a package."""
 
+    #: Handle to the build process, between calls to ``spawn()`` and ``complete()``
+    process: Optional["spack.build_environment.BuildProcess"] = None
+
+    #: Tarball of the package, if it was downloaded ahead of the installation
+    binary_download: Optional[dict] = None
+
+    #: Timer of the installation from binary cache, while the binary is being extracted
+    binary_timer: Optional[timer.Timer] = None
+
     def execute(self, install_status):
         """
         Perform the installation of the requested spec and/or dependency
         represented by the build task.
         """
+        rc = self.spawn(install_status)
+        if rc is None:
+            rc = self.complete()
+        return rc
+
+    def spawn(
+        self, install_status: InstallStatus, *, jobs: Optional[int] = None
+    ) -> Optional[ExecuteResult]:
+        """Start the installation of the package represented by the build task.
+
+        Installations from binaries are done right away, while builds from sources are done in a
+        child process, which needs to be waited for by calling ``complete()``.
+
+        Args:
+            install_status: the installation status, used to format progress reports
+            jobs: if given, the number of jobs of the build, which runs concurrently with
+                other builds
+
+        Returns:
+            The result of the installation, or None if a build process was started
+        """
         install_args = self.request.install_args
         tests = install_args.get("tests")
         unsigned = install_args.get("unsigned")
@@ -1154,9 +1324,15 @@ def execute(self, install_status):
 
         # Use the binary cache if requested
         if self.use_cache:
-            if _install_from_cache(pkg, self.explicit, unsigned):
+            download_result, self.binary_download = self.binary_download, None
+            if jobs is not None:
+                # Extract concurrently with other installations, in a child process
+                if self._spawn_binary_install(unsigned, download_result):
+                    return None
+            elif _install_from_cache(pkg, self.explicit, unsigned, download_result):
                 return ExecuteResult.SUCCESS
-            elif self.cache_only:
+
+            if self.cache_only:
                 raise spack.error.InstallError(
                     "No binary found when cache-only was specified", pkg=pkg
                 )
@@ -1170,18 +1346,76 @@ def execute(self, install_status):
         if not pkg.unit_test_check():
             return ExecuteResult.FAILED
 
-        try:
-            # Create stage object now and let it be serialized for the child process. That
-            # way monkeypatch in tests works correctly.
-            pkg.stage
+        # Create stage object now and let it be serialized for the child process. That
+        # way monkeypatch in tests works correctly.
+        pkg.stage
+
+        self._setup_install_dir(pkg)
+
+        # Create a child process to do the actual installation. Concurrent builds don't
+        # read from stdin, so that they don't compete for it.
+        if jobs is not None:
+            install_args = dict(install_args, build_jobs=jobs)
+        self.process = spack.build_environment.spawn_build_process(
+            pkg, build_process, install_args, forward_stdin=jobs is None
+        )
+        return None
+
+    def _spawn_binary_install(
+        self, unsigned: Optional[bool], download_result: Optional[dict]
+    ) -> bool:
+        """Download the binary of the package, unless it was downloaded already, and start a
+        child process to extract and relocate it.
+
+        Returns:
+            True if the child process was started, False if there is no binary for the package
+        """
+        t = timer.Timer()
+        if download_result is None:
+            if not spack.mirror.MirrorCollection(binary=True):
+                return False
+
+            with t.measure("search"):
+                matches = binary_distribution.get_mirrors_for_spec(self.pkg.spec, index_only=True)
+
+            with t.measure("fetch"):
+                download_result = binary_distribution.download_and_verify_tarball(
+                    self.pkg.spec.build_spec, unsigned, matches
+                )
+
+            if download_result is None:
+                return False
+
+        tty.msg(f"Extracting {self.pkg_id} from binary cache")
+        t.start("install")
+        self.binary_timer = t
+        self.process = spack.build_environment.spawn_build_process(
+            self.pkg,
+            extract_binary_process,
+            {"download_result": download_result, "setup_environment": False},
+            forward_stdin=False,
+        )
+        return True
 
-            self._setup_install_dir(pkg)
+    def complete(self) -> ExecuteResult:
+        """Wait for the build process started by ``spawn()``, and record its outcome."""
+        assert self.process is not None, "the build process has not been started"
+        pkg, process = self.pkg, self.process
+        self.process = None
+
+        if self.binary_timer is not None:
+            t, self.binary_timer = self.binary_timer, None
+            process.complete()
+            with spack.util.path.filter_padding():
+                _register_binary_install(pkg, self.explicit)
+            t.stop("install")
+            t.stop()
+            _report_install_from_cache(pkg, self.explicit, t)
+            return ExecuteResult.SUCCESS
 
-            # Create a child process to do the actual installation.
+        try:
             # Preserve verbosity settings across installs.
-            spack.package_base.PackageBase._verbose = spack.build_environment.start_build_process(
-                pkg, build_process, install_args
-            )
+            spack.package_base.PackageBase._verbose = process.complete()
 
             # Note: PARENT of the build process adds the new package to
             # the database, so that we don't need to re-read from file.
@@ -1241,6 +1475,7 @@ def __init__(
         packages: List["spack.package_base.PackageBase"],
         *,
         cache_only: bool = False,
+        concurrent_packages: Optional[int] = None,
         dependencies_cache_only: bool = False,
         dependencies_use_cache: bool = True,
         dirty: bool = False,
@@ -1267,6 +1502,8 @@ def __init__(
     ) -> None:
         """
         Arguments:
+            concurrent_packages: Maximum number of packages built concurrently by this process.
+                Defaults to ``config:concurrent_packages``.
             explicit: Set of package hashes to be marked as installed explicitly in the db. If
                 True, the specs from ``packages`` are marked explicit, while their dependencies are
                 not.
@@ -1322,7 +1559,7 @@ def __init__(
         self.build_requests = [BuildRequest(pkg, install_args) for pkg in packages]
 
         # Priority queue of tasks
-        self.build_pq: List[Tuple[Tuple[int, int], Task]] = []
+        self.build_pq: List[Tuple[Tuple[int, float, int], Task]] = []
 
         # Mapping of unique package ids to task
         self.build_tasks: Dict[str, Task] = {}
@@ -1349,6 +1586,15 @@ def __init__(
         # Initializing all_dependencies to empty. This will be set later in _init_queue.
         self.all_dependencies: Dict[str, Set[str]] = {}
 
+        # Maximum number of concurrent builds, and tasks being built, keyed on package's ids
+        self.concurrent_packages: int = concurrent_packages or spack.config.get(
+            "config:concurrent_packages", 1
+        )
+        self.building: Dict[str, BuildTask] = {}
+
+        # Downloads of binaries started ahead of their installation
+        self.prefetcher: Optional[binary_distribution.BinaryPrefetcher] = None
+
     def __repr__(self) -> str:
         """Returns a formal representation of the package installer."""
         rep = f"{self.__class__.__name__}("
@@ -1756,12 +2002,121 @@ def _install_task(self, task: Task, install_status: InstallStatus) -> None:
         Args:
             task: the installation task for a package
             install_status: the installation status for the package"""
-        rc = task.execute(install_status)
+        self._attach_binary_download(task)
+        self._handle_execute_result(task, task.execute(install_status))
+
+    def _attach_binary_download(self, task: Task) -> None:
+        """Give a build task the tarball prefetched for its package, if any."""
+        if self.prefetcher is not None and isinstance(task, BuildTask) and task.use_cache:
+            task.binary_download = self.prefetcher.pop(task.pkg.spec)
+
+    def _start_prefetch(self) -> None:
+        """Start downloading the binaries of all the packages that may be installed from a
+        binary cache, if configured to do so."""
+        jobs = spack.config.get("config:binary_prefetch_jobs", 0)
+        if jobs < 1 or not spack.mirror.MirrorCollection(binary=True):
+            return
+
+        specs = [
+            task.pkg.spec
+            for task in self.build_tasks.values()
+            if isinstance(task, BuildTask)
+            and task.use_cache
+            and not task.pkg.spec.external
+            and not task.pkg.spec.installed
+        ]
+        if not specs:
+            return
+
+        unsigned = self.build_requests[0].install_args.get("unsigned")
+        tty.debug(f"Prefetching the binaries of up to {len(specs)} packages")
+        self.prefetcher = binary_distribution.BinaryPrefetcher(jobs, unsigned=unsigned)
+        for spec in specs:
+            self.prefetcher.prefetch(spec)
+
+    def _handle_execute_result(self, task: Task, rc: ExecuteResult) -> None:
+        """Update the queue after the execution of a task."""
         if rc == ExecuteResult.MISSING_BUILD_SPEC:
             self._requeue_with_build_spec_tasks(task)
         else:  # if rc == ExecuteResult.SUCCESS or rc == ExecuteResult.FAILED
             self._update_installed(task)
 
+    def _can_build_concurrently(self, task: Task) -> bool:
+        """Whether the task can be built concurrently with other builds."""
+        return self.concurrent_packages > 1 and isinstance(task, BuildTask)
+
+    def _build_jobs_share(self) -> int:
+        """Return the number of jobs of a new concurrent build.
+
+        The available jobs are split evenly across the maximum number of concurrent builds, so
+        that builds started while others are in progress never exceed the available jobs.
+        """
+        return max(
+            1, spack.config.determine_number_of_jobs(parallel=True) // self.concurrent_packages
+        )
+
+    def _spawn_task(self, task: BuildTask, install_status: InstallStatus) -> bool:
+        """Start the build of a task concurrently with other builds.
+
+        Returns:
+            True if a build process was started, False if the task was completed right away
+        """
+        self._attach_binary_download(task)
+        rc = task.spawn(install_status, jobs=self._build_jobs_share())
+        if rc is None:
+            self.building[task.pkg_id] = task
+            return True
+        self._handle_execute_result(task, rc)
+        return False
+
+    def _complete_builds(
+        self,
+        install_status: InstallStatus,
+        failed_build_requests: List[Tuple["spack.package_base.PackageBase", str, str]],
+        block: bool,
+    ) -> None:
+        """Record the outcome of the concurrent builds that have finished.
+
+        Args:
+            install_status: the installation status
+            failed_build_requests: list of failed build requests, to be updated
+            block: if True wait for at least one build to finish
+        """
+        tasks = {task.process.read_pipe: task for task in self.building.values()}
+        finished = multiprocessing.connection.wait(list(tasks), timeout=None if block else 0)
+        if not finished:
+            return
+
+        # Each installation is committed to the database in its own transaction, and all the
+        # finished builds are recorded before raising the first error, so that a failure does
+        # not leave the prefixes of successful siblings unregistered.
+        error: Optional[BaseException] = None
+        for pipe in finished:
+            task = tasks[pipe]
+            del self.building[task.pkg_id]
+            try:
+                self._install(task, install_status, failed_build_requests, build_finished=True)
+            except BaseException as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+    def _terminate_builds(self) -> None:
+        """Terminate the concurrent builds in progress, removing their prefixes."""
+        for task in self.building.values():
+            tty.debug(f"Terminating the build of {task.pkg_id}")
+            task.process.terminate()
+            task.process = None
+            if not task.request.install_args.get("keep_prefix"):
+                task.pkg.remove_prefix()
+        self.building.clear()
+
+    def _next_is_ready(self) -> bool:
+        """Determine if the next task in the queue can be installed right away."""
+        while self.build_pq and self.build_pq[0][1].status == BuildStatus.REMOVED:
+            heapq.heappop(self.build_pq)
+        return bool(self.build_pq) and self._next_is_pri0()
+
     def _next_is_pri0(self) -> bool:
         """
         Determine if the next task has priority 0
@@ -1977,6 +2332,69 @@ def _init_queue(self) -> None:
                     task.add_dependent(dependent_id)
         self.all_dependencies = all_dependencies
 
+        self._prioritize_critical_path()
+
+    def _prioritize_critical_path(self) -> None:
+        """Prioritize the tasks that start the longest chains of installations.
+
+        The duration of each task is estimated from past installations of the same package,
+        and the tasks are ordered by the estimated duration of the longest chain of installations
+        that they start, so that long chains of builds start as early as possible.
+        """
+        with spack.store.STORE.db.read_transaction():
+            installed = spack.store.STORE.db.query_local(installed=True)
+        installed_hashes = {spec.dag_hash() for spec in installed}
+        pending = [
+            task
+            for task in self.build_tasks.values()
+            if task.pkg.spec.dag_hash() not in installed_hashes
+            or task.pkg.spec.dag_hash() in task.request.overwrite
+        ]
+        if not pending:
+            return
+
+        # Packages without past installations are assumed to take a typical time. If there is
+        # no past installation at all, tasks are ordered by the length of their chains.
+        durations = _recorded_install_times(pending, installed)
+        default = statistics.median(durations.values()) if durations else 1.0
+        estimates = {task.pkg_id: durations.get(task.pkg_id, default) for task in pending}
+
+        # The length of the chain starting at a task is computed after those of its dependents,
+        # with an explicit stack, since DAGs may be deeper than the recursion limit
+        lengths: Dict[str, float] = {}
+        for root in self.build_tasks:
+            stack = [root]
+            while stack:
+                pkg_id = stack[-1]
+                if pkg_id in lengths:
+                    stack.pop()
+                    continue
+                dependents = [
+                    d for d in self.build_tasks[pkg_id].dependents if d in self.build_tasks
+                ]
+                unvisited = [d for d in dependents if d not in lengths]
+                if unvisited:
+                    stack.extend(unvisited)
+                    continue
+                lengths[pkg_id] = estimates.get(pkg_id, 0.0) + max(
+                    (lengths[d] for d in dependents), default=0.0
+                )
+                stack.pop()
+
+        for pkg_id, task in self.build_tasks.items():
+            task.critical_path = lengths[pkg_id]
+        self.build_pq = [(task.key, task) for _, task in self.build_pq]
+        heapq.heapify(self.build_pq)
+
+        if durations:
+            longest = max(lengths.values())
+            makespan = max(longest, sum(estimates.values()) / self.concurrent_packages)
+            tty.msg(
+                f"Estimated install time: {pretty_seconds(makespan)}, with a critical path of "
+                f"{pretty_seconds(longest)} (from past installs of {len(durations)} of "
+                f"{len(pending)} packages)"
+            )
+
     def _install_action(self, task: Task) -> InstallAction:
         """
         Determine whether the installation should be overwritten (if it already
@@ -2013,220 +2431,269 @@ def _install_action(self, task: Task) -> InstallAction:
         # back on failure
         return InstallAction.OVERWRITE
 
-    def install(self) -> None:
-        """Install the requested package(s) and or associated dependencies."""
+    def _can_spawn(self) -> bool:
+        """Determine if another concurrent build can start right away."""
+        return len(self.building) < self.concurrent_packages and self._next_is_ready()
 
-        self._init_queue()
-        fail_fast_err = "Terminating after first install failure"
-        single_requested_spec = len(self.build_requests) == 1
-        failed_build_requests = []
+    def _install(
+        self,
+        task: Task,
+        install_status: InstallStatus,
+        failed_build_requests: List[Tuple["spack.package_base.PackageBase", str, str]],
+        build_finished: bool = False,
+    ) -> None:
+        """Install the package of a task, or start its build concurrently with other builds,
+        and handle any failure.
 
-        install_status = InstallStatus(len(self.build_pq))
+        Args:
+            task: the installation task for a package, whose write lock is held
+            install_status: the installation status
+            failed_build_requests: list of failed build requests, to be updated
+            build_finished: True if the concurrent build of the task has finished, and only
+                its outcome needs to be recorded
+        """
+        pkg, pkg_id = task.pkg, task.pkg_id
+        keep_prefix = task.request.install_args.get("keep_prefix")
+        action = InstallAction.INSTALL
+        spawned = False
+        try:
+            if not build_finished:
+                action = self._install_action(task)
 
-        # Only enable the terminal status line when we're in a tty without debug info
-        # enabled, so that the output does not get cluttered.
-        term_status = TermStatusLine(
-            enabled=sys.stdout.isatty() and tty.msg_enabled() and not tty.is_debug()
-        )
+            if build_finished:
+                self._handle_execute_result(task, task.complete())  # type: ignore[attr-defined]
+            elif action == InstallAction.INSTALL and self._can_build_concurrently(task):
+                spawned = self._spawn_task(task, install_status)  # type: ignore[arg-type]
+                if spawned:
+                    return
+            elif action == InstallAction.INSTALL:
+                self._install_task(task, install_status)
+            elif action == InstallAction.OVERWRITE:
+                # spack.store.STORE.db is not really a Database object, but a small
+                # wrapper -- silence mypy
+                OverwriteInstall(self, spack.store.STORE.db, task, install_status).install()  # type: ignore[arg-type] # noqa: E501
+
+            # If we installed then we should keep the prefix
+            stop_before_phase = getattr(pkg, "stop_before_phase", None)
+            last_phase = getattr(pkg, "last_phase", None)
+            keep_prefix = keep_prefix or (stop_before_phase is None and last_phase is None)
+
+        except KeyboardInterrupt as exc:
+            # The build has been terminated with a Ctrl-C so terminate
+            # regardless of the number of remaining specs.
+            tty.error(
+                f"Failed to install {pkg.name} due to " f"{exc.__class__.__name__}: {str(exc)}"
+            )
+            raise
 
-        while self.build_pq:
-            task = self._pop_task()
-            if task is None:
-                continue
+        except binary_distribution.NoChecksumException as exc:
+            if task.cache_only:
+                raise
 
-            install_args = task.request.install_args
-            keep_prefix = install_args.get("keep_prefix")
-
-            pkg, pkg_id, spec = task.pkg, task.pkg_id, task.pkg.spec
-            install_status.next_pkg(pkg)
-            install_status.set_term_title(f"Processing {pkg.name}")
-            tty.debug(f"Processing {pkg_id}: task={task}")
-            # Ensure that the current spec has NO uninstalled dependencies,
-            # which is assumed to be reflected directly in its priority.
-            #
-            # If the spec has uninstalled dependencies, then there must be
-            # a bug in the code (e.g., priority queue or uninstalled
-            # dependencies handling).  So terminate under the assumption that
-            # all subsequent tasks will have non-zero priorities or may be
-            # dependencies of this task.
-            if task.priority != 0:
-                term_status.clear()
-                tty.error(
-                    f"Detected uninstalled dependencies for {pkg_id}: " f"{task.uninstalled_deps}"
-                )
-                left = [dep_id for dep_id in task.uninstalled_deps if dep_id not in self.installed]
-                if not left:
-                    tty.warn(f"{pkg_id} does NOT actually have any uninstalled deps left")
-                dep_str = "dependencies" if task.priority > 1 else "dependency"
+            # Checking hash on downloaded binary failed.
+            tty.error(
+                f"Failed to install {pkg.name} from binary cache due "
+                f"to {str(exc)}: Requeueing to install from source."
+            )
+            # this overrides a full method, which is ugly.
+            task.use_cache = False  # type: ignore[misc]
+            self._requeue_task(task, install_status)
+            return
 
-                raise spack.error.InstallError(
-                    f"Cannot proceed with {pkg_id}: {task.priority} uninstalled "
-                    f"{dep_str}: {','.join(task.uninstalled_deps)}",
-                    pkg=pkg,
-                )
+        except (Exception, SystemExit) as exc:
+            self._update_failed(task, True, exc)
 
-            # Skip the installation if the spec is not being installed locally
-            # (i.e., if external or upstream) BUT flag it as installed since
-            # some package likely depends on it.
-            if _handle_external_and_upstream(pkg, task.explicit):
-                term_status.clear()
-                self._flag_installed(pkg, task.dependents)
-                continue
+            # Best effort installs suppress the exception and mark the
+            # package as a failure.
+            if not isinstance(exc, spack.error.SpackError) or not exc.printed:  # type: ignore[union-attr] # noqa: E501
+                exc.printed = True  # type: ignore[union-attr]
+                # SpackErrors can be printed by the build process or at
+                # lower levels -- skip printing if already printed.
+                # TODO: sort out this and SpackError.print_context()
+                tty.error(
+                    f"Failed to install {pkg.name} due to " f"{exc.__class__.__name__}: {str(exc)}"
+                )
+            # Terminate if requested to do so on the first failure.
+            if self.fail_fast:
+                raise spack.error.InstallError(f"{_FAIL_FAST_ERR}: {str(exc)}", pkg=pkg) from exc
 
-            # Flag a failed spec.  Do not need an (install) prefix lock since
-            # assume using a separate (failed) prefix lock file.
-            if pkg_id in self.failed or spack.store.STORE.failure_tracker.has_failed(spec):
-                term_status.clear()
-                tty.warn(f"{pkg_id} failed to install")
-                self._update_failed(task)
+            # Terminate when a single build request has failed, or summarize errors later.
+            if task.is_build_request:
+                if len(self.build_requests) == 1:
+                    raise
+                failed_build_requests.append((pkg, pkg_id, str(exc)))
 
-                if self.fail_fast:
-                    raise spack.error.InstallError(fail_fast_err, pkg=pkg)
+        finally:
+            # Remove the install prefix if anything went wrong during
+            # install.
+            if not spawned and not keep_prefix and not action == InstallAction.OVERWRITE:
+                pkg.remove_prefix()
 
-                continue
+        # Perform basic task cleanup for the installed spec to
+        # include downgrading the write to a read lock
+        if pkg.spec.installed:
+            self._cleanup_task(pkg)
 
-            # Attempt to get a write lock.  If we can't get the lock then
-            # another process is likely (un)installing the spec or has
-            # determined the spec has already been installed (though the
-            # other process may be hung).
-            install_status.set_term_title(f"Acquiring lock for {pkg.name}")
-            term_status.add(pkg_id)
-            ltype, lock = self._ensure_locked("write", pkg)
-            if lock is None:
-                # Attempt to get a read lock instead.  If this fails then
-                # another process has a write lock so must be (un)installing
-                # the spec (or that process is hung).
-                ltype, lock = self._ensure_locked("read", pkg)
-            # Requeue the spec if we cannot get at least a read lock so we
-            # can check the status presumably established by another process
-            # -- failed, installed, or uninstalled -- on the next pass.
-            if lock is None:
-                self._requeue_task(task, install_status)
-                continue
+    def install(self) -> None:
+        """Install the requested package(s) and or associated dependencies."""
 
-            term_status.clear()
-
-            # Take a timestamp with the overwrite argument to allow checking
-            # whether another process has already overridden the package.
-            if task.request.overwrite and task.explicit:
-                task.request.overwrite_time = time.time()
-
-            # Determine state of installation artifacts and adjust accordingly.
-            install_status.set_term_title(f"Preparing {pkg.name}")
-            self._prepare_for_install(task)
-
-            # Flag an already installed package
-            if pkg_id in self.installed:
-                # Downgrade to a read lock to preclude other processes from
-                # uninstalling the package until we're done installing its
-                # dependents.
-                ltype, lock = self._ensure_locked("read", pkg)
-                if lock is not None:
-                    self._update_installed(task)
-                    path = spack.util.path.debug_padded_filter(pkg.prefix)
-                    _print_installed_pkg(path)
-                else:
-                    # At this point we've failed to get a write or a read
-                    # lock, which means another process has taken a write
-                    # lock between our releasing the write and acquiring the
-                    # read.
-                    #
-                    # Requeue the task so we can re-check the status
-                    # established by the other process -- failed, installed,
-                    # or uninstalled -- on the next pass.
-                    self.installed.remove(pkg_id)
-                    self._requeue_task(task, install_status)
-                continue
+        self._init_queue()
+        failed_build_requests: List[Tuple["spack.package_base.PackageBase", str, str]] = []
 
-            # Having a read lock on an uninstalled pkg may mean another
-            # process completed an uninstall of the software between the
-            # time we failed to acquire the write lock and the time we
-            # took the read lock.
-            #
-            # Requeue the task so we can check the status presumably
-            # established by the other process -- failed, installed, or
-            # uninstalled -- on the next pass.
-            if ltype == "read":
-                lock.release_read()
-                self._requeue_task(task, install_status)
-                continue
+        install_status = InstallStatus(len(self.build_pq))
 
-            # Proceed with the installation since we have an exclusive write
-            # lock on the package.
-            install_status.set_term_title(f"Installing {pkg.name}")
-            try:
-                action = self._install_action(task)
+        # Only enable the terminal status line when we're in a tty without debug info
+        # enabled, so that the output does not get cluttered.
+        term_status = TermStatusLine(
+            enabled=sys.stdout.isatty() and tty.msg_enabled() and not tty.is_debug()
+        )
 
-                if action == InstallAction.INSTALL:
-                    self._install_task(task, install_status)
-                elif action == InstallAction.OVERWRITE:
-                    # spack.store.STORE.db is not really a Database object, but a small
-                    # wrapper -- silence mypy
-                    OverwriteInstall(self, spack.store.STORE.db, task, install_status).install()  # type: ignore[arg-type] # noqa: E501
-
-                # If we installed then we should keep the prefix
-                stop_before_phase = getattr(pkg, "stop_before_phase", None)
-                last_phase = getattr(pkg, "last_phase", None)
-                keep_prefix = keep_prefix or (stop_before_phase is None and last_phase is None)
-
-            except KeyboardInterrupt as exc:
-                # The build has been terminated with a Ctrl-C so terminate
-                # regardless of the number of remaining specs.
-                tty.error(
-                    f"Failed to install {pkg.name} due to " f"{exc.__class__.__name__}: {str(exc)}"
-                )
-                raise
+        self._start_prefetch()
+        try:
+            while self.build_pq or self.building:
+                if self.building:
+                    # Record the outcome of finished builds, waiting for one of them if no other
+                    # build can start in the meantime.
+                    self._complete_builds(
+                        install_status, failed_build_requests, block=not self._can_spawn()
+                    )
+                    term_status.set_active(sorted(self.building))
+                    if not self._can_spawn():
+                        continue
+
+                task = self._pop_task()
+                if task is None:
+                    continue
+
+                pkg, pkg_id, spec = task.pkg, task.pkg_id, task.pkg.spec
+                install_status.next_pkg(pkg)
+                install_status.set_term_title(f"Processing {pkg.name}")
+                tty.debug(f"Processing {pkg_id}: task={task}")
+                # Ensure that the current spec has NO uninstalled dependencies,
+                # which is assumed to be reflected directly in its priority.
+                #
+                # If the spec has uninstalled dependencies, then there must be
+                # a bug in the code (e.g., priority queue or uninstalled
+                # dependencies handling).  So terminate under the assumption that
+                # all subsequent tasks will have non-zero priorities or may be
+                # dependencies of this task.
+                if task.priority != 0:
+                    term_status.clear()
+                    tty.error(
+                        f"Detected uninstalled dependencies for {pkg_id}: "
+                        f"{task.uninstalled_deps}"
+                    )
+                    left = [
+                        dep_id for dep_id in task.uninstalled_deps if dep_id not in self.installed
+                    ]
+                    if not left:
+                        tty.warn(f"{pkg_id} does NOT actually have any uninstalled deps left")
+                    dep_str = "dependencies" if task.priority > 1 else "dependency"
 
-            except binary_distribution.NoChecksumException as exc:
-                if task.cache_only:
-                    raise
+                    raise spack.error.InstallError(
+                        f"Cannot proceed with {pkg_id}: {task.priority} uninstalled "
+                        f"{dep_str}: {','.join(task.uninstalled_deps)}",
+                        pkg=pkg,
+                    )
 
-                # Checking hash on downloaded binary failed.
-                tty.error(
-                    f"Failed to install {pkg.name} from binary cache due "
-                    f"to {str(exc)}: Requeueing to install from source."
-                )
-                # this overrides a full method, which is ugly.
-                task.use_cache = False  # type: ignore[misc]
-                self._requeue_task(task, install_status)
-                continue
+                # Skip the installation if the spec is not being installed locally
+                # (i.e., if external or upstream) BUT flag it as installed since
+                # some package likely depends on it.
+                if _handle_external_and_upstream(pkg, task.explicit):
+                    term_status.clear()
+                    self._flag_installed(pkg, task.dependents)
+                    continue
+
+                # Flag a failed spec.  Do not need an (install) prefix lock since
+                # assume using a separate (failed) prefix lock file.
+                if pkg_id in self.failed or spack.store.STORE.failure_tracker.has_failed(spec):
+                    term_status.clear()
+                    tty.warn(f"{pkg_id} failed to install")
+                    self._update_failed(task)
+
+                    if self.fail_fast:
+                        raise spack.error.InstallError(_FAIL_FAST_ERR, pkg=pkg)
+
+                    continue
+
+                # Attempt to get a write lock.  If we can't get the lock then
+                # another process is likely (un)installing the spec or has
+                # determined the spec has already been installed (though the
+                # other process may be hung).
+                install_status.set_term_title(f"Acquiring lock for {pkg.name}")
+                term_status.add(pkg_id)
+                ltype, lock = self._ensure_locked("write", pkg)
+                if lock is None:
+                    # Attempt to get a read lock instead.  If this fails then
+                    # another process has a write lock so must be (un)installing
+                    # the spec (or that process is hung).
+                    ltype, lock = self._ensure_locked("read", pkg)
+                # Requeue the spec if we cannot get at least a read lock so we
+                # can check the status presumably established by another process
+                # -- failed, installed, or uninstalled -- on the next pass.
+                if lock is None:
+                    self._requeue_task(task, install_status)
+                    continue
 
-            except (Exception, SystemExit) as exc:
-                self._update_failed(task, True, exc)
+                term_status.clear()
 
-                # Best effort installs suppress the exception and mark the
-                # package as a failure.
-                if not isinstance(exc, spack.error.SpackError) or not exc.printed:  # type: ignore[union-attr] # noqa: E501
-                    exc.printed = True  # type: ignore[union-attr]
-                    # SpackErrors can be printed by the build process or at
-                    # lower levels -- skip printing if already printed.
-                    # TODO: sort out this and SpackError.print_context()
-                    tty.error(
-                        f"Failed to install {pkg.name} due to "
-                        f"{exc.__class__.__name__}: {str(exc)}"
-                    )
-                # Terminate if requested to do so on the first failure.
-                if self.fail_fast:
-                    raise spack.error.InstallError(
-                        f"{fail_fast_err}: {str(exc)}", pkg=pkg
-                    ) from exc
-
-                # Terminate when a single build request has failed, or summarize errors later.
-                if task.is_build_request:
-                    if single_requested_spec:
-                        raise
-                    failed_build_requests.append((pkg, pkg_id, str(exc)))
-
-            finally:
-                # Remove the install prefix if anything went wrong during
-                # install.
-                if not keep_prefix and not action == InstallAction.OVERWRITE:
-                    pkg.remove_prefix()
-
-            # Perform basic task cleanup for the installed spec to
-            # include downgrading the write to a read lock
-            if pkg.spec.installed:
-                self._cleanup_task(pkg)
+                # Take a timestamp with the overwrite argument to allow checking
+                # whether another process has already overridden the package.
+                if task.request.overwrite and task.explicit:
+                    task.request.overwrite_time = time.time()
+
+                # Determine state of installation artifacts and adjust accordingly.
+                install_status.set_term_title(f"Preparing {pkg.name}")
+                self._prepare_for_install(task)
+
+                # Flag an already installed package
+                if pkg_id in self.installed:
+                    # Downgrade to a read lock to preclude other processes from
+                    # uninstalling the package until we're done installing its
+                    # dependents.
+                    ltype, lock = self._ensure_locked("read", pkg)
+                    if lock is not None:
+                        self._update_installed(task)
+                        path = spack.util.path.debug_padded_filter(pkg.prefix)
+                        _print_installed_pkg(path)
+                    else:
+                        # At this point we've failed to get a write or a read
+                        # lock, which means another process has taken a write
+                        # lock between our releasing the write and acquiring the
+                        # read.
+                        #
+                        # Requeue the task so we can re-check the status
+                        # established by the other process -- failed, installed,
+                        # or uninstalled -- on the next pass.
+                        self.installed.remove(pkg_id)
+                        self._requeue_task(task, install_status)
+                    continue
+
+                # Having a read lock on an uninstalled pkg may mean another
+                # process completed an uninstall of the software between the
+                # time we failed to acquire the write lock and the time we
+                # took the read lock.
+                #
+                # Requeue the task so we can check the status presumably
+                # established by the other process -- failed, installed, or
+                # uninstalled -- on the next pass.
+                if ltype == "read":
+                    lock.release_read()
+                    self._requeue_task(task, install_status)
+                    continue
+
+                # Proceed with the installation since we have an exclusive write
+                # lock on the package.
+                install_status.set_term_title(f"Installing {pkg.name}")
+                self._install(task, install_status, failed_build_requests)
+                term_status.set_active(sorted(self.building))
+        except BaseException:
+            self._terminate_builds()
+            raise
+        finally:
+            if self.prefetcher is not None:
+                self.prefetcher.shutdown()
+                self.prefetcher = None
 
         # Cleanup, which includes releasing all of the read locks
         self._cleanup_all_tasks()
@@ -2375,6 +2842,14 @@ def run(self) -> bool:
             # Stop the timer and save results
             self.timer.stop()
             _write_timer_json(self.pkg, self.timer, False)
+            if not self.fake:
+                spack.build_history.record_install(
+                    self.pkg.spec,
+                    self.timer,
+                    cache=False,
+                    jobs=spack.config.determine_number_of_jobs(parallel=self.pkg.parallel),
+                    usage=spack.build_history.resource_usage(),
+                )
 
         print_install_test_log(self.pkg)
         _print_timer(pre=self.pre, pkg_id=self.pkg_id, timer=self.timer)
@@ -492,6 +492,44 @@ class Hipblas:
             i += 1
 
 
+def _variant_definitions(variants: WhenDict, name: str) -> WhenVariantList:
+    """List of (when_spec, Variant) for all definitions of a variant, in precedence order."""
+    # construct a list of defs sorted by precedence
+    defs: WhenVariantList = []
+    for when, variants_by_name in variants.items():
+        variant_def = variants_by_name.get(name)
+        if variant_def:
+            defs.append((when, variant_def))
+
+    # With multiple definitions, ensure precedence order and simplify overrides
+    if len(defs) > 1:
+        defs.sort(key=lambda v: v[1].precedence)
+        _remove_overridden_vdefs(defs)
+
+    return defs
+
+
+def _variant_items(
+    variants: WhenDict,
+) -> Iterable[Tuple[spack.spec.Spec, Dict[str, spack.variant.Variant]]]:
+    """Iterate over ``variants.items()`` with overridden definitions removed."""
+    # Note: This is quadratic in the average number of variant definitions per name.
+    # That is likely close to linear in practice, as there are few variants with
+    # multiple definitions (but it matters when they are there).
+    exclude = {
+        name: [id(vdef) for _, vdef in _variant_definitions(variants, name)]
+        for name in _names(variants)
+    }
+
+    for when, variants_by_name in variants.items():
+        filtered_variants_by_name = {
+            name: vdef for name, vdef in variants_by_name.items() if id(vdef) in exclude[name]
+        }
+
+        if filtered_variants_by_name:
+            yield when, filtered_variants_by_name
+
+
 #: Store whether a given Spec source/binary should not be redistributed.
 class DisableRedistribute:
     def __init__(self, source, binary):
@@ -770,38 +808,12 @@ def num_variant_definitions(cls) -> int:
     @classmethod
     def variant_definitions(cls, name: str) -> WhenVariantList:
         """Iterator over (when_spec, Variant) for all variant definitions for a particular name."""
-        # construct a list of defs sorted by precedence
-        defs: WhenVariantList = []
-        for when, variants_by_name in cls.variants.items():
-            variant_def = variants_by_name.get(name)
-            if variant_def:
-                defs.append((when, variant_def))
-
-        # With multiple definitions, ensure precedence order and simplify overrides
-        if len(defs) > 1:
-            defs.sort(key=lambda v: v[1].precedence)
-            _remove_overridden_vdefs(defs)
-
-        return defs
+        return _variant_definitions(cls.variants, name)
 
     @classmethod
     def variant_items(cls) -> Iterable[Tuple[spack.spec.Spec, Dict[str, spack.variant.Variant]]]:
         """Iterate over ``cls.variants.items()`` with overridden definitions removed."""
-        # Note: This is quadratic in the average number of variant definitions per name.
-        # That is likely close to linear in practice, as there are few variants with
-        # multiple definitions (but it matters when they are there).
-        exclude = {
-            name: [id(vdef) for _, vdef in cls.variant_definitions(name)]
-            for name in cls.variant_names()
-        }
-
-        for when, variants_by_name in cls.variants.items():
-            filtered_variants_by_name = {
-                name: vdef for name, vdef in variants_by_name.items() if id(vdef) in exclude[name]
-            }
-
-            if filtered_variants_by_name:
-                yield when, filtered_variants_by_name
+        return _variant_items(cls.variants)
 
     def get_variant(self, name: str) -> spack.variant.Variant:
         """Get the highest precedence variant definition matching this package's spec.
@@ -858,60 +870,16 @@ def possible_dependencies(
         Note: the returned dict *includes* the package itself.
 
         """
-        visited = {} if visited is None else visited
-        missing = {} if missing is None else missing
-
-        visited.setdefault(cls.name, set())
-
-        for name, conditions in cls.dependencies_by_name(when=True).items():
-            # check whether this dependency could be of the type asked for
-            depflag_union = 0
-            for deplist in conditions.values():
-                for dep in deplist:
-                    depflag_union |= dep.depflag
-            if not (depflag & depflag_union):
-                continue
-
-            # expand virtuals if enabled, otherwise just stop at virtuals
-            if spack.repo.PATH.is_virtual(name):
-                if virtuals is not None:
-                    virtuals.add(name)
-                if expand_virtuals:
-                    providers = spack.repo.PATH.providers_for(name)
-                    dep_names = [spec.name for spec in providers]
-                else:
-                    visited.setdefault(cls.name, set()).add(name)
-                    visited.setdefault(name, set())
-                    continue
-            else:
-                dep_names = [name]
-
-            # add the dependency names to the visited dict
-            visited.setdefault(cls.name, set()).update(set(dep_names))
-
-            # recursively traverse dependencies
-            for dep_name in dep_names:
-                if dep_name in visited:
-                    continue
-
-                visited.setdefault(dep_name, set())
-
-                # skip the rest if not transitive
-                if not transitive:
-                    continue
-
-                try:
-                    dep_cls = spack.repo.PATH.get_pkg_class(dep_name)
-                except spack.repo.UnknownPackageError:
-                    # log unknown packages
-                    missing.setdefault(cls.name, set()).add(dep_name)
-                    continue
-
-                dep_cls.possible_dependencies(
-                    transitive, expand_virtuals, depflag, visited, missing, virtuals
-                )
-
-        return visited
+        return _possible_dependencies(
+            cls,
+            spack.repo.PATH.get_pkg_class,
+            transitive=transitive,
+            expand_virtuals=expand_virtuals,
+            depflag=depflag,
+            visited=visited,
+            missing=missing,
+            virtuals=virtuals,
+        )
 
     @classproperty
     def package_dir(cls):
@@ -2335,6 +2303,75 @@ def flatten_dependencies(spec, flat_dir):
         dep_files.merge(flat_dir + "/" + name)
 
 
+def _possible_dependencies(
+    pkg,
+    get_pkg: Callable[[str], Any],
+    *,
+    transitive: bool,
+    expand_virtuals: bool,
+    depflag: dt.DepFlag,
+    visited: Optional[dict],
+    missing: Optional[dict],
+    virtuals: Optional[set],
+) -> Dict[str, Set[str]]:
+    """Implementation of ``PackageBase.possible_dependencies``, for a package class or any
+    object with the same directive data, where dependencies are retrieved with ``get_pkg``."""
+    visited = {} if visited is None else visited
+    missing = {} if missing is None else missing
+
+    visited.setdefault(pkg.name, set())
+
+    for name, conditions in pkg.dependencies_by_name(when=True).items():
+        # check whether this dependency could be of the type asked for
+        depflag_union = 0
+        for deplist in conditions.values():
+            for dep in deplist:
+                depflag_union |= dep.depflag
+        if not (depflag & depflag_union):
+            continue
+
+        # expand virtuals if enabled, otherwise just stop at virtuals
+        if spack.repo.PATH.is_virtual(name):
+            if virtuals is not None:
+                virtuals.add(name)
+            if expand_virtuals:
+                providers = spack.repo.PATH.providers_for(name)
+                dep_names = [spec.name for spec in providers]
+            else:
+                visited.setdefault(pkg.name, set()).add(name)
+                visited.setdefault(name, set())
+                continue
+        else:
+            dep_names = [name]
+
+        # add the dependency names to the visited dict
+        visited.setdefault(pkg.name, set()).update(set(dep_names))
+
+        # recursively traverse dependencies
+        for dep_name in dep_names:
+            if dep_name in visited:
+                continue
+
+            visited.setdefault(dep_name, set())
+
+            # skip the rest if not transitive
+            if not transitive:
+                continue
+
+            try:
+                dep_pkg = get_pkg(dep_name)
+            except spack.repo.UnknownPackageError:
+                # log unknown packages
+                missing.setdefault(pkg.name, set()).add(dep_name)
+                continue
+
+            dep_pkg.possible_dependencies(
+                transitive, expand_virtuals, depflag, visited, missing, virtuals
+            )
+
+    return visited
+
+
 def possible_dependencies(
     *pkg_or_spec: Union[str, spack.spec.Spec, typing.Type[PackageBase]],
     transitive: bool = True,
@@ -2345,6 +2382,9 @@ def possible_dependencies(
 ) -> Dict[str, Set[str]]:
     """Get the possible dependencies of a number of packages.
 
+    Packages given by name or spec, and their dependencies, are read from the package
+    metadata cache when possible, without loading package classes.
+
     See ``PackageBase.possible_dependencies`` for details.
     """
     packages = []
@@ -2357,10 +2397,13 @@ def possible_dependencies(
             pos = spack.spec.Spec(pos)
 
         if spack.repo.PATH.is_virtual(pos.name):
-            packages.extend(p.package_class for p in spack.repo.PATH.providers_for(pos.name))
+            packages.extend(
+                spack.repo.PATH.get_pkg_metadata(p.fullname)
+                for p in spack.repo.PATH.providers_for(pos.name)
+            )
             continue
         else:
-            packages.append(pos.package_class)
+            packages.append(spack.repo.PATH.get_pkg_metadata(pos.fullname))
 
     visited: Dict[str, Set[str]] = {}
     for pkg in packages:
@@ -0,0 +1,595 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Persistent cache of the data defined by directives in package classes.
+
+Loading a package class means importing and executing its ``package.py`` file, and the
+files of all the classes it derives from. Many operations, e.g. setting up a concretization
+problem or listing packages, only need the data stored by directives like ``version()``,
+``variant()`` or ``depends_on()``. This module stores that data in a file cache, one entry
+per package, so that it can be read back without importing the package.
+
+Entries are keyed by the modification time and the hash of every source file the package
+class is defined in, so they are invalidated whenever any of these files change. Variant
+validators defined in packages are not serialized: the package is loaded the first time one
+of them is needed. Packages whose directive data cannot be serialized, e.g. because they
+apply patches to their dependencies, are marked as such in the cache, and are always loaded
+from their ``package.py`` file.
+"""
+import hashlib
+import inspect
+import json
+import os
+import platform
+import sys
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Type, Union
+
+import llnl.util.tty as tty
+
+import spack
+import spack.dependency
+import spack.deptypes as dt
+import spack.error
+import spack.package_base
+import spack.repo
+import spack.spec
+import spack.util.crypto
+import spack.util.file_cache
+import spack.variant as vt
+import spack.version as vn
+
+#: Version of the format of cache entries. Entries with a different version are discarded.
+FORMAT_VERSION = 1
+
+
+class PackageMetadata:
+    """Data defined by directives in a package class.
+
+    Objects of this type can be used in place of package classes by code that only needs
+    directive data, since they have the same directive dictionaries (``versions``,
+    ``variants``, ``dependencies``, ``provided``, etc.) and accessor methods. Each directive
+    dictionary is decoded from its serialized form the first time it is accessed.
+    """
+
+    #: Packages defined in a repository are never virtual
+    virtual = False
+
+    #: Directive dictionaries that are decoded lazily
+    DIRECTIVE_DICTS = (
+        "versions",
+        "variants",
+        "dependencies",
+        "provided",
+        "provided_together",
+        "conflicts",
+        "requirements",
+        "languages",
+        "splice_specs",
+    )
+
+    versions: Dict[vn.StandardVersion, Dict[str, Any]]
+    variants: Dict[spack.spec.Spec, Dict[str, vt.Variant]]
+    dependencies: Dict[spack.spec.Spec, Dict[str, spack.dependency.Dependency]]
+    provided: Dict[spack.spec.Spec, Set[spack.spec.Spec]]
+    provided_together: Dict[spack.spec.Spec, List[Set[str]]]
+    conflicts: Dict[spack.spec.Spec, List[Tuple[spack.spec.Spec, Optional[str]]]]
+    requirements: Dict[
+        spack.spec.Spec, List[Tuple[Tuple[spack.spec.Spec, ...], str, Optional[str]]]
+    ]
+    languages: Dict[spack.spec.Spec, Set[str]]
+    splice_specs: Dict[spack.spec.Spec, Tuple[spack.spec.Spec, Union[None, str, List[str]]]]
+
+    def __init__(
+        self,
+        name: str,
+        namespace: str,
+        data: Dict[str, Any],
+        get_pkg_class: Callable[[str], Type["spack.package_base.PackageBase"]],
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.namespace = namespace
+        #: Hash of the source files the data was read from, if known
+        self.fingerprint = fingerprint
+        self.__doc__ = data["doc"]
+        self.has_code: bool = data["has_code"]
+        self.homepage: Optional[str] = data["homepage"]
+        self.maintainers: List[str] = data["maintainers"]
+        self._data = {key: data[key] for key in self.DIRECTIVE_DICTS}
+        self._get_pkg_class = get_pkg_class
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes that are not set yet
+        if name.startswith("_") or name not in self.DIRECTIVE_DICTS:
+            raise AttributeError(name)
+        value = getattr(self, f"_decode_{name}")(self._data.pop(name))
+        setattr(self, name, value)
+        return value
+
+    def _decode_versions(self, data):
+        return {vn.StandardVersion.from_string(v): info for v, info in data}
+
+    def _decode_variants(self, data):
+        result = {}
+        for when, variants in data:
+            when_spec = spack.spec.Spec(when)
+            result[when_spec] = {
+                v["name"]: _variant_from_dict(v, self._variant_getter(when_spec, v["name"]))
+                for v in variants
+            }
+        return result
+
+    def _variant_getter(self, when: spack.spec.Spec, name: str) -> Callable[[], vt.Variant]:
+        return lambda: self._get_pkg_class(self.name).variants[when][name]
+
+    def _decode_dependencies(self, data):
+        Spec = spack.spec.Spec
+        return {
+            Spec(when): {
+                name: spack.dependency.Dependency(self, Spec(spec), depflag)  # type: ignore
+                for name, spec, depflag in deps
+            }
+            for when, deps in data
+        }
+
+    def _decode_provided(self, data):
+        Spec = spack.spec.Spec
+        return {Spec(when): {Spec(s) for s in provided} for when, provided in data}
+
+    def _decode_provided_together(self, data):
+        return {spack.spec.Spec(when): [set(names) for names in sets] for when, sets in data}
+
+    def _decode_conflicts(self, data):
+        Spec = spack.spec.Spec
+        return {Spec(when): [(Spec(s), msg) for s, msg in conflicts] for when, conflicts in data}
+
+    def _decode_requirements(self, data):
+        Spec = spack.spec.Spec
+        return {
+            Spec(when): [
+                (tuple(Spec(s) for s in specs), policy, msg) for specs, policy, msg in reqs
+            ]
+            for when, reqs in data
+        }
+
+    def _decode_languages(self, data):
+        return {spack.spec.Spec(when): set(languages) for when, languages in data}
+
+    def _decode_splice_specs(self, data):
+        Spec = spack.spec.Spec
+        return {
+            Spec(when): (Spec(target), match_variants) for when, target, match_variants in data
+        }
+
+    @property
+    def fullname(self) -> str:
+        return f"{self.namespace}.{self.name}"
+
+    def dependency_names(self) -> List[str]:
+        return spack.package_base._names(self.dependencies)
+
+    def dependencies_by_name(self, when: bool = False):
+        return spack.package_base._by_name(self.dependencies, when=when)
+
+    def dependencies_of_type(self, deptypes: dt.DepFlag) -> Set[str]:
+        """Get names of dependencies that can possibly have these deptypes."""
+        return {
+            name
+            for name, dependencies in self.dependencies_by_name().items()
+            if any(deptypes & dep.depflag for dep in dependencies)
+        }
+
+    def variant_names(self) -> List[str]:
+        return spack.package_base._names(self.variants)
+
+    def has_variant(self, name: str) -> bool:
+        return any(name in dictionary for dictionary in self.variants.values())
+
+    def variant_definitions(self, name: str) -> "spack.package_base.WhenVariantList":
+        return spack.package_base._variant_definitions(self.variants, name)
+
+    def variant_items(self) -> Iterable[Tuple[spack.spec.Spec, Dict[str, vt.Variant]]]:
+        return spack.package_base._variant_items(self.variants)
+
+    def provided_virtual_names(self) -> List[str]:
+        return sorted(set(vpkg.name for virtuals in self.provided.values() for vpkg in virtuals))
+
+    def possible_dependencies(
+        self,
+        transitive: bool = True,
+        expand_virtuals: bool = True,
+        depflag: dt.DepFlag = dt.ALL,
+        visited: Optional[dict] = None,
+        missing: Optional[dict] = None,
+        virtuals: Optional[set] = None,
+    ) -> Dict[str, Set[str]]:
+        """Same as ``PackageBase.possible_dependencies``, reading dependencies from the
+        package metadata cache."""
+        return spack.package_base._possible_dependencies(
+            self,
+            spack.repo.PATH.get_pkg_metadata,
+            transitive=transitive,
+            expand_virtuals=expand_virtuals,
+            depflag=depflag,
+            visited=visited,
+            missing=missing,
+            virtuals=virtuals,
+        )
+
+    def __repr__(self) -> str:
+        return f"PackageMetadata({self.fullname})"
+
+
+#: Type of objects exposing the directive data of a package
+PackageMetadataType = Union[Type["spack.package_base.PackageBase"], PackageMetadata]
+
+
+class MetadataSerializationError(spack.error.SpackError):
+    """Raised when the directive data of a package cannot be serialized."""
+
+
+def _json_value(value: Any) -> Any:
+    """Return a value that is stored as-is in JSON, or raise if it would be altered."""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, list):
+        return [_json_value(x) for x in value]
+    if isinstance(value, dict) and all(isinstance(key, str) for key in value):
+        return {key: _json_value(x) for key, x in value.items()}
+    raise MetadataSerializationError(f"cannot serialize {value!r}")
+
+
+def _spec_to_str(spec: spack.spec.Spec) -> str:
+    """Return a string that is parsed back into the same spec, or raise."""
+    result = str(spec)
+    if spack.spec.Spec(result) != spec:
+        raise MetadataSerializationError(f"cannot serialize the '{result}' spec")
+    return result
+
+
+def _when_to_str(when: Optional[spack.spec.Spec]) -> Optional[str]:
+    return None if when is None else _spec_to_str(when)
+
+
+def _when_from_str(when: Optional[str]) -> Optional[spack.spec.Spec]:
+    return None if when is None else spack.spec.Spec(when)
+
+
+def _lazy_validator(get_variant: Callable[[], vt.Variant], attr: str, doc: Optional[str]):
+    """Return a validator that calls the one of the variant definition in the package class,
+    so that the package is loaded only if some variant value needs to be validated."""
+
+    def _validator(*args):
+        return getattr(get_variant(), attr)(*args)
+
+    _validator.__doc__ = doc
+    return _validator
+
+
+def _variant_to_dict(variant: vt.Variant) -> Dict[str, Any]:
+    values = variant.values
+    group_validator = variant.group_validator is not None
+    if isinstance(values, vt.DisjointSetsOfValues):
+        # The group validator comes from the set of values itself
+        validator = variant.group_validator
+        if getattr(validator, "__code__", None) is not values.validator.__code__:
+            raise MetadataSerializationError(f"variant '{variant.name}' has a custom validator")
+        group_validator = False
+        values_dict: Any = {
+            "sets": [_json_value(sorted(s)) for s in values.sets],
+            "feature_values": _json_value(list(values.feature_values)),
+            "error_fmt": values.error_fmt,
+        }
+    elif values is None:
+        # Values are checked by a callable, which stays in the package class
+        values_dict = {"doc": inspect.getdoc(variant.single_value_validator)}
+    else:
+        values_dict = [
+            (
+                {"value": _json_value(x.value), "when": _when_to_str(x.when)}
+                if isinstance(x, vt.ConditionalValue)
+                else _json_value(x)
+            )
+            for x in values
+        ]
+
+    default = variant.default
+    default_is_tuple = isinstance(default, tuple)
+    return {
+        "name": variant.name,
+        "default": _json_value(list(default) if default_is_tuple else default),
+        "default_is_tuple": default_is_tuple,
+        "description": variant.description,
+        "values": values_dict,
+        "group_validator": group_validator,
+        "multi": variant.multi,
+        "sticky": variant.sticky,
+        "precedence": variant.precedence,
+    }
+
+
+def _variant_from_dict(data: Dict[str, Any], get_variant: Callable[[], vt.Variant]) -> vt.Variant:
+    default = tuple(data["default"]) if data["default_is_tuple"] else data["default"]
+    values_dict = data["values"]
+    validator = None
+    if isinstance(values_dict, dict) and "sets" in values_dict:
+        values: Any = vt.DisjointSetsOfValues(*values_dict["sets"])
+        values.feature_values = tuple(values_dict["feature_values"])
+        values.error_fmt = values_dict["error_fmt"]
+        values.default = default
+        validator = values.validator
+    elif isinstance(values_dict, dict):
+        values = _lazy_validator(get_variant, "single_value_validator", values_dict["doc"])
+    else:
+        values = tuple(
+            (
+                vt.ConditionalValue(x["value"], _when_from_str(x["when"]))
+                if isinstance(x, dict)
+                else x
+            )
+            for x in values_dict
+        )
+
+    if data["group_validator"]:
+        validator = _lazy_validator(get_variant, "group_validator", None)
+
+    return vt.Variant(
+        data["name"],
+        default=default,
+        description=data["description"],
+        values=values,
+        multi=data["multi"],
+        validator=validator,
+        sticky=data["sticky"],
+        precedence=data["precedence"],
+    )
+
+
+def to_dict(pkg: PackageMetadataType) -> Dict[str, Any]:
+    """Serialize the directive data of a package class.
+
+    Raises:
+        MetadataSerializationError: if some of the data cannot be serialized
+    """
+    versions = []
+    for version, info in pkg.versions.items():
+        if not isinstance(version, vn.StandardVersion):
+            raise MetadataSerializationError(f"cannot serialize the '{version}' version")
+        versions.append([str(version), _json_value(info)])
+
+    dependencies = []
+    for when, deps_by_name in pkg.dependencies.items():
+        deps = []
+        for name, dep in deps_by_name.items():
+            if dep.patches:
+                raise MetadataSerializationError(f"the dependency on '{name}' has patches")
+            deps.append([name, _spec_to_str(dep.spec), dep.depflag])
+        dependencies.append([_spec_to_str(when), deps])
+
+    splice_specs = []
+    for when, (target, match_variants) in pkg.splice_specs.items():
+        splice_specs.append([_spec_to_str(when), _spec_to_str(target), match_variants])
+
+    return {
+        "doc": pkg.__doc__,
+        "has_code": pkg.has_code,
+        "homepage": pkg.homepage,
+        "maintainers": _json_value(list(pkg.maintainers)),
+        "versions": versions,
+        "variants": [
+            [_spec_to_str(when), [_variant_to_dict(v) for v in variants.values()]]
+            for when, variants in pkg.variants.items()
+        ],
+        "dependencies": dependencies,
+        "provided": [
+            [_spec_to_str(when), sorted(_spec_to_str(s) for s in provided)]
+            for when, provided in pkg.provided.items()
+        ],
+        "provided_together": [
+            [_spec_to_str(when), [sorted(names) for names in sets]]
+            for when, sets in pkg.provided_together.items()
+        ],
+        "conflicts": [
+            [_spec_to_str(when), [[_spec_to_str(s), msg] for s, msg in conflicts]]
+            for when, conflicts in pkg.conflicts.items()
+        ],
+        "requirements": [
+            [
+                _spec_to_str(when),
+                [
+                    [[_spec_to_str(s) for s in specs], policy, msg]
+                    for specs, policy, msg in requirements
+                ],
+            ]
+            for when, requirements in pkg.requirements.items()
+        ],
+        "languages": [
+            [_spec_to_str(when), sorted(languages)] for when, languages in pkg.languages.items()
+        ],
+        "splice_specs": _json_value(splice_specs),
+    }
+
+
+def from_dict(
+    name: str,
+    namespace: str,
+    data: Dict[str, Any],
+    get_pkg_class: Callable[[str], Type["spack.package_base.PackageBase"]],
+    fingerprint: Optional[str] = None,
+) -> PackageMetadata:
+    """Read the directive data of a package serialized by ``to_dict()``.
+
+    Args:
+        name: name of the package
+        namespace: namespace of the repository the package is in
+        data: serialized directive data
+        get_pkg_class: function loading the package class from its name, if variant values
+            need to be checked by validators defined in the package
+        fingerprint: hash of the source files the data was read from, if known
+
+    Raises:
+        KeyError: if some data is missing
+    """
+    return PackageMetadata(name, namespace, data, get_pkg_class, fingerprint)
+
+
+def _source_files(pkg_cls: Type["spack.package_base.PackageBase"]) -> List[str]:
+    """Files of the modules defining the package class and all its base classes."""
+    result: Dict[str, None] = {}
+    for cls in pkg_cls.__mro__:
+        path = getattr(sys.modules.get(cls.__module__), "__file__", None)
+        if path:
+            result.setdefault(os.path.abspath(path))
+    return list(result)
+
+
+def _file_sha256(path: str) -> str:
+    return spack.util.crypto.checksum(hashlib.sha256, path)
+
+
+#: Sources of a cache entry, as (path, mtime, sha256) tuples
+Sources = List[Tuple[str, float, str]]
+
+
+def _sources_fingerprint(sources: Sources) -> str:
+    """Hash identifying the content of the files a cache entry was created from."""
+    sha = hashlib.sha256()
+    for path, _, sha256 in sources:
+        sha.update(f"{path}:{sha256}\n".encode())
+    return sha.hexdigest()
+
+
+def fingerprint(pkg: PackageMetadataType) -> str:
+    """Return a hash identifying the content of the source files a package is defined in.
+
+    The hash is the same whether the package is given as its class or as its metadata.
+    """
+    if isinstance(pkg, PackageMetadata):
+        if pkg.fingerprint is not None:
+            return pkg.fingerprint
+        pkg = spack.repo.PATH.get_pkg_class(pkg.fullname)
+    return _sources_fingerprint([(path, 0.0, _file_sha256(path)) for path in _source_files(pkg)])
+
+
+def _sources_unchanged(sources: Sources) -> bool:
+    """Whether the files a cache entry was created from are still the same."""
+    for path, mtime, sha256 in sources:
+        try:
+            if os.stat(path).st_mtime == mtime:
+                continue
+            if _file_sha256(path) != sha256:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+class PackageMetadataCache:
+    """Cache of the directive data of the packages in a repository.
+
+    Entries are stored in a file cache, under ``metadata/<namespace>/<package>.json``, and
+    kept in memory once read.
+    """
+
+    def __init__(self, cache: spack.util.file_cache.FileCache, namespace: str) -> None:
+        self.cache = cache
+        self.namespace = namespace
+        self._in_memory: Dict[str, Tuple[Sources, PackageMetadata]] = {}
+
+    def _key(self, pkg_name: str) -> str:
+        return f"metadata/{self.namespace}/{pkg_name}.json"
+
+    @staticmethod
+    def _entry_header() -> Dict[str, Any]:
+        # Directives may depend on the host, e.g. ``when=sys.platform != "darwin"``, or versions
+        # and resources selected from ``platform.machine()`` when the class is defined
+        return {
+            "format": FORMAT_VERSION,
+            "spack": spack.spack_version,
+            "platform": sys.platform,
+            "machine": platform.machine(),
+        }
+
+    def _read(self, pkg_name: str) -> Optional[Dict[str, Any]]:
+        """Read a cache entry, and return it if it is still valid."""
+        key = self._key(pkg_name)
+        try:
+            if not self.cache.init_entry(key):
+                return None
+            with self.cache.read_transaction(key) as f:
+                entry = json.load(f)
+        except (spack.util.file_cache.CacheError, OSError, ValueError) as e:
+            tty.debug(f"Cannot read the metadata of {self.namespace}.{pkg_name}: {e}")
+            return None
+
+        header = self._entry_header()
+        if any(entry.get(field) != value for field, value in header.items()):
+            return None
+        if not _sources_unchanged(entry["sources"]):
+            return None
+        return entry
+
+    def _write(
+        self, pkg_name: str, pkg_cls: Type["spack.package_base.PackageBase"]
+    ) -> Optional[Dict[str, Any]]:
+        """Create the cache entry for a package class, and return its serialized data."""
+        try:
+            data: Optional[Dict[str, Any]] = to_dict(pkg_cls)
+        except MetadataSerializationError as e:
+            tty.debug(f"Cannot cache the metadata of {pkg_cls.fullname}: {e}")
+            data = None
+
+        entry = self._entry_header()
+        try:
+            entry["sources"] = [
+                (path, os.stat(path).st_mtime, _file_sha256(path))
+                for path in _source_files(pkg_cls)
+            ]
+            entry["package"] = data
+            key = self._key(pkg_name)
+            self.cache.init_entry(key)
+            with self.cache.write_transaction(key) as (old, new):
+                json.dump(entry, new, separators=(",", ":"))
+        except (spack.util.file_cache.CacheError, OSError) as e:
+            tty.debug(f"Cannot write the metadata of {pkg_cls.fullname}: {e}")
+        return data
+
+    def get(
+        self, pkg_name: str, get_pkg_class: Callable[[str], Type["spack.package_base.PackageBase"]]
+    ) -> PackageMetadataType:
+        """Get the directive data of a package, loading its class with ``get_pkg_class`` if
+        the cache has no valid entry for it.
+
+        Returns the package class, instead of its metadata, when the class had to be loaded,
+        or when its directive data cannot be cached.
+        """
+        if pkg_name in self._in_memory:
+            sources, metadata = self._in_memory[pkg_name]
+            if _sources_unchanged(sources):
+                return metadata
+            del self._in_memory[pkg_name]
+
+        entry = self._read(pkg_name)
+        if entry is None:
+            pkg_cls = get_pkg_class(pkg_name)
+            self._write(pkg_name, pkg_cls)
+            return pkg_cls
+
+        if entry["package"] is None:
+            return get_pkg_class(pkg_name)
+
+        try:
+            metadata = from_dict(
+                pkg_name,
+                self.namespace,
+                entry["package"],
+                get_pkg_class,
+                fingerprint=_sources_fingerprint(entry["sources"]),
+            )
+        except KeyError:
+            pkg_cls = get_pkg_class(pkg_name)
+            self._write(pkg_name, pkg_cls)
+            return pkg_cls
+        self._in_memory[pkg_name] = (entry["sources"], metadata)
+        return metadata
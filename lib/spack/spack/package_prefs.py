@@ -148,12 +148,12 @@ def preferred_variants(cls, pkg_name):
             variants = " ".join(variants)
 
         # Only return variants that are actually supported by the package
-        pkg_cls = spack.repo.PATH.get_pkg_class(pkg_name)
+        pkg_metadata = spack.repo.PATH.get_pkg_metadata(pkg_name)
         spec = spack.spec.Spec(f"{pkg_name} {variants}")
         return {
             name: variant
             for name, variant in spec.variants.items()
-            if name in pkg_cls.variant_names()
+            if name in pkg_metadata.variant_names()
         }
 
 
@@ -510,6 +510,16 @@ def update_package(self, pkg_fullname: str) -> None:
         Args:
             pkg_fullname: package to update.
         """
+        pkg_cls = self.repository.get_pkg_class(pkg_fullname)
+        self.update_package_patches(pkg_fullname, self._index_patches(pkg_cls, self.repository))
+
+    def update_package_patches(self, pkg_fullname: str, partial_index: Dict[Any, Any]) -> None:
+        """Replace the patches of a package in the patch cache.
+
+        Args:
+            pkg_fullname: package to update.
+            partial_index: patch index for that package, as returned by ``_index_patches``.
+        """
         # remove this package from any patch entries that reference it.
         empty = []
         for sha256, package_to_patch in self.index.items():
@@ -529,8 +539,6 @@ def update_package(self, pkg_fullname: str) -> None:
             del self.index[sha256]
 
         # update the index with per-package patch indexes
-        pkg_cls = self.repository.get_pkg_class(pkg_fullname)
-        partial_index = self._index_patches(pkg_cls, self.repository)
         for sha256, package_to_patch in partial_index.items():
             p2p = self.index.setdefault(sha256, {})
             p2p.update(package_to_patch)
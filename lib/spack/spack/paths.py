@@ -109,6 +109,9 @@ def _get_user_cache_path():
 #: transient caches for Spack data (virtual cache, patch sha256 lookup, etc.)
 default_misc_cache_path = os.path.join(user_cache_path, "cache")
 
+#: durations and resources of past installations
+default_build_history_path = os.path.join(user_cache_path, "build_history")
+
 
 # Below paths pull configuration from the host environment.
 #
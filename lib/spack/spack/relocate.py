@@ -3,12 +3,13 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 import collections
+import concurrent.futures
 import itertools
 import os
 import re
 import sys
 from collections import OrderedDict
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Sequence
 
 import macholib.mach_o
 import macholib.MachO
@@ -43,6 +44,33 @@ def __init__(self, file_path, root_path):
         )
 
 
+def _map_in_batches(
+    fn: Callable[[List[str]], Optional[List[str]]], files: Sequence[str], jobs: int = 1
+) -> List[str]:
+    """Call ``fn`` on consecutive batches of files, on up to ``jobs`` threads, and return the
+    concatenation of the lists it returns, in the order of the files.
+
+    Relocation spends most of its time reading and writing files, and running patchelf, which
+    don't hold the GIL. If ``fn`` raises for some batches, the exception of the first one is
+    re-raised, after all batches are done.
+    """
+    if jobs <= 1 or len(files) <= 1:
+        return fn(list(files)) or []
+
+    # A few batches per thread balance the load without much overhead per file
+    num_batches = min(len(files), 4 * jobs)
+    size, extra = divmod(len(files), num_batches)
+    batches, start = [], 0
+    for i in range(num_batches):
+        end = start + size + (1 if i < extra else 0)
+        batches.append(list(files[start:end]))
+        start = end
+
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        futures = [executor.submit(fn, batch) for batch in batches]
+    return [path for future in futures for path in future.result() or []]
+
+
 @memoized
 def _patchelf() -> Optional[executable.Executable]:
     """Return the full path to the patchelf binary, if available, else None."""
@@ -324,6 +352,8 @@ def _set_elf_rpaths_and_interpreter(
 ) -> Optional[str]:
     """Replace the original RPATH of the target with the paths passed as arguments.
 
+    The file is rewritten in-process when possible, and with ``patchelf`` otherwise.
+
     Args:
         target: target executable. Must be an ELF object.
         rpaths: paths to be set in the RPATH
@@ -332,6 +362,26 @@ def _set_elf_rpaths_and_interpreter(
     Returns:
         A string concatenating the stdout and stderr of the call to ``patchelf`` if it was invoked
     """
+    try:
+        elf.set_rpath_and_interpreter(
+            target,
+            ":".join(rpaths).encode("utf-8"),
+            interpreter.encode("utf-8") if interpreter else None,
+        )
+        return None
+    except (elf.ElfParsingError, elf.ElfRewriteError) as e:
+        tty.debug(f"Cannot set the RPATH of {target} in-process, using patchelf: {e}")
+    return _patchelf_set_rpaths_and_interpreter(target, rpaths, interpreter)
+
+
+def _patchelf_set_rpaths_and_interpreter(
+    target: str,
+    rpaths: List[str],
+    interpreter: Optional[str] = None,
+    needed: Optional[Dict[str, str]] = None,
+) -> Optional[str]:
+    """Same as ``_set_elf_rpaths_and_interpreter``, but always with ``patchelf``, which can also
+    replace needed libraries, mapping the old ones to the new ones in ``needed``."""
     # Join the paths using ':' as a separator
     rpaths_str = ":".join(rpaths)
 
@@ -342,6 +392,8 @@ def _set_elf_rpaths_and_interpreter(
         args = ["--force-rpath", "--set-rpath", rpaths_str]
         if interpreter:
             args.extend(["--set-interpreter", interpreter])
+        for old, new in (needed or {}).items():
+            args.extend(["--replace-needed", old, new])
         args.append(target)
         return _patchelf()(*args, output=str, error=str)
     except executable.ProcessError as e:
@@ -460,27 +512,39 @@ def _transform_rpaths(orig_rpaths, orig_root, new_prefixes):
     return new_rpaths
 
 
-def new_relocate_elf_binaries(binaries, prefix_to_prefix):
+def new_relocate_elf_binaries(binaries, prefix_to_prefix, jobs: int = 1):
     """Take a list of binaries, and an ordered dictionary of
-    prefix to prefix mapping, and update the rpaths accordingly."""
+    prefix to prefix mapping, and update the rpaths, the interpreter and
+    the needed libraries given by absolute path accordingly. Binaries are
+    rewritten in-process, on up to ``jobs`` threads, and only fall back to
+    patchelf when there is no room in the file for longer strings."""
 
     # Transform to binary string
     prefix_to_prefix = OrderedDict(
         (k.encode("utf-8"), v.encode("utf-8")) for (k, v) in prefix_to_prefix.items()
     )
+    _map_in_batches(
+        lambda batch: _new_relocate_elf_binaries(batch, prefix_to_prefix), binaries, jobs
+    )
 
+
+def _new_relocate_elf_binaries(binaries, prefix_to_prefix):
     for path in binaries:
         try:
-            elf.substitute_rpath_and_pt_interp_in_place_or_raise(path, prefix_to_prefix)
+            elf.substitute_rpath_needed_and_pt_interp(path, prefix_to_prefix)
         except elf.ElfCStringUpdatesFailed as e:
-            # Fall back to `patchelf --set-rpath ... --set-interpreter ...`
-            rpaths = e.rpath.new_value.decode("utf-8").split(":") if e.rpath else []
+            # Fall back to `patchelf --set-rpath ... --set-interpreter ... --replace-needed ...`
+            if e.rpath:
+                rpaths = e.rpath.new_value.decode("utf-8").split(":")
+            else:
+                rpaths = elf.get_rpaths(path) or []
             interpreter = e.pt_interp.new_value.decode("utf-8") if e.pt_interp else None
-            _set_elf_rpaths_and_interpreter(path, rpaths=rpaths, interpreter=interpreter)
+            needed = {a.old_value.decode("utf-8"): a.new_value.decode("utf-8") for a in e.needed}
+            _patchelf_set_rpaths_and_interpreter(path, rpaths, interpreter, needed)
 
 
 def relocate_elf_binaries(
-    binaries, orig_root, new_root, new_prefixes, rel, orig_prefix, new_prefix
+    binaries, orig_root, new_root, new_prefixes, rel, orig_prefix, new_prefix, jobs: int = 1
 ):
     """Relocate the binaries passed as arguments by changing their RPATHs.
 
@@ -501,7 +565,20 @@ def relocate_elf_binaries(
         rel (bool): True if the RPATHs are relative, False if they are absolute
         orig_prefix (str): prefix where the executable was originally located
         new_prefix (str): prefix where we want to relocate the executable
+        jobs (int): maximum number of threads relocating binaries
     """
+    _map_in_batches(
+        lambda batch: _relocate_elf_binaries(
+            batch, orig_root, new_root, new_prefixes, rel, orig_prefix, new_prefix
+        ),
+        binaries,
+        jobs,
+    )
+
+
+def _relocate_elf_binaries(
+    binaries, orig_root, new_root, new_prefixes, rel, orig_prefix, new_prefix
+):
     for new_binary in binaries:
         orig_rpaths = _elf_rpaths_for(new_binary)
         # TODO: Can we deduce `rel` from the original RPATHs?
@@ -594,7 +671,30 @@ def relocate_links(links, prefix_to_prefix):
         symlink(new_target, link)
 
 
-def relocate_text(files, prefixes):
+def _apply_at_recorded_offsets(replacer, files, offsets):
+    """Apply the replacer to files, only at the offsets recorded for them by
+    ``relocation_offsets``, and return the files that were modified. Files without offsets,
+    or whose offsets are stale, are scanned instead."""
+    if replacer.is_noop:
+        return []
+    changed_files = []
+    for path in files:
+        modified = None
+        entry = offsets.get(path)
+        if entry is not None:
+            modified = replacer.apply_at_offsets(
+                path, entry["size"], entry["offsets"], entry.get("elf_strings", ())
+            )
+            if modified is None:
+                tty.debug(f"Relocation offsets of {path} are stale, scanning the file instead")
+        if modified is None:
+            modified = replacer.apply_to_filename(path)
+        if modified:
+            changed_files.append(path)
+    return changed_files
+
+
+def relocate_text(files, prefixes, jobs: int = 1, offsets: Optional[Dict[str, Dict]] = None):
     """Relocate text file from the original installation prefix to the
     new prefix.
 
@@ -603,11 +703,19 @@ def relocate_text(files, prefixes):
     Args:
         files (list): Text files to be relocated
         prefixes (OrderedDict): String prefixes which need to be changed
+        jobs (int): maximum number of threads relocating files
+        offsets (dict): offsets of the prefixes in the files, by absolute path, as recorded by
+            ``relocation_offsets``. Files that are not in there are scanned for prefixes.
     """
-    TextFilePrefixReplacer.from_strings_or_bytes(prefixes).apply(files)
+    replacer = TextFilePrefixReplacer.from_strings_or_bytes(prefixes)
+    _map_in_batches(
+        lambda batch: _apply_at_recorded_offsets(replacer, batch, offsets or {}), files, jobs
+    )
 
 
-def relocate_text_bin(binaries, prefixes):
+def relocate_text_bin(
+    binaries, prefixes, jobs: int = 1, offsets: Optional[Dict[str, Dict]] = None
+):
     """Replace null terminated path strings hard-coded into binaries.
 
     The new install prefix must be shorter than the original one.
@@ -615,11 +723,81 @@ def relocate_text_bin(binaries, prefixes):
     Args:
         binaries (list): binaries to be relocated
         prefixes (OrderedDict): String prefixes which need to be changed.
+        jobs (int): maximum number of threads relocating binaries
+        offsets (dict): offsets of the prefixes in the binaries, by absolute path, as recorded
+            by ``relocation_offsets``. Binaries that are not in there are scanned for prefixes.
+
+    Returns:
+        list: the binaries that were modified, in the order they were passed
 
     Raises:
       spack.relocate_text.BinaryTextReplaceError: when the new path is longer than the old path
     """
-    return BinaryFilePrefixReplacer.from_strings_or_bytes(prefixes).apply(binaries)
+    replacer = BinaryFilePrefixReplacer.from_strings_or_bytes(prefixes)
+    return _map_in_batches(
+        lambda batch: _apply_at_recorded_offsets(replacer, batch, offsets or {}), binaries, jobs
+    )
+
+
+def _elf_strings_with_prefixes(path, prefixes):
+    """Return the (offset, length) of the RPATH and PT_INTERP strings of an ELF file that
+    start with one of the prefixes, as they are rewritten by ``new_relocate_elf_binaries``."""
+    regex = re.compile(b"|".join(re.escape(p) for p in prefixes))
+    try:
+        with open(path, "rb") as f:
+            parsed = elf.parse_elf(f, interpreter=True, dynamic_section=True)
+    except elf.ElfParsingError:
+        return []
+
+    strings = []
+    if parsed.has_rpath and any(regex.match(p) for p in parsed.dt_rpath_str.split(b":")):
+        offset = parsed.pt_dynamic_strtab_offset + parsed.rpath_strtab_offset
+        strings.append([offset, len(parsed.dt_rpath_str)])
+    if parsed.has_pt_interp and regex.match(parsed.pt_interp_str):
+        strings.append([parsed.pt_interp_p_offset, len(parsed.pt_interp_str)])
+    return strings
+
+
+def relocation_offsets(root, text_files, binaries, text_prefixes, binary_prefixes):
+    """Record where the prefixes to be relocated occur in the text files and binaries of an
+    install prefix, so that relocation can patch them without scanning the files.
+
+    Args:
+        root (str): directory the files are relative to
+        text_files (list): relative paths of the text files
+        binaries (list): relative paths of the binaries
+        text_prefixes (list): prefixes relocated in text files, in the order they are matched
+        binary_prefixes (list): prefixes relocated in binaries, in the order they are matched
+
+    Returns:
+        dict: for each file, its size, the offsets of the matches of the prefixes and, for
+        ELF binaries, the (offset, length) of the RPATH and PT_INTERP strings that start with
+        one of the prefixes.
+    """
+    # Only the old prefixes are needed to find their matches
+    text_replacer = TextFilePrefixReplacer.from_strings_or_bytes(
+        OrderedDict((p, b"") for p in text_prefixes)
+    )
+    binary_replacer = BinaryFilePrefixReplacer.from_strings_or_bytes(
+        OrderedDict((p, b"") for p in binary_prefixes)
+    )
+    encoded_prefixes = [p.encode("utf-8") for p in binary_prefixes]
+
+    offsets = {}
+    for rel_path in text_files:
+        path = os.path.join(root, rel_path)
+        offsets[rel_path] = {
+            "size": os.path.getsize(path),
+            "offsets": text_replacer.find_offsets(path),
+        }
+    for rel_path in binaries:
+        path = os.path.join(root, rel_path)
+        offsets[rel_path] = {
+            "size": os.path.getsize(path),
+            "offsets": binary_replacer.find_offsets(path),
+            "elf_strings": _elf_strings_with_prefixes(path, encoded_prefixes),
+        }
+    return offsets
 
 
 def is_binary(filename):
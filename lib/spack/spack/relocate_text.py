@@ -6,9 +6,10 @@
 """This module contains pure-Python classes and functions for replacing
 paths inside text files and binaries."""
 
+import os
 import re
 from collections import OrderedDict
-from typing import Dict, Union
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 import spack.error
 
@@ -96,6 +97,42 @@ def apply_to_file(self, f):
             return False
         return self._apply_to_file(f)
 
+    def find_offsets(self, filename) -> List[int]:
+        """Returns the offsets in the file of the matches that ``apply`` would replace, which
+        can be passed to ``apply_at_offsets`` later on."""
+        if self.is_noop:
+            return []
+        with open(filename, "rb") as f:
+            return self._find_offsets(f)
+
+    def apply_at_offsets(
+        self,
+        filename,
+        size: int,
+        offsets: Sequence[int],
+        rewritten: Sequence[Tuple[int, int]] = (),
+    ) -> Optional[bool]:
+        """Like ``apply_to_filename``, but only replaces the matches at the given offsets, as
+        returned by ``find_offsets`` when the file had the given size.
+
+        The offsets are verified before the file is modified. Returns None and leaves the file
+        untouched if they are stale: the size of the file differs, or there is no match at one
+        of the offsets. Offsets in one of the ``rewritten`` (offset, length) ranges may not
+        match anymore, because those bytes were already relocated by other means, and are
+        skipped instead."""
+        if self.is_noop:
+            return False
+        with open(filename, "rb+") as f:
+            if os.fstat(f.fileno()).st_size != size:
+                return None
+            return self._apply_at_offsets(f, offsets, rewritten)
+
+    def _find_offsets(self, f) -> List[int]:
+        raise NotImplementedError("must be implemented by derived classes")
+
+    def _apply_at_offsets(self, f, offsets, rewritten) -> Optional[bool]:
+        raise NotImplementedError("must be implemented by derived classes")
+
 
 class TextFilePrefixReplacer(PrefixReplacer):
     """This class applies prefix to prefix mappings for relocation
@@ -122,9 +159,8 @@ def from_strings_or_bytes(
     def _apply_to_file(self, f):
         """Text replacement implementation simply reads the entire file
         in memory and applies the combined regex."""
-        replacement = lambda m: m.group(1) + self.prefix_to_prefix[m.group(2)] + m.group(3)
         data = f.read()
-        new_data = re.sub(self.regex, replacement, data)
+        new_data = re.sub(self.regex, self._replacement, data)
         if id(data) == id(new_data):
             return False
         f.seek(0)
@@ -132,19 +168,54 @@ def _apply_to_file(self, f):
         f.truncate()
         return True
 
+    def _find_offsets(self, f) -> List[int]:
+        return [match.start() for match in self.regex.finditer(f.read())]
+
+    def _apply_at_offsets(self, f, offsets, rewritten) -> Optional[bool]:
+        data = f.read()
+        pieces: List[bytes] = []
+        end = 0
+        for offset in offsets:
+            match = self.regex.match(data, offset)
+            if match is None or offset < end:
+                return None
+            pieces.extend((data[end:offset], self._replacement(match)))
+            end = match.end()
+        if not pieces:
+            return False
+        pieces.append(data[end:])
+        f.seek(0)
+        f.write(b"".join(pieces))
+        f.truncate()
+        return True
+
+    def _replacement(self, match) -> bytes:
+        return match.group(1) + self.prefix_to_prefix[match.group(2)] + match.group(3)
+
 
 class BinaryFilePrefixReplacer(PrefixReplacer):
-    def __init__(self, prefix_to_prefix, suffix_safety_size=7):
+    #: Size of the blocks in which binaries are read
+    chunk_size = 1 << 20
+
+    def __init__(self, prefix_to_prefix, suffix_safety_size=7, chunk_size=None):
         """
         prefix_to_prefix (OrderedDict): OrderedDictionary where the keys are
             bytes representing the old prefixes and the values are the new
         suffix_safety_size (int): in case of null terminated strings, what size
             of the suffix should remain to avoid aliasing issues?
+        chunk_size (int): size of the blocks in which files are read, or None for the default
         """
         assert suffix_safety_size >= 0
         super().__init__(prefix_to_prefix)
         self.suffix_safety_size = suffix_safety_size
+        if chunk_size is not None:
+            assert chunk_size > 0
+            self.chunk_size = chunk_size
         self.regex = self.binary_text_regex(self.prefix_to_prefix.keys(), suffix_safety_size)
+        #: Longest possible match: the longest prefix, the lookahead window and a null byte
+        self.max_match_size = (
+            max((len(p) for p in self.prefix_to_prefix), default=0) + suffix_safety_size + 1
+        )
 
     @classmethod
     def binary_text_regex(cls, binary_prefixes, suffix_safety_size=7):
@@ -197,6 +268,11 @@ def _apply_to_file(self, f):
         sufficiently short (typically the case when going from large padding -> normal path)
         If the replacement string is longer, or all of the above fails, we error out.
 
+        The file is read in chunks of ``chunk_size`` bytes, so that memory use doesn't depend on
+        the size of the file. The last ``max_match_size - 1`` bytes of a chunk are scanned again
+        with the next chunk, so that matches across chunk boundaries, and their lookahead window,
+        are the same as if the file was scanned at once.
+
         Arguments:
             f: file opened in rb+ mode
 
@@ -205,58 +281,105 @@ def _apply_to_file(self, f):
         """
         assert f.tell() == 0
 
-        # We *could* read binary data in chunks to avoid loading all in memory,
-        # but it's nasty to deal with matches across boundaries, so let's stick to
-        # something simple.
-
         modified = True
 
-        for match in self.regex.finditer(f.read()):
-            # The matching prefix (old) and its replacement (new)
-            old = match.group(1)
-            new = self.prefix_to_prefix[old]
-
-            # Did we find a trailing null within a N + 1 bytes window after the prefix?
-            null_terminated = match.end(0) > match.end(1)
-
-            # Suffix string length, excluding the null byte
-            # Only makes sense if null_terminated
-            suffix_strlen = match.end(0) - match.end(1) - 1
-
-            # How many bytes are we shrinking our string?
-            bytes_shorter = len(old) - len(new)
-
-            # We can't make strings larger.
-            if bytes_shorter < 0:
-                raise CannotGrowString(old, new)
-
-            # If we don't know whether this is a null terminated C-string (we're looking
-            # only N + 1 bytes ahead), or if it is and we have a common suffix, we can
-            # simply pad with leading dir separators.
-            elif (
-                not null_terminated
-                or suffix_strlen >= self.suffix_safety_size  # == is enough, but let's be defensive
-                or old[-self.suffix_safety_size + suffix_strlen :]
-                == new[-self.suffix_safety_size + suffix_strlen :]
-            ):
-                replacement = b"/" * bytes_shorter + new
-
-            # If it *was* null terminated, all that matters is that we can leave N bytes
-            # of old suffix in place. Note that > is required since we also insert an
-            # additional null terminator.
-            elif bytes_shorter > self.suffix_safety_size:
-                replacement = new + match.group(2)  # includes the trailing null
-
-            # Otherwise... we can't :(
-            else:
-                raise CannotShrinkCString(old, new, match.group()[:-1])
-
-            f.seek(match.start())
-            f.write(replacement)
-            modified = True
+        for offset, match in self._matches(f):
+            f.seek(offset + match.start())
+            f.write(self._replacement(match))
 
         return modified
 
+    def _matches(self, f):
+        """Yield the matches of the prefixes in a file, read in chunks, together with the file
+        offset of the buffer they were found in."""
+        # File offset of the start of the buffer, and position in the buffer where the next
+        # match may start
+        offset, start = 0, 0
+        buffer = b""
+        eof = False
+        while not eof:
+            f.seek(offset + len(buffer))
+            data = f.read(self.chunk_size)
+            eof = not data
+            buffer += data
+
+            # Only matches starting early enough have all their lookahead window in the buffer
+            limit = len(buffer) if eof else len(buffer) - self.max_match_size + 1
+            for match in self.regex.finditer(buffer, start):
+                if match.start() >= limit:
+                    break
+                yield offset, match
+                start = match.end()
+
+            start = max(start, limit)
+            offset += start
+            buffer, start = buffer[start:], 0
+
+    def _find_offsets(self, f) -> List[int]:
+        return [offset + match.start() for offset, match in self._matches(f)]
+
+    def _apply_at_offsets(self, f, offsets, rewritten) -> Optional[bool]:
+        # A match and its lookahead window are at most max_match_size bytes long, so reading
+        # that much at an offset gives the same match as scanning the whole file
+        replacements, end = [], 0
+        for offset in offsets:
+            f.seek(offset)
+            match = self.regex.match(f.read(self.max_match_size))
+            if match is None and any(start <= offset < start + n for start, n in rewritten):
+                continue
+            if match is None or offset < end:
+                return None
+            replacements.append((offset, self._replacement(match)))
+            end = offset + match.end()
+
+        for offset, data in replacements:
+            f.seek(offset)
+            f.write(data)
+
+        return True
+
+    def _replacement(self, match) -> bytes:
+        """Return the bytes replacing a match of a prefix in a binary, which are written at the
+        start of the match."""
+        # The matching prefix (old) and its replacement (new)
+        old = match.group(1)
+        new = self.prefix_to_prefix[old]
+
+        # Did we find a trailing null within a N + 1 bytes window after the prefix?
+        null_terminated = match.end(0) > match.end(1)
+
+        # Suffix string length, excluding the null byte
+        # Only makes sense if null_terminated
+        suffix_strlen = match.end(0) - match.end(1) - 1
+
+        # How many bytes are we shrinking our string?
+        bytes_shorter = len(old) - len(new)
+
+        # We can't make strings larger.
+        if bytes_shorter < 0:
+            raise CannotGrowString(old, new)
+
+        # If we don't know whether this is a null terminated C-string (we're looking
+        # only N + 1 bytes ahead), or if it is and we have a common suffix, we can
+        # simply pad with leading dir separators.
+        elif (
+            not null_terminated
+            or suffix_strlen >= self.suffix_safety_size  # == is enough, but let's be defensive
+            or old[-self.suffix_safety_size + suffix_strlen :]
+            == new[-self.suffix_safety_size + suffix_strlen :]
+        ):
+            return b"/" * bytes_shorter + new
+
+        # If it *was* null terminated, all that matters is that we can leave N bytes
+        # of old suffix in place. Note that > is required since we also insert an
+        # additional null terminator.
+        elif bytes_shorter > self.suffix_safety_size:
+            return new + match.group(2)  # includes the trailing null
+
+        # Otherwise... we can't :(
+        else:
+            raise CannotShrinkCString(old, new, match.group()[:-1])
+
 
 class BinaryStringReplacementError(spack.error.SpackError):
     def __init__(self, file_path, old_len, new_len):
@@ -41,9 +41,11 @@
 import spack.provider_index
 import spack.spec
 import spack.tag
+import spack.util.cpus
 import spack.util.file_cache
 import spack.util.git
 import spack.util.naming as nm
+import spack.util.parallel
 import spack.util.path
 import spack.util.spack_yaml as syaml
 
@@ -501,9 +503,21 @@ def needs_update(self, pkg):
     def read(self, stream):
         """Read this index from a provided file object."""
 
-    @abc.abstractmethod
     def update(self, pkg_fullname):
         """Update the index in memory with information about a package."""
+        self.merge(pkg_fullname, self.extract(pkg_fullname))
+
+    @abc.abstractmethod
+    def extract(self, pkg_fullname) -> Any:
+        """Return the information about a package needed to update the index.
+
+        This method may be called in a worker process, on an indexer without an index, so it
+        must not modify the indexer, and its result must be picklable.
+        """
+
+    @abc.abstractmethod
+    def merge(self, pkg_fullname, data) -> None:
+        """Update the index in memory with information returned by ``extract()``."""
 
     @abc.abstractmethod
     def write(self, stream):
@@ -519,8 +533,12 @@ def _create(self):
     def read(self, stream):
         self.index = spack.tag.TagIndex.from_json(stream, self.repository)
 
-    def update(self, pkg_fullname):
-        self.index.update_package(pkg_fullname.split(".")[-1])
+    def extract(self, pkg_fullname):
+        pkg_cls = self.repository.get_pkg_class(pkg_fullname.split(".")[-1])
+        return pkg_cls.name, list(getattr(pkg_cls, "tags", []))
+
+    def merge(self, pkg_fullname, data):
+        self.index.update_package_tags(*data)
 
     def write(self, stream):
         self.index.to_json(stream)
@@ -535,15 +553,24 @@ def _create(self):
     def read(self, stream):
         self.index = spack.provider_index.ProviderIndex.from_json(stream, self.repository)
 
-    def update(self, pkg_fullname):
+    def extract(self, pkg_fullname):
         name = pkg_fullname.split(".")[-1]
         is_virtual = (
             not self.repository.exists(name) or self.repository.get_pkg_class(name).virtual
         )
         if is_virtual:
+            return None
+        partial_index = spack.provider_index.ProviderIndex(repository=self.repository)
+        partial_index.update(pkg_fullname)
+        return partial_index.providers
+
+    def merge(self, pkg_fullname, data):
+        if data is None:
             return
+        partial_index = spack.provider_index.ProviderIndex(repository=self.repository)
+        partial_index.providers = data
         self.index.remove_provider(pkg_fullname)
-        self.index.update(pkg_fullname)
+        self.index.merge(partial_index)
 
     def write(self, stream):
         self.index.to_json(stream)
@@ -568,8 +595,30 @@ def read(self, stream):
     def write(self, stream):
         self.index.to_json(stream)
 
-    def update(self, pkg_fullname):
-        self.index.update_package(pkg_fullname)
+    def extract(self, pkg_fullname):
+        pkg_cls = self.repository.get_pkg_class(pkg_fullname)
+        return spack.patch.PatchCache._index_patches(pkg_cls, self.repository)
+
+    def merge(self, pkg_fullname, data):
+        self.index.update_package_patches(pkg_fullname, data)
+
+
+def _extract_index_data(
+    repository: "RepoType", namespace: str, tasks: List[Tuple[str, Type[Indexer], str]]
+) -> List[Tuple[str, str, Any]]:
+    """Worker function extracting index data for packages in a repository.
+
+    Takes a list of (index name, indexer class, package fullname) tuples, and returns a list of
+    (index name, package fullname, data) tuples. The repository can be a RepoPath, which is
+    needed to import package modules, in which case the repo with the given namespace is used.
+    """
+    if isinstance(repository, RepoPath):
+        repository = repository.get_repo(namespace)
+    indexers = {indexer_cls: indexer_cls(repository) for _, indexer_cls, _ in tasks}
+    return [
+        (name, pkg_fullname, indexers[indexer_cls].extract(pkg_fullname))
+        for name, indexer_cls, pkg_fullname in tasks
+    ]
 
 
 class RepoIndex:
@@ -586,6 +635,9 @@ class RepoIndex:
 
     Generated indexes are accessed by name via ``__getitem__()``."""
 
+    #: Minimum number of package updates before package classes are loaded in worker processes
+    CONCURRENT_UPDATE_THRESHOLD = 64
+
     def __init__(
         self,
         package_checker: FastPackageChecker,
@@ -629,14 +681,84 @@ def _build_all_indexes(self):
         can take tens of seconds to regenerate sequentially, and we'd
         rather only pay that cost once rather than on several
         invocations."""
+        extracted = self._extract_concurrently()
         for name, indexer in self.indexers.items():
-            self.indexes[name] = self._build_index(name, indexer)
+            self.indexes[name] = self._build_index(name, indexer, extracted.get(name, {}))
 
-    def _build_index(self, name: str, indexer: Indexer):
-        """Determine which packages need an update, and update indexes."""
+    def _cache_filename(self, name: str) -> str:
+        # Filename of the index cache (we assume they're all json)
+        return f"{name}/{self.namespace}-index.json"
 
-        # Filename of the provider index cache (we assume they're all json)
-        cache_filename = f"{name}/{self.namespace}-index.json"
+    def _extract_concurrently(self) -> Dict[str, Dict[str, Any]]:
+        """Extract the data needed to update indexes in worker processes, if many packages need
+        an update, e.g. when indexes are built from scratch.
+
+        Returns, for each index name, the data extracted for each package fullname. Packages
+        whose data could not be extracted are missing, and are updated in this process.
+        """
+        packages: Dict[str, List[str]] = {}
+        for name in self.indexers:
+            index_mtime = self.cache.mtime(self._cache_filename(name))
+            for pkg_name in self.checker.modified_since(index_mtime):
+                packages.setdefault(f"{self.namespace}.{pkg_name}", []).append(name)
+
+        extracted: Dict[str, Dict[str, Any]] = {name: {} for name in self.indexers}
+        if sum(len(names) for names in packages.values()) < self.CONCURRENT_UPDATE_THRESHOLD:
+            return extracted
+
+        jobs = spack.util.cpus.cpus_available()
+        if jobs < 2:
+            return extracted
+
+        executor = spack.util.parallel.make_concurrent_executor(jobs)
+        if isinstance(executor, spack.util.parallel.SequentialExecutor):
+            return extracted
+
+        # Indexers are recreated in worker processes, without their index. Workers need the list
+        # of repositories the repo belongs to, if any, to import package modules.
+        repositories = {
+            id(indexer.repository): indexer.repository for indexer in self.indexers.values()
+        }
+        if len(repositories) != 1:
+            return extracted
+        repository = next(iter(repositories.values()))
+        if isinstance(repository, Repo) and repository._finder is not None:
+            repository = repository._finder
+
+        # Tasks for the same package are in the same chunk, so that each package class is loaded
+        # only once.
+        tasks = [
+            (name, type(self.indexers[name]), pkg_fullname)
+            for pkg_fullname, names in packages.items()
+            for name in names
+        ]
+        chunk_size = max(1, len(tasks) // (4 * jobs))
+        extract = spack.util.parallel.Task(_extract_index_data)
+        with executor:
+            futures = [
+                executor.submit(extract, repository, self.namespace, tasks[i : i + chunk_size])
+                for i in range(0, len(tasks), chunk_size)
+            ]
+            for future in futures:
+                results = future.result()
+                if isinstance(results, spack.util.parallel.ErrorFromWorker):
+                    # Errors are raised again when packages are updated in this process
+                    tty.debug(f"Could not extract index data in a worker process: {results}")
+                    continue
+                for name, pkg_fullname, data in results:
+                    extracted[name][pkg_fullname] = data
+
+        return extracted
+
+    def _build_index(self, name: str, indexer: Indexer, extracted: Dict[str, Any]):
+        """Determine which packages need an update, and update indexes.
+
+        Args:
+            name: name of the index
+            indexer: indexer for the index
+            extracted: data already extracted for some packages, keyed by package fullname
+        """
+        cache_filename = self._cache_filename(name)
 
         # Compute which packages needs to be updated in the cache
         index_mtime = self.cache.mtime(cache_filename)
@@ -660,7 +782,11 @@ def _build_index(self, name: str, indexer: Indexer):
                     needs_update = self.checker.modified_since(new_index_mtime)
 
                 for pkg_name in needs_update:
-                    indexer.update(f"{self.namespace}.{pkg_name}")
+                    pkg_fullname = f"{self.namespace}.{pkg_name}"
+                    if pkg_fullname in extracted:
+                        indexer.merge(pkg_fullname, extracted[pkg_fullname])
+                    else:
+                        indexer.update(pkg_fullname)
 
                 indexer.write(new)
 
@@ -881,6 +1007,11 @@ def get_pkg_class(self, pkg_name: str) -> Type["spack.package_base.PackageBase"]
         """Find a class for the spec's package and return the class object."""
         return self.repo_for_pkg(pkg_name).get_pkg_class(pkg_name)
 
+    def get_pkg_metadata(self, pkg_name: str) -> "spack.package_metadata.PackageMetadataType":
+        """Get the data defined by directives for a package, reading it from the package
+        metadata cache when possible."""
+        return self.repo_for_pkg(pkg_name).get_pkg_metadata(pkg_name)
+
     @autospec
     def dump_provenance(self, spec, path):
         """Dump provenance information for a spec to a particular path.
@@ -930,7 +1061,7 @@ def is_virtual_safe(self, pkg_name: str) -> bool:
             pkg_name (str): name of the package we want to check
         """
         have_name = self._have_name(pkg_name)
-        return have_name and (not self.exists(pkg_name) or self.get_pkg_class(pkg_name).virtual)
+        return have_name and (not self.exists(pkg_name) or self.get_pkg_metadata(pkg_name).virtual)
 
     def __contains__(self, pkg_name):
         return self.exists(pkg_name)
@@ -1027,6 +1158,9 @@ def check(condition, msg):
         self._repo_index: Optional[RepoIndex] = None
         self._cache = cache
 
+        # Cache of the directive data of packages, created lazily
+        self._metadata_cache: Optional["spack.package_metadata.PackageMetadataCache"] = None
+
     def finder(self, value: RepoPath) -> None:
         self._finder = value
 
@@ -1258,7 +1392,7 @@ def is_virtual_safe(self, pkg_name: str) -> bool:
 
         This function doesn't use the provider index.
         """
-        return not self.exists(pkg_name) or self.get_pkg_class(pkg_name).virtual
+        return not self.exists(pkg_name) or self.get_pkg_metadata(pkg_name).virtual
 
     def get_pkg_class(self, pkg_name: str) -> Type["spack.package_base.PackageBase"]:
         """Get the class for the package out of its module.
@@ -1316,6 +1450,25 @@ def get_pkg_class(self, pkg_name: str) -> Type["spack.package_base.PackageBase"]
 
         return cls
 
+    def get_pkg_metadata(self, pkg_name: str) -> "spack.package_metadata.PackageMetadataType":
+        """Get the data defined by directives for a package, without loading its class if it
+        is in the package metadata cache.
+
+        The package class is returned if it is already loaded, if it has configuration
+        overrides, or if its directive data cannot be cached.
+        """
+        import spack.package_metadata  # break cycle
+
+        namespace, pkg_name = self.partition_package_name(pkg_name)
+        if pkg_name in self.overrides or f"{self.full_namespace}.{pkg_name}" in sys.modules:
+            return self.get_pkg_class(pkg_name)
+
+        if self._metadata_cache is None:
+            self._metadata_cache = spack.package_metadata.PackageMetadataCache(
+                self._cache, self.namespace
+            )
+        return self._metadata_cache.get(pkg_name, self.get_pkg_class)
+
     def partition_package_name(self, pkg_name: str) -> Tuple[str, str]:
         namespace, pkg_name = partition_package_name(pkg_name)
         if namespace and (namespace != self.namespace):
@@ -71,6 +71,7 @@
             "license_dir": {"type": "string"},
             "source_cache": {"type": "string"},
             "misc_cache": {"type": "string"},
+            "build_history": {"type": "string"},
             "environments_root": {"type": "string"},
             "connect_timeout": {"type": "integer", "minimum": 0},
             "verify_ssl": {"type": "boolean"},
@@ -83,8 +84,13 @@
             "dirty": {"type": "boolean"},
             "build_language": {"type": "string"},
             "build_jobs": {"type": "integer", "minimum": 1},
+            "concurrent_packages": {"type": "integer", "minimum": 1},
+            "binary_prefetch_jobs": {"type": "integer", "minimum": 0},
+            "relocation_jobs": {"type": "integer", "minimum": 1},
             "ccache": {"type": "boolean"},
             "db_lock_timeout": {"type": "integer", "minimum": 1},
+            "db_format": {"type": "string", "enum": ["json", "binary"]},
+            "db_journal": {"type": "boolean"},
             "package_lock_timeout": {
                 "anyOf": [{"type": "integer", "minimum": 1}, {"type": "null"}]
             },
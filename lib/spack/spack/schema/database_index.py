@@ -37,6 +37,7 @@
                 },
             },
             "version": {"type": "string"},
+            "snapshot": {"type": "string"},
         },
     }
 }
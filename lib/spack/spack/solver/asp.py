@@ -2,12 +2,14 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import atexit
 import collections
 import collections.abc
 import copy
 import enum
 import functools
 import itertools
+import json
 import os
 import pathlib
 import pprint
@@ -27,6 +29,7 @@
 
 import spack
 import spack.binary_distribution
+import spack.caches
 import spack.compiler
 import spack.compilers
 import spack.concretize
@@ -34,7 +37,9 @@
 import spack.deptypes as dt
 import spack.environment as ev
 import spack.error
+import spack.hash_types as ht
 import spack.package_base
+import spack.package_metadata
 import spack.package_prefs
 import spack.platforms
 import spack.repo
@@ -63,8 +68,10 @@
     fn,
     parse_files,
     parse_term,
+    program_builder,
 )
 from .counter import FullDuplicatesCounter, MinimalDuplicatesCounter, NoDuplicatesCounter
+from .facts_cache import FactsCache, LocalId, RenderedFact, render_fact, replay
 from .version_order import concretization_version_order
 
 GitOrStandardVersion = Union[spack.version.GitVersion, spack.version.StandardVersion]
@@ -789,6 +796,53 @@ def __hash__(self):
         return hash(self._key())
 
 
+#: Statements of the logic programs shipped with Spack, by file name
+_LOGIC_PROGRAMS: Dict[str, List] = {}
+
+# Statements must be released before the clingo library is unloaded at exit
+atexit.register(_LOGIC_PROGRAMS.clear)
+
+
+def _parsed_logic_program(name: str) -> List:
+    """Return the statements of one of the logic programs shipped with Spack.
+
+    Programs are parsed once per process, and the same statements are added to the control
+    object of every solve.
+    """
+    if name not in _LOGIC_PROGRAMS:
+        statements: List = []
+        parse_files([os.path.join(os.path.dirname(__file__), name)], statements.append)
+        _LOGIC_PROGRAMS[name] = statements
+    return _LOGIC_PROGRAMS[name]
+
+
+def _load_logic_programs(control, names: List[str]) -> None:
+    """Add the statements of some of the logic programs shipped with Spack to a control
+    object.
+    """
+    with program_builder(control) as builder:
+        for name in names:
+            for statement in _parsed_logic_program(name):
+                builder.add(statement)
+
+
+@llnl.util.lang.memoized
+def _internal_error_messages() -> tuple:
+    """Return the messages of the internal errors in ``concretize.lp``."""
+    messages = []
+    for node in _parsed_logic_program("concretize.lp"):
+        if ast_type(node) != clingo().ast.ASTType.Rule:
+            continue
+        for term in node.body:
+            if ast_type(term) != clingo().ast.ASTType.Literal:
+                continue
+            if ast_type(term.atom) != clingo().ast.ASTType.SymbolicAtom:
+                continue
+            if ast_sym(term.atom).name == "internal_error":
+                messages.append(ast_sym(ast_sym(term.atom).arguments[0]).string)
+    return tuple(messages)
+
+
 class PyclingoDriver:
     def __init__(self, cores=True):
         """Driver for the Python clingo interface.
@@ -845,21 +899,19 @@ def solve(self, setup, specs, reuse=None, output=None, control=None, allow_depre
         timer.start("load")
         # Add the problem instance
         self.control.add("base", [], asp_problem)
-        # Load the file itself
-        parent_dir = os.path.dirname(__file__)
-        self.control.load(os.path.join(parent_dir, "concretize.lp"))
-        self.control.load(os.path.join(parent_dir, "heuristic.lp"))
-        self.control.load(os.path.join(parent_dir, "display.lp"))
+        # Load the logic programs, which are parsed only once per process
+        programs = ["concretize.lp", "heuristic.lp", "display.lp"]
         if not setup.concretize_everything:
-            self.control.load(os.path.join(parent_dir, "when_possible.lp"))
+            programs.append("when_possible.lp")
 
         # Binary compatibility is based on libc on Linux, and on the os tag elsewhere
         if using_libc_compatibility():
-            self.control.load(os.path.join(parent_dir, "libc_compatibility.lp"))
+            programs.append("libc_compatibility.lp")
         else:
-            self.control.load(os.path.join(parent_dir, "os_compatibility.lp"))
+            programs.append("os_compatibility.lp")
         if setup.enable_splicing:
-            self.control.load(os.path.join(parent_dir, "splices.lp"))
+            programs.append("splices.lp")
+        _load_logic_programs(self.control, programs)
 
         timer.stop("load")
 
@@ -1183,6 +1235,13 @@ def __init__(self, tests: bool = False):
         # Set during the call to setup
         self.pkgs: Set[str] = set()
         self.explicitly_required_namespaces: Dict[str, str] = {}
+        self._pkg_metadata: Dict[str, "spack.package_metadata.PackageMetadataType"] = {}
+        self._pkg_fingerprints: Dict[str, Optional[str]] = {}
+
+        # Cache of the facts generated from package directives, and the packages whose
+        # directives are used while recording facts for the cache
+        self._facts_cache: Optional[FactsCache] = None
+        self._consulted_packages: Optional[Set[str]] = None
 
         # list of unique libc specs targeted by compilers (or an educated guess if no compiler)
         self.libcs: List[spack.spec.Spec] = []
@@ -1202,7 +1261,7 @@ def key_fn(version):
             return version.origin, version.idx
 
         if isinstance(pkg, str):
-            pkg = self.pkg_class(pkg)
+            pkg = self.pkg_metadata(pkg)
 
         declared_versions = self.declared_versions[pkg.name]
         partially_sorted_versions = sorted(set(declared_versions), key=key_fn)
@@ -1336,7 +1395,7 @@ def package_requirement_rules(self, pkg):
         self.emit_facts_from_requirement_rules(parser.rules(pkg))
 
     def pkg_rules(self, pkg, tests):
-        pkg = self.pkg_class(pkg)
+        pkg = self.pkg_metadata(pkg)
 
         # Namespace of the package
         self.gen.fact(fn.pkg_fact(pkg.name, fn.namespace(pkg.namespace)))
@@ -1345,6 +1404,68 @@ def pkg_rules(self, pkg, tests):
         self.pkg_version_rules(pkg)
         self.gen.newline()
 
+        # languages, variants, conflicts, virtuals, dependencies and splices
+        self.package_directive_rules(pkg)
+
+        # virtual preferences
+        self.virtual_preferences(
+            pkg.name,
+            lambda v, p, i: self.gen.fact(fn.pkg_fact(pkg.name, fn.provider_preference(v, p, i))),
+        )
+
+        self.package_requirement_rules(pkg)
+
+        # trigger and effect tables
+        self.trigger_rules()
+        self.effect_rules()
+
+    def package_directive_rules(self, pkg):
+        """Output the facts derived from the directives of a package.
+
+        These facts only depend on the package, and on a few properties of the problem, so
+        they are replayed from the facts cache when possible.
+        """
+        key = self._directive_rules_key(pkg)
+        if key is None:
+            self._directive_rules(pkg)
+            return
+
+        if self._facts_cache is None:
+            self._facts_cache = FactsCache(spack.caches.MISC_CACHE)
+
+        entry = self._facts_cache.get(pkg.namespace, pkg.name, key)
+        if entry is None or any(
+            self.pkg_fingerprint(self.pkg_metadata(name)) != fingerprint
+            for name, fingerprint in entry["consulted"].items()
+        ):
+            consulted, facts = self._record_directive_rules(pkg)
+            if all(isinstance(x, str) for x in consulted.values()):
+                self._facts_cache.put(pkg.namespace, pkg.name, key, consulted, facts)
+        else:
+            facts = entry["facts"]
+
+        self._replay_directive_rules(pkg, facts)
+
+    def _directive_rules_key(self, pkg) -> Optional[dict]:
+        """Properties of a package, and of the problem, that the facts derived from its
+        directives depend on. Returns None if the facts cannot be cached.
+        """
+        fingerprint = self.pkg_fingerprint(pkg)
+        if fingerprint is None:
+            return None
+
+        tests = self.tests is True or (not isinstance(self.tests, bool) and pkg.name in self.tests)
+        return {
+            "package": fingerprint,
+            "tests": tests,
+            "splicing": self.enable_splicing,
+            "virtuals": sorted(set(pkg.provided_virtual_names()) & self.possible_virtuals),
+            "virtual_dependencies": sorted(
+                name for name in pkg.dependency_names() if spack.repo.PATH.is_virtual(name)
+            ),
+        }
+
+    def _directive_rules(self, pkg):
         # languages
         self.package_languages(pkg)
 
@@ -1364,18 +1485,113 @@ def pkg_rules(self, pkg, tests):
         if self.enable_splicing:
             self.package_splice_rules(pkg)
 
-        # virtual preferences
-        self.virtual_preferences(
-            pkg.name,
-            lambda v, p, i: self.gen.fact(fn.pkg_fact(pkg.name, fn.provider_preference(v, p, i))),
-        )
-
-        self.package_requirement_rules(pkg)
-
         # trigger and effect tables
         self.trigger_rules()
         self.effect_rules()
 
+    #: Attributes of the solver setup that are modified while generating facts
+    _RECORDED_ATTRIBUTES = (
+        "gen",
+        "_trigger_cache",
+        "_effect_cache",
+        "_id_counter",
+        "variant_ids_by_def_id",
+        "version_constraints",
+        "target_constraints",
+        "compiler_version_constraints",
+        "variant_values_from_specs",
+        "_consulted_packages",
+    )
+
+    def _record_directive_rules(self, pkg) -> Tuple[Dict[str, Optional[str]], dict]:
+        """Generate the facts derived from the directives of a package, in the format of
+        the facts cache, together with the fingerprints of the packages they depend on.
+        """
+        saved = {attr: getattr(self, attr) for attr in self._RECORDED_ATTRIBUTES}
+        local_ids = itertools.count()
+        self.gen = _RecordingBuilder()
+        self._id_counter = (LocalId(i) for i in local_ids)
+        self._trigger_cache = collections.defaultdict(dict)
+        self._effect_cache = collections.defaultdict(dict)
+        self.variant_ids_by_def_id = {}
+        self.version_constraints = set()
+        self.target_constraints = set()
+        self.compiler_version_constraints = set()
+        self.variant_values_from_specs = set()
+        self._consulted_packages = {pkg.name}
+        try:
+            self._directive_rules(pkg)
+            recorded = {attr: getattr(self, attr) for attr in self._RECORDED_ATTRIBUTES}
+        finally:
+            for attr, value in saved.items():
+                setattr(self, attr, value)
+
+        def variant_def_location(pkg_name, def_id):
+            pkg_metadata = self.pkg_metadata(pkg_name)
+            for name in pkg_metadata.variant_names():
+                for idx, (_, variant_def) in enumerate(pkg_metadata.variant_definitions(name)):
+                    if id(variant_def) == def_id:
+                        return name, idx
+            raise KeyError(def_id)
+
+        rendered: RenderedFact = []
+        for item in recorded["gen"].asp_problem:
+            if isinstance(item, AspFunction):
+                rendered.extend(render_fact(item))
+            else:
+                rendered.append(item)
+
+        variant_ids = []
+        for def_id, vid in recorded["variant_ids_by_def_id"].items():
+            variant_ids.append([*variant_def_location(pkg.name, def_id), int(vid)])
+
+        variant_values = []
+        for pkg_name, def_id, value in recorded["variant_values_from_specs"]:
+            variant_values.append([pkg_name, *variant_def_location(pkg_name, def_id), value])
+
+        facts = {
+            "ids": next(local_ids),
+            "facts": rendered,
+            "variant_ids": variant_ids,
+            "variant_values": variant_values,
+            "version_constraints": sorted(
+                [name, str(versions)] for name, versions in recorded["version_constraints"]
+            ),
+            "target_constraints": sorted(str(x) for x in recorded["target_constraints"]),
+            "compiler_version_constraints": sorted(
+                str(x) for x in recorded["compiler_version_constraints"]
+            ),
+        }
+        consulted = {
+            name: self.pkg_fingerprint(self.pkg_metadata(name))
+            for name in recorded["_consulted_packages"]
+        }
+        return consulted, facts
+
+    def _replay_directive_rules(self, pkg, facts: dict):
+        """Output facts recorded by ``_record_directive_rules()``, with their local ids
+        shifted to a block of unused ids.
+        """
+        base = next(self._id_counter)
+        self._id_counter = itertools.count(base + facts["ids"])
+
+        self.gen.append(replay(facts["facts"], base))
+
+        for name, idx, vid in facts["variant_ids"]:
+            _, variant_def = pkg.variant_definitions(name)[idx]
+            self.variant_ids_by_def_id[id(variant_def)] = base + vid
+
+        for pkg_name, name, idx, value in facts["variant_values"]:
+            _, variant_def = self.pkg_metadata(pkg_name).variant_definitions(name)[idx]
+            self.variant_values_from_specs.add((pkg_name, id(variant_def), value))
+
+        for pkg_name, versions in facts["version_constraints"]:
+            self.version_constraints.add((pkg_name, vn.VersionList(versions)))
+        for target in facts["target_constraints"]:
+            self.target_constraints.add(spack.spec.ArchSpec((None, None, target)).target)
+        for compiler in facts["compiler_version_constraints"]:
+            self.compiler_version_constraints.add(spack.spec.CompilerSpec(compiler))
+
     def trigger_rules(self):
         """Flushes all the trigger rules collected so far, and clears the cache."""
         if not self._trigger_cache:
@@ -1410,7 +1626,7 @@ def effect_rules(self):
 
     def define_variant(
         self,
-        pkg: "Type[spack.package_base.PackageBase]",
+        pkg: "spack.package_metadata.PackageMetadataType",
         name: str,
         when: spack.spec.Spec,
         variant_def: vt.Variant,
@@ -1514,7 +1730,7 @@ def define_auto_variant(self, name: str, multi: bool):
             )
         )
 
-    def variant_rules(self, pkg: "Type[spack.package_base.PackageBase]"):
+    def variant_rules(self, pkg: "spack.package_metadata.PackageMetadataType"):
         for name in pkg.variant_names():
             self.gen.h3(f"Variant {name} in package {pkg.name}")
             for when, variant_def in pkg.variant_definitions(name):
@@ -1920,7 +2136,7 @@ def external_packages(self):
                 exclude = source.get("exclude", default_exclude)
                 spec_filters.append(
                     SpecFilter(
-                        factory=lambda: [],
+                        factory=lambda names: [],
                         is_usable=lambda x: True,
                         include=include,
                         exclude=exclude,
@@ -1955,7 +2171,7 @@ def external_packages(self):
             selected_externals = set()
             if spec_filters:
                 for current_filter in spec_filters:
-                    current_filter.factory = lambda: candidate_specs
+                    current_filter.factory = lambda names: candidate_specs
                     selected_externals.update(current_filter.selected_specs())
 
             # Emit facts for externals specs. Note that "local_idx" is the index of the spec
@@ -2015,7 +2231,7 @@ def preferred_variants(self, pkg_name):
 
             # perform validation of the variant and values
             try:
-                variant_defs = vt.prevalidate_variant_value(self.pkg_class(pkg_name), variant)
+                variant_defs = vt.prevalidate_variant_value(self.pkg_metadata(pkg_name), variant)
             except (vt.InvalidVariantValueError, KeyError, ValueError) as e:
                 tty.debug(
                     f"[SETUP]: rejected {str(variant)} as a preference for {pkg_name}: {str(e)}"
@@ -2140,7 +2356,7 @@ def _spec_clauses(
                 # ensure that the value *can* be valid for the spec
                 if spec.name and not spec.concrete and not spec.virtual:
                     variant_defs = vt.prevalidate_variant_value(
-                        self.pkg_class(spec.name), variant, spec
+                        self.pkg_metadata(spec.name), variant, spec
                     )
 
                     # Record that that this is a valid possible value. Accounts for
@@ -2150,7 +2366,7 @@ def _spec_clauses(
 
                 if variant.propagate:
                     clauses.append(f.propagate(spec.name, fn.variant_value(vname, value)))
-                    if self.pkg_class(spec.name).has_variant(vname):
+                    if self.pkg_metadata(spec.name).has_variant(vname):
                         clauses.append(f.variant_value(spec.name, vname, value))
                 else:
                     clauses.append(f.variant_value(spec.name, vname, value))
@@ -2284,7 +2500,7 @@ def define_package_versions_and_validate_preferences(
         """Declare any versions in specs not declared in packages."""
         packages_yaml = spack.config.get("packages")
         for pkg_name in possible_pkgs:
-            pkg_cls = self.pkg_class(pkg_name)
+            pkg_cls = self.pkg_metadata(pkg_name)
 
             # All the versions from the corresponding package.py file. Since concepts
             # like being a "develop" version or being preferred exist only at a
@@ -2838,22 +3054,10 @@ def setup(
         return self.gen.value()
 
     def internal_errors(self):
-        parent_dir = os.path.dirname(__file__)
-
-        def visit(node):
-            if ast_type(node) == clingo().ast.ASTType.Rule:
-                for term in node.body:
-                    if ast_type(term) == clingo().ast.ASTType.Literal:
-                        if ast_type(term.atom) == clingo().ast.ASTType.SymbolicAtom:
-                            name = ast_sym(term.atom).name
-                            if name == "internal_error":
-                                arg = ast_sym(ast_sym(term.atom).arguments[0])
-                                symbol = AspFunction(name)(arg.string)
-                                self.assumptions.append((parse_term(str(symbol)), True))
-                                self.gen.asp_problem.append(f"{{ {symbol} }}.\n")
-
-        path = os.path.join(parent_dir, "concretize.lp")
-        parse_files([path], visit)
+        for message in _internal_error_messages():
+            symbol = fn.internal_error(message)
+            self.assumptions.append((parse_term(str(symbol)), True))
+            self.gen.asp_problem.append(f"{{ {symbol} }}.\n")
 
     def define_runtime_constraints(self):
         """Define the constraints to be imposed on the runtimes"""
@@ -3002,12 +3206,39 @@ def _specs_from_requires(self, pkg_name, section):
             for s in spec_group[key]:
                 yield _spec_with_default_name(s, pkg_name)
 
-    def pkg_class(self, pkg_name: str) -> typing.Type["spack.package_base.PackageBase"]:
+    def pkg_metadata(self, pkg_name: str) -> "spack.package_metadata.PackageMetadataType":
+        """Directive data of a package, read from the package metadata cache when possible.
+
+        The same object is returned for a package during the whole setup, since variant
+        definitions are identified by their ``id()``.
+        """
         request = pkg_name
         if pkg_name in self.explicitly_required_namespaces:
             namespace = self.explicitly_required_namespaces[pkg_name]
             request = f"{namespace}.{pkg_name}"
-        return spack.repo.PATH.get_pkg_class(request)
+        if self._consulted_packages is not None:
+            self._consulted_packages.add(pkg_name)
+        if request not in self._pkg_metadata:
+            self._pkg_metadata[request] = spack.repo.PATH.get_pkg_metadata(request)
+        return self._pkg_metadata[request]
+
+    def pkg_fingerprint(self, pkg: "spack.package_metadata.PackageMetadataType") -> Optional[str]:
+        """Hash of the source files of a package, given as its class or as its metadata, or None
+        if the facts derived from its directives cannot be cached.
+
+        Package classes are returned instead of metadata when they are already loaded, so their
+        fingerprint is computed from their source files. Classes with attributes set from the
+        configuration are not cached.
+        """
+        if isinstance(pkg, spack.package_metadata.PackageMetadata):
+            return pkg.fingerprint
+        if getattr(pkg, "overridden_attrs", None) or getattr(
+            pkg, "attrs_exclusively_from_config", None
+        ):
+            return None
+        if pkg.fullname not in self._pkg_fingerprints:
+            self._pkg_fingerprints[pkg.fullname] = spack.package_metadata.fingerprint(pkg)
+        return self._pkg_fingerprints[pkg.fullname]
 
 
 class _Head:
@@ -3088,6 +3319,17 @@ def value(self) -> str:
         return "".join(self.asp_problem)
 
 
+class _RecordingBuilder(ProblemInstanceBuilder):
+    """Problem instance builder that keeps facts as ASP functions, so that they can be
+    stored in the facts cache."""
+
+    def fact(self, atom: AspFunction) -> None:
+        if isinstance(atom, AspFunction):
+            self.asp_problem.append(atom)
+        else:
+            super().fact(atom)
+
+
 def parse_spec_from_yaml_string(string: str) -> "spack.spec.Spec":
     """Parse a spec from YAML and add file/line info to errors, if it's available.
 
@@ -4118,6 +4360,11 @@ def _has_runtime_dependencies(spec: spack.spec.Spec) -> bool:
     return True
 
 
+#: Produces a list of concrete specs, given the names of the packages they are restricted to, or
+#: None to produce the specs of all packages
+SpecFactory = Callable[[Optional[Set[str]]], List[spack.spec.Spec]]
+
+
 class SpecFilter:
     """Given a method to produce a list of specs, this class can filter them according to
     different criteria.
@@ -4125,14 +4372,14 @@ class SpecFilter:
 
     def __init__(
         self,
-        factory: Callable[[], List[spack.spec.Spec]],
+        factory: SpecFactory,
         is_usable: Callable[[spack.spec.Spec], bool],
         include: List[str],
         exclude: List[str],
     ) -> None:
         """
         Args:
-            factory: factory to produce a list of specs
+            factory: factory to produce a list of specs, restricted to some package names
             is_usable: predicate that takes a spec in input and returns False if the spec
                 should not be considered for this filter, True otherwise.
             include: if present, a "good" spec must match at least one entry in the list
@@ -4155,8 +4402,18 @@ def is_selected(self, s: spack.spec.Spec) -> bool:
 
         return True
 
-    def selected_specs(self) -> List[spack.spec.Spec]:
-        return [s for s in self.factory() if self.is_selected(s)]
+    def selected_specs(
+        self, compatibility: Optional["ReuseCompatibility"] = None
+    ) -> List[spack.spec.Spec]:
+        """Return the selected specs. If ``compatibility`` is given, the factory is asked only
+        for the specs of possible packages, and specs that cannot be reused are discarded before
+        the include and exclude constraints are checked.
+        """
+        if compatibility is None:
+            return [s for s in self.factory(None) if self.is_selected(s)]
+
+        candidates = self.factory(compatibility.names)
+        return [s for s in candidates if compatibility.accepts(s) and self.is_selected(s)]
 
     @staticmethod
     def from_store(configuration, *, include, exclude) -> "SpecFilter":
@@ -4199,15 +4456,15 @@ def from_environment_included_concrete(
         return SpecFilter(factory=factory, is_usable=is_reusable, include=include, exclude=exclude)
 
 
-def _specs_from_store(configuration):
+def _specs_from_store(names: Optional[Set[str]], *, configuration) -> List[spack.spec.Spec]:
     store = spack.store.create(configuration)
     with store.db.read_transaction():
-        return store.db.query(installed=True)
+        return store.db.query(installed=True, names=names)
 
 
-def _specs_from_mirror():
+def _specs_from_mirror(names: Optional[Set[str]]) -> List[spack.spec.Spec]:
     try:
-        return spack.binary_distribution.update_cache_and_get_specs()
+        return spack.binary_distribution.update_cache_and_get_specs(names=names)
     except (spack.binary_distribution.FetchCacheError, IndexError):
         # this is raised when no mirrors had indices.
         # TODO: update mirror configuration so it can indicate that the
@@ -4215,23 +4472,187 @@ def _specs_from_mirror():
         return []
 
 
-def _specs_from_environment(env):
+def _specs_from_environment(names: Optional[Set[str]], *, env) -> List[spack.spec.Spec]:
     """Return all concrete specs from the environment. This includes all included concrete"""
     if env:
-        return [concrete for _, concrete in env.concretized_specs()]
+        return [
+            concrete
+            for _, concrete in env.concretized_specs()
+            if names is None or concrete.name in names
+        ]
     else:
         return []
 
 
-def _specs_from_environment_included_concrete(env, included_concrete):
+def _specs_from_environment_included_concrete(
+    names: Optional[Set[str]], *, env, included_concrete
+) -> List[spack.spec.Spec]:
     """Return only concrete specs from the environment included from the included_concrete"""
     if env:
         assert included_concrete in env.included_concrete_envs
-        return [concrete for concrete in env.included_specs_by_hash[included_concrete].values()]
+        return [
+            concrete
+            for concrete in env.included_specs_by_hash[included_concrete].values()
+            if names is None or concrete.name in names
+        ]
     else:
         return []
 
 
+def _reuse_key(spec: spack.spec.Spec) -> str:
+    """Return a key that is the same for concrete specs which differ only in what the solver
+    doesn't see when reusing them: their package hash and their pure build dependencies.
+    """
+    node = spec.to_node_dict(hash=ht.dag_hash)
+    node.pop("package_hash", None)
+    node["dependencies"] = [
+        edge
+        for edge in node.get("dependencies", [])
+        if tuple(edge["parameters"]["deptypes"]) != ("build",)
+    ]
+    return json.dumps(node, sort_keys=True, default=str)
+
+
+class ReuseCompatibility:
+    """Necessary conditions for a concrete spec to be reused when solving for some input specs,
+    which can be checked before the spec is constructed, or before any fact is emitted for it.
+
+    The conditions mirror hard constraints of the logic program, so discarding the specs that
+    don't meet them never changes the result of a solve:
+
+    1. facts are emitted only for specs of packages that are possible dependencies of the input
+    2. every node is on the host platform
+    3. the target of every node is among the candidate targets of the solve
+    4. on Linux, a node depending on a libc must depend on one compatible with a host libc
+    5. elsewhere, the OS of a node must be buildable, or compatible with a buildable one
+
+    The number of discarded candidates is counted, for reporting.
+    """
+
+    def __init__(self, specs: List[spack.spec.Spec], *, tests=False) -> None:
+        #: Names of the packages that can be in the solution
+        self.names: Set[str] = _create_counter(specs, tests=tests).possible_dependencies()
+
+        host = spack.platforms.host()
+        self.platform = str(host)
+
+        env = ev.active_environment()
+        dev_specs = (
+            [spack.spec.Spec(info["spec"]) for info in env.dev_specs.values()] if env else []
+        )
+        nodes = list(traverse.traverse_nodes(list(specs) + dev_specs))
+
+        #: Candidate targets, or None if they cannot be computed without solving
+        self.targets: Optional[Set[str]] = self._candidate_targets(host, nodes)
+
+        #: Libcs of the host on Linux, None elsewhere or if there is no known libc
+        self.libcs: Optional[List[spack.spec.Spec]] = None
+        if using_libc_compatibility():
+            self.libcs = sorted(all_libcs()) or None  # type: ignore[type-var]
+
+        #: Buildable operating systems, None if any OS can be reused
+        self.oses: Optional[Set[str]] = None
+        # On macOS a release is compatible with older ones, see os_compatibility.lp
+        if not using_libc_compatibility() and host.name != "darwin":
+            self.oses = set(host.operating_sys.keys())
+            self.oses.update(str(x.os) for x in nodes if x.architecture and x.os)
+
+        #: Number of candidates discarded because they cannot be reused
+        self.incompatible = 0
+        #: Number of candidates discarded because another one is indistinguishable from them
+        self.indistinguishable = 0
+
+    @staticmethod
+    def _candidate_targets(
+        host: spack.platforms.Platform, nodes: List[spack.spec.Spec]
+    ) -> Optional[Set[str]]:
+        """Return a superset of the targets that ``SpackSolverSetup.target_defaults`` allows."""
+        uarch = archspec.cpu.TARGETS.get(host.default)
+        if uarch is None:
+            return None
+
+        candidates = [uarch] + uarch.ancestors
+        host_compatible = spack.config.get("concretizer:targets:host_compatible")
+        if not host_compatible:
+            candidates.extend(
+                t for t in archspec.cpu.TARGETS.values() if t.family.name == uarch.family.name
+            )
+
+        for node in nodes:
+            if not node.architecture or not node.architecture.target:
+                continue
+            target = archspec.cpu.TARGETS.get(node.target.name)
+            if target is None:
+                # Target ranges are resolved by the solver
+                return None
+            if not host_compatible:
+                candidates.extend([target] + target.ancestors)
+
+        return {t.name for t in candidates}
+
+    def accepts(self, spec: spack.spec.Spec) -> bool:
+        """Return False if the root of a concrete spec cannot be reused, True otherwise."""
+        if spec.name not in self.names:
+            return False
+
+        if self._is_compatible(spec):
+            return True
+
+        self.incompatible += 1
+        return False
+
+    def _is_compatible(self, spec: spack.spec.Spec) -> bool:
+        if not spec.architecture:
+            return True
+
+        if spec.architecture.platform != self.platform:
+            return False
+
+        if self.targets is not None and spec.target.name not in self.targets:
+            return False
+
+        if self.oses is not None and spec.os not in self.oses:
+            return False
+
+        # Externals are compatible with any host libc, and libc providers don't depend on a libc
+        if self.libcs is not None and not spec.external:
+            libcs = [e.spec for e in spec.edges_to_dependencies() if "libc" in e.virtuals]
+            if libcs and not any(
+                libc_is_compatible(host, libc) for libc in libcs for host in self.libcs
+            ):
+                return False
+
+        return True
+
+    def collapse(self, specs: List[spack.spec.Spec]) -> List[spack.spec.Spec]:
+        """Remove duplicate candidates, and candidates that are indistinguishable from a
+        previous one. The first candidate is kept, so earlier sources of reusable specs take
+        precedence over later ones.
+
+        Candidates that another candidate depends on are always kept, since reusing the
+        dependent imposes their DAG hash.
+        """
+        depended_upon = {
+            edge.spec.dag_hash() for spec in specs for edge in spec.edges_to_dependencies()
+        }
+        hashes: Set[str] = set()
+        keys: Set[str] = set()
+        result = []
+        for spec in specs:
+            dag_hash = spec.dag_hash()
+            if dag_hash in hashes:
+                continue
+            hashes.add(dag_hash)
+
+            key = _reuse_key(spec)
+            if key in keys and dag_hash not in depended_upon:
+                self.indistinguishable += 1
+                continue
+            keys.add(key)
+            result.append(spec)
+        return result
+
+
 class ReuseStrategy(enum.Enum):
     ROOTS = enum.auto()
     DEPENDENCIES = enum.auto()
@@ -4331,17 +4752,32 @@ def __init__(self, configuration: spack.config.Configuration) -> None:
                         )
                     )
 
-    def reusable_specs(self, specs: List[spack.spec.Spec]) -> List[spack.spec.Spec]:
+    def reusable_specs(
+        self, specs: List[spack.spec.Spec], compatibility: Optional[ReuseCompatibility] = None
+    ) -> List[spack.spec.Spec]:
+        """Return the specs that can be reused when solving for the input specs.
+
+        If ``compatibility`` is given, only the candidates meeting its conditions are returned,
+        and duplicate or indistinguishable candidates are collapsed.
+        """
         if self.reuse_strategy == ReuseStrategy.NONE:
             return []
 
         result = []
         for reuse_source in self.reuse_sources:
-            result.extend(reuse_source.selected_specs())
+            result.extend(reuse_source.selected_specs(compatibility))
         # If we only want to reuse dependencies, remove the root specs
         if self.reuse_strategy == ReuseStrategy.DEPENDENCIES:
             result = [spec for spec in result if not any(root in spec for root in specs)]
 
+        if compatibility is not None:
+            result = compatibility.collapse(result)
+            tty.debug(
+                f"[REUSE] {len(result)} candidates selected, {compatibility.incompatible} "
+                f"discarded as incompatible with the host, {compatibility.indistinguishable} "
+                f"as indistinguishable from another candidate"
+            )
+
         return result
 
 
@@ -4394,7 +4830,8 @@ def solve_with_stats(
         """
         specs = [s.lookup_hash() for s in specs]
         reusable_specs = self._check_input_and_extract_concrete_specs(specs)
-        reusable_specs.extend(self.selector.reusable_specs(specs))
+        compatibility = ReuseCompatibility(specs, tests=tests)
+        reusable_specs.extend(self.selector.reusable_specs(specs, compatibility))
         setup = SpackSolverSetup(tests=tests)
         output = OutputConfiguration(timers=timers, stats=stats, out=out, setup_only=setup_only)
         return self.driver.solve(
@@ -4431,7 +4868,8 @@ def solve_in_rounds(
         """
         specs = [s.lookup_hash() for s in specs]
         reusable_specs = self._check_input_and_extract_concrete_specs(specs)
-        reusable_specs.extend(self.selector.reusable_specs(specs))
+        compatibility = ReuseCompatibility(specs, tests=tests)
+        reusable_specs.extend(self.selector.reusable_specs(specs, compatibility))
         setup = SpackSolverSetup(tests=tests)
 
         # Tell clingo that we don't have to solve all the inputs at once
@@ -225,6 +225,16 @@ def parse_files(*args, **kwargs):
         return clingo().parse_files(*args, **kwargs)
 
 
+def program_builder(control):
+    """Wrapper around clingo ProgramBuilder, that dispatches the function according
+    to clingo API version.
+    """
+    try:
+        return importlib.import_module("clingo.ast").ProgramBuilder(control)
+    except (ImportError, AttributeError):
+        return control.builder()
+
+
 def parse_term(*args, **kwargs):
     """Wrapper around clingo parse_term, that dispatches the function according
     to clingo API version.
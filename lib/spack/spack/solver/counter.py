@@ -28,8 +28,8 @@ def __init__(self, specs: List["spack.spec.Spec"], tests: bool) -> None:
         runtime_pkgs = spack.repo.PATH.packages_with_tags("runtime")
         runtime_virtuals = set()
         for x in runtime_pkgs:
-            pkg_class = spack.repo.PATH.get_pkg_class(x)
-            runtime_virtuals.update(pkg_class.provided_virtual_names())
+            pkg_metadata = spack.repo.PATH.get_pkg_metadata(x)
+            runtime_virtuals.update(pkg_metadata.provided_virtual_names())
 
         self.specs = specs + [spack.spec.Spec(x) for x in runtime_pkgs]
 
@@ -106,7 +106,7 @@ def _compute_cache_values(self):
         )
         self._link_run_virtuals.update(self._possible_virtuals)
         for x in self._link_run:
-            build_dependencies = spack.repo.PATH.get_pkg_class(x).dependencies_of_type(dt.BUILD)
+            build_dependencies = spack.repo.PATH.get_pkg_metadata(x).dependencies_of_type(dt.BUILD)
             virtuals, reals = lang.stable_partition(
                 build_dependencies, spack.repo.PATH.is_virtual_safe
             )
@@ -0,0 +1,152 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Persistent cache of the facts generated from package directives.
+
+Setting up a concretization problem translates the directives of every possible package
+(variants, conflicts, provided virtuals, dependencies, etc.) into ASP facts. These facts only
+depend on the package and on a few properties of the problem, like the set of possible
+virtuals, so they are stored in a file cache, one entry per package, and replayed when
+setting up later problems.
+
+Facts refer to conditions, triggers, effects and variant definitions through integer ids,
+which are assigned incrementally while a problem is set up. Cached facts use ids local to
+their package, which are shifted to a block of unused ids when the facts are replayed.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import llnl.util.tty as tty
+
+import spack
+import spack.util.file_cache
+
+from .core import AspFunction, AspVar, clingo
+
+#: Version of the format of cache entries. Entries with a different version are discarded.
+FORMAT_VERSION = 1
+
+
+class LocalId(int):
+    """An id that is local to the facts of a package, and needs to be shifted on replay."""
+
+
+#: A rendered fact: text of the fact, with local ids kept as integers
+RenderedFact = List[Union[str, int]]
+
+
+def render_fact(atom: AspFunction) -> RenderedFact:
+    """Render a fact as in the ASP program, except for local ids which are kept as integers
+    so that they can be shifted on replay."""
+    segments: RenderedFact = []
+    _render(atom, segments)
+    segments.append(".\n")
+
+    # Merge adjacent pieces of text
+    result: RenderedFact = []
+    for segment in segments:
+        if isinstance(segment, str) and result and isinstance(result[-1], str):
+            result[-1] += segment
+        else:
+            result.append(segment)
+    return result
+
+
+def _render(arg: Any, segments: RenderedFact) -> None:
+    if isinstance(arg, LocalId):
+        segments.append(int(arg))
+    elif isinstance(arg, AspFunction):
+        segments.append(arg.name)
+        if not arg.args:
+            return
+        segments.append("(")
+        for i, x in enumerate(arg.args):
+            if i:
+                segments.append(",")
+            _render(x, segments)
+        segments.append(")")
+    elif isinstance(arg, AspVar):
+        segments.append(arg.name)
+    elif isinstance(arg, int) and not isinstance(arg, bool):
+        segments.append(str(clingo().Number(arg)))
+    else:
+        segments.append(str(clingo().String(str(arg))))
+
+
+def replay(rendered: RenderedFact, base: int) -> str:
+    """Return the text of rendered facts, with their local ids shifted by ``base``."""
+    return "".join(x if isinstance(x, str) else str(base + x) for x in rendered)
+
+
+class FactsCache:
+    """Cache of the facts generated from the directives of each package.
+
+    Entries are stored in a file cache under ``solver/facts/<namespace>/<package>.json``, and
+    kept in memory once read. Each entry is valid for a single key, describing the package
+    and the properties of the problem the facts depend on.
+    """
+
+    def __init__(self, cache: spack.util.file_cache.FileCache) -> None:
+        self.cache = cache
+        self._in_memory: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    @staticmethod
+    def _key(namespace: str, pkg_name: str) -> str:
+        return f"solver/facts/{namespace}/{pkg_name}.json"
+
+    @staticmethod
+    def _header(key: Dict[str, Any]) -> Dict[str, Any]:
+        return {"format": FORMAT_VERSION, "spack": spack.spack_version, "key": key}
+
+    def get(self, namespace: str, pkg_name: str, key: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for a package, if there is one for the given key."""
+        header = self._header(key)
+
+        entry = self._in_memory.get((namespace, pkg_name))
+        if entry is None:
+            cache_key = self._key(namespace, pkg_name)
+            try:
+                if not self.cache.init_entry(cache_key):
+                    return None
+                with self.cache.read_transaction(cache_key) as f:
+                    entry = json.load(f)
+            except (spack.util.file_cache.CacheError, OSError, ValueError) as e:
+                tty.debug(f"Cannot read the cached facts of {namespace}.{pkg_name}: {e}")
+                return None
+            self._in_memory[(namespace, pkg_name)] = entry
+
+        if any(entry.get(field) != value for field, value in header.items()):
+            return None
+        return entry
+
+    def put(
+        self,
+        namespace: str,
+        pkg_name: str,
+        key: Dict[str, Any],
+        consulted: Dict[str, str],
+        facts: Dict[str, Any],
+    ) -> None:
+        """Store the facts of a package for the given key.
+
+        Args:
+            namespace: namespace of the package
+            pkg_name: name of the package
+            key: properties of the package and of the problem the facts depend on
+            consulted: fingerprints of the other packages whose directives were used to
+                generate the facts
+            facts: facts to be stored
+        """
+        entry = self._header(key)
+        entry["consulted"] = consulted
+        entry["facts"] = facts
+        self._in_memory[(namespace, pkg_name)] = entry
+
+        cache_key = self._key(namespace, pkg_name)
+        try:
+            self.cache.init_entry(cache_key)
+            with self.cache.write_transaction(cache_key) as (old, new):
+                json.dump(entry, new, separators=(",", ":"))
+        except (spack.util.file_cache.CacheError, OSError) as e:
+            tty.debug(f"Cannot write the cached facts of {namespace}.{pkg_name}: {e}")
@@ -153,6 +153,8 @@ class Store:
             truncated to this length
         upstreams: optional list of upstream databases
         lock_cfg: lock configuration for the database
+        db_format: format of the database index, either "json" or "binary"
+        db_journal: whether to journal changes to a JSON database index
     """
 
     def __init__(
@@ -163,6 +165,8 @@ def __init__(
         hash_length: Optional[int] = None,
         upstreams: Optional[List[spack.database.Database]] = None,
         lock_cfg: spack.database.LockConfiguration = spack.database.NO_LOCK,
+        db_format: str = "json",
+        db_journal: bool = False,
     ) -> None:
         self.root = root
         self.unpadded_root = unpadded_root or root
@@ -170,11 +174,18 @@ def __init__(
         self.hash_length = hash_length
         self.upstreams = upstreams
         self.lock_cfg = lock_cfg
+        self.db_format = db_format
+        self.db_journal = db_journal
         self.layout = spack.directory_layout.DirectoryLayout(
             root, projections=projections, hash_length=hash_length
         )
         self.db = spack.database.Database(
-            root, upstream_dbs=upstreams, lock_cfg=lock_cfg, layout=self.layout
+            root,
+            upstream_dbs=upstreams,
+            lock_cfg=lock_cfg,
+            layout=self.layout,
+            index_format=db_format,
+            journal=db_journal,
         )
 
         timeout_format_str = (
@@ -189,9 +200,11 @@ def __init__(
             self.root, default_timeout=lock_cfg.package_timeout
         )
 
-    def reindex(self) -> None:
+    def reindex(
+        self, jobs: int = 1, progress: Optional[spack.directory_layout.ProgressCallback] = None
+    ) -> None:
         """Convenience function to reindex the store DB with its own layout."""
-        return self.db.reindex()
+        return self.db.reindex(jobs=jobs, progress=progress)
 
     def __reduce__(self):
         return Store, (
@@ -201,6 +214,8 @@ def __reduce__(self):
             self.hash_length,
             self.upstreams,
             self.lock_cfg,
+            self.db_format,
+            self.db_journal,
         )
 
 
@@ -228,6 +243,8 @@ def create(configuration: spack.config.Configuration) -> Store:
         hash_length=hash_length,
         upstreams=upstreams,
         lock_cfg=spack.database.lock_configuration(configuration),
+        db_format=configuration.get("config:db_format", "json"),
+        db_journal=configuration.get("config:db_journal", False),
     )
 
 
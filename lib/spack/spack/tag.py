@@ -118,16 +118,24 @@ def update_package(self, pkg_name):
             pkg_name (str): name of the package to be removed from the index
         """
         pkg_cls = self.repository.get_pkg_class(pkg_name)
+        self.update_package_tags(pkg_cls.name, getattr(pkg_cls, "tags", []))
 
+    def update_package_tags(self, pkg_name, tags):
+        """Replaces the tags of a package in the tag index.
+
+        Args:
+            pkg_name (str): name of the package
+            tags (list): tags of the package
+        """
         # Remove the package from the list of packages, if present
         for pkg_list in self._tag_dict.values():
             if pkg_name in pkg_list:
                 pkg_list.remove(pkg_name)
 
         # Add it again under the appropriate tags
-        for tag in getattr(pkg_cls, "tags", []):
+        for tag in tags:
             tag = tag.lower()
-            self._tag_dict[tag].append(pkg_cls.name)
+            self._tag_dict[tag].append(pkg_name)
 
 
 class TagIndexError(spack.error.SpackError):
@@ -890,6 +890,104 @@ def urlopen(request: urllib.request.Request):
         fetcher.conditional_fetch()
 
 
+def test_index_delta_fetcher_only_fetches_new_deltas():
+    deltas = ['{"delta": 1}', '{"delta": 2}']
+    hashes = [bindist.compute_hash(d) for d in deltas]
+    manifest = json.dumps({"base": "base-hash", "deltas": hashes})
+    requested = []
+
+    def urlopen(request: urllib.request.Request):
+        url = request.get_full_url()
+        requested.append(url)
+        if url.endswith(bindist.INDEX_DELTAS_MANIFEST):
+            data = manifest
+        else:
+            data = deltas[hashes.index(url.rsplit("/", 1)[1][: -len(".json")])]
+        return urllib.response.addinfourl(
+            io.BytesIO(data.encode()), headers={}, url=url, code=200  # type: ignore[arg-type]
+        )
+
+    fetcher = bindist.IndexDeltaFetcher(
+        url="https://www.example.com",
+        base_hash="base-hash",
+        known_deltas=hashes[:1],
+        urlopen=urlopen,
+    )
+    assert fetcher.conditional_fetch() == [(hashes[1], deltas[1])]
+    assert len(requested) == 2 and requested[1].endswith(f"{hashes[1]}.json")
+
+    # Deltas of another index are ignored
+    fetcher = bindist.IndexDeltaFetcher(
+        url="https://www.example.com", base_hash="other", known_deltas=[], urlopen=urlopen
+    )
+    assert fetcher.conditional_fetch() == []
+
+
+def test_index_delta_fetcher_invalid_delta():
+    def urlopen(request: urllib.request.Request):
+        url = request.get_full_url()
+        if url.endswith(bindist.INDEX_DELTAS_MANIFEST):
+            data = json.dumps({"base": "base-hash", "deltas": ["0" * 64]})
+        else:
+            data = "corrupted"
+        return urllib.response.addinfourl(
+            io.BytesIO(data.encode()), headers={}, url=url, code=200  # type: ignore[arg-type]
+        )
+
+    fetcher = bindist.IndexDeltaFetcher(
+        url="https://www.example.com", base_hash="base-hash", known_deltas=[], urlopen=urlopen
+    )
+    with pytest.raises(bindist.FetchIndexError, match="is invalid"):
+        fetcher.conditional_fetch()
+
+
+def test_index_delta_fetcher_no_manifest():
+    def urlopen(request: urllib.request.Request):
+        raise urllib.error.HTTPError(
+            request.get_full_url(), code=404, msg="Not Found", hdrs={}, fp=None  # type: ignore
+        )
+
+    fetcher = bindist.IndexDeltaFetcher(
+        url="https://www.example.com", base_hash="base-hash", known_deltas=[], urlopen=urlopen
+    )
+    assert fetcher.conditional_fetch() == []
+
+
+def test_build_cache_spec_index(tmp_path):
+    """The spec index finds the mirrors of a DAG hash, and decodes specs on demand"""
+    nodes = {
+        "a" * 32: {"name": "pkg-a", "version": "1.0"},
+        "b" * 32: {"name": "pkg-b", "version": "2.0", "external": {"path": "/usr"}},
+        "c" * 32: {"name": "pkg-c", "version": "3.0"},
+    }
+    mirrors = ["file:///mirror-1", "file:///mirror-2"]
+    path = str(tmp_path / "specs.idx")
+    bindist.BuildCacheSpecIndex.write(
+        path, mirrors, nodes, in_mirror=[{"a" * 32, "b" * 32}, {"b" * 32}]
+    )
+
+    index = bindist.BuildCacheSpecIndex(path)
+    assert len(index) == 3 and index.mirrors == mirrors
+    assert list(index.hashes()) == sorted(nodes)
+
+    assert index.mirrors_of(index.find("a" * 32)) == ["file:///mirror-1"]
+    assert index.mirrors_of(index.find("b" * 32)) == mirrors
+    assert not index.in_any_mirror(index.find("c" * 32))
+    assert index.find("d" * 32) is None
+
+    i = index.find("b" * 32)
+    assert index.decode_fields(i) == {"name": "pkg-b", "external": True}
+    assert index.decode_spec(i) == nodes["b" * 32]
+    index.close()
+
+
+def test_build_cache_spec_index_invalid(tmp_path):
+    path = tmp_path / "specs.idx"
+    path.write_bytes(b"not an index")
+    with pytest.raises(bindist.InvalidSpecIndexError):
+        bindist.BuildCacheSpecIndex(str(path))
+
+
 def _all_parents(prefix):
     parts = [p for p in prefix.split("/")]
     return ["/".join(parts[: i + 1]) for i in range(len(parts))]
@@ -1094,6 +1192,67 @@ def test_tarfile_with_files_outside_common_prefix(tmpdir, dummy_prefix):
             bindist._ensure_common_prefix(tarfile.open("broken.tar", mode="r"))
 
 
+def test_stream_strip_common_prefix(tmp_path: Path, dummy_prefix):
+    """Tarballs read in stream mode need the buildinfo file first, and are checked while
+    extracted."""
+    tarball = str(tmp_path / "example.tar")
+    with tarfile.open(tarball, mode="w") as tar:
+        bindist._add_buildinfo_to_tarfile(tar, dummy_prefix, {"buildpath": "/old"})
+        bindist.tarfile_of_spec_prefix(tar, dummy_prefix)
+
+    with open(tarball, "rb") as f, tarfile.open(fileobj=f, mode="r|") as tar:
+        tar.extractall(path=tmp_path / "prefix2", members=bindist._stream_strip_common_prefix(tar))
+
+    assert set(os.listdir(tmp_path / "prefix2")) == {"bin", "share", ".spack"}
+    assert set(os.listdir(tmp_path / "prefix2" / ".spack")) == {"binary_distribution"}
+    assert readlink(str(tmp_path / "prefix2" / "bin" / "relative_app_link")) == "app"
+
+    # The buildinfo file is needed first to know the prefix
+    with tarfile.open(tarball, mode="w") as tar:
+        bindist.tarfile_of_spec_prefix(tar, dummy_prefix)
+        bindist._add_buildinfo_to_tarfile(tar, dummy_prefix, {"buildpath": "/old"})
+
+    with open(tarball, "rb") as f, tarfile.open(fileobj=f, mode="r|") as tar:
+        with pytest.raises(ValueError, match="missing binary_distribution file"):
+            list(bindist._stream_strip_common_prefix(tar))
+
+
+@pytest.mark.parametrize(
+    "spec_dict,layout_version,zstd_available,expected",
+    [
+        ({"binary_cache_checksum": {"hash": "a"}}, 2, True, [(".spack", "gzip", "a")]),
+        (
+            {"binary_cache_checksum": {"hash": "a"}, "binary_cache_zstd_checksum": {"hash": "b"}},
+            2,
+            True,
+            [(".spack.zst", "zstd", "b"), (".spack", "gzip", "a")],
+        ),
+        (
+            {"binary_cache_checksum": {"hash": "a"}, "binary_cache_zstd_checksum": {"hash": "b"}},
+            2,
+            False,
+            [(".spack", "gzip", "a")],
+        ),
+        (
+            {"binary_cache_checksum": {"hash": "a"}, "binary_cache_compression": "zstd"},
+            3,
+            True,
+            [(".spack", "zstd", "a")],
+        ),
+        (
+            {"binary_cache_checksum": {"hash": "a"}, "binary_cache_compression": "zstd"},
+            3,
+            False,
+            [],
+        ),
+    ],
+)
+def test_tarball_formats(spec_dict, layout_version, zstd_available, expected, monkeypatch):
+    """Zstd tarballs are preferred when the zstd executable is available"""
+    monkeypatch.setattr(bindist, "which", lambda name: "/usr/bin/zstd" if zstd_available else None)
+    assert bindist._tarball_formats(spec_dict, layout_version) == expected
+
+
 def test_tarfile_of_spec_prefix(tmpdir):
     """Tests whether hardlinks, symlinks, files and dirs are added correctly,
     and that the order of entries is correct."""
@@ -1191,7 +1350,7 @@ def test_get_valid_spec_file_no_json(tmp_path, filename):
 
 
 def test_download_tarball_with_unsupported_layout_fails(tmp_path, mutable_config, capsys):
-    layout_version = bindist.CURRENT_BUILD_CACHE_LAYOUT_VERSION + 1
+    layout_version = bindist.MAX_SUPPORTED_BUILD_CACHE_LAYOUT_VERSION + 1
     spec = Spec("gmake@4.4.1%gcc@13.1.0 arch=linux-ubuntu23.04-zen2")
     spec._mark_concrete()
     spec_dict = spec.to_dict()
@@ -1213,3 +1372,12 @@ def test_download_tarball_with_unsupported_layout_fails(tmp_path, mutable_config
 
     # And there should be a warning about an unsupported layout version.
     assert f"Layout version {layout_version} is too new" in capsys.readouterr().err
+
+
+def test_relocation_jobs(mutable_config):
+    """The number of relocation threads is configurable, and defaults to the number of build
+    jobs."""
+    mutable_config.set("config:build_jobs", 3)
+    assert bindist.relocation_jobs() == min(3, spack.config.cpus_available())
+    mutable_config.set("config:relocation_jobs", 32)
+    assert bindist.relocation_jobs() == 32
@@ -604,6 +604,22 @@ def test_build_jobs_defaults():
     )
 
 
+@pytest.mark.parametrize("command_line", [True, False])
+def test_build_jobs_of_concurrent_builds(command_line, monkeypatch):
+    """Tests that the jobs given to a build running concurrently with others override both
+    configuration files and the command line.
+    """
+    scopes = [spack.config.InternalConfigScope("defaults", {"config": {"build_jobs": 16}})]
+    if command_line:
+        scopes.append(
+            spack.config.InternalConfigScope("command_line", {"config": {"build_jobs": 32}})
+        )
+    monkeypatch.setattr(spack.config, "CONFIG", spack.config.Configuration(*scopes))
+
+    spack.build_environment._limit_build_jobs(4)
+    assert spack.config.determine_number_of_jobs(parallel=True, max_cpus=64) == 4
+
+
 class TestModuleMonkeyPatcher:
     def test_getting_attributes(self, default_mock_concretization):
         s = default_mock_concretization("libelf")
@@ -0,0 +1,93 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import socket
+
+import pytest
+
+import spack.build_history
+import spack.spec
+from spack.installer import PackageInstaller
+
+
+def _record(version, total, *, cache=False, host=None, variants="+shared", time=0.0):
+    return {
+        "version": version,
+        "variants": variants,
+        "host": host or socket.gethostname(),
+        "cache": cache,
+        "time": time,
+        "total": total,
+    }
+
+
+def test_history_keeps_most_recent_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(spack.build_history, "MAX_RECORDS", 3)
+    history = spack.build_history.BuildHistory(str(tmp_path))
+    assert history.packages() == [] and history.records("zlib") == []
+
+    for i in range(5):
+        history.add("zlib", _record("1.3", float(i)))
+    history.add("cmake", _record("3.27", 1.0))
+
+    assert history.packages() == ["cmake", "zlib"]
+    assert [r["total"] for r in history.records("zlib")] == [2.0, 3.0, 4.0]
+
+    history.clear(["zlib"])
+    assert history.packages() == ["cmake"]
+    history.clear()
+    assert history.packages() == []
+
+
+def test_corrupt_history_is_discarded(tmp_path):
+    (tmp_path / "zlib.json").write_text("not json")
+    history = spack.build_history.BuildHistory(str(tmp_path))
+    assert history.records("zlib") == []
+    history.add("zlib", _record("1.3", 1.0))
+    assert len(history.records("zlib")) == 1
+
+
+def test_best_match():
+    records = [
+        _record("1.2", 10.0, time=3.0),
+        _record("1.3", 20.0, time=1.0),
+        _record("1.3", 30.0, host="other-host", time=2.0),
+        _record("1.3", 1.0, cache=True, time=4.0),
+    ]
+    best_match = spack.build_history.best_match
+    assert best_match(records, cache=False, version="1.3")["total"] == 20.0
+    assert best_match(records, cache=False, version="1.4")["total"] == 10.0
+    assert best_match(records, cache=True, version="1.3")["total"] == 1.0
+    assert best_match(records[:1], cache=True) is None
+
+
+def test_regressions():
+    records = [
+        _record("1.1", 10.0),
+        _record("1.10", 15.0),
+        _record("1.2", 11.0),
+        _record("1.2", 50.0, cache=True),
+        _record("1.2", 30.0, variants="~shared"),
+        _record("1.10", 30.0, variants="~shared"),
+    ]
+    host = socket.gethostname()
+    # Versions are compared in order, not lexicographically, within each group of builds
+    assert spack.build_history.regressions(records, 0.2) == [
+        ((host, "+shared"), "1.2", 11.0, "1.10", 15.0)
+    ]
+    assert spack.build_history.regressions(records, 0.5) == []
+
+
+@pytest.mark.not_on_windows("resource usage is not recorded on Windows")
+def test_builds_are_recorded(install_mockery, mock_fetch):
+    spec = spack.spec.Spec("trivial-install-test-package").concretized()
+    PackageInstaller([spec.package]).install()
+
+    (record,) = spack.build_history.HISTORY.records(spec.name)
+    assert record["hash"] == spec.dag_hash()
+    assert record["version"] == str(spec.version)
+    assert not record["cache"]
+    assert record["jobs"] >= 1
+    assert record["cpu_time"] > 0 and record["peak_rss"] > 0
+    assert set(record["phases"]) == {"stage", "install", "post-install"}
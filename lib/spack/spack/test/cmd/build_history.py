@@ -0,0 +1,63 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import json
+import socket
+
+import pytest
+
+import spack.build_history
+import spack.main
+
+build_history = spack.main.SpackCommand("build-history")
+
+
+@pytest.fixture()
+def mock_history(tmp_path, monkeypatch):
+    history = spack.build_history.BuildHistory(str(tmp_path))
+    monkeypatch.setattr(spack.build_history, "HISTORY", history)
+    host = socket.gethostname()
+    for version, total in (("1.0", 100.0), ("1.1", 110.0), ("2.0", 200.0)):
+        history.add(
+            "zlib",
+            {
+                "version": version,
+                "variants": "+shared",
+                "host": host,
+                "cache": False,
+                "jobs": 8,
+                "time": 0.0,
+                "total": total,
+                "cpu_time": 4 * total,
+                "peak_rss": 2**30,
+            },
+        )
+    history.add("cmake", {"version": "3.27", "host": host, "cache": True, "total": 1.0})
+    return history
+
+
+def test_build_history_show(mock_history):
+    out = build_history("show", "zlib")
+    assert "zlib" in out and "cmake" not in out
+    assert "1.0GiB" in out and "source" in out
+
+    assert "cmake" in build_history("show")
+    records = json.loads(build_history("show", "--json", "zlib"))
+    assert [r["version"] for r in records["zlib"]] == ["1.0", "1.1", "2.0"]
+
+
+def test_build_history_regressions(mock_history):
+    out = build_history("regressions")
+    assert "zlib 1.1 -> 2.0" in out
+    assert "1.0 -> 1.1" not in out
+
+    assert "zlib 1.0 -> 1.1" in build_history("regressions", "--threshold", "5", "zlib")
+    assert "No build time regressions" in build_history("regressions", "cmake")
+
+
+def test_build_history_clear(mock_history):
+    build_history("clear", "zlib")
+    assert mock_history.packages() == ["cmake"]
+    build_history("clear")
+    assert mock_history.packages() == []
@@ -18,9 +18,12 @@
 import spack.main
 import spack.mirror
 import spack.spec
+import spack.util.archive
 import spack.util.url
+import spack.util.web
 from spack.installer import PackageInstaller
 from spack.spec import Spec
+from spack.util.executable import which
 
 buildcache = spack.main.SpackCommand("buildcache")
 install = spack.main.SpackCommand("install")
@@ -36,7 +39,9 @@
 @pytest.fixture()
 def mock_get_specs(database, monkeypatch):
     specs = database.query_local()
-    monkeypatch.setattr(spack.binary_distribution, "update_cache_and_get_specs", lambda: specs)
+    monkeypatch.setattr(
+        spack.binary_distribution, "update_cache_and_get_specs", lambda names=None: specs
+    )
 
 
 @pytest.fixture()
@@ -49,7 +54,9 @@ def mock_get_specs_multiarch(database, monkeypatch):
             spec.architecture = spack.spec.ArchSpec("linux-rhel7-x86_64")
             break
 
-    monkeypatch.setattr(spack.binary_distribution, "update_cache_and_get_specs", lambda: specs)
+    monkeypatch.setattr(
+        spack.binary_distribution, "update_cache_and_get_specs", lambda names=None: specs
+    )
 
 
 @pytest.mark.db
@@ -448,6 +455,234 @@ def test_push_and_install_with_mirror_marked_unsigned_does_not_require_extra_fla
     PackageInstaller([spec.package], **kwargs).install()
 
 
+@pytest.mark.skipif(not which("zstd"), reason="requires zstd to be installed")
+@pytest.mark.parametrize("compression", ["zstd", "gzip+zstd"])
+def test_push_and_install_zstd_tarballs(tmp_path, mutable_database, monkeypatch, compression):
+    """Zstd tarballs are installed when available, and gzip tarballs are kept for older versions
+    of Spack when both are pushed."""
+    # The relocation information is computed once, even when two tarballs are pushed
+    get_buildinfo_dict = spack.binary_distribution.get_buildinfo_dict
+    calls = []
+
+    def _get_buildinfo_dict(spec):
+        calls.append(spec)
+        return get_buildinfo_dict(spec)
+
+    monkeypatch.setattr(spack.binary_distribution, "get_buildinfo_dict", _get_buildinfo_dict)
+    mirror("add", "--unsigned", "my-mirror", str(tmp_path))
+    spec = mutable_database.query_local("libelf", installed=True)[0]
+    buildcache("push", "--compression", compression, "my-mirror", f"/{spec.dag_hash()}")
+    assert calls == [spec]
+
+    with open(
+        tmp_path / "build_cache" / spack.binary_distribution.tarball_name(spec, ".spec.json")
+    ) as f:
+        spec_dict = json.load(f)
+    tarball = (
+        tmp_path / "build_cache" / spack.binary_distribution.tarball_path_name(spec, ".spack")
+    )
+    if compression == "zstd":
+        assert (
+            spec_dict["buildcache_layout_version"]
+            == spack.binary_distribution.ZSTD_BUILD_CACHE_LAYOUT_VERSION
+        )
+        assert tarball.read_bytes()[:4] == spack.util.archive.ZSTD_MAGIC
+    else:
+        assert (
+            spec_dict["buildcache_layout_version"]
+            == spack.binary_distribution.CURRENT_BUILD_CACHE_LAYOUT_VERSION
+        )
+        assert tarball.read_bytes()[:2] == b"\x1f\x8b"
+        assert tarball.with_suffix(".spack.zst").exists()
+
+    spec.package.do_uninstall(force=True)
+    download_result = spack.binary_distribution.download_tarball(spec)
+    assert download_result["tarball_compression"] == "zstd"
+    spack.binary_distribution._delete_staged_downloads(download_result)
+
+    PackageInstaller([spec.package], explicit=True, cache_only=True).install()
+    assert spec.installed
+    assert os.path.isdir(spec.prefix.lib)
+
+
+def test_push_and_install_chunked_tarballs(tmp_path, mutable_database, monkeypatch):
+    """Chunked tarballs are installed from the chunks, and chunks are pushed once."""
+    monkeypatch.setattr(
+        spack.binary_distribution, "chunk_store_location", lambda: str(tmp_path / "chunk-store")
+    )
+    mirror_dir = tmp_path / "mirror"
+    mirror("add", "--unsigned", "my-mirror", str(mirror_dir))
+    spec = mutable_database.query_local("libelf", installed=True)[0]
+    buildcache("push", "--compression", "chunks", "my-mirror", f"/{spec.dag_hash()}")
+
+    with open(
+        mirror_dir / "build_cache" / spack.binary_distribution.tarball_name(spec, ".spec.json")
+    ) as f:
+        spec_dict = json.load(f)
+    assert (
+        spec_dict["buildcache_layout_version"]
+        == spack.binary_distribution.CHUNKED_BUILD_CACHE_LAYOUT_VERSION
+    )
+    chunks = {p.name for p in (mirror_dir / "build_cache" / "_chunks").glob("*/*")}
+    assert chunks
+
+    # Pushing again does not add chunks, and the existing ones are listed rather than looked up
+    # one by one
+    def url_exists(url, *args, **kwargs):
+        assert "_chunks" not in url
+        return os.path.exists(spack.util.url.local_file_path(url))
+
+    monkeypatch.setattr(spack.util.web, "url_exists", url_exists)
+    buildcache("push", "--force", "--compression", "chunks", "my-mirror", f"/{spec.dag_hash()}")
+    assert {p.name for p in (mirror_dir / "build_cache" / "_chunks").glob("*/*")} == chunks
+
+    spec.package.do_uninstall(force=True)
+    PackageInstaller([spec.package], explicit=True, cache_only=True).install()
+    assert spec.installed
+    assert os.path.isdir(spec.prefix.lib)
+    assert {p.name for p in (tmp_path / "chunk-store").glob("*/*")} == chunks
+
+
+def test_copy_and_download_chunked_tarballs(tmp_path, mutable_database):
+    """The chunks of chunked tarballs are copied and downloaded along with the tarballs."""
+    src_dir, dest_dir, download_dir = tmp_path / "src", tmp_path / "dest", tmp_path / "download"
+    mirror("add", "--unsigned", "src", str(src_dir))
+    spec = mutable_database.query_local("libelf", installed=True)[0]
+    buildcache("push", "--compression", "chunks", "src", f"/{spec.dag_hash()}")
+    chunks = {
+        p.relative_to(src_dir / "build_cache")
+        for p in (src_dir / "build_cache" / "_chunks").glob("*/*")
+    }
+    assert chunks
+
+    def url_of(mirror_dir, path):
+        return spack.util.url.path_to_file_url(str(mirror_dir / "build_cache" / path))
+
+    copied = [
+        spack.binary_distribution.tarball_path_name(spec, ".spack"),
+        spack.binary_distribution.tarball_name(spec, ".spec.json"),
+    ]
+    manifest_file = tmp_path / "manifest.json"
+    manifest_file.write_text(
+        json.dumps(
+            {
+                spec.dag_hash(): [
+                    {"src": url_of(src_dir, path), "dest": url_of(dest_dir, path)}
+                    for path in copied
+                ]
+            }
+        )
+    )
+    buildcache("sync", "--manifest-glob", str(manifest_file))
+    for path in copied:
+        assert (dest_dir / "build_cache" / path).exists()
+    assert {
+        p.relative_to(dest_dir / "build_cache")
+        for p in (dest_dir / "build_cache" / "_chunks").glob("*/*")
+    } == chunks
+
+    buildcache("download", "--spec", f"/{spec.dag_hash()}", "--path", str(download_dir))
+    assert {p.relative_to(download_dir) for p in (download_dir / "_chunks").glob("*/*")} == chunks
+
+
+def test_push_update_index_adds_deltas(tmp_path, mutable_database):
+    """Pushing with --update-index adds a delta to the index instead of regenerating it, and
+    clients only fetch the new deltas."""
+    mirror("add", "--unsigned", "my-mirror", str(tmp_path / "mirror"))
+    build_cache = tmp_path / "mirror" / "build_cache"
+    libelf = mutable_database.query_local("libelf", installed=True)[0]
+    libdwarf = mutable_database.query_local("libdwarf", installed=True)[0]
+    callpath = mutable_database.query_local("callpath", installed=True)[0]
+
+    def manifest():
+        return json.loads(
+            (build_cache / spack.binary_distribution.INDEX_DELTAS_MANIFEST).read_text()
+        )
+
+    # The first push generates the index
+    buildcache("push", "--update-index", "my-mirror", f"/{libelf.dag_hash()}")
+    index = (build_cache / "index.json").read_text()
+    assert manifest() == {"base": spack.binary_distribution.compute_hash(index), "deltas": []}
+
+    # The next ones add deltas
+    buildcache("push", "--update-index", "my-mirror", f"/{libdwarf.dag_hash()}")
+    assert (build_cache / "index.json").read_text() == index
+    assert len(manifest()["deltas"]) == 1
+
+    cache = spack.binary_distribution.BinaryCacheIndex(str(tmp_path / "cache"))
+    cache.update()
+    assert cache.find_built_spec(libdwarf) and cache.find_built_spec(libelf)
+    assert not cache.find_built_spec(callpath)
+
+    buildcache(
+        "push", "--update-index", "--only", "package", "my-mirror", f"/{callpath.dag_hash()}"
+    )
+    assert len(manifest()["deltas"]) == 2
+    (entry,) = cache._local_index_cache.values()
+    first_delta = entry["deltas"][0]
+    cache.update()
+    (entry,) = cache._local_index_cache.values()
+    assert len(entry["deltas"]) == 2 and entry["deltas"][0] == first_delta
+    assert cache.find_built_spec(callpath) and cache.find_built_spec(libdwarf)
+
+    # Regenerating the index includes the deltas
+    buildcache("update-index", "my-mirror")
+    assert manifest()["deltas"] == []
+    db = spack.binary_distribution.BuildCacheDatabase(str(tmp_path / "db"))
+    db._read_from_file(str(build_cache / "index.json"))
+    for spec in (libelf, libdwarf, callpath):
+        assert db.query_local_by_spec_hash(spec.dag_hash()).in_buildcache
+
+
+def test_binary_cache_index_lists_specs_lazily(tmp_path, mutable_database):
+    """Specs are listed from the memory mapped spec index, with their dependencies"""
+    mirror("add", "--unsigned", "my-mirror", str(tmp_path / "mirror"))
+    libdwarf = mutable_database.query_local("libdwarf", installed=True)[0]
+    buildcache("push", "--update-index", "my-mirror", f"/{libdwarf.dag_hash()}")
+
+    cache = spack.binary_distribution.BinaryCacheIndex(str(tmp_path / "cache"))
+    cache.update()
+    assert list((tmp_path / "cache").glob("specs-*.idx"))
+    assert cache._spec_index_db is None
+
+    (result,) = cache.find_by_hash(libdwarf.dag_hash())
+    assert result["spec"] == libdwarf and result["spec"]["libelf"] == libdwarf["libelf"]
+    assert {s.dag_hash() for s in cache.get_all_built_specs()} == {
+        libdwarf.dag_hash(),
+        libdwarf["libelf"].dag_hash(),
+    }
+
+    # The index is persisted, and read back by other instances
+    other = spack.binary_distribution.BinaryCacheIndex(str(tmp_path / "cache"))
+    other.regenerate_spec_cache()
+    (found,) = other.find_built_spec(libdwarf)
+    assert found["mirror_url"] == result["mirror_url"]
+    # The spec is the one in the build cache, not the one passed as input
+    assert found["spec"] == libdwarf and found["spec"] is not libdwarf
+
+
+def test_binary_cache_index_lists_specs_by_name(tmp_path, mutable_database, monkeypatch):
+    """Listing the specs of some packages doesn't construct the specs of other packages"""
+    mirror("add", "--unsigned", "my-mirror", str(tmp_path / "mirror"))
+    libdwarf = mutable_database.query_local("libdwarf", installed=True)[0]
+    buildcache("push", "--update-index", "my-mirror", f"/{libdwarf.dag_hash()}")
+
+    cache = spack.binary_distribution.BinaryCacheIndex(str(tmp_path / "cache"))
+    cache.update()
+    (libelf,) = cache.get_all_built_specs(names={"libelf", "zlib"})
+    assert libelf.dag_hash() == libdwarf["libelf"].dag_hash()
+
+    _, record = cache._spec_index_database().query_by_spec_hash(libdwarf.dag_hash())
+    assert not record.materialized
+
+    # Queries and listings of packages by name don't either
+    monkeypatch.setattr(spack.binary_distribution, "BINARY_INDEX", cache)
+    query = spack.binary_distribution.BinaryCacheQuery(all_architectures=True)
+    assert [s.dag_hash() for s in query(Spec("libelf"))] == [libelf.dag_hash()]
+    assert libelf.name in buildcache("list", "--allarch", "libelf")
+    assert not record.materialized
+
+
 def test_skip_no_redistribute(mock_packages, config):
     specs = list(Spec("no-redistribute-dependent").concretized().traverse())
     filtered = spack.cmd.buildcache._skip_no_redistribute_for_public(specs)
@@ -128,6 +128,15 @@ def test_install_dirty_flag(arguments, expected):
     assert args.dirty == expected
 
 
+@pytest.mark.parametrize("value", ["0", "-1", "two"])
+def test_install_concurrent_packages_must_be_positive(value):
+    parser = argparse.ArgumentParser()
+    spack.cmd.install.setup_parser(parser)
+    assert parser.parse_args(["--concurrent-packages", "2"]).concurrent_packages == 2
+    with pytest.raises(argparse.ArgumentTypeError):
+        spack.cmd.common.arguments.positive_int(value)
+
+
 def test_package_output(tmpdir, capsys, install_mockery, mock_fetch):
     """
     Ensure output printed from pkgs is captured by output redirection.
@@ -4,6 +4,7 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 import shutil
 
+import spack.database
 import spack.store
 from spack.database import Database
 from spack.enums import InstallRecordStatus
@@ -77,3 +78,27 @@ def test_reindex_with_deprecated_packages(
     assert old_libelf.deprecated_for == new_libelf.spec.dag_hash()
     assert new_libelf.deprecated_for is None
     assert new_libelf.ref_count == 1
+
+
+def test_concurrent_reindex_is_identical_to_serial(
+    mock_packages, mock_archive, mock_fetch, install_mockery, tmp_path, monkeypatch
+):
+    # Records of specs that are not installed are timestamped at reindex time
+    monkeypatch.setattr(spack.database, "_now", lambda: 1.0)
+    install("libelf@0.8.13")
+    install("libelf@0.8.12")
+    install("libdwarf")
+    deprecate("-y", "libelf@0.8.12", "libelf@0.8.13")
+
+    db = spack.store.STORE.db
+
+    _clear_db(tmp_path)
+    reindex()
+    with open(db._index_path, "rb") as f:
+        serial_index = f.read()
+
+    _clear_db(tmp_path)
+    output = reindex("--jobs", "4")
+    with open(db._index_path, "rb") as f:
+        assert f.read() == serial_index
+    assert "found 2 installations" in output
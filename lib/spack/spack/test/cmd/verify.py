@@ -85,3 +85,4 @@ def test_single_spec_verify_cmd(tmpdir, mock_packages, mock_archive, mock_fetch,
     res = sjson.load(results)
     assert len(res) == 1
     assert res[new_file] == ["added"]
+    assert "1 path failed verification (1 added)" in verify("/%s" % hash, fail_on_error=False)
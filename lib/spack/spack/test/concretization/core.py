@@ -2250,6 +2250,16 @@ def test_result_specs_is_not_empty(self, specs):
 
         assert result.specs
 
+    def test_logic_programs_are_parsed_once(self, monkeypatch):
+        """Tests that logic programs are parsed once, and reused in later solves."""
+        solver = spack.solver.asp.Solver()
+        specs = [Spec("mpileaks")]
+        expected, _, _ = solver.driver.solve(spack.solver.asp.SpackSolverSetup(), specs)
+
+        monkeypatch.setattr(spack.solver.asp, "parse_files", lambda *args: pytest.fail("parsed"))
+        result, _, _ = solver.driver.solve(spack.solver.asp.SpackSolverSetup(), specs)
+        assert result.specs == expected.specs
+
     @pytest.mark.regression("38664")
     def test_unsolved_specs_raises_error(self, monkeypatch, mock_packages):
         """Check that the solver raises an exception when input specs are not
@@ -2561,7 +2571,7 @@ def test_exclude_specs_from_reuse(self, monkeypatch):
         # Prepare a mock mirror that returns an old version of dyninst
         request_str = "callpath ^mpich"
         reused = Spec(f"{request_str} ^dyninst@8.1.1").concretized()
-        monkeypatch.setattr(spack.solver.asp, "_specs_from_mirror", lambda: [reused])
+        monkeypatch.setattr(spack.solver.asp, "_specs_from_mirror", lambda names: [reused])
 
         # Exclude dyninst from reuse, so we expect that the old version is not taken into account
         with spack.config.override(
@@ -3157,11 +3167,66 @@ def test_spec_filters(specs, include, exclude, expected):
     specs = [Spec(x) for x in specs]
     expected = [Spec(x) for x in expected]
     f = spack.solver.asp.SpecFilter(
-        factory=lambda: specs, is_usable=lambda x: True, include=include, exclude=exclude
+        factory=lambda names: specs, is_usable=lambda x: True, include=include, exclude=exclude
     )
     assert f.selected_specs() == expected
 
 
+def test_reuse_compatibility_discards_specs_that_cannot_be_reused(mutable_config, mock_packages):
+    compatibility = spack.solver.asp.ReuseCompatibility([Spec("mpileaks")])
+    libelf = Spec("libelf").concretized()
+    assert compatibility.accepts(libelf)
+
+    # Not a possible dependency of the input
+    assert not compatibility.accepts(Spec("pkg-a").concretized())
+    assert compatibility.incompatible == 0
+
+    # Wrong platform, or wrong target family
+    for arch in ("linux-rhel7-x86_64", f"test-{libelf.os}-aarch64"):
+        other = libelf.copy()
+        other.architecture = spack.spec.ArchSpec(arch)
+        assert not compatibility.accepts(other)
+    assert compatibility.incompatible == 2
+
+
+def test_reuse_compatibility_collapses_indistinguishable_specs(mutable_config, mock_packages):
+    compatibility = spack.solver.asp.ReuseCompatibility([Spec("mpileaks")])
+    libdwarf = Spec("libdwarf").concretized()
+    libelf = libdwarf["libelf"]
+
+    # Same as libelf but for the package hash, which the solver doesn't see
+    rebuilt = libelf.copy()
+    rebuilt._package_hash = "rebuilt"
+    rebuilt._hash = None
+    assert rebuilt.dag_hash() != libelf.dag_hash()
+
+    assert compatibility.collapse([libelf, rebuilt, libelf]) == [libelf]
+    assert compatibility.indistinguishable == 1
+
+    # Specs that other candidates depend on are kept
+    assert compatibility.collapse([rebuilt, libelf, libdwarf]) == [rebuilt, libelf, libdwarf]
+
+
+def test_reusable_specs_pushes_possible_packages_to_sources(
+    mutable_config, mock_packages, monkeypatch
+):
+    libelf, pkg_a = Spec("libelf").concretized(), Spec("pkg-a").concretized()
+    requested = []
+
+    def _specs_from_mirror(names):
+        requested.append(names)
+        return [libelf, pkg_a]
+
+    monkeypatch.setattr(spack.solver.asp, "_specs_from_mirror", _specs_from_mirror)
+    monkeypatch.setattr(spack.solver.asp, "_has_runtime_dependencies", lambda x: True)
+    mutable_config.set("concretizer:reuse", {"from": [{"type": "buildcache"}]})
+    selector = spack.solver.asp.ReusableSpecsSelector(mutable_config)
+    compatibility = spack.solver.asp.ReuseCompatibility([Spec("mpileaks")])
+
+    assert selector.reusable_specs([Spec("mpileaks")], compatibility) == [libelf]
+    assert requested == [compatibility.names]
+
+
 @pytest.mark.regression("38484")
 def test_git_ref_version_can_be_reused(install_mockery, do_not_check_runtimes_on_reuse):
     first_spec = spack.spec.Spec("git-ref-package@git.2.1.5=2.1.5~opt").concretized()
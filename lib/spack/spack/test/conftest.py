@@ -34,6 +34,7 @@
 
 import spack.binary_distribution
 import spack.bootstrap.core
+import spack.build_history
 import spack.caches
 import spack.compiler
 import spack.compilers
@@ -499,6 +500,15 @@ def mock_fetch_cache(monkeypatch):
     monkeypatch.setattr(spack.caches, "FETCH_CACHE", MockCache())
 
 
+@pytest.fixture(autouse=True)
+def mock_build_history(monkeypatch, tmpdir_factory):
+    """Records the installations of each test in a build history of its own."""
+    history_path = tmpdir_factory.mktemp("build_history").strpath
+    monkeypatch.setattr(
+        spack.build_history, "HISTORY", spack.build_history.BuildHistory(history_path)
+    )
+
+
 @pytest.fixture()
 def mock_binary_index(monkeypatch, tmpdir_factory):
     """Changes the directory for the binary index and creates binary index for
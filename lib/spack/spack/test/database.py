@@ -170,8 +170,10 @@ def test_removed_upstream_dep(upstream_and_downstream_db, tmpdir, capsys, config
         upstream_write_db.remove(z)
         upstream_db._read()
 
-        # then rereading the downstream DB should warn about the missing dep
+        # then rereading the downstream DB should warn about the missing dep, when the spec
+        # is constructed
         downstream_db._read_from_file(downstream_db._index_path)
+        assert downstream_db.query_local_by_spec_hash(y.dag_hash()).spec.name == "y"
         assert (
             f"Missing dependency not in database: y/{y.dag_hash(7)} needs z"
             in capsys.readouterr().err
@@ -1035,6 +1037,7 @@ def test_reindex_when_all_prefixes_are_removed(mutable_database, mock_store):
 @pytest.mark.regression("11983")
 def test_check_parents(spec_str, parent_name, expected_nparents, database):
     """Check that a spec returns the correct number of parents."""
+    database.connect_dependents()
     s = database.query_one(spec_str)
 
     parents = s.dependents(name=parent_name)
@@ -1056,6 +1059,7 @@ def test_db_all_hashes(database):
 
 def test_consistency_of_dependents_upon_remove(mutable_database):
     # Check the initial state
+    mutable_database.connect_dependents()
     s = mutable_database.query_one("dyninst")
     parents = s.dependents(name="callpath")
     assert len(parents) == 3
@@ -1065,6 +1069,7 @@ def test_consistency_of_dependents_upon_remove(mutable_database):
     mutable_database.remove("callpath ^mpich2")
 
     # Check the final state
+    mutable_database.connect_dependents()
     s = mutable_database.query_one("dyninst")
     parents = s.dependents(name="callpath")
     assert len(parents) == 2
@@ -1202,3 +1207,273 @@ def test_query_with_predicate_fn(database):
 
     specs = database.query(predicate_fn=lambda x: not spack.repo.PATH.exists(x.spec.name))
     assert not specs
+
+
+def test_binary_index_is_updated_incrementally(tmp_path, default_mock_concretization):
+    root = str(tmp_path)
+    db = spack.database.Database(root, layout=None, index_format="binary")
+    spec = default_mock_concretization("mpileaks")
+    db.add(spec)
+    assert os.path.isfile(db._binary_index_path)
+    assert not os.path.exists(db._index_path)
+
+    # Marking a single spec appends a single entry, and turns the old one into a tombstone
+    size_before = os.path.getsize(db._binary_index_path)
+    db.mark(spec, "explicit", True)
+    entry_size = os.path.getsize(db._binary_index_path) - size_before
+    assert 0 < entry_size < size_before
+    assert db._binary_index.dead_bytes > 0
+
+    # A fresh instance reads the same records
+    fresh_db = spack.database.Database(root, layout=None, index_format="binary")
+    assert fresh_db.query_local(explicit=True) == [spec]
+    assert set(fresh_db.query_local()) == set(db.query_local())
+    fresh_db._check_ref_counts()
+
+    # Removing a spec turns its entry into a tombstone
+    db.remove(spec)
+    assert spec.dag_hash() not in db._binary_index.offsets
+    fresh_db = spack.database.Database(root, layout=None, index_format="binary")
+    assert spec not in fresh_db.query_local()
+    assert set(fresh_db.query_local()) == set(spec.traverse(root=False, deptype=("link", "run")))
+
+
+def test_binary_index_ignores_truncated_entries(tmp_path, default_mock_concretization):
+    root = str(tmp_path)
+    db = spack.database.Database(root, layout=None, index_format="binary")
+    spec = default_mock_concretization("pkg-a")
+    db.add(spec)
+    specs_in_db = db.query_local()
+
+    # Simulate an interrupted append at the end of the file
+    with open(db._binary_index_path, "ab") as f:
+        f.write(spack.database.BinaryIndexFile.encode(spec.dag_hash(), {"spec": {}})[:-1])
+
+    assert spack.database.Database(root, index_format="binary").query_local() == specs_in_db
+
+
+def test_binary_index_with_invalid_header(tmp_path):
+    db = spack.database.Database(str(tmp_path), index_format="binary")
+    with open(db._binary_index_path, "wb") as f:
+        f.write(b"NOTSPACK" + bytes(64))
+
+    with pytest.raises(spack.database.CorruptDatabaseError, match="magic"):
+        db.query_local()
+
+
+@pytest.mark.parametrize("old_format,new_format", [("json", "binary"), ("binary", "json")])
+def test_database_index_format_migration(
+    old_format, new_format, tmp_path, default_mock_concretization
+):
+    root = str(tmp_path)
+    old_db = spack.database.Database(root, layout=None, index_format=old_format)
+    old_db.add(default_mock_concretization("mpileaks"), explicit=True)
+    specs_in_db = old_db.query_local()
+
+    # The existing index is read, whatever its format
+    new_db = spack.database.Database(root, layout=None, index_format=new_format)
+    assert new_db.query_local() == specs_in_db
+
+    # The next write replaces it with the new format
+    new_db.add(default_mock_concretization("pkg-a"))
+    paths = {"json": new_db._index_path, "binary": new_db._binary_index_path}
+    assert os.path.isfile(paths[new_format])
+    assert not os.path.exists(paths[old_format])
+
+    # A database configured with the old format can still read it
+    old_db = spack.database.Database(root, layout=None, index_format=old_format)
+    assert old_db.query_local() == new_db.query_local()
+
+
+def test_journal_is_replayed_on_top_of_index(tmp_path, default_mock_concretization):
+    root = str(tmp_path)
+    db = spack.database.Database(root, layout=None, journal=True)
+    mpileaks = default_mock_concretization("mpileaks")
+    db.add(mpileaks)
+    index_mtime = os.stat(db._index_path).st_mtime_ns
+
+    # Further changes are journaled, and leave index.json untouched
+    pkg_a = default_mock_concretization("pkg-a")
+    db.add(pkg_a, explicit=True)
+    db.remove(mpileaks)
+    assert os.stat(db._index_path).st_mtime_ns == index_mtime
+    assert os.path.getsize(db._journal_path) > 0
+
+    # Readers see the changes, whether they write a journal or not
+    for journal in (True, False):
+        fresh_db = spack.database.Database(root, layout=None, journal=journal)
+        assert fresh_db.query_local(explicit=True) == [pkg_a]
+        assert mpileaks not in fresh_db.query_local()
+        assert set(fresh_db.query_local()) == set(db.query_local())
+        fresh_db._check_ref_counts()
+
+    # Writing without a journal compacts it into index.json
+    fresh_db.mark(pkg_a, "explicit", False)
+    assert not os.path.exists(db._journal_path)
+    with open(db._index_path) as f:
+        assert "snapshot" not in json.load(f)["database"]
+    assert spack.database.Database(root, journal=True).query_local(explicit=False)
+
+
+def test_journal_is_compacted(tmp_path, default_mock_concretization, monkeypatch):
+    monkeypatch.setattr(spack.database.DatabaseJournal, "COMPACTION_THRESHOLD", 0)
+    root = str(tmp_path)
+    db = spack.database.Database(root, layout=None, journal=True)
+    spec = default_mock_concretization("pkg-a")
+    db.add(spec)
+    db.mark(spec, "explicit", True)
+    assert os.path.exists(db._journal_path)
+
+    # Once the journal is large enough, index.json is written again
+    for _ in range(3):
+        db.mark(spec, "explicit", not db.get_record(spec).explicit)
+    assert not os.path.exists(db._journal_path)
+    assert spack.database.Database(root).get_record(spec).explicit is False
+
+
+def test_stale_journal_is_ignored(tmp_path, default_mock_concretization):
+    root = str(tmp_path)
+    db = spack.database.Database(root, layout=None, journal=True)
+    spec = default_mock_concretization("pkg-a")
+    db.add(spec)
+    db.mark(spec, "explicit", True)
+
+    # Rewrite index.json as a version of Spack without journals would
+    with open(db._index_path, "w") as f:
+        db._write_to_file(f)
+    with open(db._journal_path, "ab") as f:
+        f.write(b'{"hash":')
+
+    fresh_db = spack.database.Database(root, layout=None, journal=True)
+    assert fresh_db.query_local(explicit=True) == [spec]
+    fresh_db.mark(spec, "explicit", False)
+    assert spack.database.Database(root).get_record(spec).explicit is False
+    jsonschema.validate(json.load(open(db._index_path)), schema)
+
+
+def _check_secondary_indexes(db):
+    """Check that secondary indexes are consistent with the records in the database"""
+    indexes = db._query_index()
+    expected = spack.database._SecondaryIndexes(db._data)
+    assert indexes.by_name == expected.by_name
+    assert set(indexes.explicit) == set(expected.explicit)
+    assert indexes.by_time == expected.by_time
+
+
+def test_secondary_indexes_are_updated(mutable_database):
+    _check_secondary_indexes(mutable_database)
+
+    mpileaks = mutable_database.query_one("mpileaks ^mpich")
+    mutable_database.mark(mpileaks, "explicit", False)
+    mutable_database.remove(mutable_database.query_one("externaltool"))
+    mutable_database.remove(mpileaks)
+    _check_secondary_indexes(mutable_database)
+
+    mutable_database.add(mpileaks, explicit=True)
+    _check_secondary_indexes(mutable_database)
+    assert mpileaks in mutable_database.query_local("mpileaks", explicit=True)
+
+
+def test_query_only_checks_candidate_records(database, monkeypatch):
+    """Tests that queries by name, virtual, explicit flag or date only check the records in the
+    corresponding secondary indexes.
+    """
+    checked = []
+
+    def _satisfies(self, other, deps=True):
+        checked.append(self.name)
+        return original_satisfies(self, other, deps=deps)
+
+    original_satisfies = spack.spec.Spec.satisfies
+    monkeypatch.setattr(spack.spec.Spec, "satisfies", _satisfies)
+
+    assert len(database.query_local("callpath")) == 3
+    assert set(checked) == {"callpath"}
+
+    checked.clear()
+    assert {s.name for s in database.query_local("mpi")} == {"mpich", "mpich2", "zmpi"}
+    assert set(checked) <= {"mpich", "mpich2", "zmpi", "mpilander"}
+
+    explicit = [rec.spec for rec in database._data.values() if rec.explicit and rec.installed]
+    assert set(database.query_local(explicit=True)) == set(explicit)
+
+    times = sorted(rec.installation_time for rec in database._data.values() if rec.installed)
+    middle = datetime.datetime.fromtimestamp(times[len(times) // 2])
+    recent = database.query_local(start_date=middle)
+    assert recent and all(
+        datetime.datetime.fromtimestamp(database.get_record(s).installation_time) > middle
+        for s in recent
+    )
+    assert len(recent) + len(database.query_local(end_date=middle)) <= len(times)
+
+
+def _materialized(db):
+    return {h for h, rec in db._data.items() if rec.materialized}
+
+
+@pytest.mark.parametrize("index_format", ["json", "binary"])
+def test_specs_are_constructed_lazily(index_format, tmp_path, default_mock_concretization):
+    root = str(tmp_path)
+    mpileaks = default_mock_concretization("mpileaks")
+    spack.database.Database(root, layout=None, index_format=index_format).add(mpileaks)
+
+    # Looking up a hash constructs only the spec and its dependencies
+    db = spack.database.Database(root, layout=None, index_format=index_format)
+    callpath = mpileaks["callpath"]
+    assert db.get_by_hash(callpath.dag_hash()) == [callpath]
+    assert _materialized(db) == {s.dag_hash() for s in callpath.traverse()}
+    assert db.get_record(callpath).spec.dependencies() == callpath.dependencies()
+
+    # Queries by name construct only the specs of that name and their dependencies
+    db = spack.database.Database(root, layout=None, index_format=index_format)
+    assert db.query_local("callpath") == [callpath]
+    assert _materialized(db) == {s.dag_hash() for s in callpath.traverse()}
+
+    # Dependents are connected on request
+    db.connect_dependents()
+    assert db.query_local("callpath")[0].dependents() == [mpileaks]
+    assert _materialized(db) == set(db._data)
+
+
+def test_query_by_name_counts_materializations(tmp_path, default_mock_concretization):
+    root = str(tmp_path)
+    for name in ("mpileaks", "dyninst", "libelf"):
+        spack.database.Database(root, layout=None).add(default_mock_concretization(name))
+
+    db = spack.database.Database(root, layout=None)
+    materialized = []
+    with db.read_transaction():
+        for rec in db._data.values():
+            materialize = rec._materialize
+            rec._materialize = lambda r, f=materialize: materialized.append(r.name) or f(r)
+
+        assert [s.name for s in db.query_local("libelf")] == ["libelf"]
+    assert materialized == ["libelf"]
+
+
+def test_query_restricted_to_names(tmp_path, default_mock_concretization):
+    root = str(tmp_path)
+    spack.database.Database(root, layout=None).add(default_mock_concretization("mpileaks"))
+
+    db = spack.database.Database(root, layout=None)
+    names = {"libelf", "mpich", "zmpi"}
+    assert {s.name for s in db.query(names=names)} == {"libelf", "mpich"}
+    assert [s.name for s in db.query("mpi", names=names)] == ["mpich"]
+    assert not db.query("mpi", names={"libelf"})
+    assert not db.query("callpath", names=names)
+    assert {db._data[h].name for h in _materialized(db)} <= {"libelf", "mpich"}
+
+
+def test_full_rewrite_does_not_construct_specs(tmp_path, default_mock_concretization):
+    root = str(tmp_path)
+    mpileaks = default_mock_concretization("mpileaks")
+    spack.database.Database(root, layout=None).add(mpileaks)
+    with open(os.path.join(root, ".spack-db", "index.json")) as f:
+        expected = json.load(f)["database"]["installs"]
+
+    db = spack.database.Database(root, layout=None)
+    with db.write_transaction():
+        db._dirty = None
+    assert not _materialized(db)
+    with open(db._index_path) as f:
+        assert json.load(f)["database"]["installs"] == expected
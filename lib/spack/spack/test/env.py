@@ -11,8 +11,11 @@
 
 import llnl.util.filesystem as fs
 
+import spack.caches
+import spack.concretize
 import spack.config
 import spack.environment as ev
+import spack.repo
 import spack.solver.asp
 import spack.spec
 from spack.environment.environment import (
@@ -21,6 +24,7 @@
     _error_on_nonempty_view_dir,
 )
 from spack.spec_list import UndefinedReferenceError
+from spack.util.file_cache import FileCache
 
 pytestmark = pytest.mark.not_on_windows("Envs are not supported on windows")
 
@@ -720,6 +724,115 @@ def test_variant_propagation_with_unify_false(tmp_path, mock_packages, config):
         assert node.satisfies("+foo")
 
 
+class _SolveLog:
+    """Records the names of the specs that were solved, also from worker processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self.path.touch()
+
+    def append(self, name):
+        with open(self.path, "a") as f:
+            f.write(f"{name}\n")
+
+    def names(self):
+        return sorted(self.path.read_text().split())
+
+    def clear(self):
+        self.path.write_text("")
+
+
+@pytest.fixture()
+def concretization_cache(tmp_path, monkeypatch):
+    """Enables the cache of concretization results, and records which specs are solved."""
+    monkeypatch.setattr(spack.caches, "MISC_CACHE", FileCache(str(tmp_path / "cache")))
+    solved = _SolveLog(tmp_path / "solved.txt")
+    original_concretize = spack.spec.Spec.concretize
+
+    def _concretize(self, tests=False):
+        solved.append(self.name)
+        original_concretize(self, tests=tests)
+
+    monkeypatch.setattr(spack.spec.Spec, "concretize", _concretize)
+    with spack.config.override("concretizer:cache", True):
+        yield solved
+
+
+def _concretize_unify_false(path, specs):
+    manifest = path / "spack.yaml"
+    manifest.write_text(
+        f"""
+    spack:
+      specs: [{", ".join(specs)}]
+      concretizer:
+        unify: false
+    """
+    )
+    with ev.Environment(path) as env:
+        env.concretize(force=True)
+    return {s.name: s.dag_hash() for s in env.concrete_roots()}
+
+
+def test_concretization_cache_reuses_results(
+    tmp_path, mock_packages, config, concretization_cache
+):
+    """Tests that the results of concretizing specs separately are reused, when nothing that
+    can affect them has changed.
+    """
+    env_dir = tmp_path / "env"
+    env_dir.mkdir()
+    first = _concretize_unify_false(env_dir, ["mpileaks", "pkg-c"])
+    assert concretization_cache.names() == ["mpileaks", "pkg-c"]
+
+    concretization_cache.clear()
+    assert _concretize_unify_false(env_dir, ["mpileaks", "pkg-c"]) == first
+    assert not concretization_cache.names()
+
+    # A change in configuration invalidates the results
+    with spack.config.override("packages:all", {"variants": "~shared"}):
+        _concretize_unify_false(env_dir, ["mpileaks", "pkg-c"])
+    assert concretization_cache.names() == ["mpileaks", "pkg-c"]
+
+
+def test_concretization_cache_key_of_reusable_specs(tmp_path, mutable_database, monkeypatch):
+    """Tests that keys depend on the sources of reusable specs, without constructing them."""
+
+    def _reusable_specs(*args, **kwargs):
+        raise AssertionError("reusable specs are constructed")
+
+    monkeypatch.setattr(spack.solver.asp.ReusableSpecsSelector, "reusable_specs", _reusable_specs)
+    cache = spack.concretize.ConcretizationCache(FileCache(str(tmp_path)))
+    spec = spack.spec.Spec("mpileaks")
+    key = cache.key(spec, False)
+    assert key == cache.key(spec, False)
+
+    mutable_database.remove(mutable_database.query_one("mpileaks ^mpich"))
+    assert cache.key(spec, False) != key
+
+
+def test_concretization_cache_package_change(tmp_path, config, concretization_cache):
+    """Tests that changing a package only invalidates the results of the specs that can
+    depend on it.
+    """
+    builder = spack.repo.MockRepositoryBuilder(tmp_path / "repo")
+    builder.add_package("dep-b")
+    builder.add_package("root-a", dependencies=[("dep-b", None, None)])
+    builder.add_package("root-c")
+    env_dir = tmp_path / "env"
+    env_dir.mkdir()
+
+    with spack.repo.use_repositories(builder.root):
+        _concretize_unify_false(env_dir, ["root-a", "root-c"])
+        assert concretization_cache.names() == ["root-a", "root-c"]
+
+        with open(builder.recipe_filename("dep-b"), "a") as f:
+            f.write("\n# a change to the recipe\n")
+
+        concretization_cache.clear()
+        _concretize_unify_false(env_dir, ["root-a", "root-c"])
+        assert concretization_cache.names() == ["root-a"]
+
+
 def test_env_with_include_defs(mutable_mock_env_path, mock_packages):
     """Test environment with included definitions file."""
     env_path = mutable_mock_env_path
@@ -28,6 +28,8 @@
 import spack.spec
 import spack.store
 import spack.util.lock as lk
+import spack.util.pattern
+import spack.util.spack_json as sjson
 from spack.installer import PackageInstaller
 from spack.main import SpackCommand
 
@@ -722,6 +724,46 @@ def test_install_splice_root_from_binary(
     assert len(spack.store.STORE.db.query()) == len(list(out.traverse()))
 
 
+@pytest.mark.not_on_windows("lacking windows support for binary installs")
+@pytest.mark.parametrize("concurrent_packages", [1, 2])
+def test_install_prefetched_binaries(
+    install_mockery, mock_fetch, mutable_temporary_mirror, monkeypatch, concurrent_packages
+):
+    """Tests installing binaries that are downloaded ahead of their installation, and
+    extracted concurrently with each other."""
+    spec = spack.spec.Spec("pkg-a").concretized()
+    PackageInstaller([spec.package]).install()
+    SpackCommand("buildcache")(
+        "push", "--unsigned", "--update-index", mutable_temporary_mirror, str(spec)
+    )
+    SpackCommand("uninstall")("-ay")
+
+    prefetched = []
+    pop = spack.binary_distribution.BinaryPrefetcher.pop
+
+    def _pop(self, spec):
+        result = pop(self, spec)
+        prefetched.append((spec.name, result is not None))
+        return result
+
+    monkeypatch.setattr(spack.binary_distribution.BinaryPrefetcher, "pop", _pop)
+
+    with spack.config.override("config:binary_prefetch_jobs", 2):
+        PackageInstaller(
+            [spec.package],
+            unsigned=True,
+            package_cache_only=True,
+            dependencies_cache_only=True,
+            concurrent_packages=concurrent_packages,
+        ).install()
+
+    # Build dependencies are not needed when installing from binaries
+    nodes = list(spec.traverse(deptype=("link", "run")))
+    assert sorted(prefetched) == sorted((node.name, True) for node in nodes)
+    for node in nodes:
+        assert spack.store.STORE.db.query_local_by_spec_hash(node.dag_hash()).installed
+
+
 def test_install_task_use_cache(install_mockery, monkeypatch):
     installer = create_installer(["trivial-install-test-package"], {})
     request = installer.build_requests[0]
@@ -732,6 +774,65 @@ def test_install_task_use_cache(install_mockery, monkeypatch):
     assert request.pkg_id in installer.installed
 
 
+@pytest.mark.parametrize(
+    "durations,first,estimate",
+    [
+        # Without past installs, the longest chain of dependencies starts first
+        ({}, "libelf", None),
+        # Past installs make the chain through mpich the critical path
+        (
+            {"mpich": 100.0, "callpath": 1.0, "mpileaks": 1.0},
+            "mpich",
+            "105.000s, with a critical path of 102.000s (from past installs of 3 of 6 packages)",
+        ),
+    ],
+)
+def test_critical_path_priority(install_mockery, monkeypatch, capfd, durations, first, estimate):
+    """Test that ready tasks are ordered by the estimated length of the chain they start."""
+
+    def _recorded_install_times(tasks, installed):
+        return {t.pkg_id: durations[t.pkg.name] for t in tasks if t.pkg.name in durations}
+
+    monkeypatch.setattr(inst, "_recorded_install_times", _recorded_install_times)
+    installer = create_installer(["mpileaks"], {})
+    installer._init_queue()
+
+    assert installer._pop_task().pkg.name == first
+    out = capfd.readouterr()[0]
+    if estimate is None:
+        assert "Estimated install time" not in out
+    else:
+        assert f"Estimated install time: {estimate}\n" in out
+
+
+def test_recorded_install_times(install_mockery, mock_fetch, monkeypatch):
+    """Test that install times are read back from the prefixes of installed specs."""
+    spec = spack.spec.Spec("trivial-install-test-package").concretized()
+    PackageInstaller([spec.package]).install()
+    with open(spec.package.times_log_path) as f:
+        recorded = sjson.load(f)
+
+    task = create_build_task(spec.package)
+    assert inst._recorded_install_times([task], [spec]) == {task.pkg_id: recorded["total"]}
+
+    # Times of builds from sources are not used to estimate binary installs, whether binaries
+    # are required, or only available
+    other = create_build_task(spec.package, {"package_cache_only": True})
+    assert inst._recorded_install_times([other], [spec]) == {}
+
+    monkeypatch.setattr(
+        spack.binary_distribution,
+        "get_mirrors_for_spec",
+        lambda spec, index_only: [{"spec": spec, "mirror_url": "file:///mirror"}],
+    )
+    assert inst._recorded_install_times([task], [spec]) == {}
+
+    no_binaries = create_build_task(spec.package, {"package_use_cache": False})
+    assert inst._recorded_install_times([no_binaries], [spec]) == {
+        no_binaries.pkg_id: recorded["total"]
+    }
+
+
 def test_install_task_requeue_build_specs(install_mockery, monkeypatch, capfd):
     """Check that a missing build_spec spec is added by _install_task."""
 
@@ -1275,6 +1376,85 @@ def test_term_status_line():
     x.add("pkg-a")
     x.add("pkg-b")
     x.clear()
+    x.set_active(["pkg-a", "pkg-c"])
+    x.add("pkg-b")
+    x.clear()
+    x.set_active([])
+
+
+def test_concurrent_install(install_mockery, mock_fetch, monkeypatch):
+    """Tests that independent packages are built concurrently, sharing the available jobs."""
+    monkeypatch.setattr(spack.config, "determine_number_of_jobs", lambda **kwargs: 8)
+    installer = create_installer(["pkg-a", "pkg-c"], {"fake": True, "concurrent_packages": 2})
+
+    spawned = []
+    spawn_task = inst.PackageInstaller._spawn_task
+
+    def _spawn_task(self, task, install_status):
+        spawned.append((task.pkg.name, self._build_jobs_share(), len(self.building)))
+        return spawn_task(self, task, install_status)
+
+    monkeypatch.setattr(inst.PackageInstaller, "_spawn_task", _spawn_task)
+    installer.install()
+
+    assert all(request.pkg.spec.installed for request in installer.build_requests)
+    assert not installer.building
+    assert sorted(name for name, _, _ in spawned) == ["gmake", "pkg-a", "pkg-b", "pkg-c"]
+    # Packages were built two at a time, each with half of the jobs
+    assert any(building == 1 for _, _, building in spawned)
+    assert all(jobs == 4 for _, jobs, _ in spawned)
+
+
+def test_concurrent_install_failure(install_mockery, mock_fetch, monkeypatch):
+    """Tests that a failed concurrent build skips its dependents, but not other builds."""
+    installer = create_installer(["pkg-a", "pkg-c"], {"fake": True, "concurrent_packages": 2})
+
+    spawn = inst.BuildTask.spawn
+
+    def _fail_pkg_b(task, install_status, *, jobs=None):
+        if task.pkg.name == "pkg-b":
+            raise MyBuildException("mock build error for pkg-b")
+        return spawn(task, install_status, jobs=jobs)
+
+    monkeypatch.setattr(inst.BuildTask, "spawn", _fail_pkg_b)
+
+    with pytest.raises(spack.error.InstallError, match="Installation request failed"):
+        installer.install()
+
+    assert any(pkg_id.startswith("pkg-c-") for pkg_id in installer.installed)
+    assert not any(pkg_id.startswith(("pkg-a-", "pkg-b-")) for pkg_id in installer.installed)
+
+
+def test_complete_builds_records_all_finished_builds(install_mockery, monkeypatch):
+    """Tests that the builds finished together are recorded one at a time, outside of any
+    database transaction, even if recording one of them fails."""
+    installer = create_installer(["pkg-a", "pkg-c"], {"fake": True, "concurrent_packages": 2})
+    installer._init_queue()
+    for name in ("pkg-a", "pkg-c"):
+        task = next(t for t in installer.build_tasks.values() if t.pkg.name == name)
+        task.process = spack.util.pattern.Bunch(read_pipe=name)
+        installer.building[task.pkg_id] = task
+
+    monkeypatch.setattr(
+        inst.multiprocessing.connection, "wait", lambda pipes, timeout: sorted(pipes)
+    )
+
+    recorded = []
+
+    def _install(task, install_status, failed_build_requests, build_finished):
+        assert build_finished
+        assert not spack.store.STORE.db.lock.is_write_locked()
+        recorded.append(task.pkg.name)
+        if task.pkg.name == "pkg-a":
+            raise MyBuildException("mock error recording pkg-a")
+
+    monkeypatch.setattr(installer, "_install", _install)
+
+    with pytest.raises(MyBuildException):
+        installer._complete_builds(inst.InstallStatus(2), [], block=True)
+
+    assert recorded == ["pkg-a", "pkg-c"]
+    assert not installer.building
 
 
 @pytest.mark.parametrize("explicit", [True, False])
@@ -0,0 +1,185 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import platform
+import sys
+
+import pytest
+
+import spack.deptypes as dt
+import spack.package_metadata
+import spack.repo
+import spack.util.file_cache
+import spack.variant
+
+
+def _dependencies(pkg):
+    return {
+        (when, name, dep.spec, dep.depflag)
+        for when, deps_by_name in pkg.dependencies.items()
+        for name, dep in deps_by_name.items()
+    }
+
+
+def _values(variant):
+    if isinstance(variant.values, spack.variant.DisjointSetsOfValues):
+        return variant.values.sets
+    return variant.values
+
+
+@pytest.mark.parametrize(
+    "pkg_name",
+    [
+        "mpileaks",
+        "mpich",
+        "conditional-variant-pkg",
+        "multivalue-variant",
+        "mvdefaults",
+        "singlevalue-variant",
+        "requires_clang_or_gcc",
+        "splice-h",
+        "conditional-provider",
+    ],
+)
+def test_directive_data_round_trip(pkg_name, mock_packages):
+    """Tests that the directive data of a package is the same after serialization."""
+    pkg_cls = mock_packages.get_pkg_class(pkg_name)
+    metadata = spack.package_metadata.from_dict(
+        pkg_name,
+        pkg_cls.namespace,
+        spack.package_metadata.to_dict(pkg_cls),
+        mock_packages.get_pkg_class,
+    )
+
+    for attr in ("versions", "provided", "provided_together", "conflicts", "requirements"):
+        assert getattr(metadata, attr) == getattr(pkg_cls, attr)
+    assert _dependencies(metadata) == _dependencies(pkg_cls)
+    assert metadata.variant_names() == pkg_cls.variant_names()
+    for name in pkg_cls.variant_names():
+        expected = pkg_cls.variant_definitions(name)
+        definitions = metadata.variant_definitions(name)
+        assert [when for when, _ in definitions] == [when for when, _ in expected]
+        for (_, variant), (_, expected_variant) in zip(definitions, expected):
+            assert variant.default == expected_variant.default
+            assert _values(variant) == _values(expected_variant)
+    assert metadata.possible_dependencies() == pkg_cls.possible_dependencies()
+
+
+def test_variant_validators_are_called_from_package_class(mock_packages, monkeypatch):
+    """Tests that validators defined in packages are only used, and the package class is only
+    loaded, when a variant value is validated."""
+    pkg_cls = mock_packages.get_pkg_class("cmake-client")
+    loaded = []
+
+    def _get_pkg_class(name):
+        loaded.append(name)
+        return mock_packages.get_pkg_class(name)
+
+    metadata = spack.package_metadata.from_dict(
+        "cmake-client", pkg_cls.namespace, spack.package_metadata.to_dict(pkg_cls), _get_pkg_class
+    )
+    assert not loaded
+
+    ((_, variant),) = metadata.variant_definitions("generator")
+    variant.validate_or_raise(
+        spack.variant.SingleValuedVariant("generator", "ninja"), "cmake-client"
+    )
+    with pytest.raises(spack.variant.InvalidVariantValueError):
+        variant.validate_or_raise(
+            spack.variant.SingleValuedVariant("generator", "xcode"), "cmake-client"
+        )
+    assert loaded
+
+
+def test_dependency_patches_are_not_serialized(mock_packages):
+    pkg_cls = mock_packages.get_pkg_class("patch-a-dependency")
+    with pytest.raises(spack.package_metadata.MetadataSerializationError):
+        spack.package_metadata.to_dict(pkg_cls)
+
+
+@pytest.fixture()
+def metadata_repo(tmp_path, monkeypatch):
+    """Returns a repository builder, and a function creating new Repo objects for it, as if
+    each one was in a new process."""
+    builder = spack.repo.MockRepositoryBuilder(tmp_path / "repo", namespace="metadata")
+    cache = spack.util.file_cache.FileCache(str(tmp_path / "cache"))
+
+    def _repo():
+        for name in list(sys.modules):
+            if name.startswith("spack.pkg.metadata."):
+                monkeypatch.delitem(sys.modules, name)
+        return spack.repo.Repo(builder.root, cache=cache)
+
+    return builder, _repo
+
+
+def test_package_is_not_loaded_when_metadata_is_cached(metadata_repo, monkeypatch):
+    builder, make_repo = metadata_repo
+    builder.add_package("pkg-b")
+    builder.add_package("pkg-a", dependencies=[("pkg-b@2:", "build", "@3")])
+
+    # The first time, the package class is loaded
+    repo = make_repo()
+    pkg_cls = repo.get_pkg_metadata("pkg-a")
+    assert pkg_cls is repo.get_pkg_class("pkg-a")
+
+    # Afterwards, the package class is not loaded anymore
+    repo = make_repo()
+    monkeypatch.setattr(repo, "get_pkg_class", lambda name: pytest.fail(f"{name} was loaded"))
+    metadata = repo.get_pkg_metadata("pkg-a")
+    assert isinstance(metadata, spack.package_metadata.PackageMetadata)
+    assert metadata.fullname == "metadata.pkg-a"
+    assert metadata.versions == pkg_cls.versions
+    assert _dependencies(metadata) == _dependencies(pkg_cls)
+    assert metadata.dependencies_of_type(dt.BUILD) == {"pkg-b"}
+
+    # Metadata is kept in memory
+    assert repo.get_pkg_metadata("pkg-a") is metadata
+
+
+def test_metadata_is_invalidated_when_package_changes(metadata_repo):
+    builder, make_repo = metadata_repo
+    builder.add_package("pkg-b")
+    builder.add_package("pkg-a")
+    make_repo().get_pkg_metadata("pkg-a")
+
+    builder.add_package("pkg-a", dependencies=[("pkg-b", None, None)])
+    repo = make_repo()
+    assert repo.get_pkg_metadata("pkg-a").dependency_names() == ["pkg-b"]
+    assert isinstance(repo.get_pkg_metadata("pkg-a"), type)
+
+    repo = make_repo()
+    metadata = repo.get_pkg_metadata("pkg-a")
+    assert isinstance(metadata, spack.package_metadata.PackageMetadata)
+    assert metadata.dependency_names() == ["pkg-b"]
+
+
+def test_metadata_is_not_shared_across_machines(metadata_repo, monkeypatch):
+    builder, make_repo = metadata_repo
+    builder.add_package("pkg-a")
+    monkeypatch.setattr(platform, "machine", lambda: "aarch64")
+    make_repo().get_pkg_metadata("pkg-a")
+
+    # An entry written on another machine is not used
+    monkeypatch.setattr(platform, "machine", lambda: "x86_64")
+    assert isinstance(make_repo().get_pkg_metadata("pkg-a"), type)
+
+    repo = make_repo()
+    assert isinstance(repo.get_pkg_metadata("pkg-a"), spack.package_metadata.PackageMetadata)
+
+
+def test_loaded_package_class_is_returned(metadata_repo):
+    builder, make_repo = metadata_repo
+    builder.add_package("pkg-a")
+    make_repo().get_pkg_metadata("pkg-a")
+
+    repo = make_repo()
+    pkg_cls = repo.get_pkg_class("pkg-a")
+    assert repo.get_pkg_metadata("pkg-a") is pkg_cls
+
+
+def test_unknown_package_raises(metadata_repo):
+    _, make_repo = metadata_repo
+    with pytest.raises(spack.repo.UnknownPackageError):
+        make_repo().get_pkg_metadata("pkg-a")
@@ -105,6 +105,7 @@ def test_buildcache(mock_archive, tmp_path, monkeypatch, mutable_config):
         buildinfo = bindist.read_buildinfo_file(spec.prefix)
         assert buildinfo["relocate_textfiles"] == ["dummy.txt"]
         assert buildinfo["relocate_links"] == ["link_to_dummy.txt"]
+        assert buildinfo["relocation_offsets"]["dummy.txt"]["offsets"] == [0]
 
         args = parser.parse_args(["keys"])
         buildcache.buildcache(parser, args)
@@ -13,6 +13,7 @@
 import spack.relocate
 import spack.relocate_text as relocate_text
 import spack.repo
+import spack.util.elf
 import spack.util.executable
 
 pytestmark = pytest.mark.not_on_windows("Tests fail on Windows")
@@ -197,6 +198,37 @@ def test_relocate_elf_binaries_absolute_paths(binary_with_rpaths, copy_binary, p
     assert "/foo/lib:/usr/lib64" in rpaths_for(new_binary)
 
 
+@pytest.mark.requires_executables("gcc")
+@skip_unless_linux
+def test_relocate_elf_binaries_without_patchelf(
+    binary_with_rpaths, copy_binary, prefix_tmpdir, monkeypatch
+):
+    """RPATHs that grow are rewritten in-process, without running patchelf"""
+    monkeypatch.setattr(spack.relocate, "_patchelf", lambda: pytest.fail("patchelf was run"))
+    orig_binary = binary_with_rpaths(rpaths=[str(prefix_tmpdir.mkdir("lib")), "/usr/lib64"])
+    new_binary = copy_binary(orig_binary)
+    new_root = "/very/long/new/root/" + "x" * 200
+
+    spack.relocate.relocate_elf_binaries(
+        binaries=[str(new_binary)],
+        orig_root=str(orig_binary.dirpath()),
+        new_root=None,
+        new_prefixes={str(orig_binary.dirpath()): new_root},
+        rel=False,
+        orig_prefix=None,
+        new_prefix=None,
+    )
+    assert spack.util.elf.get_rpaths(str(new_binary)) == [new_root + "/lib", "/usr/lib64"]
+
+    spack.relocate.new_relocate_elf_binaries(
+        [str(new_binary)], {new_root: str(prefix_tmpdir) + "/" + "y" * 300}
+    )
+    assert spack.util.elf.get_rpaths(str(new_binary)) == [
+        str(prefix_tmpdir) + "/" + "y" * 300 + "/lib",
+        "/usr/lib64",
+    ]
+
+
 @pytest.mark.requires_executables("patchelf", "file", "gcc")
 @skip_unless_linux
 def test_relocate_elf_binaries_relative_paths(binary_with_rpaths, copy_binary):
@@ -277,6 +309,67 @@ def test_relocate_text_bin_raise_if_new_prefix_is_longer(tmpdir):
         spack.relocate.relocate_text_bin([fpath], {short_prefix: long_prefix})
 
 
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_relocate_text_bin_in_parallel(tmp_path, jobs):
+    """Binaries relocated by several threads are returned in order, and errors are raised"""
+    binaries = []
+    for i in range(10):
+        binary = tmp_path / f"bin{i}"
+        binary.write_bytes(b"\0/old/prefix/lib\0" if i % 2 else b"\0no prefix\0")
+        binaries.append(str(binary))
+
+    changed = spack.relocate.relocate_text_bin(binaries, {"/old/prefix": "/new/prefix"}, jobs=jobs)
+    assert changed == binaries
+    assert (tmp_path / "bin3").read_bytes() == b"\0/new/prefix/lib\0"
+
+    with pytest.raises(relocate_text.CannotGrowString):
+        spack.relocate.relocate_text_bin(binaries, {"/new/prefix": "/longer/prefix"}, jobs=jobs)
+
+
+@pytest.mark.requires_executables("gcc")
+@skip_unless_linux
+def test_relocation_at_recorded_offsets(binary_with_rpaths, prefix_tmpdir, monkeypatch):
+    """Relocating binaries at the recorded offsets, after their RPATHs were relocated, gives
+    the same result as scanning them"""
+    old_prefix = "/usr/" + "x" * 40
+    executable = binary_with_rpaths(
+        rpaths=[old_prefix + "/lib", "/usr/lib64"], message=old_prefix + "/share"
+    )
+    root = str(executable.dirpath())
+    offsets = spack.relocate.relocation_offsets(
+        root, [], [executable.basename], [old_prefix], [old_prefix]
+    )
+    entry = offsets[executable.basename]
+    assert entry["size"] == os.path.getsize(str(executable))
+    assert len(entry["offsets"]) >= 2
+    assert len(entry["elf_strings"]) == 1
+
+    scanned = prefix_tmpdir.join("scanned.x")
+    shutil.copy(str(executable), str(scanned))
+    prefix_to_prefix = {old_prefix: "/opt/new"}
+    spack.relocate.new_relocate_elf_binaries([str(scanned)], prefix_to_prefix)
+    spack.relocate.relocate_text_bin([str(scanned)], prefix_to_prefix)
+
+    # The binary with recorded offsets is not scanned
+    monkeypatch.setattr(
+        relocate_text.BinaryFilePrefixReplacer, "apply_to_filename", lambda *args: pytest.fail()
+    )
+    spack.relocate.new_relocate_elf_binaries([str(executable)], prefix_to_prefix)
+    spack.relocate.relocate_text_bin(
+        [str(executable)], prefix_to_prefix, offsets={str(executable): entry}
+    )
+
+    assert executable.read_binary() == scanned.read_binary()
+    assert spack.util.elf.get_rpaths(str(executable)) == ["/opt/new/lib", "/usr/lib64"]
+    assert not text_in_bin(old_prefix, executable)
+
+
+def test_map_in_batches_keeps_order():
+    files = [str(i) for i in range(50)]
+    assert spack.relocate._map_in_batches(list, files, jobs=4) == files
+    assert spack.relocate._map_in_batches(lambda batch: None, files, jobs=4) == []
+
+
 @pytest.mark.requires_executables("install_name_tool", "file", "cc")
 def test_fixup_macos_rpaths(make_dylib, make_object_file):
     compiler_cls = spack.repo.PATH.get_pkg_class("apple-clang")
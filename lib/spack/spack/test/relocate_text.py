@@ -237,3 +237,105 @@ def test_relocate_text_filters_redundant_entries():
     replacer_2 = relocate_text.TextFilePrefixReplacer.from_strings_or_bytes(mapping)
     assert not replacer_1.prefix_to_prefix
     assert not replacer_2.prefix_to_prefix
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 13, 64, 1 << 20])
+def test_binary_replacement_in_chunks(chunk_size):
+    """Matches across chunk boundaries, and their lookahead window, are replaced as if the
+    whole file was read at once"""
+    prefix_to_prefix = OrderedDict(
+        [(b"/old/prefix/pkg", b"/new/pkg"), (b"/old/prefix", b"/new/prefix")]
+    )
+    before = (
+        b"\0\0/old/prefix/pkg/lib\0 /old/prefix/bin\0xx/old/prefix/pkg/include\0"
+        + b"\x7fELF" * 10
+        + b"/old/prefix/pkg/lib/libfoo.so.1.2.3\0/old/prefix"
+    )
+    after = (
+        b"\0\0////////new/pkg/lib\0 /new/prefix/bin\0xx////////new/pkg/include\0"
+        + b"\x7fELF" * 10
+        + b"////////new/pkg/lib/libfoo.so.1.2.3\0/new/prefix"
+    )
+
+    f = io.BytesIO(before)
+    relocate_text.BinaryFilePrefixReplacer(prefix_to_prefix, chunk_size=chunk_size).apply_to_file(
+        f
+    )
+    assert f.getvalue() == after
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 20])
+def test_binary_replacement_in_chunks_checks_null_terminator(chunk_size):
+    """The null terminator after a prefix is found even if it's in another chunk"""
+    replacer = relocate_text.BinaryFilePrefixReplacer(
+        OrderedDict([(b"pkg-abcdef", b"pkg-xyzabc")]), suffix_safety_size=7, chunk_size=chunk_size
+    )
+    with pytest.raises(relocate_text.CannotShrinkCString):
+        replacer.apply_to_file(io.BytesIO(b"Binary with pkg-abcdef\0/xx\0"))
+
+
+@pytest.mark.parametrize(
+    "replacer_type,before",
+    [
+        (
+            relocate_text.BinaryFilePrefixReplacer,
+            b"\0\0/old/prefix/pkg/lib\0 /old/prefix/bin\0xx/old/prefix/pkg/include\0/old/prefix",
+        ),
+        (
+            relocate_text.TextFilePrefixReplacer,
+            b"#!/old/prefix/bin/sh\nPATH=/old/prefix/pkg/bin:$PATH\n/old/prefix/pkg /old/prefix",
+        ),
+    ],
+)
+def test_replacement_at_offsets(replacer_type, before, tmp_path):
+    """Replacing at the offsets found earlier gives the same result as scanning the file"""
+    prefix_to_prefix = OrderedDict(
+        [(b"/old/prefix/pkg", b"/new/pkg"), (b"/old/prefix", b"/new/prefix")]
+    )
+    replacer = replacer_type(prefix_to_prefix)
+    scanned, patched = tmp_path / "scanned", tmp_path / "patched"
+    scanned.write_bytes(before)
+    patched.write_bytes(before)
+
+    offsets = replacer.find_offsets(str(patched))
+    assert len(offsets) == 4
+    assert replacer.apply_at_offsets(str(patched), len(before), offsets) is True
+    replacer.apply_to_filename(str(scanned))
+    assert patched.read_bytes() == scanned.read_bytes()
+
+
+@pytest.mark.parametrize(
+    "replacer_type", [relocate_text.BinaryFilePrefixReplacer, relocate_text.TextFilePrefixReplacer]
+)
+def test_replacement_at_stale_offsets(replacer_type, tmp_path):
+    """Stale offsets are detected before the file is modified"""
+    replacer = replacer_type(OrderedDict([(b"/old/prefix", b"/new/prefix")]))
+    before = b"abc /old/prefix/bin\0 /old/prefix/lib\0"
+    f = tmp_path / "file"
+    f.write_bytes(before)
+    offsets = replacer.find_offsets(str(f))
+
+    # The file has a different size
+    assert replacer.apply_at_offsets(str(f), len(before) + 1, offsets) is None
+
+    # There is no match at the second offset
+    assert replacer.apply_at_offsets(str(f), len(before), [offsets[0], offsets[1] + 1]) is None
+
+    assert f.read_bytes() == before
+
+
+def test_binary_replacement_at_rewritten_offsets(tmp_path):
+    """Offsets in ranges that were relocated already may not match anymore"""
+    replacer = relocate_text.BinaryFilePrefixReplacer(
+        OrderedDict([(b"/old/prefix", b"/new/prefix")])
+    )
+    f = tmp_path / "binary"
+    f.write_bytes(b"\0/old/prefix/lib\0/old/prefix/bin\0")
+    offsets = replacer.find_offsets(str(f))
+    assert offsets == [1, 17]
+
+    # Say the RPATH at offset 1 was rewritten by other means
+    f.write_bytes(b"\0/new/prefix/lib\0/old/prefix/bin\0")
+    assert replacer.apply_at_offsets(str(f), 33, offsets) is None
+    assert replacer.apply_at_offsets(str(f), 33, offsets, rewritten=[(1, 15)]) is True
+    assert f.read_bytes() == b"\0/new/prefix/lib\0/new/prefix/bin\0"
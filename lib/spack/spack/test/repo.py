@@ -2,8 +2,11 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import concurrent.futures
+import multiprocessing
 import os
 import pathlib
+import sys
 
 import pytest
 
@@ -11,7 +14,9 @@
 import spack.paths
 import spack.repo
 import spack.spec
+import spack.util.cpus
 import spack.util.file_cache
+import spack.util.parallel
 
 
 @pytest.fixture(params=["packages", "", "foo"])
@@ -302,3 +307,35 @@ def test_get_repo(self, mock_test_cache):
         # foo is not there, raise
         with pytest.raises(spack.repo.UnknownNamespaceError):
             repo.get_repo("foo")
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork", reason="indexes are built in worker processes"
+)
+def test_repo_indexes_built_concurrently(mock_packages, tmp_path, monkeypatch):
+    """Tests that indexes built by loading package classes in worker processes are the same as
+    indexes built serially.
+    """
+    monkeypatch.setattr(spack.util.cpus, "cpus_available", lambda: 4)
+    # Process pools are disabled in tests by default
+    monkeypatch.setattr(
+        spack.util.parallel,
+        "make_concurrent_executor",
+        lambda jobs, **kwargs: concurrent.futures.ProcessPoolExecutor(jobs),
+    )
+
+    def _indexes(name):
+        cache = spack.util.file_cache.FileCache(str(tmp_path / name))
+        repo = spack.repo.RepoPath(spack.paths.mock_packages_path, cache=cache).repos[0]
+        return repo.provider_index, repo.tag_index.tags, repo.patch_index.index
+
+    monkeypatch.setattr(spack.repo.RepoIndex, "CONCURRENT_UPDATE_THRESHOLD", sys.maxsize)
+    expected = _indexes("serial")
+
+    # No package should be updated in this process
+    def _fail(self, pkg_fullname):
+        raise AssertionError(f"{pkg_fullname} was updated serially")
+
+    monkeypatch.setattr(spack.repo.RepoIndex, "CONCURRENT_UPDATE_THRESHOLD", 0)
+    monkeypatch.setattr(spack.repo.Indexer, "update", _fail)
+    assert _indexes("concurrent") == expected
@@ -0,0 +1,115 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Unit tests for the cache of facts generated from package directives."""
+import pytest
+
+import spack.package_base
+import spack.package_metadata
+import spack.repo
+import spack.util.file_cache
+from spack.solver import asp
+from spack.solver.core import fn
+from spack.solver.facts_cache import FactsCache, LocalId, render_fact, replay
+
+pytestmark = pytest.mark.usefixtures("mock_packages", "config")
+
+
+@pytest.mark.parametrize(
+    "atom",
+    [
+        fn.deprecated_versions_not_allowed(),
+        fn.pkg_fact("foo", fn.condition(LocalId(3))),
+        fn.condition_reason(LocalId(0), 'foo depends on "bar" when +baz'),
+        fn.pkg_fact("foo", fn.conflict(LocalId(1), LocalId(2), None)),
+        fn.variant_default_value_from_package_py(LocalId(5), True),
+        fn.attr("depends_on", fn.node(0, "foo"), -1),
+    ],
+)
+def test_rendered_facts_are_the_same_as_clingo_output(atom):
+    assert replay(render_fact(atom), 0) == f"{atom.symbol()}.\n"
+
+
+def _directive_facts(pkg, cache, metadata=None):
+    setup = asp.SpackSolverSetup()
+    setup.possible_virtuals = {"mpi"}
+    setup._facts_cache = cache
+    if metadata is not None:
+        setup._pkg_metadata[metadata.name] = metadata
+    setup.package_directive_rules(pkg)
+    return (
+        setup.gen.value(),
+        sorted(setup.variant_ids_by_def_id.values()),
+        setup.version_constraints,
+        setup.target_constraints,
+        setup.compiler_version_constraints,
+    )
+
+
+@pytest.mark.parametrize(
+    "pkg_name", ["mpileaks", "conditional-variant-pkg", "requires_clang_or_gcc", "splice-h"]
+)
+def test_replayed_facts_are_the_same_as_generated_facts(pkg_name, tmp_path):
+    """Tests that facts replayed from the cache are the same as generated facts, both when they
+    are recorded and when they are read back from the cache.
+    """
+    # Load the classes of all the packages that may be consulted, as a long-lived process
+    # would, so that the result doesn't depend on the tests run before
+    for name in spack.package_base.possible_dependencies(pkg_name):
+        if not spack.repo.PATH.is_virtual(name):
+            spack.repo.PATH.get_pkg_class(name)
+
+    pkg_cls = spack.repo.PATH.get_pkg_class(pkg_name)
+    metadata = spack.package_metadata.from_dict(
+        pkg_name,
+        pkg_cls.namespace,
+        spack.package_metadata.to_dict(pkg_cls),
+        spack.repo.PATH.get_pkg_class,
+        fingerprint="fingerprint",
+    )
+    file_cache = spack.util.file_cache.FileCache(str(tmp_path))
+
+    expected = _directive_facts(pkg_cls, FactsCache(file_cache))
+    assert _directive_facts(metadata, FactsCache(file_cache), metadata) == expected
+    assert (tmp_path / "solver" / "facts" / "builtin.mock" / f"{pkg_name}.json").exists()
+    assert _directive_facts(metadata, FactsCache(file_cache), metadata) == expected
+
+
+def test_fingerprints_do_not_depend_on_loaded_classes(tmp_path):
+    """A package has the same fingerprint whether it is given as its class, because the class
+    is loaded already, or as metadata from the package metadata cache."""
+    pkg_cls = spack.repo.PATH.get_pkg_class("splice-z")
+    cache = spack.package_metadata.PackageMetadataCache(
+        spack.util.file_cache.FileCache(str(tmp_path)), pkg_cls.namespace
+    )
+    cache.get("splice-z", spack.repo.PATH.get_pkg_class)
+    metadata = cache.get("splice-z", spack.repo.PATH.get_pkg_class)
+    assert isinstance(metadata, spack.package_metadata.PackageMetadata)
+
+    setup = asp.SpackSolverSetup()
+    assert setup.pkg_fingerprint(metadata) is not None
+    assert setup.pkg_fingerprint(pkg_cls) == setup.pkg_fingerprint(metadata)
+
+
+def test_cached_facts_are_not_regenerated(tmp_path, monkeypatch):
+    pkg_cls = spack.repo.PATH.get_pkg_class("mpileaks")
+    metadata = spack.package_metadata.from_dict(
+        "mpileaks",
+        pkg_cls.namespace,
+        spack.package_metadata.to_dict(pkg_cls),
+        spack.repo.PATH.get_pkg_class,
+        fingerprint="fingerprint",
+    )
+    file_cache = spack.util.file_cache.FileCache(str(tmp_path))
+    expected = _directive_facts(metadata, FactsCache(file_cache), metadata)
+
+    monkeypatch.setattr(
+        asp.SpackSolverSetup, "_directive_rules", lambda *args: pytest.fail("not cached")
+    )
+    assert _directive_facts(metadata, FactsCache(file_cache), metadata) == expected
+
+    # A different package fingerprint invalidates the entry
+    metadata.fingerprint = "other fingerprint"
+    with pytest.raises(pytest.fail.Exception, match="not cached"):
+        _directive_facts(metadata, FactsCache(file_cache), metadata)
@@ -5,16 +5,29 @@
 
 import gzip
 import hashlib
+import io
 import os
 import shutil
 import tarfile
+import zlib
 from pathlib import Path, PurePath
 
+import pytest
+
 import spack.util.crypto
-from spack.util.archive import gzip_compressed_tarfile, reproducible_tarfile_from_prefix
+from spack.util.archive import (
+    GzipBlockReader,
+    GzipBlockWriter,
+    gzip_compressed_tarfile,
+    open_compressed_tarfile,
+    reproducible_tarfile_from_prefix,
+    zstd_compressed_tarfile,
+)
+from spack.util.executable import which
 
 
-def test_gzip_compressed_tarball_is_reproducible(tmpdir):
+@pytest.mark.parametrize("jobs", [None, 1, 2])
+def test_gzip_compressed_tarball_is_reproducible(tmpdir, jobs):
     """Test gzip_compressed_tarfile and reproducible_tarfile_from_prefix for reproducibility"""
 
     with tmpdir.as_cwd():
@@ -45,7 +58,11 @@ def test_gzip_compressed_tarball_is_reproducible(tmpdir):
         (dir_b / "symlink_dir").symlink_to(PurePath("..", "a"))
 
         # Create the first tarball
-        with gzip_compressed_tarfile("fst.tar.gz") as (tar, gzip_checksum_1, tarfile_checksum_1):
+        with gzip_compressed_tarfile("fst.tar.gz", jobs=jobs) as (
+            tar,
+            gzip_checksum_1,
+            tarfile_checksum_1,
+        ):
             reproducible_tarfile_from_prefix(tar, "root")
 
         # Expected mode for non-dirs is 644 if not executable, 755 if executable. Better to compute
@@ -136,7 +153,11 @@ def test_gzip_compressed_tarball_is_reproducible(tmpdir):
             tar.extractall()
 
         # Create the second tarball
-        with gzip_compressed_tarfile("snd.tar.gz") as (tar, gzip_checksum_2, tarfile_checksum_2):
+        with gzip_compressed_tarfile("snd.tar.gz", jobs=jobs) as (
+            tar,
+            gzip_checksum_2,
+            tarfile_checksum_2,
+        ):
             reproducible_tarfile_from_prefix(tar, "root")
 
         # Verify the .tar.gz checksums are identical and correct
@@ -155,3 +176,96 @@ def test_gzip_compressed_tarball_is_reproducible(tmpdir):
                 == spack.util.crypto.checksum_stream(hashlib.sha256, f)
                 == spack.util.crypto.checksum_stream(hashlib.sha256, g)
             )
+
+
+#: Compressible data spanning several blocks of 4 KiB
+DATA = b"".join(b"%d spack " % (i % 1000) + bytes([i % 251]) for i in range(10000))
+
+
+def _block_compress(data, jobs, block_size=4096):
+    out = io.BytesIO()
+    writer = GzipBlockWriter(out, jobs=jobs, block_size=block_size)
+    for start in range(0, len(data), 1000):
+        writer.write(data[start : start + 1000])
+    writer.close()
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("data", [DATA, b""], ids=["data", "empty"])
+def test_gzip_block_writer(data):
+    """Test that blocks are standard gzip members, and do not depend on the number of jobs"""
+    compressed = _block_compress(data, jobs=1)
+    assert compressed == _block_compress(data, jobs=3)
+    assert gzip.decompress(compressed) == data
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+@pytest.mark.parametrize(
+    "compressed",
+    [
+        _block_compress(DATA, jobs=1),
+        # Members without recorded size are decompressed sequentially
+        gzip.compress(DATA),
+        gzip.compress(DATA[:5000]) + _block_compress(DATA, jobs=1) + gzip.compress(b"x"),
+    ],
+    ids=["blocks", "stream", "mixed"],
+)
+def test_gzip_block_reader(compressed, jobs):
+    expected = gzip.decompress(compressed)
+    with io.BufferedReader(GzipBlockReader(io.BytesIO(compressed), jobs=jobs)) as f:
+        assert f.read() == expected
+
+        # Seeking backwards and forwards
+        for offset in (len(expected) // 2, 5, len(expected) - 3, 4096):
+            f.seek(offset)
+            assert f.read(1000) == expected[offset : offset + 1000]
+
+
+def test_gzip_block_reader_detects_corruption():
+    compressed = bytearray(_block_compress(DATA, jobs=1))
+    compressed[-10] ^= 0xFF
+    with io.BufferedReader(GzipBlockReader(io.BytesIO(compressed), jobs=2)) as f:
+        with pytest.raises(zlib.error):
+            f.read()
+
+
+@pytest.mark.parametrize("jobs", [None, 2])
+def test_open_compressed_tarfile(tmp_path, jobs):
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "data").write_bytes(DATA)
+    (root / "link").symlink_to("data")
+
+    with gzip_compressed_tarfile(str(tmp_path / "root.tar.gz"), jobs=jobs) as (tar, _, _):
+        reproducible_tarfile_from_prefix(
+            tar, str(root), path_to_name=lambda p: p[len(str(tmp_path)) + 1 :]
+        )
+
+    with open_compressed_tarfile(str(tmp_path / "root.tar.gz"), jobs=2) as tar:
+        assert tar.getnames() == ["root", "root/data", "root/link"]
+        tar.extractall(tmp_path / "extracted")
+    assert (tmp_path / "extracted" / "root" / "data").read_bytes() == DATA
+    assert os.readlink(tmp_path / "extracted" / "root" / "link") == "data"
+
+
+@pytest.mark.skipif(not which("zstd"), reason="requires zstd to be installed")
+def test_zstd_compressed_tarfile(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "data").write_bytes(DATA)
+
+    tarball = str(tmp_path / "root.tar.zst")
+    with zstd_compressed_tarfile(tarball, jobs=2) as (tar, zstd_checksum, tarfile_checksum):
+        reproducible_tarfile_from_prefix(
+            tar, str(root), path_to_name=lambda p: p[len(str(tmp_path)) + 1 :]
+        )
+
+    with open(tarball, "rb") as f:
+        assert zstd_checksum.hexdigest() == spack.util.crypto.checksum_stream(hashlib.sha256, f)
+
+    # Zstd tarfiles are streamed from the decompressor
+    with open_compressed_tarfile(tarball) as tar:
+        assert [m.name for m in tar] == ["root", "root/data"]
+    with open_compressed_tarfile(tarball) as tar:
+        tar.extractall(tmp_path / "extracted")
+    assert (tmp_path / "extracted" / "root" / "data").read_bytes() == DATA
@@ -0,0 +1,96 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import io
+import os
+import random
+import tarfile
+
+import pytest
+
+from spack.util.chunking import (
+    MAX_CHUNK_SIZE,
+    MIN_CHUNK_SIZE,
+    ChunkChecksumError,
+    ChunkingTarWriter,
+    ChunkStore,
+    chunk_digest,
+    compress_chunk,
+    content_defined_chunks,
+    open_chunked_tarfile,
+)
+
+
+def _random_bytes(n: int, seed: int = 0) -> bytes:
+    return random.Random(seed).getrandbits(8 * n).to_bytes(n, "little")
+
+
+def test_chunks_concatenate_to_content():
+    data = _random_bytes(2_000_000)
+    chunks = list(content_defined_chunks(io.BytesIO(data)))
+    assert b"".join(chunks) == data
+    assert all(MIN_CHUNK_SIZE <= len(c) <= MAX_CHUNK_SIZE for c in chunks[:-1])
+
+
+def test_chunks_smaller_than_boundary_pattern():
+    """A minimum size shorter than the boundary pattern still finds boundaries"""
+    data = _random_bytes(100_000)
+    chunks = list(
+        content_defined_chunks(io.BytesIO(data), min_size=1, avg_size=256, max_size=1024)
+    )
+    assert b"".join(chunks) == data
+    assert all(1 <= len(c) <= 1024 for c in chunks)
+    assert len(chunks) > len(data) // 1024 + 1
+
+
+def test_chunks_are_stable_under_insertion():
+    """An insertion in the middle of a file only changes the chunks around it"""
+    data = _random_bytes(2_000_000)
+    modified = data[:1_000_000] + b"inserted" + data[1_000_000:]
+    before = {chunk_digest(c) for c in content_defined_chunks(io.BytesIO(data))}
+    after = {chunk_digest(c) for c in content_defined_chunks(io.BytesIO(modified))}
+    assert len(before - after) <= 2
+    assert len(before & after) >= len(before) - 2
+
+
+def test_chunk_store_verifies_digest(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    data = b"hello world"
+    digest = chunk_digest(data)
+
+    with pytest.raises(ChunkChecksumError):
+        store.add(digest, compress_chunk(b"something else"))
+    assert digest not in store
+
+    store.add(digest, compress_chunk(data))
+    assert digest in store
+    assert store.read(digest) == data
+
+
+def test_chunked_tarfile_roundtrip(tmp_path):
+    """A tarfile recorded by ChunkingTarWriter is reassembled from the chunk store"""
+    store = ChunkStore(str(tmp_path / "store"))
+    writer = ChunkingTarWriter(lambda digest, data: store.add(digest, compress_chunk(data)))
+    files = {"prefix/small": b"small file", "prefix/large": _random_bytes(1_000_000)}
+
+    info = tarfile.TarInfo("prefix")
+    info.type = tarfile.DIRTYPE
+    info.mode = 0o755
+    writer.addfile(info)
+    for name, content in files.items():
+        info = tarfile.TarInfo(name)
+        info.size = len(content)
+        info.mode = 0o644
+        writer.addfile(info, io.BytesIO(content))
+    info = tarfile.TarInfo("prefix/link")
+    info.type = tarfile.SYMTYPE
+    info.linkname = "small"
+    writer.addfile(info)
+
+    with open_chunked_tarfile(writer.members, store) as tar:
+        tar.extractall(tmp_path / "out")
+
+    for name, content in files.items():
+        assert (tmp_path / "out" / name).read_bytes() == content
+    assert os.readlink(tmp_path / "out" / "prefix" / "link") == "small"
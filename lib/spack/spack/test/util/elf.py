@@ -177,6 +177,117 @@ def test_elf_get_and_replace_rpaths_and_pt_interp(binary_with_rpaths):
     assert info.value.pt_interp.new_value == b"/very/long/prefix-b/lib/ld.so"
 
 
+def _assert_sections_are_consistent(path):
+    """The dynamic string table is a section of its own, and sections don't overlap"""
+    with open(path, "rb") as f:
+        parsed = elf.parse_elf(f, interpreter=True, dynamic_section=True)
+        rewriter = elf.ElfStringRewriter(f, parsed)
+        sections = rewriter._read_section_headers()
+    assert any(
+        sh.sh_type == elf.ELF_CONSTANTS.SHT_STRTAB
+        and sh.sh_offset == rewriter.strtab_offset
+        and sh.sh_size == rewriter.strtab_size
+        for sh in sections
+    )
+    ranges = sorted(
+        (sh.sh_offset, sh.sh_offset + sh.sh_size)
+        for sh in sections
+        if sh.sh_type != elf.ELF_CONSTANTS.SHT_NOBITS and sh.sh_size
+    )
+    assert ranges
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end <= start
+
+
+@pytest.mark.requires_executables("gcc")
+@skip_unless_linux
+def test_elf_grow_rpaths_and_pt_interp(binary_with_rpaths):
+    """Longer strings are appended after the dynamic string table, and the old ones are zeroed"""
+    executable = str(
+        binary_with_rpaths(rpaths=["/short-a/x", "/usr/lib"], dynamic_linker="/short-a/ld.so")
+    )
+    long_prefix = b"/very/long/prefix/" + b"a" * 100
+
+    assert elf.substitute_rpath_needed_and_pt_interp(executable, {b"/short-a": long_prefix})
+    assert elf.get_rpaths(executable) == [f"{long_prefix.decode()}/x", "/usr/lib"]
+    assert elf.get_interpreter(executable) == f"{long_prefix.decode()}/ld.so"
+    with open(executable, "rb") as f:
+        assert b"/short-a" not in f.read()
+    _assert_sections_are_consistent(executable)
+
+    # Strings can be grown again, in the space that's left
+    elf.set_rpath_and_interpreter(executable, long_prefix * 2, long_prefix + b"/lib/ld.so")
+    assert elf.get_rpaths(executable) == [(long_prefix * 2).decode()]
+    assert elf.get_interpreter(executable) == f"{long_prefix.decode()}/lib/ld.so"
+    _assert_sections_are_consistent(executable)
+
+
+@pytest.mark.requires_executables("gcc")
+@skip_unless_linux
+def test_elf_grow_rpaths_without_room(binary_with_rpaths):
+    """The file is left untouched if the strings don't fit"""
+    executable = str(binary_with_rpaths(rpaths=["/short-a/x"]))
+    with open(executable, "rb") as f:
+        before = f.read()
+
+    with pytest.raises(elf.ElfCStringUpdatesFailed) as info:
+        elf.substitute_rpath_needed_and_pt_interp(executable, {b"/short-a": b"/a" * 5000})
+    assert info.value.rpath.new_value == b"/a" * 5000 + b"/x"
+
+    with pytest.raises(elf.ElfRewriteError):
+        elf.set_rpath_and_interpreter(executable, b"/a" * 5000)
+
+    with open(executable, "rb") as f:
+        assert f.read() == before
+
+
+@pytest.mark.requires_executables("gcc")
+@skip_unless_linux
+def test_elf_grow_needed_libraries(tmpdir):
+    """Needed libraries given by absolute path are substituted, and RUNPATH becomes RPATH when
+    set like patchelf --force-rpath does"""
+    gcc = spack.util.executable.which("gcc")
+
+    with fs.working_dir(str(tmpdir)):
+        with open("foo.c", "w") as f:
+            f.write("int foo(){return 0;}")
+        with open("foo.map", "w") as f:
+            f.write("FOO_1 { global: foo; local: *; };")
+        with open("bar.c", "w") as f:
+            f.write("int foo(); int _start(){return foo();}")
+
+        # Without soname, the library is needed by the path it was linked with
+        library = str(tmpdir.join("libfoo.so"))
+        gcc("-shared", "-o", library, "-Wl,--version-script,foo.map", "-nostdlib", "foo.c")
+        gcc(
+            "-o",
+            "bar",
+            "-Wl,--enable-new-dtags",
+            "-Wl,-rpath,/first",
+            "-nostdlib",
+            "bar.c",
+            library,
+        )
+
+        old_prefix = str(tmpdir).encode()
+        new_prefix = b"/very/long/prefix/" + b"a" * 100
+        assert elf.substitute_rpath_needed_and_pt_interp("bar", {old_prefix: new_prefix})
+        with open("bar", "rb") as f:
+            parsed = elf.parse_elf(f, dynamic_section=True)
+            f.seek(0)
+            assert library.encode() not in f.read()
+        assert parsed.dt_needed_strs == [new_prefix + b"/libfoo.so"]
+        assert parsed.is_runpath
+        _assert_sections_are_consistent("bar")
+
+        elf.set_rpath_and_interpreter("bar", b"/second")
+        with open("bar", "rb") as f:
+            parsed = elf.parse_elf(f, dynamic_section=True)
+        assert not parsed.is_runpath
+        assert parsed.dt_rpath_str == b"/second"
+        assert parsed.dt_needed_strs == [new_prefix + b"/libfoo.so"]
+
+
 @pytest.mark.requires_executables("gcc")
 @skip_unless_linux
 def test_drop_redundant_rpath(tmpdir, binary_with_rpaths):
@@ -13,8 +13,11 @@
 import llnl.util.filesystem as fs
 from llnl.util.symlink import symlink
 
+import spack.caches
+import spack.hooks.write_install_manifest
 import spack.spec
 import spack.store
+import spack.util.file_cache
 import spack.util.spack_json as sjson
 import spack.verify
 
@@ -185,6 +188,89 @@ def test_check_prefix_manifest(tmpdir):
     assert results.errors[spec.prefix] == ["manifest corrupted"]
 
 
+def test_check_prefix_manifest_fast(tmpdir, monkeypatch):
+    # Test that files whose size, mtime and inode did not change are not hashed again
+    cache = spack.util.file_cache.FileCache(str(tmpdir.join("cache")))
+    monkeypatch.setattr(spack.caches, "MISC_CACHE", cache)
+
+    prefix_path = tmpdir.join("prefix")
+    spec = spack.spec.Spec("libelf")
+    spec._mark_concrete()
+    spec.prefix = str(prefix_path)
+
+    fs.mkdirp(str(prefix_path.join(".spack")))
+    files = [str(prefix_path.join("file%d" % i)) for i in range(4)]
+    for file in files:
+        with open(file, "w") as f:
+            f.write("Contents of %s" % file)
+    spack.verify.write_manifest(spec)
+
+    assert not spack.verify.check_spec_manifest(spec, jobs=2).has_errors()
+
+    # Changing the contents but not the metadata goes unnoticed in fast mode only
+    def overwrite_keeping_metadata(path, contents):
+        s = os.stat(path)
+        with open(path, "r+") as f:
+            f.write(contents)
+        os.utime(path, ns=(s.st_atime_ns, s.st_mtime_ns))
+
+    overwrite_keeping_metadata(files[1], "X")
+    assert not spack.verify.check_spec_manifest(spec, fast=True, jobs=2).has_errors()
+    assert spack.verify.check_spec_manifest(spec, jobs=2).errors == {files[1]: ["hash"]}
+    overwrite_keeping_metadata(files[1], "C")
+    assert not spack.verify.check_spec_manifest(spec, jobs=2).has_errors()
+
+    hashed = []
+
+    def _compute_hash(path):
+        hashed.append(path)
+        return "0" * 32
+
+    monkeypatch.setattr(spack.verify, "compute_hash", _compute_hash)
+    assert not spack.verify.check_spec_manifest(spec, fast=True, jobs=2).has_errors()
+    assert not hashed
+
+    # Changing the metadata makes fast mode hash the file again
+    os.utime(files[0], ns=(0, 0))
+    results = spack.verify.check_spec_manifest(spec, fast=True, jobs=2)
+    assert hashed == [files[0]]
+    assert results.errors == {files[0]: ["mtime", "hash"]}
+
+    results = spack.verify.check_spec_manifest(spec, jobs=2)
+    assert sorted(hashed) == sorted([files[0]] + files)
+    assert len(results.errors) == 4
+    assert results.summary() == "4 paths failed verification (4 hash, 1 mtime)"
+
+
+def test_file_hash_cache_errors_are_not_fatal(tmpdir, monkeypatch):
+    # The cache of hashes is best effort, and removed when the spec is uninstalled
+    cache = spack.util.file_cache.FileCache(str(tmpdir.join("cache")))
+    monkeypatch.setattr(spack.caches, "MISC_CACHE", cache)
+
+    prefix_path = tmpdir.join("prefix")
+    spec = spack.spec.Spec("libelf")
+    spec._mark_concrete()
+    spec.prefix = str(prefix_path)
+    fs.mkdirp(str(prefix_path.join(".spack")))
+    with open(str(prefix_path.join("file")), "w") as f:
+        f.write("contents")
+    spack.verify.write_manifest(spec)
+
+    def _fail(*args, **kwargs):
+        raise spack.util.file_cache.CacheError("read-only cache")
+
+    with monkeypatch.context() as m:
+        m.setattr(cache, "write_transaction", _fail)
+        m.setattr(cache, "read_transaction", _fail)
+        assert not spack.verify.check_spec_manifest(spec, fast=True).has_errors()
+
+    assert not spack.verify.check_spec_manifest(spec, fast=True).has_errors()
+    name = os.path.join("verify", f"{spec.dag_hash()}.json")
+    assert os.path.exists(cache.cache_path(name))
+    spack.hooks.write_install_manifest.post_uninstall(spec)
+    assert not os.path.exists(cache.cache_path(name))
+
+
 def test_single_file_verification(tmpdir):
     # Test the API to verify a single file, including finding the package
     # to which it belongs
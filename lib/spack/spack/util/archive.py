@@ -2,18 +2,27 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import bisect
+import collections
+import concurrent.futures
 import errno
 import hashlib
 import io
 import os
 import pathlib
+import shutil
+import struct
+import subprocess
 import tarfile
+import zlib
 from contextlib import closing, contextmanager
 from gzip import GzipFile
-from typing import Callable, Dict, Tuple
+from typing import IO, Callable, Deque, Dict, Generator, Iterator, List, Optional, Tuple, cast
 
 from llnl.util.symlink import readlink
 
+from spack.util.executable import ProcessError, which
+
 
 class ChecksumWriter(io.BufferedIOBase):
     """Checksum writer computes a checksum while writing to a file."""
@@ -95,17 +104,314 @@ def readline(self, size=-1):
         raise OSError(errno.EBADF, "readline() on write-only object")
 
 
+#: Size of the blocks of data that are compressed independently by ``GzipBlockWriter``
+GZIP_BLOCK_SIZE = 1024 * 1024
+
+#: Identifier of the gzip extra subfield holding the size of the compressed data of a member
+_GZIP_SIZE_SUBFIELD = b"SP"
+
+_GZIP_FEXTRA, _GZIP_FNAME, _GZIP_FCOMMENT, _GZIP_FHCRC = 4, 8, 16, 2
+
+
+def _gzip_member(data: bytes, compresslevel: int) -> bytes:
+    """Compress data as a complete gzip member, with a normalized header (no file name, zero
+    mtime) whose extra field records the size of the compressed data."""
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    xfl = 2 if compresslevel == 9 else 4 if compresslevel == 1 else 0
+    extra = _GZIP_SIZE_SUBFIELD + struct.pack("<HI", 4, len(deflated))
+    header = struct.pack("<BBBBIBBH", 0x1F, 0x8B, 8, _GZIP_FEXTRA, 0, xfl, 255, len(extra))
+    trailer = struct.pack("<II", zlib.crc32(data), len(data) & 0xFFFFFFFF)
+    return b"".join((header, extra, deflated, trailer))
+
+
+class GzipBlockWriter(io.BufferedIOBase):
+    """Gzip compressor that splits data in blocks of fixed size, compresses them concurrently,
+    and writes each of them as a gzip member. Multi-member gzip files are standard, and can be
+    read by any gzip reader, while ``GzipBlockReader`` also decompresses them concurrently.
+
+    The output only depends on the data, the block size and the compression level, and not on
+    the number of threads."""
+
+    def __init__(
+        self,
+        fileobj: IO[bytes],
+        compresslevel: int = 6,
+        jobs: int = 1,
+        block_size: int = GZIP_BLOCK_SIZE,
+    ) -> None:
+        self.fileobj: Optional[IO[bytes]] = fileobj
+        self.compresslevel = compresslevel
+        self.block_size = block_size
+        self.jobs = jobs
+        self.executor = concurrent.futures.ThreadPoolExecutor(jobs) if jobs > 1 else None
+        self.pending: Deque[concurrent.futures.Future] = collections.deque()
+        self.buffer = bytearray()
+        self.length = 0
+        self.members = 0
+
+    def _submit(self, data: bytes) -> None:
+        if self.executor is None:
+            self._write_member(_gzip_member(data, self.compresslevel))
+            return
+        self.pending.append(self.executor.submit(_gzip_member, data, self.compresslevel))
+        # Bound the memory used by blocks waiting to be compressed or written
+        while len(self.pending) > 2 * self.jobs:
+            self._write_member(self.pending.popleft().result())
+
+    def _write_member(self, member: bytes) -> None:
+        assert self.fileobj is not None
+        self.fileobj.write(member)
+        self.members += 1
+
+    def write(self, data) -> int:
+        if self.fileobj is None:
+            raise ValueError("write() on closed GzipBlockWriter object")
+        data = memoryview(data).cast("B")
+        self.buffer += data
+        self.length += data.nbytes
+        if len(self.buffer) >= self.block_size:
+            full = len(self.buffer) - len(self.buffer) % self.block_size
+            for start in range(0, full, self.block_size):
+                self._submit(bytes(self.buffer[start : start + self.block_size]))
+            del self.buffer[:full]
+        return data.nbytes
+
+    def close(self) -> None:
+        if self.fileobj is None:
+            return
+        try:
+            # An empty input is still compressed to a valid gzip file
+            if self.buffer or not self.members and not self.pending:
+                self._submit(bytes(self.buffer))
+                self.buffer.clear()
+            while self.pending:
+                self._write_member(self.pending.popleft().result())
+            self.fileobj.flush()
+        finally:
+            for future in self.pending:
+                future.cancel()
+            if self.executor is not None:
+                self.executor.shutdown()
+            self.fileobj = None
+
+    @property
+    def closed(self) -> bool:
+        return self.fileobj is None
+
+    def flush(self) -> None:
+        pass
+
+    def readable(self) -> bool:
+        return False
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self.length
+
+
+def _inflate(deflated: bytes, crc: int, size: int) -> bytes:
+    data = zlib.decompress(deflated, -zlib.MAX_WBITS)
+    if zlib.crc32(data) != crc or len(data) & 0xFFFFFFFF != size:
+        raise zlib.error("CRC check failed in gzip member")
+    return data
+
+
+class GzipBlockReader(io.RawIOBase):
+    """Seekable reader of gzip files, decompressing concurrently the members written by
+    ``GzipBlockWriter``. Other members are decompressed sequentially, so any gzip file can be
+    read.
+
+    Seeking backwards restarts the decompression from the start of the member containing the
+    new position."""
+
+    def __init__(self, fileobj: IO[bytes], jobs: int = 1) -> None:
+        self.fileobj = fileobj
+        self.jobs = jobs
+        self.executor = concurrent.futures.ThreadPoolExecutor(jobs) if jobs > 1 else None
+        #: Uncompressed and compressed offsets of the members found so far
+        self.members: List[Tuple[int, int]] = []
+        self.pos = 0
+        self.block = b""
+        self.block_start = 0
+        self.blocks: Optional[Generator[Tuple[int, bytes], None, None]] = None
+
+    def _read_exact(self, size: int) -> bytes:
+        data = self.fileobj.read(size)
+        if len(data) != size:
+            raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+        return data
+
+    def _read_header(self) -> Optional[int]:
+        """Read the header of the next member, and return the size of its compressed data if
+        recorded. Raise EOFError if there is no other member."""
+        magic = self.fileobj.read(2)
+        while magic == b"\x00\x00":  # skip zero padding after the last member
+            magic = self.fileobj.read(2)
+        if magic in (b"", b"\x00"):
+            raise EOFError
+        if magic != b"\x1f\x8b":
+            raise zlib.error("Not a gzipped file")
+        _, flags, _, _, _ = struct.unpack("<BBIBB", self._read_exact(8))
+
+        deflated_size = None
+        if flags & _GZIP_FEXTRA:
+            (extra_size,) = struct.unpack("<H", self._read_exact(2))
+            extra = self._read_exact(extra_size)
+            while len(extra) >= 4:
+                subfield, length = extra[:2], struct.unpack("<H", extra[2:4])[0]
+                if subfield == _GZIP_SIZE_SUBFIELD and length == 4:
+                    (deflated_size,) = struct.unpack("<I", extra[4:8])
+                extra = extra[4 + length :]
+        for flag in (_GZIP_FNAME, _GZIP_FCOMMENT):
+            if flags & flag:
+                while self._read_exact(1) != b"\x00":
+                    pass
+        if flags & _GZIP_FHCRC:
+            self._read_exact(2)
+        return deflated_size
+
+    def _inflate_stream(self) -> Iterator[bytes]:
+        """Decompress sequentially the data of a member without recorded size."""
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        crc, size = 0, 0
+        while not decompressor.eof:
+            chunk = self.fileobj.read(GZIP_BLOCK_SIZE)
+            if not chunk:
+                raise EOFError("Compressed file ended before the end-of-stream marker")
+            data = decompressor.decompress(chunk)
+            crc, size = zlib.crc32(data, crc), size + len(data)
+            yield data
+        self.fileobj.seek(-len(decompressor.unused_data), io.SEEK_CUR)
+        if struct.unpack("<II", self._read_exact(8)) != (crc, size & 0xFFFFFFFF):
+            raise zlib.error("CRC check failed in gzip member")
+
+    def _iter_blocks(
+        self, offset: int, compressed_offset: int
+    ) -> Generator[Tuple[int, bytes], None, None]:
+        """Yield the uncompressed offset and data of blocks, starting from the member at the
+        given offsets."""
+        pending: Deque[Tuple[int, concurrent.futures.Future]] = collections.deque()
+        self.fileobj.seek(compressed_offset)
+        try:
+            while True:
+                member_start = self.fileobj.tell()
+                try:
+                    deflated_size = self._read_header()
+                except EOFError:
+                    break
+                self._add_member(offset, member_start)
+
+                if deflated_size is None:
+                    # Flush the members in flight, and decompress this one sequentially
+                    while pending:
+                        start, future = pending.popleft()
+                        yield start, future.result()
+                    for data in self._inflate_stream():
+                        yield offset, data
+                        offset += len(data)
+                    continue
+
+                deflated = self._read_exact(deflated_size)
+                crc, size = struct.unpack("<II", self._read_exact(8))
+                if self.executor is None:
+                    yield offset, _inflate(deflated, crc, size)
+                else:
+                    pending.append((offset, self.executor.submit(_inflate, deflated, crc, size)))
+                    # Bound the memory used by blocks read ahead
+                    while len(pending) > 2 * self.jobs:
+                        start, future = pending.popleft()
+                        yield start, future.result()
+                offset += size
+
+            while pending:
+                start, future = pending.popleft()
+                yield start, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def _add_member(self, offset: int, compressed_offset: int) -> None:
+        if not self.members or self.members[-1][0] < offset:
+            self.members.append((offset, compressed_offset))
+
+    def _restart(self, pos: int) -> None:
+        """Restart the decompression from the last known member starting at or before pos."""
+        if self.blocks is not None:
+            self.blocks.close()
+        index = bisect.bisect_right(self.members, (pos, float("inf"))) - 1
+        offset, compressed_offset = self.members[index] if index >= 0 else (0, 0)
+        self.blocks = self._iter_blocks(offset, compressed_offset)
+        self.block, self.block_start = b"", offset
+
+    def readinto(self, b) -> int:
+        if self.blocks is None or self.pos < self.block_start:
+            self._restart(self.pos)
+        assert self.blocks is not None
+
+        # Advance to the block containing the current position
+        while self.pos >= self.block_start + len(self.block):
+            try:
+                self.block_start, self.block = next(self.blocks)
+            except StopIteration:
+                self.block_start, self.block = self.block_start + len(self.block), b""
+                return 0
+
+        start = self.pos - self.block_start
+        with memoryview(b) as view:
+            chunk = self.block[start : start + view.nbytes]
+            view[: len(chunk)] = chunk
+        self.pos += len(chunk)
+        return len(chunk)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        else:
+            raise OSError(errno.EINVAL, "Seeking from the end is not supported")
+        return self.pos
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self.blocks is not None:
+            self.blocks.close()
+        if self.executor is not None:
+            self.executor.shutdown()
+        super().close()
+
+
 @contextmanager
-def gzip_compressed_tarfile(path):
+def gzip_compressed_tarfile(path, jobs: Optional[int] = None):
     """Create a reproducible, gzip compressed tarfile, and keep track of shasums of both the
     compressed and uncompressed tarfile. Reproduciblity is achived by normalizing the gzip header
     (no file name and zero mtime).
 
+    If ``jobs`` is given, the tarfile is compressed in independent blocks by as many threads,
+    see ``GzipBlockWriter``. Otherwise, it is compressed as a single gzip stream.
+
     Yields a tuple of the following:
         tarfile.TarFile: tarfile object
         ChecksumWriter: checksum of the gzip compressed tarfile
         ChecksumWriter: checksum of the uncompressed tarfile
     """
+
     # Create gzip compressed tarball of the install prefix
     # 1) Use explicit empty filename and mtime 0 for gzip header reproducibility.
     #    If the filename="" is dropped, Python will use fileobj.name instead.
@@ -114,14 +420,106 @@ def gzip_compressed_tarfile(path):
     # compresslevel=6 gzip default: llvm takes 4mins, roughly 2.1GB
     # compresslevel=9 python default: llvm takes 12mins, roughly 2.1GB
     # So we follow gzip.
+    def compressor(fileobj):
+        if jobs is None:
+            return GzipFile(filename="", mode="wb", compresslevel=6, mtime=0, fileobj=fileobj)
+        return GzipBlockWriter(fileobj, compresslevel=6, jobs=jobs)
+
     with open(path, "wb") as f, ChecksumWriter(f) as gzip_checksum, closing(
-        GzipFile(filename="", mode="wb", compresslevel=6, mtime=0, fileobj=gzip_checksum)
+        compressor(gzip_checksum)
     ) as gzip_file, ChecksumWriter(gzip_file) as tarfile_checksum, tarfile.TarFile(
         name="", mode="w", fileobj=tarfile_checksum
     ) as tar:
         yield tar, gzip_checksum, tarfile_checksum
 
 
+#: Magic number at the start of zstd frames
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+@contextmanager
+def zstd_compressed_tarfile(path: str, jobs: int = 1, level: int = 3):
+    """Create a zstd compressed tarfile, and keep track of shasums of both the compressed and
+    uncompressed tarfile. Compression is done by the ``zstd`` executable using ``jobs`` threads,
+    with the tarfile written to its standard input.
+
+    Yields a tuple of the following:
+        tarfile.TarFile: tarfile object
+        ChecksumWriter: checksum of the zstd compressed tarfile
+        ChecksumWriter: checksum of the uncompressed tarfile
+    """
+    zstd = which("zstd", required=True)
+    with open(path, "wb") as f, ChecksumWriter(f) as zstd_checksum:
+        proc = subprocess.Popen(
+            [zstd.path, "-q", "-c", f"-{level}", f"-T{jobs}"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        assert proc.stdin is not None and proc.stdout is not None
+        # The compressed output is copied by another thread, so that zstd never blocks on a full
+        # pipe while we are writing to it.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            copy = executor.submit(shutil.copyfileobj, proc.stdout, zstd_checksum)
+            try:
+                # The pipe is not seekable, so the tarfile is written in stream mode
+                with ChecksumWriter(proc.stdin) as tarfile_checksum, tarfile.open(
+                    fileobj=cast(IO[bytes], tarfile_checksum), mode="w|"
+                ) as tar:
+                    yield tar, zstd_checksum, tarfile_checksum
+            finally:
+                # Closing stdin lets zstd flush its output and exit
+                proc.stdin.close()
+                copy.result()
+                proc.stdout.close()
+                proc.wait()
+        if proc.returncode != 0:
+            raise ProcessError(f"zstd failed to compress {path}", f"exit status {proc.returncode}")
+
+
+@contextmanager
+def _zstd_decompressed_tarfile(path: str) -> Iterator[tarfile.TarFile]:
+    zstd = which("zstd", required=True)
+    proc = subprocess.Popen([zstd.path, "-d", "-q", "-c", path], stdout=subprocess.PIPE)
+    assert proc.stdout is not None
+    try:
+        with tarfile.open(fileobj=proc.stdout, mode="r|") as tar:
+            yield tar
+        # Drain the padding after the end of the archive, so that zstd can exit cleanly
+        while proc.stdout.read(io.DEFAULT_BUFFER_SIZE):
+            pass
+    finally:
+        proc.stdout.close()
+        proc.wait()
+    if proc.returncode != 0:
+        raise ProcessError(f"zstd failed to decompress {path}", f"exit status {proc.returncode}")
+
+
+@contextmanager
+def open_compressed_tarfile(path: str, jobs: int = 1) -> Iterator[tarfile.TarFile]:
+    """Open a compressed tarfile for reading. Gzip compressed tarfiles are decompressed by a
+    ``GzipBlockReader`` using ``jobs`` threads, other ones are opened by ``tarfile``.
+
+    Zstd compressed tarfiles are decompressed by the ``zstd`` executable through a pipe, without
+    a temporary file. They are opened in stream mode, so their members can only be accessed
+    sequentially, by iterating over the tarfile."""
+    with open(path, "rb") as f:
+        magic = f.read(4)
+        if magic == ZSTD_MAGIC:
+            with _zstd_decompressed_tarfile(path) as tar:
+                yield tar
+            return
+
+        if magic[:2] != b"\x1f\x8b":
+            with tarfile.open(path, "r") as tar:
+                yield tar
+            return
+
+        with closing(GzipBlockReader(f, jobs=jobs)) as gzip_file, tarfile.open(
+            fileobj=io.BufferedReader(gzip_file), mode="r:"
+        ) as tar:
+            yield tar
+
+
 def default_path_to_name(path: str) -> str:
     """Converts a path to a tarfile name, which uses posix path separators."""
     p = pathlib.PurePath(path)
@@ -0,0 +1,212 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Content-defined chunking of the files of a tarball, so that data shared by several tarballs
+is stored once.
+
+Files are split in chunks whose boundaries depend only on the content of the files: a chunk
+ends where the bytes before it match a pattern. An insertion or a modification in a file
+therefore changes only the chunks around it, and identical files or parts of files produce
+identical chunks. Chunks are addressed by the sha256 digest of their uncompressed content, and
+stored zlib compressed.
+"""
+import hashlib
+import io
+import os
+import tarfile
+import tempfile
+import zlib
+from typing import IO, Callable, Dict, Generator, Iterator, List, Optional
+
+from llnl.util.filesystem import mkdirp
+
+#: Chunks are at least this large, unless the file is smaller
+MIN_CHUNK_SIZE = 16 * 1024
+
+#: Average size of chunks, which must be a power of two
+AVG_CHUNK_SIZE = 64 * 1024
+
+#: Chunks are cut at this size if no boundary was found
+MAX_CHUNK_SIZE = 256 * 1024
+
+#: Each byte is mapped to one bit, which is 0 or 1 with equal probability. The mapping is
+#: derived from sha256, so that chunk boundaries are stable across versions of Spack.
+_BYTE_TO_BIT = bytes(hashlib.sha256(bytes([i])).digest()[0] & 1 for i in range(256))
+
+
+def _boundary_pattern(avg_size: int) -> bytes:
+    """Sequence of bits marking the end of a chunk. A random sequence of n bits occurs on
+    average every 2^n bytes."""
+    bits = avg_size.bit_length() - 1
+    return bytes(b & 1 for b in hashlib.sha256(b"chunk boundary").digest()[:bits])
+
+
+def _find_cut(data: bytes, min_size: int, max_size: int, pattern: bytes) -> int:
+    """Return the length of the first chunk of data, which ends after the first occurrence of
+    the boundary pattern in the bits of the bytes following the minimum size."""
+    end = min(len(data), max_size)
+    if end <= min_size:
+        return end
+
+    # The boundary may start in the window before the minimum size. Mapping bytes to bits and
+    # searching for the pattern are both done in C, which is much faster than a rolling hash
+    # in Python.
+    start = max(min_size - len(pattern) + 1, 0)
+    found = data[start:end].translate(_BYTE_TO_BIT).find(pattern)
+    return end if found < 0 else start + found + len(pattern)
+
+
+def content_defined_chunks(
+    f: IO[bytes],
+    min_size: int = MIN_CHUNK_SIZE,
+    avg_size: int = AVG_CHUNK_SIZE,
+    max_size: int = MAX_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """Split the content of a file in chunks, whose boundaries depend only on the content."""
+    pattern = _boundary_pattern(avg_size)
+    buffer = b""
+    eof = False
+    while True:
+        while not eof and len(buffer) < max_size:
+            data = f.read(max_size)
+            eof = not data
+            buffer += data
+        if not buffer:
+            return
+        cut = _find_cut(buffer, min_size, max_size, pattern)
+        yield buffer[:cut]
+        buffer = buffer[cut:]
+
+
+def chunk_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def compress_chunk(data: bytes) -> bytes:
+    return zlib.compress(data, 6)
+
+
+class ChunkChecksumError(ValueError):
+    """Raised when the content of a chunk does not match its digest"""
+
+
+class ChunkStore:
+    """Local directory of zlib compressed chunks, addressed by the sha256 digest of their
+    uncompressed content."""
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def __contains__(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def add(self, digest: str, compressed: bytes) -> None:
+        """Add a compressed chunk to the store, after verifying its digest."""
+        if chunk_digest(zlib.decompress(compressed)) != digest:
+            raise ChunkChecksumError(f"chunk {digest} does not match its digest")
+
+        # Write to a temporary file first, so that concurrent readers never see partial chunks
+        path = self.path(digest)
+        mkdirp(os.path.dirname(path))
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{digest}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def read(self, digest: str) -> bytes:
+        with open(self.path(digest), "rb") as f:
+            return zlib.decompress(f.read())
+
+
+class ChunkingTarWriter:
+    """Stand-in for a tarfile opened in write mode, which splits regular files in chunks instead
+    of writing them. Only ``addfile`` is supported, which is enough for
+    ``spack.util.archive.reproducible_tarfile_from_prefix``.
+
+    The members are recorded in ``members``, with the digests of the chunks of regular files.
+    Each chunk is passed to ``add_chunk`` with its digest, possibly several times."""
+
+    def __init__(self, add_chunk: Callable[[str, bytes], None]) -> None:
+        self.add_chunk = add_chunk
+        self.members: List[Dict] = []
+
+    def addfile(self, tarinfo: tarfile.TarInfo, fileobj: Optional[IO[bytes]] = None) -> None:
+        member: Dict = {"name": tarinfo.name, "type": tarinfo.type.decode(), "mode": tarinfo.mode}
+        if tarinfo.linkname:
+            member["linkname"] = tarinfo.linkname
+        if tarinfo.isreg() and fileobj is not None:
+            chunks = []
+            size = 0
+            for data in content_defined_chunks(fileobj):
+                digest = chunk_digest(data)
+                self.add_chunk(digest, data)
+                chunks.append(digest)
+                size += len(data)
+            member["size"] = size
+            member["chunks"] = chunks
+        self.members.append(member)
+
+
+def _tar_stream(members: List[Dict], store: ChunkStore) -> Generator[bytes, None, None]:
+    for member in members:
+        tarinfo = tarfile.TarInfo(member["name"])
+        tarinfo.type = member["type"].encode()
+        tarinfo.mode = member["mode"]
+        tarinfo.linkname = member.get("linkname", "")
+        tarinfo.size = member.get("size", 0)
+        yield tarinfo.tobuf()
+
+        size = 0
+        for digest in member.get("chunks", ()):
+            data = store.read(digest)
+            size += len(data)
+            yield data
+        if size != tarinfo.size:
+            raise ChunkChecksumError(f"chunks of {tarinfo.name} do not match its size")
+        yield tarfile.NUL * (-size % tarfile.BLOCKSIZE)
+
+    # End of archive marker
+    yield tarfile.NUL * (2 * tarfile.BLOCKSIZE)
+
+
+class ChunkedTarReader(io.RawIOBase):
+    """Uncompressed tarfile reassembled from its members and the chunks in a store, as recorded
+    by ``ChunkingTarWriter``. It can only be read sequentially."""
+
+    def __init__(self, members: List[Dict], store: ChunkStore) -> None:
+        self.pieces = _tar_stream(members, store)
+        self.piece = memoryview(b"")
+
+    def readinto(self, b) -> int:
+        while not self.piece:
+            piece = next(self.pieces, None)
+            if piece is None:
+                return 0
+            self.piece = memoryview(piece)
+
+        with memoryview(b) as view:
+            n = min(view.nbytes, self.piece.nbytes)
+            view[:n] = self.piece[:n]
+        self.piece = self.piece[n:]
+        return n
+
+    def readable(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        self.pieces.close()
+        super().close()
+
+
+def open_chunked_tarfile(members: List[Dict], store: ChunkStore) -> tarfile.TarFile:
+    """Open in stream mode the tarfile recorded by ``ChunkingTarWriter``, reading the content of
+    files from the chunk store."""
+    return tarfile.open(fileobj=io.BufferedReader(ChunkedTarReader(members, store)), mode="r|")
@@ -6,8 +6,8 @@
 import bisect
 import re
 import struct
-from struct import calcsize, unpack, unpack_from
-from typing import BinaryIO, Callable, Dict, List, NamedTuple, Optional, Pattern, Tuple
+from struct import calcsize, pack, unpack, unpack_from
+from typing import Any, BinaryIO, Callable, Dict, List, NamedTuple, Optional, Pattern, Tuple
 
 
 class ElfHeader(NamedTuple):
@@ -75,10 +75,15 @@ class ELF_CONSTANTS:
     DT_NULL = 0
     DT_NEEDED = 1
     DT_STRTAB = 5
+    DT_STRSZ = 10
     DT_SONAME = 14
     DT_RPATH = 15
     DT_RUNPATH = 29
+    DT_VERNEED = 0x6FFFFFFE
+    DT_VERNEEDNUM = 0x6FFFFFFF
+    SHT_PROGBITS = 1
     SHT_STRTAB = 3
+    SHT_NOBITS = 8
 
 
 class ElfFile:
@@ -319,6 +324,7 @@ def parse_pt_dynamic(f: BinaryIO, elf: ElfFile) -> None:
     count_rpath = 0
     count_runpath = 0
     count_strtab = 0
+    strtab_size: Optional[int] = None
 
     f.seek(elf.pt_dynamic_p_offset)
 
@@ -343,6 +349,8 @@ def parse_pt_dynamic(f: BinaryIO, elf: ElfFile) -> None:
         elif tag == ELF_CONSTANTS.DT_STRTAB:
             count_strtab += 1
             strtab_vaddr = val
+        elif tag == ELF_CONSTANTS.DT_STRSZ:
+            strtab_size = val
         elif tag == ELF_CONSTANTS.DT_NEEDED:
             elf.has_needed = True
             elf.dt_needed_strtab_offsets.append(val)
@@ -365,7 +373,13 @@ def parse_pt_dynamic(f: BinaryIO, elf: ElfFile) -> None:
         return
 
     elf.pt_dynamic_strtab_offset = vaddr_to_offset(elf, strtab_vaddr)
-    string_table = retrieve_strtab(f, elf, elf.pt_dynamic_strtab_offset)
+    if strtab_size is None:
+        string_table = retrieve_strtab(f, elf, elf.pt_dynamic_strtab_offset)
+    else:
+        # Like the dynamic loader, trust DT_STRSZ rather than the section headers, which don't
+        # cover strings appended by ElfStringRewriter
+        f.seek(elf.pt_dynamic_strtab_offset)
+        string_table = read_exactly(f, strtab_size, "Could not read string table")
 
     if elf.has_needed:
         elf.dt_needed_strs = list(
@@ -659,6 +673,402 @@ def substitute_rpath_and_pt_interp_in_place_or_raise(
         return False
 
 
+def _get_needed_substitutions(
+    elf: ElfFile, regex: Pattern, substitutions: Dict[bytes, bytes]
+) -> List[UpdateCStringAction]:
+    """Substitutions of needed libraries given by absolute path."""
+    if not elf.has_needed:
+        return []
+
+    actions = []
+    for offset, needed in zip(elf.dt_needed_strtab_offsets, elf.dt_needed_strs):
+        match = regex.match(needed)
+        if match:
+            actions.append(
+                UpdateCStringAction(
+                    old_value=needed,
+                    new_value=substitutions[match.group()] + needed[match.end() :],
+                    offset=elf.pt_dynamic_strtab_offset + offset,
+                )
+            )
+    return actions
+
+
+#: Smallest page size of the supported platforms. The bytes between the end of a loadable
+#: segment and the end of its last page are mapped in memory together with the segment.
+MIN_PAGE_SIZE = 4096
+
+
+class ElfStringRewriter:
+    """Rewrites the RPATH, the needed libraries and the interpreter of an ELF file, without
+    external tools.
+
+    Strings that don't grow are overwritten in place. Otherwise the dynamic string table is
+    moved as a whole, with the longer strings appended, like patchelf does. A longer
+    interpreter is moved too. They are moved to the unused bytes between the end of the
+    loadable segment that holds the string table and the end of the last page of that segment.
+    Those bytes are mapped in memory with the segment already, so it is enough to extend the
+    segment over them, and to update the dynamic array and the program and section headers.
+    ``ElfRewriteError`` is raised when there is not enough room.
+
+    Updates are only written to the file by ``write``, so that a failure leaves the file
+    untouched."""
+
+    def __init__(self, f: BinaryIO, elf: ElfFile):
+        self.f = f
+        self.elf = elf
+
+        ph_fmt = elf.byte_order + ("LLQQQQQQ" if elf.is_64_bit else "LLLLLLLL")
+        self.ph_size = calcsize(ph_fmt)
+        ProgramHeader = ProgramHeader64 if elf.is_64_bit else ProgramHeader32
+        f.seek(elf.elf_hdr.e_phoff)
+        data = read_exactly(f, elf.elf_hdr.e_phnum * self.ph_size, "Malformed program header")
+        self.program_headers: List[Any] = [
+            ProgramHeader(*ph) for ph in struct.iter_unpack(ph_fmt, data)
+        ]
+        self.original_program_headers = list(self.program_headers)
+
+        self.dynamic_fmt = elf.byte_order + ("qQ" if elf.is_64_bit else "lL")
+        self.dynamic_size = calcsize(self.dynamic_fmt)
+        self.dynamic: List[List[int]] = []
+        if elf.has_pt_dynamic:
+            f.seek(elf.pt_dynamic_p_offset)
+            num_entries = elf.pt_dynamic_p_filesz // self.dynamic_size
+            data = read_exactly(
+                f, num_entries * self.dynamic_size, "Malformed dynamic array entry"
+            )
+            self.dynamic = [list(d) for d in struct.iter_unpack(self.dynamic_fmt, data)]
+        self.original_dynamic = [list(d) for d in self.dynamic]
+
+        strtab = self._dynamic_value(ELF_CONSTANTS.DT_STRTAB)
+        self.strtab_offset = None if strtab is None else vaddr_to_offset(elf, strtab)
+        self.strtab_size = self._dynamic_value(ELF_CONSTANTS.DT_STRSZ)
+
+        #: Bytes to write at given offsets in the file
+        self.writes: List[Tuple[int, bytes]] = []
+
+        #: Strings appended to the string table, which is then moved after the segment holding it
+        self.appended = b""
+
+        #: New interpreter, null terminated, if it is moved after that segment too
+        self.interpreter: Optional[bytes] = None
+
+        #: Index of that segment, and file offset and size of the unused bytes after it
+        self.space: Optional[Tuple[int, int, int]] = None
+
+    def _dynamic_index(self, tag: int) -> Optional[int]:
+        for i, (t, _) in enumerate(self.dynamic):
+            if t == ELF_CONSTANTS.DT_NULL:
+                break
+            if t == tag:
+                return i
+        return None
+
+    def _dynamic_value(self, tag: int) -> Optional[int]:
+        i = self._dynamic_index(tag)
+        return None if i is None else self.dynamic[i][1]
+
+    def _read_section_headers(self) -> List[SectionHeader]:
+        if self.elf.elf_hdr.e_shoff == 0:
+            return []
+        fmt = self.elf.byte_order + ("LLQQQQLLQQ" if self.elf.is_64_bit else "LLLLLLLLLL")
+        self.f.seek(self.elf.elf_hdr.e_shoff)
+        data = read_exactly(
+            self.f, self.elf.elf_hdr.e_shnum * calcsize(fmt), "Malformed section header"
+        )
+        return [SectionHeader(*sh) for sh in struct.iter_unpack(fmt, data)]
+
+    def _find_space(self) -> Tuple[int, int, int]:
+        if self.strtab_offset is None:
+            raise ElfRewriteError("No dynamic string table")
+
+        segments = [
+            i
+            for i, ph in enumerate(self.program_headers)
+            if ph.p_type == ELF_CONSTANTS.PT_LOAD
+            and ph.p_offset <= self.strtab_offset < ph.p_offset + ph.p_filesz
+        ]
+        if len(segments) != 1:
+            raise ElfRewriteError("Could not find the segment of the dynamic string table")
+        index = segments[0]
+        segment = self.program_headers[index]
+        if segment.p_filesz != segment.p_memsz:
+            raise ElfRewriteError("The dynamic string table is followed by uninitialized data")
+
+        start = segment.p_offset + segment.p_filesz
+        end = -(-start // MIN_PAGE_SIZE) * MIN_PAGE_SIZE
+
+        # Don't overwrite other segments, sections, or the section header table
+        sections = self._read_section_headers()
+        used = [(ph.p_offset, ph.p_filesz) for ph in self.program_headers]
+        used.extend(
+            (sh.sh_offset, sh.sh_size) for sh in sections if sh.sh_type != ELF_CONSTANTS.SHT_NOBITS
+        )
+        used.append((self.elf.elf_hdr.e_shoff, len(sections) * self.elf.elf_hdr.e_shentsize))
+        for offset, size in used:
+            if size and offset < end and start < offset + size:
+                end = max(start, offset)
+
+        # Don't use memory pages mapped by other segments
+        vaddr = segment.p_vaddr - segment.p_offset
+        for ph in self.program_headers:
+            if ph is segment or ph.p_type != ELF_CONSTANTS.PT_LOAD:
+                continue
+            page_start = ph.p_vaddr // MIN_PAGE_SIZE * MIN_PAGE_SIZE
+            page_end = -(-(ph.p_vaddr + ph.p_memsz) // MIN_PAGE_SIZE) * MIN_PAGE_SIZE
+            if page_start < vaddr + end and vaddr + start < page_end:
+                end = max(start, page_start - vaddr)
+
+        # Only use bytes that are zero, in case they are used in ways we don't know about
+        self.f.seek(start)
+        data = self.f.read(end - start)
+        end = start + len(data) - len(data.lstrip(b"\0"))
+        return index, start, end - start
+
+    def _layout(self) -> Tuple[Optional[int], Optional[int], int]:
+        """Return the file offsets of the moved string table and of the moved interpreter, if
+        any, and the end of the space they use."""
+        assert self.space is not None and self.strtab_size is not None
+        offset = self.space[1]
+        strtab = interpreter = None
+        if self.appended:
+            strtab = offset
+            offset += self.strtab_size + len(self.appended)
+        if self.interpreter is not None:
+            interpreter = offset
+            offset += len(self.interpreter)
+        return strtab, interpreter, offset
+
+    def _check_space(self) -> None:
+        if self.space is None:
+            self.space = self._find_space()
+        if self.strtab_size is None:
+            raise ElfRewriteError("Could not determine the size of the dynamic string table")
+        _, start, size = self.space
+        if self._layout()[2] > start + size:
+            raise ElfRewriteError("Not enough space after the dynamic string table")
+
+    def _append(self, value: bytes) -> int:
+        """Append a string to the string table, and return its offset in the table."""
+        self.appended += value + b"\0"
+        self._check_space()
+        assert self.strtab_size is not None
+        return self.strtab_size + len(self.appended) - len(value) - 1
+
+    def _dynamic_string(self, old_offset: Optional[int], old_value: bytes, new: bytes) -> int:
+        """Return the offset in the string table of a new string, which replaces the old one in
+        place if it fits. Otherwise the old string is zeroed out, like patchelf does, so that no
+        old paths are left in the file."""
+        assert self.strtab_offset is not None
+        if old_offset is None:
+            return self._append(new)
+        if len(new) <= len(old_value):
+            padding = b"\0" * (len(old_value) - len(new))
+            self.writes.append((self.strtab_offset + old_offset, new + padding))
+            return old_offset
+        offset = self._append(new)
+        self.writes.append((self.strtab_offset + old_offset, b"\0" * len(old_value)))
+        return offset
+
+    def set_rpath(self, value: bytes, force_rpath: bool = False) -> None:
+        """Set the RPATH or RUNPATH. With ``force_rpath``, it's stored as DT_RPATH, like
+        ``patchelf --force-rpath`` does."""
+        if self.strtab_offset is None:
+            raise ElfRewriteError("No dynamic string table")
+
+        if self.elf.has_rpath:
+            i = (self.elf.dt_rpath_offset - self.elf.pt_dynamic_p_offset) // self.dynamic_size
+            self.dynamic[i][1] = self._dynamic_string(
+                self.elf.rpath_strtab_offset, self.elf.dt_rpath_str, value
+            )
+            if force_rpath:
+                self.dynamic[i][0] = ELF_CONSTANTS.DT_RPATH
+            return
+
+        # Use the padding at the end of the dynamic array for a new entry, keeping a DT_NULL
+        null = self._dynamic_index(ELF_CONSTANTS.DT_NULL)
+        if null is None or null + 1 >= len(self.dynamic):
+            raise ElfRewriteError("No room for an RPATH entry in the dynamic section")
+        tag = ELF_CONSTANTS.DT_RPATH if force_rpath else ELF_CONSTANTS.DT_RUNPATH
+        self.dynamic[null] = [tag, self._dynamic_string(None, b"", value)]
+
+    def set_needed(self, old: bytes, new: bytes) -> None:
+        """Replace a needed library."""
+        old_offset = self.elf.dt_needed_strtab_offsets[self.elf.dt_needed_strs.index(old)]
+        new_offset = self._dynamic_string(old_offset, old, new)
+        if new_offset == old_offset:
+            return
+
+        for entry in self.dynamic:
+            if entry[0] == ELF_CONSTANTS.DT_NEEDED and entry[1] == old_offset:
+                entry[1] = new_offset
+
+        # Version requirements refer to the library by the same string
+        verneed = self._dynamic_value(ELF_CONSTANTS.DT_VERNEED)
+        count = self._dynamic_value(ELF_CONSTANTS.DT_VERNEEDNUM) or 0
+        offset = 0 if verneed is None else vaddr_to_offset(self.elf, verneed)
+        vn_fmt = self.elf.byte_order + "HHLLL"
+        for _ in range(count):
+            self.f.seek(offset)
+            data = read_exactly(self.f, calcsize(vn_fmt), "Malformed version requirement")
+            _, _, vn_file, _, vn_next = unpack(vn_fmt, data)
+            if vn_file == old_offset:
+                self.writes.append((offset + 4, pack(self.elf.byte_order + "L", new_offset)))
+            if vn_next == 0:
+                break
+            offset += vn_next
+
+    def set_interpreter(self, value: bytes) -> None:
+        """Replace the interpreter."""
+        if not self.elf.has_pt_interp:
+            raise ElfRewriteError("No interpreter to replace")
+
+        old = self.elf.pt_interp_str
+        if len(value) <= len(old):
+            padding = b"\0" * (len(old) - len(value))
+            self.writes.append((self.elf.pt_interp_p_offset, value + padding))
+            return
+
+        self.interpreter = value + b"\0"
+        self._check_space()
+        self.writes.append((self.elf.pt_interp_p_offset, b"\0" * len(old)))
+
+    def write(self) -> None:
+        """Write the updates to the file."""
+        writes = list(self.writes)
+
+        if self.space is not None:
+            writes.extend(self._move_to_space())
+
+        ph_fmt = self.elf.byte_order + ("LLQQQQQQ" if self.elf.is_64_bit else "LLLLLLLL")
+        for i, (old, new) in enumerate(zip(self.original_program_headers, self.program_headers)):
+            if old != new:
+                writes.append((self.elf.elf_hdr.e_phoff + i * self.ph_size, pack(ph_fmt, *new)))
+
+        for i, (old, new) in enumerate(zip(self.original_dynamic, self.dynamic)):
+            if old != new:
+                offset = self.elf.pt_dynamic_p_offset + i * self.dynamic_size
+                writes.append((offset, pack(self.dynamic_fmt, *new)))
+
+        for offset, data in writes:
+            self.f.seek(offset)
+            self.f.write(data)
+
+    def _move_to_space(self) -> List[Tuple[int, bytes]]:
+        """Move the grown string table and interpreter after the segment holding the string
+        table, extend that segment over them, and update the dynamic array and the program and
+        section headers that refer to them. Sections are moved as a whole, so that they don't
+        overlap, and tools that work on sections, like strip, keep their contents."""
+        assert self.space is not None and self.strtab_offset is not None
+        assert self.strtab_size is not None
+        index, _, _ = self.space
+        strtab, interpreter, end = self._layout()
+        segment = self.program_headers[index]
+        size = end - segment.p_offset
+        self.program_headers[index] = segment._replace(p_filesz=size, p_memsz=size)
+
+        def vaddr(offset: int) -> int:
+            return segment.p_vaddr + offset - segment.p_offset
+
+        writes: List[Tuple[int, bytes]] = []
+        #: Sections moved, by type and old file offset, with their new offset and size
+        moved: Dict[Tuple[int, int], Tuple[int, int]] = {}
+
+        if strtab is not None:
+            # Copy the string table with the strings updated in place, and the new strings
+            self.f.seek(self.strtab_offset)
+            table = bytearray(read_exactly(self.f, self.strtab_size, "Malformed string table"))
+            for offset, data in self.writes:
+                start = offset - self.strtab_offset
+                if 0 <= start < self.strtab_size:
+                    table[start : start + len(data)] = data
+            table += self.appended
+            writes.append((strtab, bytes(table)))
+            for entry in self.dynamic:
+                if entry[0] == ELF_CONSTANTS.DT_STRTAB:
+                    entry[1] = vaddr(strtab)
+                elif entry[0] == ELF_CONSTANTS.DT_STRSZ:
+                    entry[1] = len(table)
+            moved[(ELF_CONSTANTS.SHT_STRTAB, self.strtab_offset)] = (strtab, len(table))
+
+        if interpreter is not None:
+            assert self.interpreter is not None
+            writes.append((interpreter, self.interpreter))
+            for i, ph in enumerate(self.program_headers):
+                if ph.p_type == ELF_CONSTANTS.PT_INTERP:
+                    self.program_headers[i] = ph._replace(
+                        p_offset=interpreter,
+                        p_vaddr=vaddr(interpreter),
+                        p_paddr=vaddr(interpreter),
+                        p_filesz=len(self.interpreter),
+                        p_memsz=len(self.interpreter),
+                    )
+            key = (ELF_CONSTANTS.SHT_PROGBITS, self.elf.pt_interp_p_offset)
+            moved[key] = (interpreter, len(self.interpreter))
+
+        sh_fmt = self.elf.byte_order + ("LLQQQQLLQQ" if self.elf.is_64_bit else "LLLLLLLLLL")
+        for i, sh in enumerate(self._read_section_headers()):
+            if not sh.sh_size or (sh.sh_type, sh.sh_offset) not in moved:
+                continue
+            offset, size = moved.pop((sh.sh_type, sh.sh_offset))
+            sh = sh._replace(sh_offset=offset, sh_addr=vaddr(offset), sh_size=size)
+            writes.append(
+                (self.elf.elf_hdr.e_shoff + i * self.elf.elf_hdr.e_shentsize, pack(sh_fmt, *sh))
+            )
+
+        return writes
+
+
+def substitute_rpath_needed_and_pt_interp(path: str, substitutions: Dict[bytes, bytes]) -> bool:
+    """Like ``substitute_rpath_and_pt_interp_in_place_or_raise``, but also substitutes needed
+    libraries given by absolute path, and grows strings with ``ElfStringRewriter`` when they
+    don't fit in place. ElfCStringUpdatesFailed is raised only if there is not enough room for
+    them in the file, which is left untouched in that case."""
+    regex = re.compile(b"|".join(re.escape(p) for p in substitutions.keys()))
+
+    try:
+        with open(path, "rb+") as f:
+            elf = parse_elf(f, interpreter=True, dynamic_section=True)
+
+            rpath = _get_rpath_substitution(elf, regex, substitutions)
+            pt_interp = _get_pt_interp_substitution(elf, regex, substitutions)
+            needed = _get_needed_substitutions(elf, regex, substitutions)
+
+            if not rpath and not pt_interp and not needed:
+                return False
+
+            rewriter = ElfStringRewriter(f, elf)
+            try:
+                if rpath:
+                    rewriter.set_rpath(rpath.new_value)
+                if pt_interp:
+                    rewriter.set_interpreter(pt_interp.new_value)
+                for action in needed:
+                    rewriter.set_needed(action.old_value, action.new_value)
+            except ElfRewriteError as e:
+                raise ElfCStringUpdatesFailed(rpath, pt_interp, needed) from e
+
+            rewriter.write()
+            return True
+
+    except ElfParsingError:
+        # Not an ELF file, nothing to update.
+        return False
+
+
+def set_rpath_and_interpreter(path: str, rpath: bytes, interpreter: Optional[bytes] = None):
+    """Set the RPATH of an ELF file as DT_RPATH, like ``patchelf --force-rpath --set-rpath``,
+    and optionally its interpreter. Raises ElfRewriteError if there is not enough room, leaving
+    the file untouched."""
+    with open(path, "rb+") as f:
+        elf = parse_elf(f, interpreter=True, dynamic_section=True)
+        rewriter = ElfStringRewriter(f, elf)
+        rewriter.set_rpath(rpath, force_rpath=True)
+        if interpreter is not None:
+            rewriter.set_interpreter(interpreter)
+        rewriter.write()
+
+
 def pt_interp(path: str) -> Optional[str]:
     """Retrieve the interpreter of an executable at `path`."""
     try:
@@ -685,11 +1095,19 @@ def get_elf_compat(path):
 
 class ElfCStringUpdatesFailed(Exception):
     def __init__(
-        self, rpath: Optional[UpdateCStringAction], pt_interp: Optional[UpdateCStringAction]
+        self,
+        rpath: Optional[UpdateCStringAction],
+        pt_interp: Optional[UpdateCStringAction],
+        needed: Optional[List[UpdateCStringAction]] = None,
     ):
         self.rpath = rpath
         self.pt_interp = pt_interp
+        self.needed = needed or []
 
 
 class ElfParsingError(Exception):
     pass
+
+
+class ElfRewriteError(Exception):
+    pass
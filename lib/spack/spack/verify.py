@@ -3,18 +3,23 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 import base64
+import concurrent.futures
 import hashlib
+import json
 import os
 import stat
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 import llnl.util.tty as tty
+from llnl.util.lock import LockError
 from llnl.util.symlink import readlink
 
+import spack.caches
 import spack.store
 import spack.util.file_permissions as fp
 import spack.util.spack_json as sjson
 from spack.package_base import spack_times_log
+from spack.util.file_cache import CacheError
 
 
 def compute_hash(path: str, block_size: int = 1048576) -> str:
@@ -29,6 +34,95 @@ def compute_hash(path: str, block_size: int = 1048576) -> str:
     return base64.b32encode(hasher.digest()).decode()
 
 
+def _try_compute_hash(path: str) -> Optional[str]:
+    try:
+        return compute_hash(path)
+    except OSError:
+        return None
+
+
+def _stat_key(s: os.stat_result) -> List[int]:
+    return [s.st_size, s.st_mtime_ns, s.st_ino]
+
+
+class FileHashCache:
+    """Hashes of the files of an install prefix computed by previous verifications, stored in
+    the misc cache with the size, modification time and inode of each file when it was hashed.
+
+    The cache is only an optimization, so errors accessing it never fail a verification."""
+
+    def __init__(self, spec) -> None:
+        self.cache = spack.caches.MISC_CACHE
+        self.name = os.path.join("verify", f"{spec.dag_hash()}.json")
+
+    def read(self) -> Dict[str, List]:
+        try:
+            self.cache.init_entry(self.name)
+            with self.cache.read_transaction(self.name) as f:
+                assert f is not None
+                data = json.loads(f.read())
+                assert isinstance(data, dict)
+        except (json.JSONDecodeError, AssertionError):
+            data = {}
+        except (CacheError, LockError, OSError) as e:
+            tty.debug(f"Cannot read the cached hashes in {self.name}: {e}")
+            data = {}
+        return data
+
+    def write(self, data: Dict[str, List]) -> None:
+        try:
+            self.cache.init_entry(self.name)
+            with self.cache.write_transaction(self.name) as (old, new):
+                new.write(json.dumps(data, separators=(",", ":")))
+        except (CacheError, LockError, OSError) as e:
+            tty.warn(f"Cannot cache the hashes of the verified files in {self.name}: {e}")
+
+    def remove(self) -> None:
+        if not os.path.exists(self.cache.cache_path(self.name)):
+            return
+        try:
+            self.cache.remove(self.name)
+        except (CacheError, LockError, OSError) as e:
+            tty.debug(f"Cannot remove the cached hashes in {self.name}: {e}")
+
+
+def compute_hashes(
+    paths: List[str], hash_cache: FileHashCache, fast: bool = False, jobs: int = 1
+) -> Dict[str, str]:
+    """Hash the regular files among paths on ``jobs`` threads, and record the hashes in the
+    cache. With ``fast=True``, the cached hash of a file is trusted if its size, modification
+    time and inode did not change since it was hashed."""
+    cached = hash_cache.read() if fast else {}
+
+    hashes: Dict[str, str] = {}
+    stats: Dict[str, List[int]] = {}
+    to_hash = []
+    for path in paths:
+        try:
+            s = os.lstat(path)
+        except OSError:
+            continue
+        if not stat.S_ISREG(s.st_mode):
+            continue
+        # Stat before hashing, so that a file modified while it is hashed is hashed again
+        stats[path] = _stat_key(s)
+        entry = cached.get(path)
+        if isinstance(entry, list) and entry[:-1] == stats[path]:
+            hashes[path] = entry[-1]
+        else:
+            to_hash.append(path)
+
+    if jobs > 1 and len(to_hash) > 1:
+        with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+            computed = list(executor.map(_try_compute_hash, to_hash))
+    else:
+        computed = [_try_compute_hash(path) for path in to_hash]
+
+    hashes.update((path, h) for path, h in zip(to_hash, computed) if h is not None)
+    hash_cache.write({path: stats[path] + [h] for path, h in hashes.items()})
+    return hashes
+
+
 def create_manifest_entry(path: str) -> Dict[str, Any]:
     try:
         s = os.lstat(path)
@@ -71,7 +165,7 @@ def write_manifest(spec):
         fp.set_permissions_by_spec(manifest_file, spec)
 
 
-def check_entry(path, data):
+def check_entry(path, data, file_hash: Optional[str] = None):
     res = VerificationResults()
 
     if not data:
@@ -99,7 +193,7 @@ def check_entry(path, data):
             res.add_error(path, "size")
         if s.st_mtime != data["time"]:
             res.add_error(path, "mtime")
-        if compute_hash(path) != data.get("hash"):
+        if (file_hash or compute_hash(path)) != data.get("hash"):
             res.add_error(path, "hash")
 
     return res
@@ -137,7 +231,10 @@ def check_file_manifest(filename):
     return results
 
 
-def check_spec_manifest(spec):
+def check_spec_manifest(spec, fast: bool = False, jobs: int = 1):
+    """Verify the prefix of an installed spec against its manifest. Files are hashed on
+    ``jobs`` threads, and with ``fast=True`` files whose size, modification time and inode
+    did not change since the last verification are not hashed again."""
     prefix = spec.prefix
 
     results = VerificationResults()
@@ -156,6 +253,7 @@ def check_spec_manifest(spec):
         results.add_error(prefix, "manifest corrupted")
         return results
 
+    entries = []
     for root, dirs, files in os.walk(prefix):
         for entry in list(dirs + files):
             path = os.path.join(root, entry)
@@ -168,10 +266,15 @@ def check_spec_manifest(spec):
             if entry == spack_times_log:
                 continue
 
-            data = manifest.pop(path, {})
-            results += check_entry(path, data)
+            entries.append((path, manifest.pop(path, {})))
+
+    entries.append((prefix, manifest.pop(prefix, {})))
 
-    results += check_entry(prefix, manifest.pop(prefix, {}))
+    hashes = compute_hashes(
+        [path for path, data in entries if "hash" in data], FileHashCache(spec), fast, jobs
+    )
+    for path, data in entries:
+        results += check_entry(path, data, hashes.get(path))
 
     for path in manifest:
         results.add_error(path, "deleted")
@@ -194,6 +297,16 @@ def __add__(self, vr):
     def has_errors(self):
         return bool(self.errors)
 
+    def summary(self) -> str:
+        """Number of paths that failed verification, and of errors of each kind"""
+        counts: Dict[str, int] = {}
+        for fields in self.errors.values():
+            for error in fields:
+                counts[error] = counts.get(error, 0) + 1
+        kinds = ", ".join(f"{n} {error}" for error, n in sorted(counts.items()))
+        n = len(self.errors)
+        return f"{n} path{'' if n == 1 else 's'} failed verification ({kinds})"
+
     def json_string(self):
         return sjson.dump(self.errors)
 
@@ -354,6 +354,7 @@ complete -c spack -n '__fish_spack_using_command_pos 0 ' -f -a audit -d 'audit c
 complete -c spack -n '__fish_spack_using_command_pos 0 ' -f -a blame -d 'show contributors to packages'
 complete -c spack -n '__fish_spack_using_command_pos 0 ' -f -a bootstrap -d 'manage bootstrap configuration'
 complete -c spack -n '__fish_spack_using_command_pos 0 ' -f -a build-env -d 'run a command in a spec'"'"'s install environment, or dump its environment to screen or file'
+complete -c spack -n '__fish_spack_using_command_pos 0 ' -f -a build-history -d 'query the durations and resources of past installations'
 complete -c spack -n '__fish_spack_using_command_pos 0 ' -f -a buildcache -d 'create, download and install binary packages'
 complete -c spack -n '__fish_spack_using_command_pos 0 ' -f -a cd -d 'cd to spack directories in the shell'
 complete -c spack -n '__fish_spack_using_command_pos 0 ' -f -a change -d 'change an existing spec in an environment'
@@ -685,6 +686,36 @@ complete -c spack -n '__fish_spack_using_command build-env' -l dump -r -d 'dump
 complete -c spack -n '__fish_spack_using_command build-env' -l pickle -r -f -a pickle
 complete -c spack -n '__fish_spack_using_command build-env' -l pickle -r -d 'dump a pickled source-able environment to FILE'
 
+# spack build-history
+set -g __fish_spack_optspecs_spack_build_history h/help
+complete -c spack -n '__fish_spack_using_command_pos 0 build-history' -f -a show -d 'show the records of past installations'
+complete -c spack -n '__fish_spack_using_command_pos 0 build-history' -f -a regressions -d 'report versions that build slower than the previous version'
+complete -c spack -n '__fish_spack_using_command_pos 0 build-history' -f -a clear -d 'remove records of past installations'
+complete -c spack -n '__fish_spack_using_command build-history' -s h -l help -f -a help
+complete -c spack -n '__fish_spack_using_command build-history' -s h -l help -d 'show this help message and exit'
+
+# spack build-history show
+set -g __fish_spack_optspecs_spack_build_history_show h/help json
+
+complete -c spack -n '__fish_spack_using_command build-history show' -s h -l help -f -a help
+complete -c spack -n '__fish_spack_using_command build-history show' -s h -l help -d 'show this help message and exit'
+complete -c spack -n '__fish_spack_using_command build-history show' -l json -f -a json
+complete -c spack -n '__fish_spack_using_command build-history show' -l json -d 'output records in JSON format'
+
+# spack build-history regressions
+set -g __fish_spack_optspecs_spack_build_history_regressions h/help t/threshold=
+
+complete -c spack -n '__fish_spack_using_command build-history regressions' -s h -l help -f -a help
+complete -c spack -n '__fish_spack_using_command build-history regressions' -s h -l help -d 'show this help message and exit'
+complete -c spack -n '__fish_spack_using_command build-history regressions' -s t -l threshold -r -f -a threshold
+complete -c spack -n '__fish_spack_using_command build-history regressions' -s t -l threshold -r -d 'minimum increase of the build time to report, in percent (default: 20)'
+
+# spack build-history clear
+set -g __fish_spack_optspecs_spack_build_history_clear h/help
+
+complete -c spack -n '__fish_spack_using_command build-history clear' -s h -l help -f -a help
+complete -c spack -n '__fish_spack_using_command build-history clear' -s h -l help -d 'show this help message and exit'
+
 # spack buildcache
 set -g __fish_spack_optspecs_spack_buildcache h/help
 complete -c spack -n '__fish_spack_using_command_pos 0 buildcache' -f -a push -d 'create a binary package and push it to a mirror'
@@ -703,7 +734,7 @@ complete -c spack -n '__fish_spack_using_command buildcache' -s h -l help -f -a
 complete -c spack -n '__fish_spack_using_command buildcache' -s h -l help -d 'show this help message and exit'
 
 # spack buildcache push
-set -g __fish_spack_optspecs_spack_buildcache_push h/help f/force u/unsigned signed k/key= update-index spec-file= only= with-build-dependencies without-build-dependencies fail-fast base-image= t/tag= private j/jobs=
+set -g __fish_spack_optspecs_spack_buildcache_push h/help f/force u/unsigned signed k/key= update-index spec-file= only= with-build-dependencies without-build-dependencies fail-fast base-image= t/tag= private compression= j/jobs=
 complete -c spack -n '__fish_spack_using_command_pos_remainder 1 buildcache push' -f -k -a '(__fish_spack_specs)'
 complete -c spack -n '__fish_spack_using_command buildcache push' -s h -l help -f -a help
 complete -c spack -n '__fish_spack_using_command buildcache push' -s h -l help -d 'show this help message and exit'
@@ -733,11 +764,13 @@ complete -c spack -n '__fish_spack_using_command buildcache push' -l tag -s t -r
 complete -c spack -n '__fish_spack_using_command buildcache push' -l tag -s t -r -d 'when pushing to an OCI registry, tag an image containing all root specs and their runtime dependencies'
 complete -c spack -n '__fish_spack_using_command buildcache push' -l private -f -a private
 complete -c spack -n '__fish_spack_using_command buildcache push' -l private -d 'for a private mirror, include non-redistributable packages'
+complete -c spack -n '__fish_spack_using_command buildcache push' -l compression -r -f -a 'gzip zstd gzip+zstd chunks'
+complete -c spack -n '__fish_spack_using_command buildcache push' -l compression -r -d 'compression of the tarballs: zstd is faster to extract but needs a recent Spack, gzip+zstd pushes both, chunks stores file contents deduplicated across specs'
 complete -c spack -n '__fish_spack_using_command buildcache push' -s j -l jobs -r -f -a jobs
 complete -c spack -n '__fish_spack_using_command buildcache push' -s j -l jobs -r -d 'explicitly set number of parallel jobs'
 
 # spack buildcache create
-set -g __fish_spack_optspecs_spack_buildcache_create h/help f/force u/unsigned signed k/key= update-index spec-file= only= with-build-dependencies without-build-dependencies fail-fast base-image= t/tag= private j/jobs=
+set -g __fish_spack_optspecs_spack_buildcache_create h/help f/force u/unsigned signed k/key= update-index spec-file= only= with-build-dependencies without-build-dependencies fail-fast base-image= t/tag= private compression= j/jobs=
 complete -c spack -n '__fish_spack_using_command_pos_remainder 1 buildcache create' -f -k -a '(__fish_spack_specs)'
 complete -c spack -n '__fish_spack_using_command buildcache create' -s h -l help -f -a help
 complete -c spack -n '__fish_spack_using_command buildcache create' -s h -l help -d 'show this help message and exit'
@@ -767,6 +800,8 @@ complete -c spack -n '__fish_spack_using_command buildcache create' -l tag -s t
 complete -c spack -n '__fish_spack_using_command buildcache create' -l tag -s t -r -d 'when pushing to an OCI registry, tag an image containing all root specs and their runtime dependencies'
 complete -c spack -n '__fish_spack_using_command buildcache create' -l private -f -a private
 complete -c spack -n '__fish_spack_using_command buildcache create' -l private -d 'for a private mirror, include non-redistributable packages'
+complete -c spack -n '__fish_spack_using_command buildcache create' -l compression -r -f -a 'gzip zstd gzip+zstd chunks'
+complete -c spack -n '__fish_spack_using_command buildcache create' -l compression -r -d 'compression of the tarballs: zstd is faster to extract but needs a recent Spack, gzip+zstd pushes both, chunks stores file contents deduplicated across specs'
 complete -c spack -n '__fish_spack_using_command buildcache create' -s j -l jobs -r -f -a jobs
 complete -c spack -n '__fish_spack_using_command buildcache create' -s j -l jobs -r -d 'explicitly set number of parallel jobs'
 
@@ -2007,7 +2042,7 @@ complete -c spack -n '__fish_spack_using_command info' -l variants-by-name -f -a
 complete -c spack -n '__fish_spack_using_command info' -l variants-by-name -d 'list variants in strict name order; don'"'"'t group by condition'
 
 # spack install
-set -g __fish_spack_optspecs_spack_install h/help only= u/until= j/jobs= overwrite fail-fast keep-prefix keep-stage dont-restage use-cache no-cache cache-only use-buildcache= include-build-deps no-check-signature show-log-on-error source n/no-checksum v/verbose fake only-concrete add no-add f/file= clean dirty test= log-format= log-file= help-cdash cdash-upload-url= cdash-build= cdash-site= cdash-track= cdash-buildstamp= y/yes-to-all U/fresh reuse fresh-roots deprecated
+set -g __fish_spack_optspecs_spack_install h/help only= u/until= j/jobs= p/concurrent-packages= overwrite fail-fast keep-prefix keep-stage dont-restage use-cache no-cache cache-only use-buildcache= include-build-deps no-check-signature show-log-on-error source n/no-checksum v/verbose fake only-concrete add no-add f/file= clean dirty test= log-format= log-file= help-cdash cdash-upload-url= cdash-build= cdash-site= cdash-track= cdash-buildstamp= y/yes-to-all U/fresh reuse fresh-roots deprecated
 complete -c spack -n '__fish_spack_using_command_pos_remainder 0 install' -f -k -a '(__fish_spack_specs)'
 complete -c spack -n '__fish_spack_using_command install' -s h -l help -f -a help
 complete -c spack -n '__fish_spack_using_command install' -s h -l help -d 'show this help message and exit'
@@ -2017,6 +2052,8 @@ complete -c spack -n '__fish_spack_using_command install' -s u -l until -r -f -a
 complete -c spack -n '__fish_spack_using_command install' -s u -l until -r -d 'phase to stop after when installing (default None)'
 complete -c spack -n '__fish_spack_using_command install' -s j -l jobs -r -f -a jobs
 complete -c spack -n '__fish_spack_using_command install' -s j -l jobs -r -d 'explicitly set number of parallel jobs'
+complete -c spack -n '__fish_spack_using_command install' -s p -l concurrent-packages -r -f -a concurrent_packages
+complete -c spack -n '__fish_spack_using_command install' -s p -l concurrent-packages -r -d 'maximum number of packages to build concurrently (default from config)'
 complete -c spack -n '__fish_spack_using_command install' -l overwrite -f -a overwrite
 complete -c spack -n '__fish_spack_using_command install' -l overwrite -d 'reinstall an existing spec, even if it has dependents'
 complete -c spack -n '__fish_spack_using_command install' -l fail-fast -f -a fail_fast
@@ -2695,9 +2732,11 @@ complete -c spack -n '__fish_spack_using_command python' -l path -f -a show_path
 complete -c spack -n '__fish_spack_using_command python' -l path -d 'show path to python interpreter that spack uses'
 
 # spack reindex
-set -g __fish_spack_optspecs_spack_reindex h/help
+set -g __fish_spack_optspecs_spack_reindex h/help j/jobs=
 complete -c spack -n '__fish_spack_using_command reindex' -s h -l help -f -a help
 complete -c spack -n '__fish_spack_using_command reindex' -s h -l help -d 'show this help message and exit'
+complete -c spack -n '__fish_spack_using_command reindex' -s j -l jobs -r -f -a jobs
+complete -c spack -n '__fish_spack_using_command reindex' -s j -l jobs -r -d 'number of processes used to read spec files from the install tree (default: 1)'
 
 # spack remove
 set -g __fish_spack_optspecs_spack_remove h/help a/all l/list-name= f/force
@@ -3148,7 +3187,7 @@ complete -c spack -n '__fish_spack_using_command url stats' -l show-issues -f -a
 complete -c spack -n '__fish_spack_using_command url stats' -l show-issues -d 'show packages with issues (md5 hashes, http urls)'
 
 # spack verify
-set -g __fish_spack_optspecs_spack_verify h/help l/local j/json a/all s/specs f/files
+set -g __fish_spack_optspecs_spack_verify h/help l/local j/json a/all fast jobs= s/specs f/files
 complete -c spack -n '__fish_spack_using_command_pos_remainder 0 verify' $__fish_spack_force_files -a '(__fish_spack_installed_specs)'
 complete -c spack -n '__fish_spack_using_command verify' -s h -l help -f -a help
 complete -c spack -n '__fish_spack_using_command verify' -s h -l help -d 'show this help message and exit'
@@ -3158,6 +3197,10 @@ complete -c spack -n '__fish_spack_using_command verify' -s j -l json -f -a json
 complete -c spack -n '__fish_spack_using_command verify' -s j -l json -d 'ouptut json-formatted errors'
 complete -c spack -n '__fish_spack_using_command verify' -s a -l all -f -a all
 complete -c spack -n '__fish_spack_using_command verify' -s a -l all -d 'verify all packages'
+complete -c spack -n '__fish_spack_using_command verify' -l fast -f -a fast
+complete -c spack -n '__fish_spack_using_command verify' -l fast -d 'do not hash again files whose size, modification time and inode did not change since the last verification'
+complete -c spack -n '__fish_spack_using_command verify' -l jobs -r -f -a jobs
+complete -c spack -n '__fish_spack_using_command verify' -l jobs -r -d 'explicitly set number of parallel jobs used to hash files'
 complete -c spack -n '__fish_spack_using_command verify' -s s -l specs -f -a type
 complete -c spack -n '__fish_spack_using_command verify' -s s -l specs -d 'treat entries as specs (default)'
 complete -c spack -n '__fish_spack_using_command verify' -s f -l files -f -a type